@@ -19,6 +19,7 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 from fantastico.contrib.dynamic_menu.menu_exceptions import FantasticoMenuNotFoundException
 from fantastico.contrib.dynamic_menu.models.menus import DynamicMenuItem, DynamicMenu
 from fantastico.mvc.base_controller import BaseController
+from fantastico.mvc.cache_decorator import Cached
 from fantastico.mvc.controller_decorators import ControllerProvider, Controller
 from fantastico.mvc.models.model_filter import ModelFilter
 from webob.response import Response
@@ -47,8 +48,10 @@ class DynamicMenuController(BaseController):
     @Controller(url=ITEMS_URL, method="GET",
                 models={"Menus": "fantastico.contrib.dynamic_menu.models.menus.DynamicMenu",
                         "Items": "fantastico.contrib.dynamic_menu.models.menus.DynamicMenuItem"})
+    @Cached(ttl=300)
     def retrieve_menu_items(self, request, menu_id):
-        '''This method is used to retrieve all items associated with a specified menu.
+        '''This method is used to retrieve all items associated with a specified menu. Menu items are cached until menus or
+        menu items change (in any worker) or for at most five minutes.
 
         :param request: Http request being processed.
         :type request: HTTP request
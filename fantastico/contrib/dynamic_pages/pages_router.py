@@ -19,6 +19,7 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 from fantastico.contrib.dynamic_pages.models.pages import DynamicPage, DynamicPageModel
 from fantastico.exceptions import FantasticoTemplateNotFoundError
 from fantastico.mvc.base_controller import BaseController
+from fantastico.mvc.cache_decorator import Cached
 from fantastico.mvc.controller_decorators import ControllerProvider, Controller
 from fantastico.mvc.models.model_filter import ModelFilter
 from webob.response import Response
@@ -64,9 +65,11 @@ class PagesRouter(BaseController):
     @Controller(url="/dynamic/(?P<page_url>.*)$", method="GET",
                 models={"DynamicPage": "fantastico.contrib.dynamic_pages.models.pages.DynamicPage",
                         "DynamicPageModel": "fantastico.contrib.dynamic_pages.models.pages.DynamicPageModel"})
+    @Cached(ttl=60, vary=["Authorization", "Cookie"])
     def serve_dynamic_page(self, request, page_url, os_provider=os):
         '''This method is used to route all /dynamic/... requests to database pages. It renders the configured template into
-        database binded to :py:class:`fantastico.contrib.models.pages.DynamicPageModel` values.'''
+        database binded to :py:class:`fantastico.contrib.models.pages.DynamicPageModel` values. Rendered pages are cached
+        until pages or page models change (in any worker) or for at most one minute.'''
 
         page_facade = request.models.DynamicPage
         page_attr_facade = request.models.DynamicPageModel
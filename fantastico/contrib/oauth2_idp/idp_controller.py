@@ -24,10 +24,8 @@ from fantastico.contrib.oauth2_idp.models.user_repository import UserRepository
 from fantastico.mvc.base_controller import BaseController
 from fantastico.mvc.controller_decorators import Controller, ControllerProvider, \
     CorsEnabled
-from fantastico.mvc.models.model_filter import ModelFilter
-from fantastico.mvc.models.model_filter_compound import ModelFilterAnd
 from fantastico.oauth2.exceptions import OAuth2MissingQueryParamError, OAuth2AuthenticationError, OAuth2Error
-from fantastico.oauth2.models.return_urls import ClientReturnUrl
+from fantastico.oauth2.models.return_urls_index import RETURN_URLS_INDEX
 from fantastico.oauth2.oauth2_decorators import RequiredScopes
 from fantastico.oauth2.passwords_hasher_factory import PasswordsHasherFactory
 from fantastico.oauth2.tokengenerator_factory import TokenGeneratorFactory
@@ -42,7 +40,7 @@ class IdpController(BaseController):
 
     REDIRECT_PARAM = "redirect_uri"
 
-    def __init__(self, settings_facade, passwords_hasher_cls=PasswordsHasherFactory):
+    def __init__(self, settings_facade, passwords_hasher_cls=PasswordsHasherFactory, urls_index=None):
         super(IdpController, self).__init__(settings_facade)
 
         self._idp_config = self._settings_facade.get("oauth2_idp")
@@ -50,6 +48,7 @@ class IdpController(BaseController):
         self._idp_expires_in = self._idp_config["expires_in"]
         self._login_tpl = self._idp_config["template"]
         self._passwords_hasher = passwords_hasher_cls().get_hasher(PasswordsHasherFactory.SHA512_SALT)
+        self._urls_index = urls_index or RETURN_URLS_INDEX
 
     @Controller(url="^/oauth/idp/ui/login$")
     def show_login(self, request):
@@ -138,20 +137,10 @@ class IdpController(BaseController):
             raise OAuth2AuthenticationError("Unexpected error occured: %s" % str(ex))
 
     def _validate_return_url(self, clienturls_facade, return_url):
-        '''This test case checks the existence of return url in the list of supported return urls for idp.'''
+        '''This method checks the existence of return url in the list of supported return urls for idp. The check is done
+        against the in memory return urls index; clienturls_facade is used only when the index must be rebuilt.'''
 
-        qmark_pos = return_url.find("?")
-
-        if qmark_pos > -1:
-            return_url = return_url[:qmark_pos]
-
-        client_urls = clienturls_facade.get_records_paged(
-                                    start_record=0, end_record=1,
-                                    filter_expr=ModelFilterAnd(
-                                                    ModelFilter(ClientReturnUrl.client_id, self._idp_client_id, ModelFilter.EQ),
-                                                    ModelFilter(ClientReturnUrl.return_url, return_url, ModelFilter.EQ)))
-
-        if len(client_urls) != 1:
+        if not self._urls_index.is_registered(return_url, clienturls_facade, client_id=self._idp_client_id):
             raise OAuth2MissingQueryParamError(self.REDIRECT_PARAM)
 
     def _validate_user(self, username, password, user_repo):
@@ -18,10 +18,7 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 '''
 
 from fantastico.contrib.oauth2_idp.models.users import User
-from fantastico.mvc.models.model_filter import ModelFilter
-from fantastico.mvc.models.model_filter_compound import ModelFilterAnd
 from fantastico.oauth2.exceptions import OAuth2MissingQueryParamError, OAuth2AuthenticationError, OAuth2Error
-from fantastico.oauth2.models.return_urls import ClientReturnUrl
 from fantastico.oauth2.passwords_hasher_factory import PasswordsHasherFactory
 from fantastico.oauth2.token import Token
 from fantastico.oauth2.tokengenerator_factory import TokenGeneratorFactory
@@ -41,6 +38,7 @@ class IdpControllerTests(FantasticoUnitTestsCase):
 
     _idp_controller = None
     _hasher = None
+    _urls_index = None
 
     _tokens_service = None
     _tokens_service_cls = None
@@ -61,7 +59,10 @@ class IdpControllerTests(FantasticoUnitTestsCase):
         settings_facade = Mock()
         settings_facade.get = Mock(return_value=oauth2_idp)
 
-        self._idp_controller = IdpController(settings_facade, passwords_hasher_cls=hasher_cls)
+        self._urls_index = Mock()
+        self._urls_index.is_registered = Mock(return_value=True)
+
+        self._idp_controller = IdpController(settings_facade, passwords_hasher_cls=hasher_cls, urls_index=self._urls_index)
 
         settings_facade.get.assert_called_once_with("oauth2_idp")
         hasher_cls.assert_called_once_with()
@@ -207,17 +208,12 @@ class IdpControllerTests(FantasticoUnitTestsCase):
         request, user_repo_cls, user_repo, tokens_service_cls, \
             tokens_service, clienturl_facade = self._mock_authenticate_dependencies(token, user, return_url)
 
-        clienturl_facade.get_records_paged = Mock(return_value=[])
+        self._urls_index.is_registered = Mock(return_value=False)
 
         with self.assertRaises(OAuth2MissingQueryParamError):
             self._idp_controller.authenticate(request, tokens_service_cls=tokens_service_cls, user_repo_cls=user_repo_cls)
 
-        return_url = return_url[:return_url.find("?")]
-        clienturl_facade.get_records_paged.assert_called_once_with(
-                                    start_record=0, end_record=1,
-                                    filter_expr=ModelFilterAnd(
-                                                    ModelFilter(ClientReturnUrl.client_id, self._IDP_CLIENTID, ModelFilter.EQ),
-                                                    ModelFilter(ClientReturnUrl.return_url, return_url, ModelFilter.EQ)))
+        self._urls_index.is_registered.assert_called_once_with(return_url, clienturl_facade, client_id=self._IDP_CLIENTID)
 
     def _test_authenticate_missing_param(self, user, return_url, param_name):
         '''This method provides a template test case for checking missing required query parameters tests.'''
@@ -449,16 +445,7 @@ class IdpControllerTests(FantasticoUnitTestsCase):
     def _mock_authenticate_dependencies(self, token, user, return_url):
         '''This method mocks authenticate dependencies and returns them as a tuple object.'''
 
-        if return_url:
-            return_url_base = return_url
-
-            if return_url_base.find("?") > -1:
-                return_url_base = return_url_base[:return_url_base.find("?")]
-
         clienturl_facade = Mock()
-
-        if return_url:
-            clienturl_facade.get_records_paged = Mock(return_value=[return_url_base])
         clienturl_facade.session = Mock()
 
         request = Mock()
@@ -90,8 +90,6 @@ class RoaDiscoveryController(BaseController):
         body = json.dumps(body).encode()
         
         response = Response(body=body, content_type="application/json", charset="UTF-8")
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "OPTIONS,GET,POST,PUT,DELETE"
         
         return response
 
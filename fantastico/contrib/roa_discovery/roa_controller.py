@@ -18,7 +18,9 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 '''
 from fantastico import mvc
 from fantastico.contrib.roa_discovery import roa_helper
-from fantastico.exceptions import FantasticoDbError
+from fantastico.exceptions import FantasticoDbError, FantasticoDbConflictError
+from fantastico.middleware.compression_middleware import etag_matches
+from fantastico.middleware.conditional_middleware import compute_etag, is_not_modified
 from fantastico.mvc.base_controller import BaseController
 from fantastico.mvc.controller_decorators import ControllerProvider, Controller, \
     CorsEnabled
@@ -92,7 +94,6 @@ class RoaController(BaseController):
                  "error_details": error_details}
 
         response = Response(text=json.dumps(error), status_code=http_code, content_type="application/json")
-        self._add_cors_headers(response)
 
         return response
 
@@ -152,6 +153,67 @@ class RoaController(BaseController):
                                                     (url, version, str(dbex)),
                                           error_details=self._errors_url % error_code)
 
+    def _handle_resource_precondition_failed(self, version, url, resource_id):
+        '''This method builds a resource precondition failed response which is sent to the client when the **If-Match** header
+        does not match the current version of the resource.'''
+
+        error_code = 10050
+
+        return self._build_error_response(http_code=412,
+                                          error_code=error_code,
+                                          error_description="Resource %s version %s id %s was modified meanwhile." % \
+                                                    (url, version, resource_id),
+                                          error_details=self._errors_url % error_code)
+
+    def _build_etag(self, resource, *row_versions):
+        '''This method builds a strong ETag for the given resource from the given row version values.'''
+
+        tag = "|".join(str(value) for value in (resource.name, resource.version) + row_versions)
+
+        return compute_etag(tag.encode())
+
+    def _get_item_etag(self, resource, resource_id, model):
+        '''This method returns the ETag of an already loaded resource item or None if the resource does not declare a version
+        column.'''
+
+        if not resource.version_column:
+            return None
+
+        return self._build_etag(resource, resource_id, getattr(model, resource.version_column))
+
+    def _build_not_modified_response(self, etag):
+        '''This method builds a bodiless not modified response for the given ETag.'''
+
+        response = Response(status=304)
+        response.headers["ETag"] = etag
+
+        return response
+
+    def _is_precondition_failed(self, request, etag):
+        '''This method returns True if the request carries an **If-Match** header which does not match the given item ETag.
+        **If-Match** is ignored for resources which do not declare a version column (etag is None). ETags of compressed
+        representations match the item ETag.'''
+
+        if not etag:
+            return False
+
+        if_match = request.environ.get("HTTP_IF_MATCH")
+
+        if not if_match:
+            return False
+
+        return not etag_matches(etag, if_match)
+
+    def _get_expected_values(self, request, resource, model):
+        '''This method returns the column values an item must still hold when it is updated or deleted: the version column
+        value read before if the request carries an **If-Match** header (None otherwise). This way, two concurrent writers
+        sending the same ETag can not both succeed.'''
+
+        if not resource.version_column or not request.environ.get("HTTP_IF_MATCH"):
+            return None
+
+        return {getattr(resource.model, resource.version_column): getattr(model, resource.version_column)}
+
     def _get_current_connection(self, request):
         '''This method returns the current db connection for this request.'''
 
@@ -168,12 +230,6 @@ class RoaController(BaseController):
 
         return resource_url
 
-    def _add_cors_headers(self, response):
-        '''This method add cors headers to a given respones.'''
-
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "OPTIONS,GET,POST,PUT,DELETE"
-
     @Controller(url=BASE_URL + "$", method="GET")
     def get_collection(self, request, version, resource_url):
         '''This method provides the route for accessing a resource collection. :doc:`/features/roa/rest_standard` for collections
@@ -193,6 +249,10 @@ class RoaController(BaseController):
             {"error_code": 10000,
              "error_description": "Resource %s version %s does not exist.",
              "error_details": "http://rcosnita.github.io/fantastico/html/features/roa/errors/error_10000.html"}
+
+        For resources which declare a version column, collection responses carry an **ETag** computed from the greatest version,
+        the number of records and (for version counters) the sum of versions matching the filter. **If-None-Match** requests
+        are answered with **304 Not Modified** after this single aggregate query.
         '''
 
         if version != "latest":
@@ -223,6 +283,16 @@ class RoaController(BaseController):
 
         model_facade = self._model_facade_cls(resource.model, self._get_current_connection(request))
 
+        etag = None
+
+        if resource.version_column:
+            max_version, models_count, versions_sum = \
+                        model_facade.aggregate_version(getattr(resource.model, resource.version_column), filter_expr=filter_expr)
+            etag = self._build_etag(resource, max_version, models_count, versions_sum)
+
+            if is_not_modified(request.environ, etag):
+                return self._build_not_modified_response(etag)
+
         models = model_facade.get_records_paged(start_record=params.offset, end_record=params.offset + params.limit,
                                                 filter_expr=filter_expr,
                                                 sort_expr=sort_expr)
@@ -231,14 +301,16 @@ class RoaController(BaseController):
         if resource.validator:
             resource.validator().format_collection(items, request)
 
-        models_count = model_facade.count_records(filter_expr=filter_expr)
+        if not etag:
+            models_count = model_facade.count_records(filter_expr=filter_expr)
 
         body = {"items": items,
                 "totalItems": models_count}
 
         response = Response(text=json.dumps(body), content_type="application/json", status_code=200)
 
-        self._add_cors_headers(response)
+        if etag:
+            response.headers["ETag"] = etag
 
         return response
 
@@ -313,6 +385,9 @@ class RoaController(BaseController):
             * **10000** - Whenever we try to retrieve a resource with unknown type. (Not registered to ROA).
             * **10030** - Whenever we try to retrieve a resource and an unexpected database exception occurs.
             * **10040** - Whenever we try to retrieve a resource which does not exist.
+
+        For resources which declare a version column, item responses carry an **ETag**. **If-None-Match** requests are answered
+        with **304 Not Modified** after selecting only the version column of the item.
         '''
 
         if version != "latest":
@@ -330,6 +405,15 @@ class RoaController(BaseController):
 
         model_facade = self._model_facade_cls(resource.model, self._get_current_connection(request))
 
+        if resource.version_column and request.environ.get("HTTP_IF_NONE_MATCH"):
+            try:
+                not_modified = self._get_item_not_modified(request, resource, model_facade, resource_id, access_token)
+            except FantasticoDbError as dbex:
+                return self._handle_resource_dberror(version, resource_url, dbex)
+
+            if not_modified:
+                return not_modified
+
         try:
             model = model_facade.find_by_pk({model_facade.model_pk_cols[0]: resource_id})
 
@@ -346,15 +430,42 @@ class RoaController(BaseController):
         resource_body = json_serializer.serialize(model, fields)
 
         if resource.validator and model:
-            resource.validator().format_resource(DictionaryObject(resource_body, immutable=False), request)
+            resource.validator().format_resource(DictionaryObject.view(resource_body, immutable=False), request)
 
         resource_body = json.dumps(resource_body)
 
         response = Response(body=resource_body.encode(), content_type="application/json", status_code=200)
-        self._add_cors_headers(response)
+
+        etag = self._get_item_etag(resource, resource_id, model)
+
+        if etag:
+            response.headers["ETag"] = etag
 
         return response
 
+    def _get_item_not_modified(self, request, resource, model_facade, resource_id, access_token):
+        '''This method returns a not modified response if the client copy of the given item is still valid (None otherwise).
+        Only the version column of the item is selected from database.'''
+
+        filter_expr = None
+
+        if resource.user_dependent:
+            filter_expr = ModelFilter(resource.model.user_id, access_token.user_id, ModelFilter.EQ)
+
+        row_version = model_facade.find_row_version({model_facade.model_pk_cols[0]: resource_id},
+                                                    getattr(resource.model, resource.version_column),
+                                                    filter_expr=filter_expr)
+
+        if row_version is None:
+            return None
+
+        etag = self._build_etag(resource, resource_id, row_version)
+
+        if not is_not_modified(request.environ, etag):
+            return None
+
+        return self._build_not_modified_response(etag)
+
     @Controller(url=BASE_LATEST_URL + "/(?P<resource_id>.*?)$", method="GET")
     def get_item_latest(self, request, resource_url, resource_id):
         '''This method provides the latest get_item route for ROA api.'''
@@ -416,7 +527,6 @@ class RoaController(BaseController):
         model_location += "/%s" % model_id
 
         response = Response(status_code=201, content_type="application/json")
-        self._add_cors_headers(response)
         response.headers["Location"] = model_location
 
         return response
@@ -446,6 +556,8 @@ class RoaController(BaseController):
             * **10020** - Whenever we try to update a resource without passing a valid body.
             * **10030** - Whenever we try to update a resource and an unexpected database exception occurs.
             * **10040** - Whenever we try to update a resource which does not exist.
+            * **10050** - Whenever **If-Match** header does not match the current version of the resource (or the resource is
+              changed meanwhile by a concurrent request).
 
         You can find more information about typical REST ROA APIs response on :doc:`/features/roa/rest_responses`.'''
 
@@ -473,20 +585,24 @@ class RoaController(BaseController):
             if not existing_model or not self._is_model_owned_by(existing_model, access_token, resource):
                 return self._handle_resource_item_notfound(version, resource_url, resource_id)
 
+            if self._is_precondition_failed(request, self._get_item_etag(resource, resource_id, existing_model)):
+                return self._handle_resource_precondition_failed(version, resource_url, resource_id)
+
             setattr(model, pk_col.name, resource_id)
 
             if resource.validator:
                 resource.validator().on_pre_update(model, request)            
             
-            model_facade.update(model)
+            model_facade.update(model, expected_values=self._get_expected_values(request, resource, existing_model))
             
             if resource.validator:
                 resource.validator().on_post_update(model, request)
+        except FantasticoDbConflictError:
+            return self._handle_resource_precondition_failed(version, resource_url, resource_id)
         except FantasticoDbError as dbex:
             return self._handle_resource_dberror(resource.version, resource.url, dbex)
 
         response = Response(content_type="application/json", status_code=204)
-        self._add_cors_headers(response)
 
         return response
 
@@ -512,6 +628,8 @@ class RoaController(BaseController):
             * **10000** - Whenever we try to delete a resource with unknown type. (Not registered to ROA).
             * **10030** - Whenever we try to delete a resource and an unexpected database exception occurs.
             * **10040** - Whenever we try to delete a resource which does not exist.
+            * **10050** - Whenever **If-Match** header does not match the current version of the resource (or the resource is
+              changed meanwhile by a concurrent request).
 
         You can find more information about typical REST ROA APIs response on :doc:`/features/roa/rest_responses`.'''
 
@@ -538,18 +656,23 @@ class RoaController(BaseController):
             if not existing_model:
                 return self._handle_resource_item_notfound(version, resource_url, resource_id)
 
+            if self._is_precondition_failed(request, self._get_item_etag(resource, resource_id, existing_model)):
+                return self._handle_resource_precondition_failed(version, resource_url, resource_id)
+
             if resource.validator:
                 resource.validator().on_pre_delete(existing_model, request)
 
-            model_facade.delete(existing_model)
+            model_facade.delete(existing_model,
+                                expected_values=self._get_expected_values(request, resource, existing_model))
             
             if resource.validator:
                 resource.validator().on_post_delete(existing_model, request)
+        except FantasticoDbConflictError:
+            return self._handle_resource_precondition_failed(version, resource_url, resource_id)
         except FantasticoDbError as dbex:
             return self._handle_resource_dberror(version, resource_url, dbex)
 
         response = Response(content_type="application/json", status_code=204)
-        self._add_cors_headers(response)
 
         return response
 
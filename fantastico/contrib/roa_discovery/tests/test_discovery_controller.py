@@ -57,8 +57,7 @@ class RoaDiscoveryControllerTests(FantasticoUnitTestsCase):
         self.assertIsNotNone(response)
         self.assertEqual(response.content_type, "application/json")
         self.assertEqual(response.charset, "UTF-8")
-        self.assertEqual(response.headers["Access-Control-Allow-Origin"], "*")
-        self.assertEqual(response.headers["Access-Control-Allow-Methods"], "OPTIONS,GET,POST,PUT,DELETE")
+        self.assertNotIn("Access-Control-Allow-Origin", response.headers)
 
         resources = json.loads(response.body.decode())
 
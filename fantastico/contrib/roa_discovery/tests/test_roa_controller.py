@@ -17,7 +17,7 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.contrib.roa_discovery.tests.test_roa_controller
 '''
 
-from fantastico.exceptions import FantasticoDbError
+from fantastico.exceptions import FantasticoDbError, FantasticoDbConflictError
 from fantastico.oauth2.exceptions import OAuth2UnauthorizedError, OAuth2Error
 from fantastico.oauth2.token import Token
 from fantastico.roa.resource_decorator import Resource
@@ -110,10 +110,10 @@ class RoaControllerTests(FantasticoUnitTestsCase):
         self._controller.validate_security_context.assert_called_once_with(request, "read")
 
     def _assert_cors_headers(self, response):
-        '''This method checks response for cors headers.'''
+        '''This method checks response does not set cors headers by hand (they are added by cors middleware).'''
 
-        self.assertEqual("*", response.headers["Access-Control-Allow-Origin"])
-        self.assertEqual("OPTIONS,GET,POST,PUT,DELETE", response.headers["Access-Control-Allow-Methods"])
+        self.assertNotIn("Access-Control-Allow-Origin", response.headers)
+        self.assertNotIn("Access-Control-Allow-Methods", response.headers)
 
     def test_get_collection_default_values_emptyresult(self):
         '''This test case ensures get collection works as expected without any query parameters passed. It ensures
@@ -132,6 +132,7 @@ class RoaControllerTests(FantasticoUnitTestsCase):
 
         resource = Mock()
         resource.user_dependent = False
+        resource.version_column = None
         resource.model = Mock()
 
         self._mock_model_facade(records=expected_records, records_count=expected_records_count)
@@ -173,6 +174,7 @@ class RoaControllerTests(FantasticoUnitTestsCase):
 
         resource = Mock()
         resource.user_dependent = False
+        resource.version_column = None
         resource.model = Mock()
 
         self._query_parser.parse_filter = Mock(return_value=expected_filter)
@@ -699,7 +701,7 @@ class RoaControllerTests(FantasticoUnitTestsCase):
         self._model_facade.find_by_pk.assert_called_once_with({MockSimpleResourceRoa.id: resource_id})
         self._json_serializer_cls.assert_called_once_with(resource)
         self._json_serializer.deserialize.assert_called_once_with(json.dumps(expected_body))
-        self._model_facade.update.assert_called_once_with(model)
+        self._model_facade.update.assert_called_once_with(model, expected_values=None)
         self._controller.validate_security_context.assert_called_once_with(request, "update")
 
     def test_delete_item_resource_unknown(self):
@@ -800,9 +802,206 @@ class RoaControllerTests(FantasticoUnitTestsCase):
 
         self._resources_registry.find_by_url.assert_called_once_with(url, float(version))
         self._model_facade.find_by_pk.assert_called_once_with({MockSimpleResourceRoa.id: resource_id})
-        self._model_facade.delete.assert_called_once_with(model)
+        self._model_facade.delete.assert_called_once_with(model, expected_values=None)
         self._controller.validate_security_context.assert_called_once_with(request, "delete")
 
+    def _mock_versioned_resource(self, url):
+        '''This method registers a resource which declares a version column and returns it.'''
+
+        resource = Resource(name="Mock Versioned Resource", url=url, version=1.0, version_column="updated_at")
+        resource(MockVersionedResourceRoa, self._resources_registry)
+
+        self._controller.validate_security_context = Mock(return_value=None)
+        self._resources_registry.find_by_url = Mock(return_value=resource)
+        self._model_facade.model_pk_cols = [MockVersionedResourceRoa.id]
+
+        return resource
+
+    def test_get_item_not_modified(self):
+        '''This test case ensures an item which did not change is answered with 304 after selecting only its version.'''
+
+        url = "/versioned-resources"
+        resource_id = "1986"
+
+        resource = self._mock_versioned_resource(url)
+        etag = self._controller._build_etag(resource, resource_id, 7)
+
+        request = Mock()
+        request.params = {}
+        request.environ = {"HTTP_IF_NONE_MATCH": etag}
+
+        self._model_facade.find_row_version = Mock(return_value=7)
+        self._model_facade.find_by_pk = Mock()
+
+        response = self._controller.get_item(request, "1.0", url, resource_id)
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response.headers["ETag"])
+        self.assertEqual(0, len(response.body))
+        self._assert_cors_headers(response)
+
+        self._model_facade.find_row_version.assert_called_once_with({MockVersionedResourceRoa.id: resource_id},
+                                                                    MockVersionedResourceRoa.updated_at,
+                                                                    filter_expr=None)
+        self.assertFalse(self._model_facade.find_by_pk.called)
+        self.assertFalse(self._json_serializer.serialize.called)
+
+    def test_get_item_modified(self):
+        '''This test case ensures an item which changed is rendered and receives its current ETag.'''
+
+        url = "/versioned-resources"
+        resource_id = "1986"
+
+        resource = self._mock_versioned_resource(url)
+
+        request = Mock()
+        request.params = {}
+        request.environ = {"HTTP_IF_NONE_MATCH": self._controller._build_etag(resource, resource_id, 7)}
+
+        model = Mock()
+        model.updated_at = 8
+
+        self._model_facade.find_row_version = Mock(return_value=8)
+        self._model_facade.find_by_pk = Mock(return_value=model)
+        self._json_serializer.serialize = Mock(return_value={"id": 1986})
+
+        response = self._controller.get_item(request, "1.0", url, resource_id)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"id": 1986}, json.loads(response.body.decode()))
+        self.assertEqual(self._controller._build_etag(resource, resource_id, 8), response.headers["ETag"])
+
+        self._model_facade.find_by_pk.assert_called_once_with({MockVersionedResourceRoa.id: resource_id})
+
+    def test_get_collection_not_modified(self):
+        '''This test case ensures a collection which did not change is answered with 304 after a single aggregate query.'''
+
+        url = "/versioned-resources"
+
+        resource = self._mock_versioned_resource(url)
+        etag = self._controller._build_etag(resource, 7, 20, 95)
+
+        request = Mock()
+        request.params = {}
+        request.environ = {"HTTP_IF_NONE_MATCH": etag}
+
+        self._model_facade.aggregate_version = Mock(return_value=(7, 20, 95))
+        self._mock_model_facade(records=[], records_count=0)
+
+        response = self._controller.get_collection(request, "1.0", url)
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response.headers["ETag"])
+
+        self._model_facade.aggregate_version.assert_called_once_with(MockVersionedResourceRoa.updated_at, filter_expr=None)
+        self.assertFalse(self._model_facade.get_records_paged.called)
+        self.assertFalse(self._model_facade.count_records.called)
+
+    def test_get_collection_etag(self):
+        '''This test case ensures collection responses of versioned resources carry an ETag and reuse the aggregate count.'''
+
+        url = "/versioned-resources"
+
+        resource = self._mock_versioned_resource(url)
+
+        request = Mock()
+        request.params = {}
+        request.environ = {}
+
+        self._model_facade.aggregate_version = Mock(return_value=(7, 20, 95))
+        self._mock_model_facade(records=[Mock()], records_count=0)
+        self._json_serializer.serialize = Mock(return_value={"id": 1})
+
+        response = self._controller.get_collection(request, "1.0", url)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(self._controller._build_etag(resource, 7, 20, 95), response.headers["ETag"])
+        self.assertEqual({"items": [{"id": 1}], "totalItems": 20}, json.loads(response.body.decode()))
+
+        self.assertFalse(self._model_facade.count_records.called)
+
+    def test_update_item_precondition_failed(self):
+        '''This test case ensures an item is not updated when If-Match header does not match its current version.'''
+
+        url = "/versioned-resources"
+        resource_id = "12345"
+
+        resource = self._mock_versioned_resource(url)
+
+        request = Mock()
+        request.body = json.dumps({"name": "cool name"}).encode()
+        request.environ = {"HTTP_IF_MATCH": self._controller._build_etag(resource, resource_id, 7)}
+
+        existing_model = Mock()
+        existing_model.updated_at = 8
+
+        self._json_serializer.deserialize = Mock(return_value=Mock())
+        self._model_facade.find_by_pk = Mock(return_value=existing_model)
+
+        response = self._controller.update_item(request, "1.0", url, resource_id)
+
+        self._assert_resource_error(response, 412, 10050, "1.0", url)
+        self.assertFalse(self._model_facade.update.called)
+
+    def test_delete_item_if_match(self):
+        '''This test case ensures an item is deleted when If-Match header matches its current version (ETags of compressed
+        representations match too).'''
+
+        url = "/versioned-resources"
+        resource_id = "12345"
+
+        resource = self._mock_versioned_resource(url)
+
+        existing_model = Mock()
+        existing_model.updated_at = 8
+
+        etag = self._controller._build_etag(resource, resource_id, 8)
+
+        request = Mock()
+        request.environ = {"HTTP_IF_MATCH": "\"other\", \"%s-gzip\"" % etag.strip('"')}
+
+        self._model_facade.find_by_pk = Mock(return_value=existing_model)
+
+        response = self._controller.delete_item(request, "1.0", url, resource_id)
+
+        self.assertEqual(204, response.status_code)
+        self._model_facade.delete.assert_called_once_with(existing_model,
+                                                          expected_values={MockVersionedResourceRoa.updated_at: 8})
+
+    def test_update_item_concurrent_write(self):
+        '''This test case ensures an item is updated only if it still holds the version matched by If-Match header (412 is
+        returned when a concurrent request changed it meanwhile).'''
+
+        url = "/versioned-resources"
+        resource_id = "12345"
+
+        resource = self._mock_versioned_resource(url)
+
+        request = Mock()
+        request.body = json.dumps({"name": "cool name"}).encode()
+        request.environ = {"HTTP_IF_MATCH": self._controller._build_etag(resource, resource_id, 8)}
+
+        existing_model = Mock()
+        existing_model.updated_at = 8
+
+        model = Mock()
+
+        self._json_serializer.deserialize = Mock(return_value=model)
+        self._model_facade.find_by_pk = Mock(return_value=existing_model)
+        self._model_facade.update = Mock(side_effect=FantasticoDbConflictError("Changed meanwhile."))
+
+        response = self._controller.update_item(request, "1.0", url, resource_id)
+
+        self._assert_resource_error(response, 412, 10050, "1.0", url)
+        self._model_facade.update.assert_called_once_with(model,
+                                                          expected_values={MockVersionedResourceRoa.updated_at: 8})
+
+        self._model_facade.delete = Mock(side_effect=FantasticoDbConflictError("Removed meanwhile."))
+
+        response = self._controller.delete_item(request, "1.0", url, resource_id)
+
+        self._assert_resource_error(response, 412, 10050, "1.0", url)
+
     def test_validate_security_context_ok(self):
         '''This test case ensures that security context validation works as expected.'''
 
@@ -874,3 +1073,10 @@ class MockSimpleResourceValidator(ResourceValidator):
             raise FantasticoRoaError("Name must be provided.")
 
         return True
+
+class MockVersionedResourceRoa(object):
+    '''This class provides a very simple resource which declares a version column. It is used in tests.'''
+
+    id = Column("id", Integer)
+    name = Column("name", String(50))
+    updated_at = Column("updated_at", Integer)
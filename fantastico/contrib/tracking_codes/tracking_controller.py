@@ -21,6 +21,7 @@ import json
 from webob.response import Response
 
 from fantastico.mvc.base_controller import BaseController
+from fantastico.mvc.cache_decorator import Cached
 from fantastico.mvc.controller_decorators import ControllerProvider, Controller
 
 @ControllerProvider()
@@ -54,6 +55,7 @@ class TrackingController(BaseController):
         return response
 
     @Controller(url="^/tracking-codes/ui/codes(/)?$") #pylint: disable=W0613
+    @Cached(ttl=300, models=["fantastico.contrib.tracking_codes.models.codes.TrackingCode"])
     def list_codes_ui(self, request):
         '''This method renders all available tracking codes.'''
 
@@ -17,26 +17,49 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.config_nginx
 '''
 from argparse import ArgumentParser
-from fantastico.settings import BasicSettings
+from fantastico.mvc.controller_decorators import Controller
+from fantastico.mvc.controller_registrator import ControllerRouteLoader
+from fantastico.mvc.static_assets_controller import FINGERPRINT_REGEX
+from fantastico.roa.resources_registrator import ResourcesRegistrator
+from fantastico.roa.resources_registry import ResourcesRegistry
+from fantastico.settings import BasicSettings, SettingsFacade
 from fantastico.utils import instantiator
 from jinja2.environment import Environment
 from jinja2.loaders import FileSystemLoader
 import os
+import re
 import sys
 
 class ConfigNginx(object):
     '''This class provides all required operations for generating a valid nginx configuration file for
     a given domain name and ip address. The configuration can be used together with other scripts in order
-    to include the configuration into nginx enabled sites.'''
+    to include the configuration into nginx enabled sites.
+
+    The generated configuration is built from the routes of the active settings profile:
+
+    * GET routes decorated with :py:class:`fantastico.mvc.cache_decorator.Cached` and resources declaring **cache_ttl**
+      (:py:class:`fantastico.roa.resource_decorator.Resource`) are micro cached by nginx (**uwsgi_cache**) for their ttl
+      (at most **--max-cache-ttl** seconds).
+      Requests carrying an **Authorization** header are never served from (or stored into) nginx cache.
+    * fingerprinted static assets are sent with far future **expires** headers and **.gz** siblings are sent to clients
+      accepting gzip.
+    * gzip settings are taken from **compression_config** setting and the **X-Accel-Redirect** internal location from
+      **static_assets_config** setting.'''
+
+    def __init__(self, settings_facade=SettingsFacade, route_loaders=None, controller_cls=Controller,
+                 resources_registry_cls=ResourcesRegistry):
+        self._settings_facade_cls = settings_facade
+        self._route_loaders = route_loaders or [ControllerRouteLoader, ResourcesRegistrator]
+        self._controller_cls = controller_cls
+        self._resources_registry_cls = resources_registry_cls
 
-    def __init__(self):
         self._args_parser = ArgumentParser(description="This script generates an nginx vhost file for the" +
                                            " current fantastico project.")
 
         root_folder = os.path.abspath(instantiator.get_class_abslocation(BasicSettings) + "../")
         
         tpl_loader = FileSystemLoader(searchpath=root_folder)
-        self._tpl_env = Environment(loader=tpl_loader)        
+        self._tpl_env = Environment(loader=tpl_loader, trim_blocks=True)
         
         self._build_args_parser()
             
@@ -61,20 +84,85 @@ class ConfigNginx(object):
         self._args_parser.add_argument("--modules-folder", dest="modules_folder", type=str,
                                        help="Modules folder where this project holds fantastico custom components.",
                                        default="/")
+        self._args_parser.add_argument("--cache-path", dest="cache_path", type=str,
+                                       help="Folder where nginx stores micro cached responses.",
+                                       default="/var/cache/nginx/fantastico")
+        self._args_parser.add_argument("--cache-size", dest="cache_size", type=str,
+                                       help="Maximum size of nginx micro cache: e.g 256m",
+                                       default="256m")
+        self._args_parser.add_argument("--max-cache-ttl", dest="max_cache_ttl", type=int,
+                                       help="Maximum number of seconds nginx micro caches a response.",
+                                       default=10)
+
+    def get_cached_locations(self, settings_facade, max_ttl=10):
+        '''This method loads all routes of the current project and returns the nginx locations which can be micro cached.
+        Each location is described by url regex, ttl, name and the nginx variables which must be added to cache key (for
+        headers listed in vary argument of :py:class:`fantastico.mvc.cache_decorator.Cached`). Ttls are limited to max_ttl
+        seconds because nginx cache is not invalidated when models change.'''
+
+        for loader_cls in self._route_loaders:
+            loader_cls(settings_facade).load_routes()
+
+        locations = []
+
+        for controller in self._controller_cls.get_registered_routes():
+            cache_policy = getattr(getattr(controller.fn_handler, "orig_fn", None), "cache_policy", None)
+
+            if "GET" not in controller.method or not cache_policy or not cache_policy.ttl or cache_policy.key:
+                continue
+
+            vary = "".join("$http_%s" % header.lower().replace("-", "_") for header in cache_policy.vary)
+
+            for url in controller.url:
+                locations.append({"url": url.replace('"', '\\"'), "ttl": min(cache_policy.ttl, max_ttl), "vary": vary,
+                                  "name": controller.fn_handler.full_name})
+
+        roa_api = settings_facade.get("roa_api")
+
+        for name, versions in sorted(self._resources_registry_cls().available_resources.items()):
+            latest = versions.get("latest")
+
+            for version, resource in sorted((version, resource) for version, resource in versions.items()
+                                            if version != "latest"):
+                if not resource.cache_ttl or resource.user_dependent:
+                    continue
+
+                versions_regex = re.escape(str(version)) + ("|latest" if resource is latest else "")
+
+                locations.append({"url": "^%s/(%s)%s(/.*)?$" % (roa_api, versions_regex, re.escape(resource.url)),
+                                  "ttl": min(resource.cache_ttl, max_ttl), "vary": "", "name": "%s %s" % (name, version)})
+
+        return locations
     
     def __call__(self, args):
         '''This method coordinate the config generation by parsing the given arguments and using them
         to generate nginx config file.'''
         
         args_namespace = self._args_parser.parse_args(args)
-        
+
+        settings_facade = self._settings_facade_cls()
+        compression_config = settings_facade.get("compression_config") or {}
+        static_assets_config = settings_facade.get("static_assets_config") or {}
+        name = re.sub("[^a-zA-Z0-9]", "_", args_namespace.vhost_name)
+
         config_data = {"ip_address": args_namespace.ip_address,
                        "vhost_name": args_namespace.vhost_name,
                        "http_port": args_namespace.http_port,
                        "uwsgi_port": args_namespace.uwsgi_port,
                        "root_folder": args_namespace.root_folder,
-                       "modules_folder": args_namespace.modules_folder}
-        
+                       "modules_folder": args_namespace.modules_folder,
+                       "upstream_name": "fantastico_%s" % name,
+                       "cache_zone": "fantastico_%s" % name,
+                       "cache_path": args_namespace.cache_path,
+                       "cache_size": args_namespace.cache_size,
+                       "cached_locations": self.get_cached_locations(settings_facade, args_namespace.max_cache_ttl),
+                       "gzip_level": compression_config.get("level", 6),
+                       "gzip_min_length": compression_config.get("min_size", 1024),
+                       "gzip_types": [content_type for content_type in compression_config.get("content_types", [])
+                                      if content_type != "text/html"],
+                       "x_accel_redirect": static_assets_config.get("x_accel_redirect"),
+                       "fingerprint_regex": FINGERPRINT_REGEX.pattern}
+
         config = self._tpl_env.get_template("/deployment/conf/nginx/fantastico-wsgi").render(config_data) 
         
         return config
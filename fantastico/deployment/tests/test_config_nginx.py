@@ -17,7 +17,9 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.deployment.tests.test_config_nginx
 '''
 from fantastico.deployment.config_nginx import ConfigNginx
-from fantastico.settings import BasicSettings
+from fantastico.mvc.cache_decorator import Cached
+from fantastico.roa.resource_decorator import Resource
+from fantastico.settings import BasicSettings, SettingsFacade
 from fantastico.tests.base_case import FantasticoUnitTestsCase
 from fantastico.utils import instantiator
 from jinja2.environment import Environment
@@ -37,7 +39,18 @@ class ConfigNginxTests(FantasticoUnitTestsCase):
     def init(self):
         self._os_provider = Mock()
         self._args = []
-        self._config_nginx = ConfigNginx()
+        self._route_loader = Mock()
+        self._registered_routes = []
+        self._resources = {}
+
+        controller_cls = Mock()
+        controller_cls.get_registered_routes = Mock(return_value=self._registered_routes)
+
+        resources_registry = Mock()
+        resources_registry.available_resources = self._resources
+
+        self._config_nginx = ConfigNginx(route_loaders=[self._route_loader], controller_cls=controller_cls,
+                                         resources_registry_cls=Mock(return_value=resources_registry))
         
         self._old_error_handler = ArgumentParser.error
         ArgumentParser.error  = self.mocked_error
@@ -75,17 +88,78 @@ class ConfigNginxTests(FantasticoUnitTestsCase):
         root_folder = os.path.abspath(instantiator.get_class_abslocation(BasicSettings) + "../")        
         
         tpl_loader = FileSystemLoader(searchpath=root_folder)
-        tpl_env = Environment(loader=tpl_loader)
-        
+        tpl_env = Environment(loader=tpl_loader, trim_blocks=True)
+
         config_data = {"ip_address": "127.0.0.1",
                        "vhost_name": "test-app.com",
                        "http_port": 80,
                        "uwsgi_port": 12090,
                        "root_folder": "/test/folder/vhost",
-                       "modules_folder": "/"}
+                       "modules_folder": "/",
+                       "upstream_name": "fantastico_test_app_com",
+                       "cache_zone": "fantastico_test_app_com",
+                       "cache_path": "/var/cache/nginx/fantastico",
+                       "cache_size": "256m",
+                       "cached_locations": [],
+                       "gzip_level": 6,
+                       "gzip_min_length": 1024,
+                       "gzip_types": ["text/css", "text/plain", "text/javascript", "application/javascript",
+                                      "application/json", "application/xml", "image/svg+xml"],
+                       "x_accel_redirect": None,
+                       "fingerprint_regex": r"\.[0-9a-f]{10}\.[^./]+$"}
         
         expected_config = tpl_env.get_template("/deployment/conf/nginx/fantastico-wsgi").render(config_data)
         
         config = self._config_nginx(self._args)
         
-        self.assertEqual(expected_config, config)
\ No newline at end of file
+        self.assertEqual(expected_config, config)
+
+        self.assertFalse("uwsgi_cache_path" in config)
+        self.assertTrue('location ~ "^/(.*?)/static/(.*\\.[0-9a-f]{10}\\.[^./]+$)"' in config)
+        self.assertTrue("uwsgi_pass fantastico_test_app_com;" in config)
+        self.assertTrue(self._route_loader.call_count == 1)
+
+    def test_conf_micro_cache(self):
+        '''This test case ensures cached routes and cached resources are micro cached by nginx for their ttl.'''
+
+        @Cached(ttl=30, vary=["Accept-Language"])
+        def list_codes(request):
+            pass
+
+        @Cached(ttl=30, key=lambda request, url_params: request.path)
+        def custom_key(request):
+            pass
+
+        def not_cached(request):
+            pass
+
+        for fn, method in [(list_codes, "GET"), (list_codes, "POST"), (custom_key, "GET"), (not_cached, "GET")]:
+            fn_handler = Mock(orig_fn=fn, full_name="blog.BlogController.%s" % fn.__name__)
+            self._registered_routes.append(Mock(url=["^/blog/%s$" % fn.__name__], method=[method], fn_handler=fn_handler))
+
+        old_version = Resource(name="setting", url="/settings", version=1.0, cache_ttl=5)
+        new_version = Resource(name="setting", url="/settings", version=2.0, cache_ttl=10)
+
+        self._resources["setting"] = {1.0: old_version, 2.0: new_version, "latest": new_version}
+        self._resources["user-setting"] = {1.0: Resource(name="user-setting", url="/user-settings", cache_ttl=5,
+                                                         user_dependent=True)}
+        self._resources["person"] = {1.0: Resource(name="person", url="/persons")}
+
+        locations = self._config_nginx.get_cached_locations(SettingsFacade())
+
+        self.assertEqual([("^/blog/list_codes$", 10, "$http_accept_language"),
+                          (r"^/api/(1\.0)/settings(/.*)?$", 5, ""),
+                          (r"^/api/(2\.0|latest)/settings(/.*)?$", 10, "")],
+                         [(location["url"], location["ttl"], location["vary"]) for location in locations])
+
+        config = self._config_nginx(["--ipaddress", "127.0.0.1", "--vhost-name", "test-app.com", "--uwsgi-port", "12090",
+                                     "--root-folder", "/test/folder/vhost", "--cache-path", "/tmp/nginx-cache",
+                                     "--max-cache-ttl", "60"])
+
+        self.assertTrue("uwsgi_cache_path /tmp/nginx-cache levels=1:2 keys_zone=fantastico_test_app_com:10m max_size=256m" in
+                        config)
+        self.assertTrue('location ~ "^/blog/list_codes$" {' in config)
+        self.assertTrue('uwsgi_cache_key "$scheme$request_method$host$request_uri$http_accept_language";' in config)
+        self.assertTrue("uwsgi_cache_valid 200 30s;" in config)
+        self.assertTrue("uwsgi_cache_valid 200 10s;" in config)
+        self.assertTrue("uwsgi_no_cache $http_authorization;" in config)
@@ -102,6 +102,10 @@ class FantasticoDbNotFoundError(FantasticoDbError):
     '''This exception is usually thrown when an entity does not exist but we try to update it. For one good example where this is
     used see :py:class:`fantastico.mvc.model_facade.ModelFacade`.'''
 
+class FantasticoDbConflictError(FantasticoDbError):
+    '''This exception is usually thrown when a conditional write (optimistic concurrency) does not affect any row because the
+    entity was changed (or removed) meanwhile. See :py:class:`fantastico.mvc.model_facade.ModelFacade`.'''
+
 class FantasticoInsufficientArgumentsError(FantasticoError):
     '''This exception is usually thrown when a component extension received wrong number of arguments. See
     :py:class:`fantastico.rendering.component.Component`.'''
@@ -109,3 +113,8 @@ class FantasticoInsufficientArgumentsError(FantasticoError):
 class FantasticoUrlInvokerError(FantasticoError):
     '''This exception is usually thrown when an internal url invoker fails. For instance, if a component reusage rendering
     fails then this exception is raised.'''
+
+class FantasticoUnsafeFileError(FantasticoError):
+    '''This exception is thrown when a file (or folder) holding data which is loaded by the framework (e.g: pickled cache entries)
+    is not private to the current user or does not have the expected layout. See
+    :py:mod:`fantastico.utils.private_files`.'''
@@ -0,0 +1,265 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.access_log_middleware
+'''
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+from logging.handlers import WatchedFileHandler
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+class AsyncAccessLogWriter(object):
+    '''This class provides a file writer which never blocks the caller on disk I/O. Lines are appended into a bounded
+    in memory queue and a background thread writes them in batches. When the queue is full or the file can not be written,
+    lines are dropped and **fantastico_access_log_dropped_total** metric is incremented.
+
+    The file is never rotated by the writer because every prefork worker holds its own handler on the same file. Rotation
+    must be done externally (e.g logrotate): the file is reopened automatically once it was moved or removed.
+
+    .. code-block:: python
+
+        writer = AsyncAccessLogWriter("/var/log/fantastico/access.log")
+
+        writer.write("{\\"status\\": 200}")
+        writer.flush()
+
+    When **background** is False, no thread is started and lines are written only when flush is invoked.'''
+
+    def __init__(self, file_path, queue_size=10000, batch_size=256, flush_interval=1.0, handler_cls=WatchedFileHandler,
+                 metrics_registry=None, background=True):
+        self._file_path = file_path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._handler_cls = handler_cls
+        self._background = background
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._handler = None
+        self._thread = None
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+        metrics_registry = metrics_registry or metrics.METRICS
+
+        self._dropped = metrics_registry.counter("fantastico_access_log_dropped_total",
+                                                 "Access log records dropped because the queue was full or the "
+                                                 "file could not be written.")
+
+    @property
+    def dropped(self):
+        '''This property returns the number of lines dropped because the queue was full or the file could not be written.'''
+
+        return int(self._dropped.value)
+
+    def write(self, line):
+        '''This method enqueues the given line. It returns False if the line was dropped.'''
+
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self._dropped.inc()
+
+            return False
+
+        return True
+
+    def flush(self):
+        '''This method writes all enqueued lines into the log file from the calling thread.'''
+
+        while self._write_batch(self._drain(block=False)):
+            pass
+
+    def _ensure_started(self):
+        '''This method starts the background writer thread once per process (forked workers start their own thread).'''
+
+        if not self._background or self._thread_pid == os.getpid():
+            return
+
+        with self._thread_lock:
+            if self._thread_pid == os.getpid():
+                return
+
+            self._thread = threading.Thread(target=self._run, name="fantastico-access-log")
+            self._thread.daemon = True
+            self._thread.start()
+
+            self._thread_pid = os.getpid()
+
+            atexit.register(self.flush)
+
+    def _run(self):
+        '''This method is the loop of the background writer thread.'''
+
+        while True:
+            self._write_batch(self._drain(block=True))
+
+    def _drop_batch(self, lines):
+        '''This method counts the given lines as dropped after they could not be written. The handler is closed so that it is
+        built again for the next batch.'''
+
+        self._dropped.inc(len(lines))
+
+        self._logger.exception("Unable to write %s access log lines into %s.", len(lines), self._file_path)
+
+        handler, self._handler = self._handler, None
+
+        if handler is not None:
+            try:
+                handler.close()
+            except Exception: # pylint: disable=W0703
+                pass
+
+    def _drain(self, block):
+        '''This method removes at most **batch_size** lines from the queue. When block is True, it waits at most
+        **flush_interval** seconds for the first line.'''
+
+        lines = []
+
+        try:
+            lines.append(self._queue.get(block, self._flush_interval))
+
+            while len(lines) < self._batch_size:
+                lines.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        return lines
+
+    def _write_batch(self, lines):
+        '''This method writes the given lines into the log file (reopening it if it was rotated externally). Failures never
+        propagate: lines are counted as dropped so that the background thread keeps draining the queue. It returns True if
+        lines were consumed.'''
+
+        if not lines:
+            return False
+
+        with self._write_lock:
+            try:
+                if self._handler is None:
+                    handler = self._handler_cls(self._file_path)
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    handler.handleError = self._raise_error
+
+                    self._handler = handler
+
+                self._handler.emit(logging.makeLogRecord({"msg": "\n".join(lines)}))
+            except Exception: # pylint: disable=W0703
+                self._drop_batch(lines)
+
+        return True
+
+    @staticmethod
+    def _raise_error(record):
+        '''This method replaces logging handler default error handling (printing on stderr) so that emit failures are
+        counted.'''
+
+        raise
+
+class AccessLogMiddleware(object):
+    '''This class provides a structured access log. For each request, a json line is written containing request_id, method,
+    path, route pattern, status, response bytes, total time and the time spent in database and templates rendering. Lines
+    are written asynchronously by :py:class:`fantastico.middleware.access_log_middleware.AsyncAccessLogWriter` so request
+    threads never block on disk I/O.
+
+    .. code-block:: javascript
+
+        {"request_id": "6f0f...", "time": 1381234567.12, "method": "GET", "path": "/api/latest/sample-resources",
+         "route": "^/api/latest/sample-resources$", "status": 200, "bytes": 512, "duration": 0.0123, "db_time": 0.0081,
+         "template_time": 0.0}
+
+    The middleware is not installed by default. In order to enable it, add it as the first middleware into
+    **installed_middleware** setting and specify **file_path** into **access_log_config** setting.'''
+
+    def __init__(self, app, settings_facade=SettingsFacade, writer_cls=AsyncAccessLogWriter, metrics_registry=None,
+                 time_provider=time):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+        self._time_provider = time_provider
+
+        log_config = settings_facade().get("access_log_config") or {}
+
+        self._writer = None
+
+        if log_config.get("file_path"):
+            self._writer = writer_cls(log_config["file_path"],
+                                      queue_size=log_config.get("queue_size", 10000),
+                                      batch_size=log_config.get("batch_size", 256),
+                                      flush_interval=log_config.get("flush_interval", 1.0))
+
+    def __call__(self, environ, start_response):
+        '''This method executes the next middleware and writes the access log record of the current request.'''
+
+        if not self._writer:
+            return self._app(environ, start_response)
+
+        response_info = {"status": 500, "bytes": None}
+
+        def start_response_logged(status, headers, exc_info=None):
+            '''This function captures response status and content length.'''
+
+            response_info["status"] = int(status.split(" ", 1)[0])
+
+            for header_name, header_value in headers:
+                if header_name.lower() == "content-length":
+                    response_info["bytes"] = int(header_value)
+
+            if exc_info:
+                return start_response(status, headers, exc_info)
+
+            return start_response(status, headers)
+
+        start = self._time_provider.time()
+        breakdown = self._metrics.start_breakdown()
+
+        try:
+            response = self._app(environ, start_response_logged)
+        finally:
+            self._metrics.stop_breakdown()
+
+            self._write_record(environ, response_info, start, breakdown)
+
+        return response
+
+    def _write_record(self, environ, response_info, start, breakdown):
+        '''This method builds the json access log record of the current request and enqueues it.'''
+
+        request = environ.get("fantastico.request")
+        route_handler = environ.get("route_%s_handler" % request.path) if request else None
+
+        request_id = getattr(request, "request_id", None)
+
+        record = {"request_id": str(request_id) if request_id is not None else None,
+                  "time": round(start, 3),
+                  "method": environ.get("REQUEST_METHOD"),
+                  "path": environ.get("PATH_INFO"),
+                  "route": (route_handler or {}).get("route"),
+                  "status": response_info["status"],
+                  "bytes": response_info["bytes"],
+                  "duration": round(self._time_provider.time() - start, 6),
+                  "db_time": round(breakdown.get("db", 0.0), 6),
+                  "template_time": round(breakdown.get("template", 0.0), 6)}
+
+        self._writer.write(json.dumps(record))
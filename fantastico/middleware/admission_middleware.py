@@ -0,0 +1,255 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.admission_middleware
+'''
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+from webob.response import Response
+import json
+import re
+import threading
+import time
+
+class ConcurrencyLimiter(object):
+    '''This class limits the number of requests which concurrently execute a lane (a route, a controller or the whole
+    application). Requests which can not enter the lane wait at most the given timeout; at most **max_queue** requests wait
+    at the same time (others are rejected immediately).
+
+    .. code-block:: python
+
+        limiter = ConcurrencyLimiter("api", max_concurrency=20, max_queue=100)
+
+        if limiter.acquire(timeout=0.5):
+            try:
+                # execute the request
+            finally:
+                limiter.release()
+    '''
+
+    def __init__(self, name, max_concurrency, max_queue=None):
+        self._name = name
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._active = 0
+        self._queued = 0
+        self._condition = threading.Condition(threading.Lock())
+
+    @property
+    def name(self):
+        '''This property returns the name of this limiter.'''
+
+        return self._name
+
+    @property
+    def max_concurrency(self):
+        '''This property returns the maximum number of requests which can concurrently execute the lane.'''
+
+        return self._max_concurrency
+
+    @property
+    def active(self):
+        '''This property returns the number of requests currently executing the lane.'''
+
+        return self._active
+
+    @property
+    def queued(self):
+        '''This property returns the number of requests currently waiting to enter the lane.'''
+
+        return self._queued
+
+    def acquire(self, timeout):
+        '''This method enters the lane. It returns False if the lane is still full after timeout seconds or if the waiting
+        queue is full.'''
+
+        with self._condition:
+            if self._active < self._max_concurrency:
+                self._active += 1
+                return True
+
+            if timeout <= 0 or (self._max_queue is not None and self._queued >= self._max_queue):
+                return False
+
+            self._queued += 1
+
+            try:
+                if not self._condition.wait_for(lambda: self._active < self._max_concurrency, timeout):
+                    return False
+
+                self._active += 1
+                return True
+            finally:
+                self._queued -= 1
+
+    def release(self):
+        '''This method leaves the lane and wakes up one waiting request.'''
+
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+class AdmissionControlMiddleware(object):
+    '''This class provides admission control: it bounds the number of requests which concurrently execute each route so that
+    a slow dependency (e.g the database) can not make all worker threads pile up on it. Requests which wait for their lane
+    longer than the configured queue timeout are rejected fast with **503 Service Unavailable** and a **Retry-After**
+    header; the tail latency stays bounded under overload.
+
+    Lanes are configured through **admission_config** setting:
+
+    #. **reserved** routes (e.g static assets, favicon, health checks) execute in a separate lane which is never blocked by
+       other routes.
+    #. a controller lane: controllers may declare their own limits (``@Controller(url="/api/reports$",
+       max_concurrency=4, queue_timeout=0.2)``).
+    #. a route lane: the first configured route pattern matching the request path.
+    #. a global lane (**max_concurrency**) shared by all requests which are not reserved.
+
+    The middleware is not installed by default. In order to enable it, add it into **installed_middleware** setting right
+    after :py:class:`fantastico.middleware.routing_middleware.RoutingMiddleware`.'''
+
+    RESERVED_LANE = "reserved"
+    GLOBAL_LANE = "global"
+
+    def __init__(self, app, settings_facade=SettingsFacade, metrics_registry=None, time_provider=time):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+        self._time_provider = time_provider
+
+        config = settings_facade().get("admission_config") or {}
+
+        self._queue_timeout = config.get("queue_timeout", 1.0)
+        self._retry_after = config.get("retry_after", 1)
+        self._max_queue = config.get("max_queue")
+
+        reserved_config = config.get("reserved") or {}
+        self._reserved_patterns = [re.compile(pattern) for pattern in reserved_config.get("patterns") or []]
+        self._reserved_limiter = self._build_limiter(self.RESERVED_LANE, reserved_config.get("max_concurrency"))
+
+        self._global_limiter = self._build_limiter(self.GLOBAL_LANE, config.get("max_concurrency"))
+
+        self._routes = []
+
+        for route_config in config.get("routes") or []:
+            self._routes.append((re.compile(route_config["pattern"]),
+                                 self._build_limiter(route_config["pattern"], route_config.get("max_concurrency")),
+                                 route_config.get("queue_timeout", self._queue_timeout)))
+
+        self._controller_limiters = {}
+        self._controller_limiters_lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        '''This method admits the current request into its lanes (or rejects it) and executes the next middleware.'''
+
+        path = environ.get("PATH_INFO", "")
+        lanes = self._get_lanes(path, environ)
+
+        if not lanes:
+            return self._app(environ, start_response)
+
+        acquired = []
+        start = self._time_provider.time()
+
+        for limiter, queue_timeout in lanes:
+            remaining = queue_timeout - (self._time_provider.time() - start)
+
+            if not limiter.acquire(remaining):
+                for acquired_limiter in acquired:
+                    acquired_limiter.release()
+
+                self._metrics.counter("fantastico_admission_rejected_total", "Requests rejected by admission control.",
+                                      {"lane": limiter.name}).inc()
+
+                return self._build_rejection(limiter)(environ, start_response)
+
+            acquired.append(limiter)
+
+        self._metrics.histogram("fantastico_admission_wait_seconds", "Time spent by admitted requests waiting for a lane.",
+                                {"lane": lanes[-1][0].name}).observe(self._time_provider.time() - start)
+
+        try:
+            return self._app(environ, start_response)
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    def _build_limiter(self, name, max_concurrency):
+        '''This method builds a lane limiter (or returns None if the lane is not limited).'''
+
+        if not max_concurrency:
+            return None
+
+        return ConcurrencyLimiter(name, max_concurrency, max_queue=self._max_queue)
+
+    def _get_lanes(self, path, environ):
+        '''This method returns the list of (limiter, queue timeout) tuples the current request must enter.'''
+
+        if any(pattern.search(path) for pattern in self._reserved_patterns):
+            return [(self._reserved_limiter, self._queue_timeout)] if self._reserved_limiter else []
+
+        lanes = []
+
+        if self._global_limiter:
+            lanes.append((self._global_limiter, self._queue_timeout))
+
+        lane = self._get_controller_lane(environ.get("route_%s_handler" % path))
+
+        if not lane:
+            for pattern, limiter, queue_timeout in self._routes:
+                if pattern.search(path):
+                    lane = (limiter, queue_timeout) if limiter else None
+                    break
+
+        if lane:
+            lanes.append(lane)
+
+        return lanes
+
+    def _get_controller_lane(self, route_handler):
+        '''This method returns the lane declared by the controller method which handles the current request (if any).'''
+
+        if not route_handler:
+            return None
+
+        controller = route_handler.get("controller")
+        handler = getattr(controller, route_handler.get("method") or "", None)
+        admission = getattr(handler, "admission", None)
+
+        if not admission or not admission.get("max_concurrency"):
+            return None
+
+        name = getattr(handler, "full_name", None) or \
+                    "%s.%s" % (type(controller).__name__, route_handler.get("method"))
+
+        with self._controller_limiters_lock:
+            limiter = self._controller_limiters.get(name)
+
+            if limiter is None:
+                limiter = self._controller_limiters[name] = self._build_limiter(name, admission["max_concurrency"])
+
+        queue_timeout = admission.get("queue_timeout")
+
+        return limiter, self._queue_timeout if queue_timeout is None else queue_timeout
+
+    def _build_rejection(self, limiter):
+        '''This method builds the fast 503 response returned for requests which can not be admitted.'''
+
+        body = {"error_code": 503, "error_description": "Service overloaded (lane %s is full)." % limiter.name}
+
+        response = Response(body=json.dumps(body).encode(), content_type="application/json; charset=UTF-8", status=503)
+        response.headers["Retry-After"] = str(self._retry_after)
+        response.headers["Cache-Control"] = "no-cache"
+
+        return response
@@ -0,0 +1,143 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.coalescing_middleware
+'''
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+from urllib.parse import parse_qsl, urlencode
+import re
+import threading
+
+class InFlightRequest(object):
+    '''This class holds the state of a request which is currently executed on behalf of all identical concurrent requests.'''
+
+    __slots__ = ("done", "response", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.followers = 0
+
+class RequestCoalescingMiddleware(object):
+    '''This class provides single flight execution of identical concurrent GET requests. The first request (the leader)
+    executes the controller while identical requests received meanwhile wait for it and receive a copy of its response (status,
+    headers and body). Requests are identical if they have the same method, path, normalized query string (parameters are
+    sorted) and the same values for all **vary_headers**. By default, credentials headers (**Authorization** and **Cookie**)
+    are part of the key so user dependent resources are never shared between users.
+
+    Only routes matching one of **routes** patterns from **coalescing_config** setting are coalesced. Responses which set
+    cookies are never shared; when the leader fails (or does not complete in **timeout** seconds), waiting requests execute
+    the controller themselves.
+
+    The middleware is not installed by default. In order to enable it, add it into **installed_middleware** setting right
+    after :py:class:`fantastico.middleware.request_middleware.RequestMiddleware`.'''
+
+    COALESCED_METHODS = ("GET", "HEAD")
+
+    def __init__(self, app, settings_facade=SettingsFacade, metrics_registry=None):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+
+        config = settings_facade().get("coalescing_config") or {}
+
+        self._routes = [re.compile(pattern) for pattern in config.get("routes") or []]
+        self._vary_headers = ["HTTP_%s" % header.upper().replace("-", "_") for header in config.get("vary_headers") or []]
+        self._timeout = config.get("timeout", 5.0)
+
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        '''This property returns the number of distinct requests currently executing.'''
+
+        return len(self._in_flight)
+
+    def __call__(self, environ, start_response):
+        '''This method executes the current request or waits for an identical request which is already executing.'''
+
+        if environ.get("REQUEST_METHOD") not in self.COALESCED_METHODS or \
+                not any(route.search(environ.get("PATH_INFO", "")) for route in self._routes):
+            return self._app(environ, start_response)
+
+        key = self.build_key(environ)
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self._in_flight[key] = InFlightRequest()
+            else:
+                flight.followers += 1
+
+        if leader:
+            return self._execute_leader(key, flight, environ, start_response)
+
+        if flight.done.wait(self._timeout) and flight.response:
+            self._metrics.counter("fantastico_coalesced_requests_total",
+                                  "Requests served with the response of an identical concurrent request.").inc()
+
+            status, headers, body = flight.response
+
+            start_response(status, list(headers))
+
+            return [body]
+
+        return self._app(environ, start_response)
+
+    def build_key(self, environ):
+        '''This method builds the key which identifies identical requests.'''
+
+        query = urlencode(sorted(parse_qsl(environ.get("QUERY_STRING", ""), keep_blank_values=True)))
+        vary = tuple(environ.get(header, "") for header in self._vary_headers)
+
+        return environ.get("REQUEST_METHOD"), environ.get("PATH_INFO", ""), query, vary
+
+    def _execute_leader(self, key, flight, environ, start_response):
+        '''This method executes the given request and publishes its response to all identical requests waiting for it.'''
+
+        response_state = {}
+
+        def capture_response(status, headers, exc_info=None):
+            '''This function stores the response status and headers before sending them to the server.'''
+
+            response_state["status"] = status
+            response_state["headers"] = list(headers)
+
+            return start_response(status, headers, exc_info) if exc_info else start_response(status, headers)
+
+        try:
+            result = self._app(environ, capture_response)
+
+            try:
+                body = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+
+            headers = response_state.get("headers") or []
+
+            if not any(header_name.lower() == "set-cookie" for header_name, _ in headers):
+                flight.response = (response_state.get("status"), headers, body)
+
+            return [body]
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+            flight.done.set()
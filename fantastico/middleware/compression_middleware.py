@@ -0,0 +1,377 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.compression_middleware
+'''
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+from fantastico.utils.lru_cache import LruCache
+from webob.etag import AnyETag, ETagMatcher
+import zlib
+
+ENCODINGS_WBITS = {"gzip": 31, "deflate": 15}
+
+def parse_accept_encoding(header_value):
+    '''This function parses the given **Accept-Encoding** header value into a dictionary of lower case content codings and
+    their quality values.'''
+
+    codings = {}
+
+    for item in (header_value or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+
+        if not coding:
+            continue
+
+        quality = 1.0
+
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        codings[coding] = quality
+
+    return codings
+
+def negotiate_encoding(header_value, encodings=("gzip", "deflate")):
+    '''This function returns the content coding (from the given encodings, in order of preference) which the client prefers
+    according to the given **Accept-Encoding** header value. None is returned if the client accepts none of them.'''
+
+    accepted = parse_accept_encoding(header_value)
+    best_encoding, best_quality = None, 0.0
+
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+
+    return best_encoding
+
+def accept_encoding_key(header_value):
+    '''This function normalizes the given **Accept-Encoding** header value so that it can be used in cache keys: values which
+    have the same key always negotiate the same content coding (e.g **gzip, deflate** and **deflate,gzip;q=1** are the same
+    key).'''
+
+    accepted = parse_accept_encoding(header_value)
+
+    return ",".join("%s;q=%s" % (encoding, accepted.get(encoding, accepted.get("*", 0.0)))
+                    for encoding in sorted(ENCODINGS_WBITS))
+
+def identity_etag(etag):
+    '''This function returns the given ETag (unquoted) without the content coding suffix added by
+    :py:class:`fantastico.middleware.compression_middleware.CompressionMiddleware` to compressed representations.'''
+
+    for encoding in ENCODINGS_WBITS:
+        suffix = "-%s" % encoding
+
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)]
+
+    return etag
+
+def etag_matches(etag, header_value, strong=True):
+    '''This function returns True if the given ETag matches one of the ETags listed in the given **If-Match** /
+    **If-None-Match** header value. ETags of compressed representations match the ETag of the identity representation.
+    When strong is True, weak ETags from the header value are ignored.'''
+
+    matcher = ETagMatcher.parse(header_value, strong=strong)
+
+    if matcher is AnyETag:
+        return True
+
+    etag = etag[2:] if etag.startswith("W/") else etag
+
+    return identity_etag(etag.strip('"')) in [identity_etag(tag) for tag in matcher.etags]
+
+def iter_body(chunks, result):
+    '''This function returns the body of a response made of the given chunks (written using the write callable returned by
+    start_response) followed by the given response iterable. The response iterable is returned unchanged when no chunk was
+    written (so file wrappers reach the server) and it is never read into memory.'''
+
+    if not chunks:
+        return result
+
+    def chain_body():
+        '''This generator yields the written chunks and then the response iterable chunks (closing the response iterable).'''
+
+        try:
+            for chunk in chunks:
+                yield chunk
+
+            for chunk in result:
+                yield chunk
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    return chain_body()
+
+def start_lazily(result, response_state, start_response):
+    '''This generator forwards the response of an application which calls start_response while its body is iterated (as
+    allowed by WSGI). The status and headers captured in **response_state** (and the chunks written using the write callable)
+    are sent to the server as soon as they are available.'''
+
+    def pending_chunks():
+        '''This function starts the response (if it was captured) and returns the chunks written so far.'''
+
+        if not response_state.get("started"):
+            if not response_state.get("status"):
+                return []
+
+            response_state["started"] = True
+
+            start_response(response_state["status"], response_state["headers"])
+
+        chunks = response_state.get("chunks") or []
+        pending, chunks[:] = list(chunks), []
+
+        return pending
+
+    try:
+        for chunk in result:
+            for pending_chunk in pending_chunks():
+                yield pending_chunk
+
+            yield chunk
+
+        for pending_chunk in pending_chunks():
+            yield pending_chunk
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+class CompressionMiddleware(object):
+    '''This class provides gzip / deflate compression of responses. The content coding is negotiated using
+    **Accept-Encoding** request header and a response is compressed only if:
+
+    * its content type is listed in **content_types** of **compression_config** setting.
+    * it has at least **min_size** bytes (streamed responses which do not declare **Content-Length** are always compressed).
+    * it is not already encoded and it does not send **Cache-Control: no-transform**.
+
+    Responses built in memory (e.g webob responses) are compressed at once and receive a new **Content-Length**; other
+    responses (app_iter) are compressed chunk by chunk while they are streamed (they are never read into memory and responses
+    which are not compressed are returned unchanged). Compressed responses receive
+    **Vary: Accept-Encoding** and their strong **ETag** receives the content coding suffix (e.g **"abc-gzip"**); use
+    :py:func:`fantastico.middleware.compression_middleware.etag_matches` to validate such ETags against the identity
+    representation. Compressed bodies of responses which carry an **ETag** are remembered so that they are compressed only
+    once.
+
+    The middleware is not installed by default. In order to enable it, add it into **installed_middleware** setting after
+    :py:class:`fantastico.middleware.http_cache_middleware.HttpCacheMiddleware` (if it is installed) so that the cache stores
+    compressed variants and serves them without compressing them again.'''
+
+    SKIPPED_STATUSES = ("204", "206", "304")
+
+    def __init__(self, app, settings_facade=SettingsFacade, metrics_registry=None):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+
+        config = settings_facade().get("compression_config") or {}
+
+        self._encodings = [encoding for encoding in config.get("encodings", ["gzip", "deflate"])
+                           if encoding in ENCODINGS_WBITS]
+        self._min_size = config.get("min_size", 1024)
+        self._level = config.get("level", 6)
+        self._content_types = set(config.get("content_types") or [])
+
+        etag_cache_size = config.get("etag_cache_size", 256)
+
+        self._compressed_bodies = None
+
+        if etag_cache_size:
+            self._compressed_bodies = LruCache(max_size=etag_cache_size, name="compressed_bodies",
+                                               metrics_registry=self._metrics)
+
+    def __call__(self, environ, start_response):
+        '''This method executes the current request and compresses its response if the client accepts it.'''
+
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return self._app(environ, start_response)
+
+        response_state = {}
+
+        def capture_response(status, headers, exc_info=None):
+            '''This function delays sending the response status and headers until the response encoding is decided.'''
+
+            if exc_info:
+                response_state["started"] = True
+
+                return start_response(status, headers, exc_info)
+
+            response_state["status"] = status
+            response_state["headers"] = list(headers)
+
+            return response_state.setdefault("chunks", []).append
+
+        result = self._app(environ, capture_response)
+
+        if response_state.get("started"):
+            return result
+
+        if not response_state.get("status"):
+            return start_lazily(result, response_state, start_response)
+
+        status, headers = response_state["status"], response_state["headers"]
+        chunks = response_state.get("chunks")
+
+        if not self._is_compressible(status, headers):
+            start_response(status, headers)
+
+            return iter_body(chunks, result)
+
+        encoding = negotiate_encoding(environ.get("HTTP_ACCEPT_ENCODING"), self._encodings)
+
+        if not isinstance(result, (list, tuple)):
+            if not encoding:
+                start_response(status, self._add_vary(headers))
+
+                return iter_body(chunks, result)
+
+            start_response(status, self._get_encoded_headers(headers, encoding))
+
+            return self._stream(iter_body(chunks, result), encoding)
+
+        try:
+            body = b"".join((chunks or []) + list(result))
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        if len(body) < self._min_size:
+            start_response(status, headers)
+
+            return [body]
+
+        if not encoding:
+            start_response(status, self._add_vary(headers))
+
+            return [body]
+
+        compressed_body = self._compress_body(environ, headers, encoding, body)
+
+        headers = self._get_encoded_headers(headers, encoding)
+        headers.append(("Content-Length", str(len(compressed_body))))
+
+        start_response(status, headers)
+
+        return [compressed_body]
+
+    def _is_compressible(self, status, headers):
+        '''This method returns True if a response with the given status and headers can be compressed.'''
+
+        if status[:1] != "2" or status[:3] in self.SKIPPED_STATUSES:
+            return False
+
+        headers_lower = {name.lower(): value for name, value in headers}
+
+        if headers_lower.get("content-encoding", "identity").lower() != "identity" or \
+                "no-transform" in headers_lower.get("cache-control", "").lower():
+            return False
+
+        content_type = headers_lower.get("content-type", "").split(";")[0].strip().lower()
+
+        if content_type not in self._content_types:
+            return False
+
+        content_length = headers_lower.get("content-length")
+
+        return not content_length or not content_length.isdigit() or int(content_length) >= self._min_size
+
+    def _add_vary(self, headers):
+        '''This method returns the given headers with **Accept-Encoding** appended to **Vary** header.'''
+
+        result = []
+        vary = []
+
+        for name, value in headers:
+            if name.lower() == "vary":
+                vary.extend(header.strip() for header in value.split(",") if header.strip())
+            else:
+                result.append((name, value))
+
+        if "accept-encoding" not in [header.lower() for header in vary]:
+            vary.append("Accept-Encoding")
+
+        result.append(("Vary", ", ".join(vary)))
+
+        return result
+
+    def _get_encoded_headers(self, headers, encoding):
+        '''This method returns the headers of the compressed response built from the given headers (and counts the compressed
+        response). **Content-Length** is dropped and strong ETags receive the content coding suffix.'''
+
+        result = []
+
+        for name, value in self._add_vary(headers):
+            name_lower = name.lower()
+
+            if name_lower in ("content-length", "content-encoding"):
+                continue
+
+            if name_lower == "etag" and not value.startswith("W/"):
+                value = '"%s-%s"' % (value.strip('"'), encoding)
+
+            result.append((name, value))
+
+        result.append(("Content-Encoding", encoding))
+
+        self._metrics.counter("fantastico_compressed_responses_total", "Compressed responses.", {"encoding": encoding}).inc()
+
+        return result
+
+    def _compress_body(self, environ, headers, encoding, body):
+        '''This method compresses the given body. Compressed bodies of responses which carry an **ETag** are reused.'''
+
+        etag = {name.lower(): value for name, value in headers}.get("etag")
+        cache_key = None
+
+        if etag and self._compressed_bodies is not None:
+            cache_key = (encoding, environ.get("PATH_INFO"), environ.get("QUERY_STRING"), etag, len(body))
+            compressed_body = self._compressed_bodies.get(cache_key)
+
+            if compressed_body is not None:
+                return compressed_body
+
+        compressor = zlib.compressobj(self._level, zlib.DEFLATED, ENCODINGS_WBITS[encoding])
+        compressed_body = compressor.compress(body) + compressor.flush()
+
+        if cache_key:
+            self._compressed_bodies.set(cache_key, compressed_body)
+
+        return compressed_body
+
+    def _stream(self, result, encoding):
+        '''This method compresses the given response iterable chunk by chunk. Each chunk is flushed so that streamed responses
+        are still delivered progressively.'''
+
+        compressor = zlib.compressobj(self._level, zlib.DEFLATED, ENCODINGS_WBITS[encoding])
+
+        try:
+            for chunk in result:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+            yield compressor.flush()
+        finally:
+            if hasattr(result, "close"):
+                result.close()
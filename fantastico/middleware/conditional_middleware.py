@@ -0,0 +1,157 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.conditional_middleware
+'''
+from fantastico.middleware.compression_middleware import etag_matches, iter_body, start_lazily
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+from webob.datetime_utils import parse_date
+import hashlib
+
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "last-modified", "set-cookie",
+                        "vary")
+
+def compute_etag(body):
+    '''This function returns a strong ETag (quoted) computed from the given response body.'''
+
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def is_not_modified(environ, etag=None, last_modified=None):
+    '''This function returns True if the validators of the client (**If-None-Match** or, when missing,
+    **If-Modified-Since**) match the given response ETag and **Last-Modified** values.'''
+
+    if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+
+    if if_none_match:
+        if not etag:
+            return False
+
+        return etag_matches(etag, if_none_match, strong=False)
+
+    if_modified_since = parse_date(environ.get("HTTP_IF_MODIFIED_SINCE"))
+
+    if not if_modified_since or not last_modified:
+        return False
+
+    last_modified = parse_date(last_modified) if isinstance(last_modified, str) else last_modified
+
+    return last_modified is not None and last_modified <= if_modified_since
+
+class ConditionalGetMiddleware(object):
+    '''This class provides conditional GET support. Each successful GET response which does not have an **ETag** receives a
+    strong ETag computed from its body. When the validators sent by the client (**If-None-Match** or **If-Modified-Since**)
+    match the response, a bodiless **304 Not Modified** response is sent instead so the client reuses its copy.
+
+    Only bodies built in memory or declaring a **Content-Length** of at most **max_body_size** bytes are hashed; other responses
+    (e.g streamed responses or files) are streamed unchanged unless they already carry validators. Responses started lazily
+    (while their body is iterated) are forwarded unchanged. Controllers
+    which can compute their validators cheaply should use :py:class:`fantastico.mvc.conditional_decorator.ConditionalGet`
+    so that not modified responses are not even rendered.
+
+    The middleware is not installed by default. In order to enable it, add it into **installed_middleware** setting right
+    after :py:class:`fantastico.middleware.request_middleware.RequestMiddleware` (before
+    :py:class:`fantastico.middleware.http_cache_middleware.HttpCacheMiddleware` if it is installed, so that cached responses
+    are validated too).'''
+
+    def __init__(self, app, settings_facade=SettingsFacade, metrics_registry=None):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+
+        config = settings_facade().get("conditional_config") or {}
+
+        self._max_body_size = config.get("max_body_size", 10485760)
+
+    def __call__(self, environ, start_response):
+        '''This method executes the current request and replaces its response with 304 if the client copy is still valid.'''
+
+        method = environ.get("REQUEST_METHOD")
+
+        if method not in ("GET", "HEAD"):
+            return self._app(environ, start_response)
+
+        response_state = {}
+
+        def capture_response(status, headers, exc_info=None):
+            '''This function delays sending the response status and headers until validators are checked.'''
+
+            if exc_info:
+                response_state["started"] = True
+
+                return start_response(status, headers, exc_info)
+
+            response_state["status"] = status
+            response_state["headers"] = list(headers)
+
+            return response_state.setdefault("chunks", []).append
+
+        result = self._app(environ, capture_response)
+
+        if response_state.get("started"):
+            return result
+
+        if not response_state.get("status"):
+            return start_lazily(result, response_state, start_response)
+
+        status, headers = response_state.get("status"), response_state.get("headers") or []
+        headers_lower = {name.lower(): value for name, value in headers}
+        chunks = response_state.get("chunks")
+
+        if not status.startswith("200"):
+            start_response(status, headers)
+
+            return iter_body(chunks, result)
+
+        etag = headers_lower.get("etag")
+
+        if not etag and method == "GET" and self._is_hashable(result, headers_lower):
+            try:
+                body = b"".join((chunks or []) + list(result))
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+
+            result, chunks = [body], None
+
+            if len(body) <= self._max_body_size:
+                etag = compute_etag(body)
+                headers.append(("ETag", etag))
+
+        if is_not_modified(environ, etag, headers_lower.get("last-modified")):
+            if hasattr(result, "close"):
+                result.close()
+
+            self._metrics.counter("fantastico_not_modified_total", "Responses replaced by 304 Not Modified.").inc()
+
+            start_response("304 Not Modified", [(name, value) for name, value in headers
+                                                if name.lower() in NOT_MODIFIED_HEADERS])
+
+            return []
+
+        start_response(status, headers)
+
+        return iter_body(chunks, result)
+
+    def _is_hashable(self, result, headers_lower):
+        '''This method returns True if the ETag of the given response can be computed from its body: the body is built in
+        memory or it declares a small enough **Content-Length**.'''
+
+        content_length = headers_lower.get("content-length")
+
+        if content_length:
+            return content_length.isdigit() and int(content_length) <= self._max_body_size
+
+        return isinstance(result, (list, tuple))
@@ -0,0 +1,249 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.cors_middleware
+'''
+from fantastico.exceptions import FantasticoNotSupportedError
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+
+ACTUAL_HEADERS = ("access-control-allow-origin", "access-control-allow-credentials", "access-control-expose-headers")
+EMPTY_BODY_HEADERS = [("Content-Type", "text/plain"), ("Content-Length", "0")]
+
+class CorsPolicy(object):
+    '''This class holds the CORS (cross origin resource sharing) policy configured through **cors_config** setting. All header
+    sets which do not depend on the request are computed only once, when the policy is built.
+
+    .. code-block:: python
+
+        policy = CorsPolicy({"allowed_origins": ["https://app.fantastico.com"], "max_age": 3600})
+
+        print(policy.get_preflight_headers("https://app.fantastico.com", "PUT", "Content-Type"))
+        print(policy.get_actual_headers("https://app.fantastico.com"))
+
+    When **paths** are not configured, **default_paths** are used (or all paths if they are not given either). Allowing
+    credentials for any origin (**\***) is not supported: the allowed origins must be listed explicitly.
+
+    :raises fantastico.exceptions.FantasticoNotSupportedError: When credentials are allowed for any origin.'''
+
+    DEFAULT_METHODS = ["OPTIONS", "GET", "POST", "PUT", "DELETE"]
+
+    def __init__(self, config=None, default_paths=None):
+        config = config or {}
+
+        self._paths = [path.rstrip("/") for path in config.get("paths") or default_paths or ["/"]]
+        self._origins = config.get("allowed_origins") or ["*"]
+        self._methods = [method.upper() for method in config.get("allowed_methods") or self.DEFAULT_METHODS]
+        self._allowed_headers = config.get("allowed_headers")
+        self._credentials = config.get("allow_credentials", False)
+        self._any_origin = "*" in self._origins
+
+        if self._any_origin and self._credentials:
+            raise FantasticoNotSupportedError("CORS credentials can not be allowed for any origin. List the allowed origins "
+                                              "explicitly into cors_config setting.")
+
+        allowed_methods = ",".join(self._methods)
+        max_age = config.get("max_age")
+        expose_headers = config.get("expose_headers")
+
+        common_headers = []
+
+        if self._credentials:
+            common_headers.append(("Access-Control-Allow-Credentials", "true"))
+
+        self._common_actual = list(common_headers)
+
+        if expose_headers:
+            self._common_actual.append(("Access-Control-Expose-Headers", ", ".join(expose_headers)))
+
+        self._common_preflight = common_headers + [("Access-Control-Allow-Methods", allowed_methods)]
+
+        if self._allowed_headers is not None:
+            self._common_preflight.append(("Access-Control-Allow-Headers", ", ".join(self._allowed_headers)))
+
+        if max_age is not None:
+            self._common_preflight.append(("Access-Control-Max-Age", str(max_age)))
+
+        self._actual_headers = {}
+        self._preflight_headers = {}
+
+        origins = ["*"] if self._any_origin else self._origins
+
+        for origin in origins:
+            self._actual_headers[origin], self._preflight_headers[origin] = self._build_header_sets(origin)
+
+    @property
+    def allowed_methods(self):
+        '''This property returns the http methods allowed for cross origin requests.'''
+
+        return self._methods
+
+    def _build_header_sets(self, origin):
+        '''This method builds the actual request and preflight header sets sent to the given origin.'''
+
+        actual_headers = [("Access-Control-Allow-Origin", origin)] + self._common_actual
+        preflight_headers = [("Access-Control-Allow-Origin", origin)] + self._common_preflight
+
+        vary = ["Origin"] if origin != "*" else []
+
+        if vary:
+            actual_headers.append(("Vary", ", ".join(vary)))
+
+        if self._allowed_headers is None:
+            vary.append("Access-Control-Request-Headers")
+
+        if vary:
+            preflight_headers.append(("Vary", ", ".join(vary)))
+
+        return actual_headers, preflight_headers
+
+    def _get_header_sets(self, origin):
+        '''This method returns the header sets (actual request, preflight) which must be sent to the given origin (None if the
+        origin is not allowed).'''
+
+        if self._any_origin:
+            origin = "*"
+
+        if origin in self._actual_headers:
+            return self._actual_headers[origin], self._preflight_headers[origin]
+
+        return None
+
+    def is_cors_path(self, path):
+        '''This method returns True if the given path is covered by this policy.'''
+
+        path = path or "/"
+
+        return any(not prefix or path == prefix or path.startswith(prefix + "/") for prefix in self._paths)
+
+    def get_actual_headers(self, origin):
+        '''This method returns the headers which must be appended to a response sent to the given origin (None if the origin
+        is not allowed).'''
+
+        header_sets = self._get_header_sets(origin)
+
+        if header_sets is None:
+            return None
+
+        return header_sets[0]
+
+    def get_preflight_headers(self, origin, request_method, request_headers=None):
+        '''This method returns the headers of the response for a preflight request coming from the given origin (None if the
+        origin or the requested method are not allowed). Unless **allowed_headers** are configured, the requested headers
+        are allowed.'''
+
+        header_sets = self._get_header_sets(origin)
+
+        if header_sets is None or (request_method or "").upper() not in self._methods:
+            return None
+
+        headers = header_sets[1]
+
+        if self._allowed_headers is None:
+            headers = headers + [("Access-Control-Allow-Headers", request_headers or "")]
+
+        return headers
+
+class CorsMiddleware(object):
+    '''This class provides CORS (cross origin resource sharing) support for all urls located under the **paths** configured in
+    **cors_config** setting:
+
+    * preflight requests (**OPTIONS** requests carrying **Access-Control-Request-Method** header) are answered immediately,
+      without routing, database sessions or oauth2 tokens decoding. Thanks to **Access-Control-Max-Age** browsers reuse
+      preflight results instead of sending a preflight before each request.
+    * responses of allowed origins receive **Access-Control-Allow-Origin** (and **Access-Control-Allow-Credentials** /
+      **Access-Control-Expose-Headers** if configured). Headers set by controllers with the same names are replaced.
+
+    Preflight requests from origins (or for methods) which are not allowed receive **403 Forbidden**. The middleware is
+    installed by default right after :py:class:`fantastico.middleware.request_middleware.RequestMiddleware`. Unless
+    **paths** are configured, CORS is enabled for **roa_api** setting, **/roa** and **/oauth** urls.'''
+
+    DEFAULT_PATHS = ["/roa", "/oauth"]
+
+    def __init__(self, app, settings_facade=SettingsFacade, metrics_registry=None):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+
+        settings_facade = settings_facade()
+
+        self._policy = CorsPolicy(settings_facade.get("cors_config"),
+                                  default_paths=[settings_facade.get("roa_api") or "/api"] + self.DEFAULT_PATHS)
+
+    def __call__(self, environ, start_response):
+        '''This method answers preflight requests and appends CORS headers to responses of allowed origins.'''
+
+        if not self._policy.is_cors_path(environ.get("PATH_INFO")):
+            return self._app(environ, start_response)
+
+        origin = environ.get("HTTP_ORIGIN")
+
+        if environ.get("REQUEST_METHOD") == "OPTIONS" and environ.get("HTTP_ACCESS_CONTROL_REQUEST_METHOD"):
+            return self._handle_preflight(environ, origin, start_response)
+
+        cors_headers = self._policy.get_actual_headers(origin)
+
+        if cors_headers is None:
+            return self._app(environ, start_response)
+
+        def cors_start_response(status, headers, exc_info=None):
+            '''This function appends CORS headers to the response headers.'''
+
+            headers = [(name, value) for name, value in headers if name.lower() not in ACTUAL_HEADERS]
+            headers.extend(self._merge_vary(headers, cors_headers))
+
+            return start_response(status, headers, exc_info) if exc_info else start_response(status, headers)
+
+        return self._app(environ, cors_start_response)
+
+    def _handle_preflight(self, environ, origin, start_response):
+        '''This method answers the given preflight request.'''
+
+        cors_headers = self._policy.get_preflight_headers(origin, environ["HTTP_ACCESS_CONTROL_REQUEST_METHOD"],
+                                                          environ.get("HTTP_ACCESS_CONTROL_REQUEST_HEADERS"))
+
+        if cors_headers is None:
+            self._count("rejected")
+
+            start_response("403 Forbidden", list(EMPTY_BODY_HEADERS))
+
+            return [b""]
+
+        self._count("allowed")
+
+        start_response("200 OK", cors_headers + EMPTY_BODY_HEADERS)
+
+        return [b""]
+
+    def _merge_vary(self, headers, cors_headers):
+        '''This method returns the given CORS headers; their Vary header is merged into the existing Vary header (if any).'''
+
+        cors_vary = [value for name, value in cors_headers if name == "Vary"]
+
+        if not cors_vary:
+            return cors_headers
+
+        for idx, (name, value) in enumerate(headers):
+            if name.lower() == "vary":
+                headers[idx] = (name, "%s, %s" % (value, cors_vary[0]))
+
+                return [(name, value) for name, value in cors_headers if name != "Vary"]
+
+        return cors_headers
+
+    def _count(self, result):
+        '''This method counts a preflight request with the given result.'''
+
+        self._metrics.counter("fantastico_cors_preflights_total", "Answered CORS preflight requests.", {"result": result}).inc()
@@ -18,46 +18,103 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 '''
 
 from fantastico.exceptions import FantasticoContentTypeError, FantasticoNoRequestError, FantasticoRouteNotFoundError
+from fantastico.middleware.pipeline import MiddlewarePipeline
 from fantastico.settings import SettingsFacade
-from fantastico.utils import instantiator
+from fantastico.utils import metrics
+from fantastico.utils.invalidation_bus import INVALIDATION_BUS, get_default_path
 
 class FantasticoApp(object):
     '''This class represents the wsgi application entry point. It is designed to wrap together all configured middlewares
-    and to return an http response.'''
+    and to return an http response. Middlewares are composed once, when the application is built, using
+    :py:class:`fantastico.middleware.pipeline.MiddlewarePipeline`.'''
 
-    class OldCallableApp(object):
-        '''Class used to save __call__ method from a wsgi middleware. It is used before chaining it at startup.'''
+    def __init__(self, settings_facade=SettingsFacade, pipeline_cls=MiddlewarePipeline, metrics_registry=None,
+                 invalidation_bus=None):
+        self._settings_facade = settings_facade()
+        self._metrics = metrics_registry or metrics.METRICS
+        self._invalidation_bus = invalidation_bus or INVALIDATION_BUS
 
-        def __init__(self, callable_obj):
-            self._callable_obj = callable_obj
+        self._pipeline = None
+        self._app = None
 
-        def __call__(self, environ, start_response):
-            '''Take the same number of arguments as any other middleware __call__ method.'''
+        self._configure_metrics()
+        self._configure_invalidation_bus()
+        self._wrap_middlewares(pipeline_cls)
 
-            return self._callable_obj(environ, start_response)
+        self._requests_histogram = self._metrics.histogram("fantastico_http_request_seconds",
+                                                           "Time spent handling http requests (including internal calls).")
 
-    def __init__(self, settings_facade=SettingsFacade):
-        self._settings_facade = settings_facade()
+    @property
+    def pipeline(self):
+        '''This property returns the middleware pipeline of this application. It can be used to read per middleware latency
+        histograms when **middleware_timing** setting is enabled.'''
 
-        self._wrap_middlewares()
+        return self._pipeline
 
-    def _wrap_middlewares(self):
-        '''Method used to register all configured middlewares in the correct order.'''
+    def _configure_metrics(self):
+        '''This method configures the shared memory store of the metrics registry if **metrics_config** setting specifies
+        one.'''
 
-        installed_middlewares = self._settings_facade.get("installed_middleware")
+        metrics_config = self._settings_facade.get("metrics_config")
+
+        if not isinstance(metrics_config, dict) or not metrics_config.get("mmap_file"):
+            return
+
+        store = self._metrics.store
+
+        if store and store.file_path == metrics_config["mmap_file"]:
+            return
+
+        store = metrics.MmapMetricsStore(metrics_config["mmap_file"], slots=metrics_config.get("slots", 64),
+                                         slot_size=metrics_config.get("slot_size", 65536))
+
+        self._metrics.configure(store, metrics_config.get("publish_interval"))
+
+    def _configure_invalidation_bus(self):
+        '''This method maps the invalidation bus on the shared memory file given in **invalidation_config** setting (if any).'''
+
+        invalidation_config = self._settings_facade.get("invalidation_config")
+
+        if not isinstance(invalidation_config, dict) or not invalidation_config.get("mmap_file"):
+            return
 
-        curr_app_cls, curr_app_inst = FantasticoApp, FantasticoApp.OldCallableApp(self.__call__)
+        file_path = invalidation_config["mmap_file"]
 
-        for middleware_cls in reversed(installed_middlewares):
-            middleware = instantiator.instantiate_class(middleware_cls, [curr_app_inst])
+        if file_path is True:
+            file_path = get_default_path()
 
-            curr_app_cls.__call__ = lambda inst, *args: middleware(*args)
+        if self._invalidation_bus.file_path == file_path:
+            return
 
-            curr_app_cls, curr_app_inst = middleware.__class__, FantasticoApp.OldCallableApp(middleware.__call__)
+        self._invalidation_bus.configure(file_path, slots=invalidation_config.get("slots"),
+                                         poll_interval=invalidation_config.get("poll_interval"))
+
+    def _wrap_middlewares(self, pipeline_cls):
+        '''Method used to register all configured middlewares in the correct order.'''
+
+        installed_middlewares = self._settings_facade.get("installed_middleware")
+
+        self._pipeline = pipeline_cls(installed_middlewares, self._execute_controller,
+                                      timed=self._settings_facade.get("middleware_timing") is True,
+                                      registry=self._metrics)
+
+        self._app = self._pipeline.build()
 
     def __call__(self, environ, start_response):
         '''This method is used to execute the application and all configured middlewares in the correct order.'''
 
+        self._invalidation_bus.poll()
+
+        with metrics.MetricsTimer(self._requests_histogram):
+            response = self._app(environ, start_response)
+
+        self._metrics.publish()
+
+        return response
+
+    def _execute_controller(self, environ, start_response):
+        '''This method is the innermost stage of the pipeline: it executes the controller selected by routing middleware.'''
+
         request = environ.get("fantastico.request")
 
         if hasattr(request, "context"):
@@ -87,7 +144,7 @@ class FantasticoApp(object):
 
         response = contr_method(request, **kwargs)
 
-        if request.accept.quality(response.content_type) is None:
+        if response.status_int != 304 and request.accept.quality(response.content_type) is None:
             raise FantasticoContentTypeError("User brower accepts %s but received %s." % \
                                              (request.accept, response.content_type))
         
@@ -95,7 +152,7 @@ class FantasticoApp(object):
         
         start_response(response.status, response.headerlist)
 
-        return [response.body]
+        return response.app_iter
 
     def _append_global_response_headers(self, response):
         '''This method appends all global response headers into the given response.'''
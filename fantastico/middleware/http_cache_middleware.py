@@ -0,0 +1,379 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.http_cache_middleware
+'''
+from concurrent.futures import ThreadPoolExecutor
+from fantastico.middleware.compression_middleware import accept_encoding_key
+from fantastico.middleware.request_middleware import RequestMiddleware
+from fantastico.settings import SettingsFacade
+from fantastico.utils import metrics
+from fantastico.utils.cache_backends import CACHES
+from fantastico.utils.invalidation_bus import INVALIDATION_BUS
+from urllib.parse import parse_qsl, urlencode
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+def parse_cache_control(header_value):
+    '''This function parses the given **Cache-Control** header value into a dictionary of lower case directives. Directives
+    without a value are mapped to True.'''
+
+    directives = {}
+
+    for directive in (header_value or "").split(","):
+        name, _, value = directive.strip().partition("=")
+
+        if name:
+            directives[name.lower()] = value.strip('"') if value else True
+
+    return directives
+
+def path_topics(path):
+    '''This function returns the invalidation topics of the given path: one topic for each of its segment prefixes (e.g
+    **/blog/posts/1** is purged by purging **/**, **/blog**, **/blog/posts** or **/blog/posts/1**).'''
+
+    topics = ["http:/"]
+    prefix = ""
+
+    for segment in path.strip("/").split("/"):
+        if segment:
+            prefix += "/" + segment
+            topics.append("http:%s" % prefix)
+
+    return topics
+
+def purge_url_prefix(prefix, invalidation_bus=None):
+    '''This function discards (in all workers) responses cached by
+    :py:class:`fantastico.middleware.http_cache_middleware.HttpCacheMiddleware` for urls located under the given path prefix.
+    Prefixes are matched segment by segment: purging **/blog** discards **/blog** and **/blog/posts** but not **/blogs**.'''
+
+    (invalidation_bus or INVALIDATION_BUS).publish(path_topics(prefix)[-1])
+
+class HttpCacheMiddleware(object):
+    '''This class provides a reverse proxy like cache for GET responses which follows http caching semantics. Fresh cached
+    responses are served without routing, oauth2 tokens decoding or database access.
+
+    A response is stored only if:
+
+    * the request method is **GET** and the request does not send **Cache-Control: no-store**.
+    * the response status is 200, 203, 301, 404 or 410 and it does not set cookies.
+    * the response **Cache-Control** grants an explicit freshness lifetime (**s-maxage** or **max-age**) and does not contain
+      **no-store**, **no-cache** or **private**. **Vary: \\*** responses are never stored.
+    * the request does not carry **Authorization** header unless the response is explicitly marked **public**. Requests
+      carrying **Authorization** header are only served from responses marked **public**.
+
+    Cached responses are keyed by path, normalized query string and the values of request headers listed in response
+    **Vary** header (**Accept-Encoding** values are normalized so that compressed variants are shared by all clients which
+    negotiate the same content coding). Responses served from cache receive **Age** and **X-Cache** headers. When a
+    response is stale but still within its **stale-while-revalidate** window, it is served immediately and refreshed in
+    background (at most one refresh per url and worker). Requests sending **Cache-Control: no-cache** skip the lookup and
+    refresh the cached response.
+
+    Responses are stored into the backend named **backend** in **http_cache_config** setting (see
+    :py:class:`fantastico.utils.cache_backends.CacheRegistry`). Cached responses can be purged by url prefix (in all workers if
+    invalidation bus is shared) using :py:func:`fantastico.middleware.http_cache_middleware.purge_url_prefix`:
+
+    .. code-block:: python
+
+        purge_url_prefix("/dynamic-menu/menus/1")
+
+    The middleware is not installed by default. In order to enable it, add it into **installed_middleware** setting right
+    after :py:class:`fantastico.middleware.request_middleware.RequestMiddleware`.'''
+
+    CACHEABLE_STATUSES = (200, 203, 301, 404, 410)
+    KEY_PREFIX = "fantastico.http:"
+
+    def __init__(self, app, settings_facade=SettingsFacade, metrics_registry=None, time_provider=time, caches=None,
+                 invalidation_bus=None, refresh_app=None):
+        self._app = app
+        self._metrics = metrics_registry or metrics.METRICS
+        self._time_provider = time_provider
+        self._caches = caches or CACHES
+        self._invalidation_bus = invalidation_bus or INVALIDATION_BUS
+        self._refresh_app = refresh_app or RequestMiddleware(app)
+        self._logger = logging.getLogger(__name__)
+
+        config = settings_facade().get("http_cache_config") or {}
+
+        self._backend_name = config.get("backend")
+        self._max_entry_size = config.get("max_entry_size", 1048576)
+        self._refresh_threads = config.get("refresh_threads", 2)
+
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    def __call__(self, environ, start_response):
+        '''This method serves the current request from cache if possible; otherwise it executes the request and stores its
+        response if it is cacheable.'''
+
+        method = environ.get("REQUEST_METHOD")
+        request_cc = parse_cache_control(environ.get("HTTP_CACHE_CONTROL"))
+
+        if method not in ("GET", "HEAD") or "no-store" in request_cc:
+            return self._app(environ, start_response)
+
+        backend = self._caches.get_backend(self._backend_name)
+        primary_key = self.build_key(environ)
+
+        if "no-cache" not in request_cc:
+            entry = self._lookup(backend, primary_key, environ)
+
+            if entry is not None:
+                age = self._time_provider.time() - entry["stored_at"]
+
+                if age < entry["max_age"]:
+                    return self._serve(entry, age, "HIT", method, start_response)
+
+                if age < entry["max_age"] + entry["swr"]:
+                    self._schedule_refresh(primary_key, environ)
+
+                    return self._serve(entry, age, "STALE", method, start_response)
+
+        self._count("miss")
+
+        if method == "HEAD":
+            return self._app(environ, start_response)
+
+        return self._execute(backend, primary_key, environ, start_response)
+
+    def build_key(self, environ):
+        '''This method builds the primary cache key of the given request (path and normalized query string).'''
+
+        query = urlencode(sorted(parse_qsl(environ.get("QUERY_STRING", ""), keep_blank_values=True)))
+
+        return "%s%s?%s" % (self.KEY_PREFIX, environ.get("PATH_INFO", ""), query)
+
+    def _lookup(self, backend, primary_key, environ):
+        '''This method returns the cached entry matching the given request or None if it is not cached (or purged).'''
+
+        vary = backend.get(primary_key)
+
+        if vary is None:
+            return None
+
+        entry = backend.get(self._get_variant_key(primary_key, vary, environ))
+
+        if entry is None or entry["generations"] != self._get_generations(environ):
+            return None
+
+        if environ.get("HTTP_AUTHORIZATION") and not entry["public"]:
+            return None
+
+        return entry
+
+    def _serve(self, entry, age, cache_result, method, start_response):
+        '''This method sends the given cached entry to client.'''
+
+        self._count(cache_result.lower())
+
+        headers = [(name, value) for name, value in entry["headers"] if name.lower() not in ("age", "x-cache")]
+        headers.extend([("Age", str(int(age))), ("X-Cache", cache_result)])
+
+        start_response(entry["status"], headers)
+
+        return [b""] if method == "HEAD" else [entry["body"]]
+
+    def _execute(self, backend, primary_key, environ, start_response):
+        '''This method executes the given request and stores its response if it is cacheable. Responses which can not be
+        stored (decided from status and headers) are returned unchanged so streamed bodies and file wrappers reach the
+        server.'''
+
+        generations = self._get_generations(environ)
+        response_state = {}
+
+        def capture_response(status, headers, exc_info=None):
+            '''This function stores the response status and headers before sending them to the server.'''
+
+            response_state["status"] = status
+            response_state["headers"] = list(headers)
+
+            return start_response(status, headers, exc_info) if exc_info else start_response(status, headers)
+
+        result = self._app(environ, capture_response)
+
+        if response_state and self._get_store_policy(environ, response_state) is None:
+            return result
+
+        return self._store_body(result, backend, primary_key, environ, generations, response_state)
+
+    def _store_body(self, result, backend, primary_key, environ, generations, response_state):
+        '''This generator sends the given response body chunks and keeps a copy of them (while the body is not bigger than
+        **max_entry_size**) so that the response is stored once it is completely sent.'''
+
+        policy = None
+        chunks, size = [], 0
+
+        try:
+            for chunk in result:
+                if policy is None:
+                    policy = self._get_store_policy(environ, response_state) or False
+
+                if policy and chunks is not None:
+                    size += len(chunk)
+
+                    if size <= self._max_entry_size:
+                        chunks.append(chunk)
+                    else:
+                        chunks = None
+
+                yield chunk
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        if policy is None:
+            policy = self._get_store_policy(environ, response_state)
+
+        if policy and chunks is not None:
+            self._store(backend, primary_key, environ, generations, response_state, policy, b"".join(chunks))
+
+    def _get_store_policy(self, environ, response_state):
+        '''This method decides (from response status and headers) if the response of the given request can be stored. It
+        returns None if the response can not be stored or a (max age, stale while revalidate, vary, public) tuple.'''
+
+        status = response_state.get("status") or ""
+        headers_lower = {}
+
+        for name, value in response_state.get("headers") or []:
+            headers_lower.setdefault(name.lower(), []).append(value)
+
+        response_cc = parse_cache_control(", ".join(headers_lower.get("cache-control", [])))
+        max_age = self._get_max_age(response_cc)
+
+        if max_age is None or not status[:3].isdigit() or int(status[:3]) not in self.CACHEABLE_STATUSES or \
+                "set-cookie" in headers_lower or \
+                any(directive in response_cc for directive in ("no-store", "no-cache", "private")) or \
+                (environ.get("HTTP_AUTHORIZATION") and "public" not in response_cc):
+            return None
+
+        content_length = (headers_lower.get("content-length") or [""])[0]
+
+        if content_length.isdigit() and int(content_length) > self._max_entry_size:
+            return None
+
+        vary = sorted({header.strip().lower() for value in headers_lower.get("vary", []) for header in value.split(",")
+                       if header.strip()})
+
+        if "*" in vary:
+            return None
+
+        try:
+            swr = max(0, int(response_cc.get("stale-while-revalidate", 0)))
+        except ValueError:
+            swr = 0
+
+        return max_age, swr, vary, "public" in response_cc
+
+    def _store(self, backend, primary_key, environ, generations, response_state, policy, body):
+        '''This method stores the given response body using the given store policy.'''
+
+        max_age, swr, vary, public = policy
+
+        entry = {"stored_at": self._time_provider.time(),
+                 "max_age": max_age,
+                 "swr": swr,
+                 "public": public,
+                 "generations": generations,
+                 "status": response_state["status"],
+                 "headers": response_state["headers"],
+                 "body": body}
+
+        backend.set(primary_key, vary, ttl=max_age + swr)
+        backend.set(self._get_variant_key(primary_key, vary, environ), entry, ttl=max_age + swr)
+
+    def _schedule_refresh(self, primary_key, environ):
+        '''This method refreshes the given stale request in background (unless a refresh is already running in this worker).
+        The request is executed with a fresh request object so that it does not depend on the lifecycle of the client
+        request.'''
+
+        with self._lock:
+            if primary_key in self._refreshing:
+                return
+
+            self._refreshing.add(primary_key)
+
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self._refresh_threads)
+                self._executor_pid = os.getpid()
+
+        refresh_environ = {key: value for key, value in environ.items()
+                           if not key.startswith("fantastico.") and not key.startswith("route_")}
+        refresh_environ["wsgi.input"] = io.BytesIO(b"")
+
+        self._executor.submit(self._refresh, primary_key, refresh_environ)
+
+    def _refresh(self, primary_key, environ):
+        '''This method executes the given request and stores its response. It runs in background.'''
+
+        try:
+            backend = self._caches.get_backend(self._backend_name)
+            generations = self._get_generations(environ)
+            response_state = {}
+
+            def capture_response(status, headers, exc_info=None): # pylint: disable=W0613
+                '''This function stores the response status and headers.'''
+
+                response_state["status"] = status
+                response_state["headers"] = list(headers)
+
+            result = self._refresh_app(environ, capture_response)
+
+            for _ in self._store_body(result, backend, primary_key, environ, generations, response_state):
+                pass
+        except Exception as ex: # pylint: disable=W0703
+            self._logger.warning("Background refresh of %s failed: %s", primary_key, ex)
+        finally:
+            with self._lock:
+                self._refreshing.discard(primary_key)
+
+    def _get_generations(self, environ):
+        '''This method returns the invalidation generations of all path prefixes of the given request.'''
+
+        return tuple(self._invalidation_bus.generation(topic) for topic in path_topics(environ.get("PATH_INFO", "")))
+
+    def _get_variant_key(self, primary_key, vary, environ):
+        '''This method builds the cache key of the response variant selected by the given vary headers.'''
+
+        values = [environ.get("HTTP_%s" % header.upper().replace("-", "_"), "") for header in vary]
+        values = [accept_encoding_key(value) if header == "accept-encoding" else value
+                  for header, value in zip(vary, values)]
+
+        return "%s#%s" % (primary_key, json.dumps([list(item) for item in zip(vary, values)]))
+
+    def _get_max_age(self, response_cc):
+        '''This method returns the freshness lifetime granted by the given response cache control directives (None if the
+        response does not grant one).'''
+
+        for directive in ("s-maxage", "max-age"):
+            try:
+                max_age = int(response_cc.get(directive))
+            except (TypeError, ValueError):
+                continue
+
+            return max_age if max_age > 0 else None
+
+        return None
+
+    def _count(self, result):
+        '''This method counts a cache lookup with the given result.'''
+
+        self._metrics.counter("fantastico_http_cache_requests_total", "Http cache lookups.", {"result": result}).inc()
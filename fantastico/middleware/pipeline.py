@@ -0,0 +1,108 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.pipeline
+'''
+from fantastico.utils import instantiator, metrics
+import time
+
+class PipelineStageTimer(object):
+    '''This class wraps a pipeline stage (a middleware or the controller executor) and records the time spent in the stage
+    itself (the time spent in downstream stages is excluded) into a histogram.'''
+
+    STAGE_TIME_KEY = "fantastico.pipeline.stage_time"
+
+    def __init__(self, app, histogram, outermost=False, time_provider=time):
+        self._app = app
+        self._histogram = histogram
+        self._outermost = outermost
+        self._time_provider = time_provider
+
+    def __call__(self, environ, start_response):
+        start = self._time_provider.time()
+
+        try:
+            return self._app(environ, start_response)
+        finally:
+            inclusive = self._time_provider.time() - start
+            downstream = environ.pop(self.STAGE_TIME_KEY, 0.0)
+
+            self._histogram.observe(max(inclusive - downstream, 0.0))
+
+            if not self._outermost:
+                environ[self.STAGE_TIME_KEY] = inclusive
+
+class MiddlewarePipeline(object):
+    '''This class composes the configured middlewares into a plain nested callable chain. The chain is built only once and
+    middleware classes are never changed so multiple pipelines (and multiple applications) can safely coexist in the same
+    process.
+
+    .. code-block:: python
+
+        pipeline = MiddlewarePipeline(["fantastico.middleware.request_middleware.RequestMiddleware",
+                                       "fantastico.middleware.routing_middleware.RoutingMiddleware"],
+                                      controller_executor, timed=True)
+
+        app = pipeline.build()
+        app(environ, start_response)
+
+        for stage_name, histogram in pipeline.timings.items():
+            print(stage_name, histogram.count, histogram.sum)
+
+    When **timed** is True, each middleware and the controller executor (named **CONTROLLER_STAGE**) are wrapped in a
+    :py:class:`fantastico.middleware.pipeline.PipelineStageTimer` which records the latency of the stage. Latency histograms
+    are registered into the given metrics registry as **fantastico_pipeline_stage_seconds** (labeled by stage).'''
+
+    CONTROLLER_STAGE = "controller"
+
+    def __init__(self, middlewares, app, timed=False, time_provider=time, registry=None):
+        self._middlewares = list(middlewares or [])
+        self._app = app
+        self._timed = timed
+        self._time_provider = time_provider
+        self._registry = registry or metrics.METRICS
+        self._timings = {}
+
+    @property
+    def timings(self):
+        '''This property returns a dictionary containing the latency histogram of each stage (indexed by middleware class full
+        name). It is empty if the pipeline is not timed.'''
+
+        return self._timings
+
+    def build(self):
+        '''This method instantiates all middlewares (in reverse order) and returns the outermost callable of the chain.'''
+
+        curr_app = self._wrap_stage(self.CONTROLLER_STAGE, self._app, outermost=not self._middlewares)
+
+        for idx, middleware_cls in enumerate(reversed(self._middlewares)):
+            middleware = instantiator.instantiate_class(middleware_cls, [curr_app])
+
+            curr_app = self._wrap_stage(middleware_cls, middleware, outermost=idx == len(self._middlewares) - 1)
+
+        return curr_app
+
+    def _wrap_stage(self, stage_name, stage, outermost):
+        '''This method wraps the given stage into a timer if the pipeline is timed.'''
+
+        if not self._timed:
+            return stage
+
+        histogram = self._registry.histogram("fantastico_pipeline_stage_seconds", "Time spent in each pipeline stage.",
+                                             {"stage": stage_name})
+        self._timings[stage_name] = histogram
+
+        return PipelineStageTimer(stage, histogram, outermost=outermost, time_provider=self._time_provider)
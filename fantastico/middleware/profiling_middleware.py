@@ -0,0 +1,231 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.middleware.profiling_middleware
+'''
+from fantastico.settings import SettingsFacade
+import cProfile
+import hashlib
+import hmac
+import itertools
+import logging
+import os
+import re
+import time
+
+class ProfilingMiddleware(object):
+    '''This class provides on demand profiling of individual requests using **cProfile**. A request is profiled when:
+
+    * it carries a valid **X-Fantastico-Profile** signed header (see
+      :py:meth:`fantastico.middleware.profiling_middleware.ProfilingMiddleware.sign`).
+    * it is the n-th request handled by the worker (1 in **sample_every** requests).
+
+    Profiles are dumped (in **pstats** format) into **spool_folder**, in a subfolder named after the route controller method,
+    and can be merged and displayed using **fsdk profiles** command. Each worker profiles at most one request every
+    **min_interval** seconds and only the newest **max_profiles** profiles of each route are kept (older ones are removed).
+    Profiles are written into a temporary file which is renamed once complete, so merging never reads a partial profile, and
+    failures while dumping a profile are logged without affecting the response. Requests which are not profiled pass through
+    this middleware without any profiling overhead. The middleware is not installed by default; add it right before
+    **RoutingMiddleware** into **installed_middleware** setting and configure **profiling_config** setting:
+
+    .. code-block:: python
+
+        class ProfiledSettings(BasicSettings):
+            @property
+            def profiling_config(self):
+                return {"spool_folder": "/tmp/fantastico-profiles",
+                        "sample_every": 1000,
+                        "secret": "my secret",
+                        "signature_ttl": 300,
+                        "max_profiles": 100,
+                        "min_interval": 1.0}
+
+    A signed header can be obtained as shown below:
+
+    .. code-block:: python
+
+        header_value = ProfilingMiddleware.sign("my secret", "/api/latest/sample-resources")
+
+        # curl -H "X-Fantastico-Profile: <header_value>" http://localhost:12000/api/latest/sample-resources
+    '''
+
+    PROFILE_HEADER = "HTTP_X_FANTASTICO_PROFILE"
+    PROFILE_EXTENSION = ".prof"
+
+    def __init__(self, app, settings_facade=SettingsFacade, profiler_cls=cProfile.Profile, time_provider=time):
+        self._app = app
+        self._profiler_cls = profiler_cls
+        self._time_provider = time_provider
+
+        profiling_config = settings_facade().get("profiling_config") or {}
+
+        self._spool_folder = profiling_config.get("spool_folder")
+        self._sample_every = profiling_config.get("sample_every") or 0
+        self._secret = profiling_config.get("secret")
+        self._signature_ttl = profiling_config.get("signature_ttl", 300)
+        self._max_profiles = profiling_config.get("max_profiles", 100)
+        self._min_interval = profiling_config.get("min_interval", 1.0)
+        self._last_profile = None
+        self._logger = logging.getLogger(__name__)
+
+        self._requests_counter = itertools.count(1)
+        self._profiles_counter = itertools.count(1)
+
+    @staticmethod
+    def sign(secret, path, timestamp=None):
+        '''This method builds a signed profiling header value for the given path. The signature is valid for
+        **signature_ttl** seconds from the given timestamp (default now).'''
+
+        timestamp = str(int(timestamp if timestamp is not None else time.time()))
+
+        signature = hmac.new(secret.encode(), ("%s:%s" % (timestamp, path)).encode(), hashlib.sha256).hexdigest()
+
+        return "%s:%s" % (timestamp, signature)
+
+    def __call__(self, environ, start_response):
+        '''This method profiles the current request only if it is triggered by header or sampling. Otherwise, the request is
+        handled by the next middleware directly.'''
+
+        if not self._should_profile(environ):
+            return self._app(environ, start_response)
+
+        profiler = self._profiler_cls()
+        profiler.enable()
+
+        try:
+            return self._app(environ, start_response)
+        finally:
+            profiler.disable()
+
+            try:
+                self._dump_profile(profiler, environ)
+            except Exception: # pylint: disable=W0703
+                self._logger.exception("Unable to dump the profile of %s.", environ.get("PATH_INFO"))
+
+    def _should_profile(self, environ):
+        '''This method decides if the current request must be profiled.'''
+
+        if not self._spool_folder:
+            return False
+
+        header_value = environ.get(self.PROFILE_HEADER)
+
+        if header_value is not None and self._is_signature_valid(header_value, environ.get("PATH_INFO", "")):
+            return self._acquire_dump_slot()
+
+        if self._sample_every > 0 and next(self._requests_counter) % self._sample_every == 0:
+            return self._acquire_dump_slot()
+
+        return False
+
+    def _acquire_dump_slot(self):
+        '''This method returns True if the current worker did not profile another request in the last **min_interval**
+        seconds.'''
+
+        now = self._time_provider.time()
+
+        if self._last_profile is not None and now - self._last_profile < self._min_interval:
+            return False
+
+        self._last_profile = now
+
+        return True
+
+    def _is_signature_valid(self, header_value, path):
+        '''This method validates the given signed header value against the requested path.'''
+
+        if not self._secret:
+            return False
+
+        timestamp = header_value.split(":", 1)[0]
+
+        try:
+            if abs(self._time_provider.time() - int(timestamp)) > self._signature_ttl:
+                return False
+        except ValueError:
+            return False
+
+        return hmac.compare_digest(ProfilingMiddleware.sign(self._secret, path, int(timestamp)), header_value)
+
+    def _dump_profile(self, profiler, environ):
+        '''This method writes the profile of the current request into the spool folder of the current route. The profile is
+        dumped into a temporary file which is then renamed.'''
+
+        route_folder = os.path.join(self._spool_folder, self._get_route_name(environ))
+
+        os.makedirs(route_folder, exist_ok=True)
+
+        profile_name = "%s-%s-%s%s" % (os.getpid(), int(self._time_provider.time()), next(self._profiles_counter),
+                                       self.PROFILE_EXTENSION)
+        profile_file = os.path.join(route_folder, profile_name)
+        tmp_file = "%s.tmp" % profile_file
+
+        try:
+            profiler.dump_stats(tmp_file)
+
+            os.replace(tmp_file, profile_file)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+            raise
+
+        self._remove_old_profiles(route_folder)
+
+    def _remove_old_profiles(self, route_folder):
+        '''This method removes the oldest profiles of the given route folder so that at most **max_profiles** are kept. Profiles
+        removed concurrently by other workers are ignored.'''
+
+        if not self._max_profiles:
+            return
+
+        profiles = []
+
+        for profile_name in os.listdir(route_folder):
+            if not profile_name.endswith(self.PROFILE_EXTENSION):
+                continue
+
+            profile_file = os.path.join(route_folder, profile_name)
+
+            try:
+                profiles.append((os.stat(profile_file).st_mtime, profile_name, profile_file))
+            except FileNotFoundError:
+                continue
+
+        profiles.sort()
+
+        for _, _, profile_file in profiles[:max(len(profiles) - self._max_profiles, 0)]:
+            try:
+                os.remove(profile_file)
+            except FileNotFoundError:
+                pass
+
+    def _get_route_name(self, environ):
+        '''This method returns a file system safe name of the current route: the controller method selected by routing
+        middleware or the requested path if the request was not routed.'''
+
+        request = environ.get("fantastico.request")
+        path = request.path if request else environ.get("PATH_INFO", "")
+        route_handler = environ.get("route_%s_handler" % path)
+
+        if route_handler and route_handler.get("controller"):
+            controller_cls = route_handler["controller"].__class__
+
+            route_name = "%s.%s.%s" % (controller_cls.__module__, controller_cls.__name__, route_handler.get("method"))
+        else:
+            route_name = path
+
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", route_name).strip("._") or "root"
@@ -20,18 +20,28 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 
 class RequestContext(object):
     '''This class holds various attributes useful giving a context to an http request. Among other things we need
-    to be able to access current language, current session and possible current user profile.'''
+    to be able to access current language, current session and possible current user profile.
 
-    def __init__(self, settings, language):
+    Language and security context can be computed lazily: instead of a value, the middlewares can register a resolver which is
+    invoked only the first time the attribute is accessed. This way, requests which never use the language (or the security
+    context) do not pay for computing it.'''
+
+    def __init__(self, settings, language=None, language_resolver=None):
         '''
         :param language: The language associated with the current request.
         :type language: fantastico.locale.language.Language
         :param settings: The current settings facade that can be used to obtain items from framework configuration.
         :type settings: fantastico.settings.SettingsFacade
+        :param language_resolver: A callable without arguments which returns the request language. It is used only if
+            language is not given.
+        :type language_resolver: callable
         '''
 
         self._settings = settings
         self._language = language
+        self._language_resolver = language_resolver
+        self._security = None
+        self._security_resolver = None
         self._wsgi_app = None
 
     @property
@@ -44,8 +54,44 @@ class RequestContext(object):
     def language(self):
         '''Property that holds the current language that must be used during this request.'''
 
+        if self._language is None and self._language_resolver:
+            self._language = self._language_resolver()
+            self._language_resolver = None
+
         return self._language
 
+    @property
+    def security(self):
+        '''Property that holds the OAuth2 security context of the current request
+        (:py:class:`fantastico.oauth2.security_context.SecurityContext`). If the registered resolver raises an exception, the
+        exception is propagated and the resolver is invoked again on next access.'''
+
+        if self._security is None and self._security_resolver:
+            self._security = self._security_resolver()
+            self._security_resolver = None
+
+        return self._security
+
+    @security.setter
+    def security(self, value):
+        '''Setter property used to set the security context of the current request.'''
+
+        self._security = value
+        self._security_resolver = None
+
+    @property
+    def security_resolver(self):
+        '''Property that holds the callable used to build the security context the first time it is accessed.'''
+
+        return self._security_resolver
+
+    @security_resolver.setter
+    def security_resolver(self, value):
+        '''Setter property used to register a callable which builds the security context on first access.'''
+
+        self._security = None
+        self._security_resolver = value
+
     @property
     def wsgi_app(self):
         '''Property that holds the WSGI application instance under which the request is handled.'''
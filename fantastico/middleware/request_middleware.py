@@ -22,49 +22,90 @@ from fantastico.locale.language import Language
 from fantastico.middleware.request_context import RequestContext
 from fantastico.routing_engine.custom_responses import RedirectResponse
 from fantastico.settings import SettingsFacade
+from fantastico.utils.lru_cache import LruCache
 from webob.request import Request
 import uuid
 
 class RequestMiddleware(object):
     '''This class provides the middleware responsible for converting wsgi environ dictionary into a request. The result is saved
     into current WSGI environ under key **fantastico.request**. In addition each new request receives an identifier. If subsequent
-    requests are triggered from that request then they will also receive the same request id.'''
+    requests are triggered from that request then they will also receive the same request id.
 
-    def __init__(self, app):
+    Request language is detected only when it is first accessed from request context. Detected languages are cached by raw
+    **Accept-Language** header value (at most **LANGUAGES_CACHE_SIZE** distinct headers) and language objects are shared
+    between requests.'''
+
+    LANGUAGES_CACHE_SIZE = 512
+
+    def __init__(self, app, languages_cache=None):
         self._app = app
+        self._languages_cache = languages_cache if languages_cache is not None \
+                                    else LruCache(self.LANGUAGES_CACHE_SIZE, name="languages")
+        self._languages = {}
 
     def _build_context(self, request):
         '''Method used to build the context object starting for a request.'''
 
+        settings_facade = SettingsFacade.for_environ(request.environ)
+
+        request.context = RequestContext(settings_facade,
+                                         language_resolver=lambda: self._detect_language(request, settings_facade))
+
+    def _detect_language(self, request, settings_facade):
+        '''Method used to detect the language of the given request. The result is cached by raw Accept-Language header.'''
+
+        cache_key = (settings_facade, request.environ.get("HTTP_ACCEPT_LANGUAGE"))
+
+        language = self._languages_cache.get(cache_key)
+
+        if language:
+            return language
+
         client_langs = request.accept_language
 
-        settings_facade = SettingsFacade(request.environ)
         supported_langs = settings_facade.get("supported_languages")
+        langs_lookup = settings_facade.get("supported_languages_lookup")
 
         if hasattr(client_langs, "_parsed"):
             client_langs = client_langs._parsed # pylint: disable=W0212
         else:
             client_langs = []
 
-        context = RequestContext(settings_facade, self._get_supported_lang(supported_langs, client_langs))
+        language = self._get_supported_lang(supported_langs, client_langs, langs_lookup)
 
-        request.context = context
+        self._languages_cache.set(cache_key, language)
 
-    def _get_supported_lang(self, supported_languages, client_languages):
+        return language
+
+    def _get_supported_lang(self, supported_languages, client_languages, langs_lookup=None):
         '''Method used to detect supported language by intersected the supported languages configured with the languages
-        requested by user.'''
+        requested by user. Languages lookup maps every prefix of a supported language to the first supported language starting
+        with that prefix (see :py:class:`fantastico.settings.SettingsSnapshot`).'''
 
-        for lang in client_languages:
-            lang_code = lang[0].lower().replace("-", "_")
+        if langs_lookup is None:
+            langs_lookup = {}
 
             for lang_supported in supported_languages:
-                if lang_code == lang_supported:
-                    return Language(lang_code)
+                for idx in range(1, len(lang_supported) + 1):
+                    langs_lookup.setdefault(lang_supported[:idx], lang_supported)
+
+        for lang in client_languages:
+            lang_supported = langs_lookup.get(lang[0].lower().replace("-", "_"))
+
+            if lang_supported:
+                return self._get_language(lang_supported)
+
+        return self._get_language(supported_languages[0])
+
+    def _get_language(self, lang_code):
+        '''Method used to obtain the shared language object for the given language code.'''
+
+        language = self._languages.get(lang_code)
 
-                if(lang_supported.startswith(lang_code)):
-                    return Language(lang_supported)
+        if not language:
+            language = self._languages[lang_code] = Language(lang_code)
 
-        return Language(supported_languages[0])
+        return language
 
     def _redirect(self, destination, query_params=None):
         '''This method is used to build a redirect response base on the given arguments.'''
@@ -0,0 +1,179 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_access_log_middleware
+'''
+from fantastico.middleware.access_log_middleware import AccessLogMiddleware, AsyncAccessLogWriter
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+from webob.request import Request
+import json
+import os
+import shutil
+import tempfile
+
+class AccessLogMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for structured access log middleware and its asynchronous writer.'''
+
+    def init(self):
+        '''This method is invoked automatically in order to set common dependencies for all test cases.'''
+
+        self._log_folder = tempfile.mkdtemp()
+        self._registry = MetricsRegistry()
+
+    def cleanup(self):
+        '''This method removes the log folder used by test cases.'''
+
+        shutil.rmtree(self._log_folder)
+
+    def test_record_ok(self):
+        '''This test case ensures a json record containing response info and timing breakdown is written per request.'''
+
+        request = Request.blank("/simple/request", method="POST")
+        request.request_id = 15
+
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/simple/request", "fantastico.request": request,
+                   "route_/simple/request_handler": {"route": "^/simple/request$"}}
+
+        def app(environ, start_response):
+            self._registry.add_to_breakdown("db", 0.25)
+            self._registry.add_to_breakdown("template", 0.5)
+
+            start_response("201 Created", [("Content-Type", "text/plain"), ("Content-Length", "11")])
+
+            return [b"Hello world"]
+
+        writer = Mock()
+        settings_facade = Mock()
+        settings_facade.get = Mock(return_value={"file_path": "/tmp/access.log"})
+
+        time_provider = Mock()
+        time_provider.time = Mock(side_effect=[10.0, 12.0])
+
+        middleware = AccessLogMiddleware(app, Mock(return_value=settings_facade), Mock(return_value=writer), self._registry,
+                                         time_provider)
+
+        start_response = Mock()
+
+        self.assertEqual([b"Hello world"], middleware(environ, start_response))
+
+        start_response.assert_called_once_with("201 Created", [("Content-Type", "text/plain"), ("Content-Length", "11")])
+
+        record = json.loads(writer.write.call_args[0][0])
+
+        self.assertEqual({"request_id": "15", "time": 10.0, "method": "POST", "path": "/simple/request",
+                          "route": "^/simple/request$", "status": 201, "bytes": 11, "duration": 2.0, "db_time": 0.25,
+                          "template_time": 0.5}, record)
+
+    def test_disabled(self):
+        '''This test case ensures no writer is created when access log file is not configured.'''
+
+        app = Mock(return_value=[b"response"])
+        writer_cls = Mock()
+
+        settings_facade = Mock()
+        settings_facade.get = Mock(return_value={"file_path": None})
+
+        middleware = AccessLogMiddleware(app, Mock(return_value=settings_facade), writer_cls, self._registry)
+
+        self.assertEqual([b"response"], middleware({}, Mock()))
+        self.assertEqual(0, writer_cls.call_count)
+
+    def test_writer_drops_when_full(self):
+        '''This test case ensures lines are dropped and counted when the queue is full and the rest are written on flush.'''
+
+        file_path = os.path.join(self._log_folder, "access.log")
+
+        writer = AsyncAccessLogWriter(file_path, queue_size=2, batch_size=1, metrics_registry=self._registry,
+                                      background=False)
+
+        self.assertTrue(writer.write("line1"))
+        self.assertTrue(writer.write("line2"))
+        self.assertFalse(writer.write("line3"))
+        self.assertEqual(1, writer.dropped)
+
+        writer.flush()
+
+        with open(file_path) as log_file:
+            self.assertEqual("line1\nline2\n", log_file.read())
+
+    def test_writer_reopens_rotated(self):
+        '''This test case ensures log file is reopened after it was moved by an external rotation tool.'''
+
+        file_path = os.path.join(self._log_folder, "access.log")
+
+        writer = AsyncAccessLogWriter(file_path, batch_size=1, metrics_registry=self._registry, background=False)
+
+        writer.write("line1")
+        writer.flush()
+
+        os.rename(file_path, file_path + ".1")
+
+        writer.write("line2")
+        writer.flush()
+
+        with open(file_path + ".1") as log_file:
+            self.assertEqual("line1\n", log_file.read())
+
+        with open(file_path) as log_file:
+            self.assertEqual("line2\n", log_file.read())
+
+    def test_writer_survives_failures(self):
+        '''This test case ensures lines are counted as dropped when the log file can not be opened and the writer retries
+        on the next batch.'''
+
+        file_path = os.path.join(self._log_folder, "missing", "access.log")
+
+        writer = AsyncAccessLogWriter(file_path, batch_size=5, metrics_registry=self._registry, background=False)
+
+        writer.write("line1")
+        writer.write("line2")
+        writer.flush()
+
+        self.assertEqual(2, writer.dropped)
+
+        os.mkdir(os.path.dirname(file_path))
+
+        writer.write("line3")
+        writer.flush()
+
+        self.assertEqual(2, writer.dropped)
+
+        with open(file_path) as log_file:
+            self.assertEqual("line3\n", log_file.read())
+
+    def test_writer_emit_failure(self):
+        '''This test case ensures emit failures are counted as dropped lines and the handler is built again.'''
+
+        handler = Mock()
+        handler.emit = Mock(side_effect=IOError("Disk full."))
+
+        handler_cls = Mock(return_value=handler)
+
+        writer = AsyncAccessLogWriter("/tmp/access.log", handler_cls=handler_cls, metrics_registry=self._registry,
+                                      background=False)
+
+        writer.write("line1")
+        writer.flush()
+
+        writer.write("line2")
+        writer.flush()
+
+        self.assertEqual(2, writer.dropped)
+        self.assertEqual(2, handler_cls.call_count)
+        self.assertEqual(2, handler.close.call_count)
@@ -0,0 +1,177 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_admission_middleware
+'''
+from fantastico.middleware.admission_middleware import AdmissionControlMiddleware, ConcurrencyLimiter
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+import json
+import threading
+
+class AdmissionControlMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for admission control middleware and its concurrency limiter.'''
+
+    def init(self):
+        self._config = {"max_concurrency": None,
+                        "queue_timeout": 0,
+                        "retry_after": 3,
+                        "routes": [{"pattern": "^/api/", "max_concurrency": 1}],
+                        "reserved": {"patterns": ["^/health$"], "max_concurrency": 1}}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "admission_config" else None
+
+        self._settings_facade_cls = Mock(return_value=settings_facade)
+        self._registry = MetricsRegistry()
+
+    def _build_middleware(self, app):
+        '''This method builds an admission control middleware which wraps the given app.'''
+
+        return AdmissionControlMiddleware(app, self._settings_facade_cls, metrics_registry=self._registry)
+
+    def _invoke_nested(self, path, nested_path, environ=None, nested_environ=None):
+        '''This method invokes the middleware for path and, while that request is executing, for nested_path. It returns
+        the status of the nested request.'''
+
+        nested_status = []
+
+        def app(environ, start_response):
+            if environ["PATH_INFO"] == path and not nested_status:
+                nested_environ_full = dict(nested_environ or {})
+                nested_environ_full["PATH_INFO"] = nested_path
+                nested_environ_full["REQUEST_METHOD"] = "GET"
+
+                middleware(nested_environ_full, lambda status, headers: nested_status.append((status, dict(headers))))
+
+                if not nested_status:
+                    nested_status.append(("200 OK", {}))
+
+            return [b""]
+
+        middleware = self._build_middleware(app)
+
+        environ_full = dict(environ or {})
+        environ_full["PATH_INFO"] = path
+        environ_full["REQUEST_METHOD"] = "GET"
+
+        middleware(environ_full, Mock())
+
+        return nested_status[0]
+
+    def test_route_lane_rejects(self):
+        '''This test case ensures requests exceeding a route lane limit are rejected fast with 503 and Retry-After.'''
+
+        status, headers = self._invoke_nested("/api/resources", "/api/other")
+
+        self.assertEqual("503 Service Unavailable", status)
+        self.assertEqual("3", headers["Retry-After"])
+
+        rendered = self._registry.render()
+
+        self.assertTrue(rendered.find('fantastico_admission_rejected_total{lane="^/api/"} 1') > -1)
+
+    def test_other_routes_not_limited(self):
+        '''This test case ensures routes which do not match a limited lane are not affected.'''
+
+        status, _ = self._invoke_nested("/api/resources", "/blogs")
+
+        self.assertEqual("200 OK", status)
+
+    def test_reserved_lane(self):
+        '''This test case ensures reserved routes are not blocked by other lanes but are limited by their own lane.'''
+
+        self._config["max_concurrency"] = 1
+
+        status, _ = self._invoke_nested("/api/resources", "/health")
+
+        self.assertEqual("200 OK", status)
+
+        status, _ = self._invoke_nested("/health", "/health")
+
+        self.assertTrue(status.startswith("503"))
+
+    def test_global_lane(self):
+        '''This test case ensures the global lane limits all requests which are not reserved.'''
+
+        self._config["max_concurrency"] = 1
+
+        status, _ = self._invoke_nested("/blogs", "/posts")
+
+        self.assertTrue(status.startswith("503"))
+
+    def test_controller_lane(self):
+        '''This test case ensures limits declared through @Controller are enforced.'''
+
+        controller = Mock()
+        controller.monthly_report.admission = {"max_concurrency": 1, "queue_timeout": 0}
+
+        route_handler = {"controller": controller, "method": "monthly_report"}
+        environ = {"route_/reports/monthly_handler": route_handler}
+
+        status, _ = self._invoke_nested("/reports/monthly", "/reports/monthly", environ, environ)
+
+        self.assertTrue(status.startswith("503"))
+
+    def test_rejection_body(self):
+        '''This test case ensures rejected requests receive a json error body.'''
+
+        self._config["max_concurrency"] = 1
+        bodies = []
+
+        def app(environ, start_response):
+            if not bodies:
+                bodies.append(b"".join(middleware({"PATH_INFO": "/other", "REQUEST_METHOD": "GET"}, Mock())))
+
+            return [b""]
+
+        middleware = self._build_middleware(app)
+        middleware({"PATH_INFO": "/first", "REQUEST_METHOD": "GET"}, Mock())
+
+        body = json.loads(bodies[0].decode())
+
+        self.assertEqual(503, body["error_code"])
+
+    def test_limiter_waits(self):
+        '''This test case ensures a waiting request enters the lane as soon as another request leaves it.'''
+
+        limiter = ConcurrencyLimiter("sample", max_concurrency=1)
+
+        self.assertTrue(limiter.acquire(0))
+        self.assertFalse(limiter.acquire(0))
+
+        releaser = threading.Timer(0.05, limiter.release)
+        releaser.start()
+
+        self.assertTrue(limiter.acquire(5))
+        self.assertEqual(1, limiter.active)
+        self.assertEqual(0, limiter.queued)
+
+        releaser.join()
+
+    def test_limiter_max_queue(self):
+        '''This test case ensures requests are rejected immediately when the waiting queue is full.'''
+
+        limiter = ConcurrencyLimiter("sample", max_concurrency=1, max_queue=0)
+
+        self.assertTrue(limiter.acquire(0))
+        self.assertFalse(limiter.acquire(5))
+
+        limiter.release()
+
+        self.assertEqual(0, limiter.active)
@@ -0,0 +1,189 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_coalescing_middleware
+'''
+from fantastico.middleware.coalescing_middleware import RequestCoalescingMiddleware
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+import threading
+import time
+
+class RequestCoalescingMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for single flight coalescing of identical concurrent requests.'''
+
+    def init(self):
+        self._config = {"routes": ["^/api/latest/"],
+                        "vary_headers": ["Accept", "Authorization"],
+                        "timeout": 5.0}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "coalescing_config" else None
+
+        self._registry = MetricsRegistry()
+        self._calls = []
+        self._release = threading.Event()
+        self._response_headers = [("Content-Type", "application/json")]
+
+        self._middleware = RequestCoalescingMiddleware(self._app, Mock(return_value=settings_facade),
+                                                       metrics_registry=self._registry)
+
+    def _app(self, environ, start_response):
+        '''This method provides a slow application which blocks until the test releases it.'''
+
+        self._calls.append(environ)
+
+        self._release.wait(5)
+
+        start_response("200 OK", self._response_headers)
+
+        return [b"body %s" % str(len(self._calls)).encode()]
+
+    def _build_environ(self, path="/api/latest/resources", query="", method="GET", **headers):
+        '''This method builds a WSGI environ for the given request.'''
+
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query}
+        environ.update(headers)
+
+        return environ
+
+    def _invoke(self, environ, results):
+        '''This method invokes the middleware and stores the response into results.'''
+
+        start_response = Mock()
+        body = b"".join(self._middleware(environ, start_response))
+
+        results.append((start_response.call_args[0][0], body))
+
+    def _wait_for(self, condition):
+        '''This method waits until the given condition is met.'''
+
+        for _ in range(500):
+            if condition():
+                return
+
+            time.sleep(0.01)
+
+        self.fail("Condition not met.")
+
+    def _run_concurrently(self, leader_environ, followers_environs):
+        '''This method executes the leader request and, while it is in flight, all followers requests.'''
+
+        results = []
+        threads = [threading.Thread(target=self._invoke, args=(leader_environ, results))]
+        threads[0].start()
+
+        self._wait_for(lambda: len(self._calls) == 1)
+
+        for environ in followers_environs:
+            thread = threading.Thread(target=self._invoke, args=(environ, results))
+            thread.start()
+            threads.append(thread)
+
+        time.sleep(0.05)
+        self._release.set()
+
+        for thread in threads:
+            thread.join(5)
+
+        return results
+
+    def test_identical_requests_coalesced(self):
+        '''This test case ensures identical concurrent requests execute the application only once.'''
+
+        environ = self._build_environ(query="b=2&a=1")
+        followers = [self._build_environ(query="a=1&b=2") for _ in range(3)]
+
+        results = self._run_concurrently(environ, followers)
+
+        self.assertEqual(1, len(self._calls))
+        self.assertEqual([("200 OK", b"body 1")] * 4, results)
+        self.assertEqual(0, self._middleware.in_flight)
+        self.assertTrue(self._registry.render().find("fantastico_coalesced_requests_total 3") > -1)
+
+    def test_vary_headers(self):
+        '''This test case ensures requests with different vary headers (e.g different users) are not coalesced.'''
+
+        environ = self._build_environ(HTTP_AUTHORIZATION="Bearer token1")
+        followers = [self._build_environ(HTTP_AUTHORIZATION="Bearer token2"), self._build_environ(query="a=2")]
+
+        self._run_concurrently(environ, followers)
+
+        self.assertEqual(3, len(self._calls))
+
+    def test_cookies_not_shared(self):
+        '''This test case ensures responses setting cookies are not shared.'''
+
+        self._response_headers.append(("Set-Cookie", "session=abc"))
+
+        self._run_concurrently(self._build_environ(), [self._build_environ()])
+
+        self.assertEqual(2, len(self._calls))
+
+    def test_not_coalesced(self):
+        '''This test case ensures only GET requests for configured routes are coalesced.'''
+
+        self._release.set()
+
+        for environ in [self._build_environ(method="POST"), self._build_environ(path="/blogs")]:
+            self._invoke(environ, [])
+
+        self.assertEqual(0, self._middleware.in_flight)
+        self.assertEqual(2, len(self._calls))
+
+    def test_leader_failure(self):
+        '''This test case ensures requests waiting for a failing leader execute the application themselves.'''
+
+        leader_failed = []
+
+        def app(environ, start_response):
+            if not leader_failed:
+                leader_failed.append(True)
+                self._release.wait(5)
+                raise Exception("Unexpected error.")
+
+            start_response("200 OK", [])
+
+            return [b"follower"]
+
+        self._middleware._app = app
+
+        results = []
+        leader = threading.Thread(target=self._safe_invoke, args=(self._build_environ(),))
+        leader.start()
+
+        self._wait_for(lambda: self._middleware.in_flight == 1)
+
+        follower = threading.Thread(target=self._invoke, args=(self._build_environ(), results))
+        follower.start()
+
+        time.sleep(0.05)
+        self._release.set()
+
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual([("200 OK", b"follower")], results)
+
+    def _safe_invoke(self, environ):
+        '''This method invokes the middleware ignoring application errors.'''
+
+        try:
+            self._middleware(environ, Mock())
+        except Exception: # pylint: disable=W0703
+            pass
@@ -0,0 +1,247 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_compression_middleware
+'''
+from fantastico.middleware.compression_middleware import CompressionMiddleware, accept_encoding_key, etag_matches, \
+    negotiate_encoding
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+import gzip
+import zlib
+
+class CompressionMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for response compression middleware.'''
+
+    def init(self):
+        self._config = {"encodings": ["gzip", "deflate"],
+                        "min_size": 100,
+                        "level": 6,
+                        "etag_cache_size": 10,
+                        "content_types": ["application/json", "text/html"]}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "compression_config" else None
+
+        self._registry = MetricsRegistry()
+        self._body = b'{"items": [%s]}' % b", ".join([b'{"id": 1, "name": "simple resource"}'] * 20)
+        self._response_headers = [("Content-Type", "application/json; charset=UTF-8"),
+                                  ("Content-Length", str(len(self._body)))]
+        self._streamed = False
+
+        self._middleware = CompressionMiddleware(self._app, Mock(return_value=settings_facade),
+                                                 metrics_registry=self._registry)
+
+    def _app(self, environ, start_response):
+        '''This method provides an application which returns the configured response.'''
+
+        start_response("200 OK", list(self._response_headers))
+
+        if self._streamed:
+            return iter([self._body[:50], self._body[50:]])
+
+        return [self._body]
+
+    def _invoke(self, method="GET", **headers):
+        '''This method invokes the middleware and returns response status, headers and body.'''
+
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": "/api/resources"}
+        environ.update(headers)
+
+        start_response = Mock()
+        body = b"".join(self._middleware(environ, start_response))
+
+        status, headers = start_response.call_args[0][:2]
+
+        return status, dict(headers), body
+
+    def test_negotiate_encoding(self):
+        '''This test case ensures content coding is negotiated according to quality values and server preferences.'''
+
+        self.assertEqual("gzip", negotiate_encoding("gzip, deflate, br"))
+        self.assertEqual("deflate", negotiate_encoding("gzip;q=0.5, deflate"))
+        self.assertEqual("deflate", negotiate_encoding("gzip, deflate", ["deflate", "gzip"]))
+        self.assertEqual("gzip", negotiate_encoding("*"))
+        self.assertIsNone(negotiate_encoding("gzip;q=0, *;q=0"))
+        self.assertIsNone(negotiate_encoding("br, identity"))
+        self.assertIsNone(negotiate_encoding(None))
+
+        self.assertEqual(accept_encoding_key("gzip, deflate"), accept_encoding_key("deflate,gzip;q=1, br"))
+        self.assertNotEqual(accept_encoding_key("gzip"), accept_encoding_key("gzip, deflate"))
+
+    def test_gzip_response(self):
+        '''This test case ensures responses are gzip compressed when the client accepts it.'''
+
+        status, headers, body = self._invoke(HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual("200 OK", status)
+        self.assertEqual("gzip", headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", headers["Vary"])
+        self.assertEqual(str(len(body)), headers["Content-Length"])
+        self.assertLess(len(body), len(self._body))
+        self.assertEqual(self._body, gzip.decompress(body))
+        self.assertIn('fantastico_compressed_responses_total{encoding="gzip"} 1', self._registry.render())
+
+    def test_deflate_response(self):
+        '''This test case ensures responses are deflate compressed when the client prefers it.'''
+
+        _, headers, body = self._invoke(HTTP_ACCEPT_ENCODING="deflate")
+
+        self.assertEqual("deflate", headers["Content-Encoding"])
+        self.assertEqual(self._body, zlib.decompress(body))
+
+    def test_identity_response(self):
+        '''This test case ensures responses are not compressed for clients which do not accept any supported coding, but they
+        still vary on Accept-Encoding.'''
+
+        for accept_encoding in [{}, {"HTTP_ACCEPT_ENCODING": "br"}]:
+            _, headers, body = self._invoke(**accept_encoding)
+
+            self.assertEqual(self._body, body)
+            self.assertNotIn("Content-Encoding", headers)
+            self.assertEqual("Accept-Encoding", headers["Vary"])
+
+        _, headers, body = self._invoke("HEAD", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", headers)
+
+    def test_not_compressible(self):
+        '''This test case ensures small, already encoded, no-transform and not allowed content type responses are not
+        compressed.'''
+
+        original_headers = self._response_headers
+
+        for extra_headers in [[("Content-Encoding", "br")], [("Cache-Control", "public, no-transform")]]:
+            self._response_headers = original_headers + extra_headers
+
+            _, headers, body = self._invoke(HTTP_ACCEPT_ENCODING="gzip")
+
+            self.assertEqual(self._body, body)
+            self.assertNotIn("Vary", headers)
+
+        self._response_headers = [("Content-Type", "image/png"), ("Content-Length", str(len(self._body)))]
+        self.assertNotIn("Content-Encoding", self._invoke(HTTP_ACCEPT_ENCODING="gzip")[1])
+
+        self._body = b'{"id": 1}'
+        self._response_headers = [("Content-Type", "application/json")]
+
+        _, headers, body = self._invoke(HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(self._body, body)
+        self.assertNotIn("Content-Encoding", headers)
+
+    def test_streamed_response(self):
+        '''This test case ensures app_iter responses are compressed while they are streamed.'''
+
+        self._streamed = True
+        self._response_headers = [("Content-Type", "text/html")]
+
+        environ = {"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}
+        start_response = Mock()
+
+        chunks = self._middleware(environ, start_response)
+
+        headers = dict(start_response.call_args[0][1])
+
+        self.assertEqual("gzip", headers["Content-Encoding"])
+        self.assertNotIn("Content-Length", headers)
+
+        first_chunk = next(chunks)
+        decompressor = zlib.decompressobj(31)
+
+        self.assertEqual(self._body[:50], decompressor.decompress(first_chunk))
+        self.assertEqual(self._body, gzip.decompress(first_chunk + b"".join(chunks)))
+
+    def test_streamed_passthrough(self):
+        '''This test case ensures streamed responses which are not compressed are returned unchanged and responses which
+        also write chunks are streamed (not joined in memory).'''
+
+        file_wrapper = iter([self._body])
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "image/png")])
+
+            return file_wrapper
+
+        self._middleware._app = app
+
+        self.assertIs(file_wrapper, self._middleware({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}, Mock()))
+
+        def write_app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/html")])(b"written ")
+
+            return iter([self._body])
+
+        self._middleware._app = write_app
+
+        chunks = self._middleware({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}, Mock())
+
+        self.assertNotIsInstance(chunks, list)
+        self.assertEqual(b"written " + self._body, gzip.decompress(b"".join(chunks)))
+
+    def test_etag_encoded_and_compressed_once(self):
+        '''This test case ensures compressed responses carry strong etags specific to the content coding and their bodies
+        are compressed only once.'''
+
+        self._response_headers.append(("ETag", '"v1"'))
+
+        compressobj = zlib.compressobj
+
+        try:
+            zlib.compressobj = Mock(side_effect=compressobj)
+
+            _, headers, body = self._invoke(HTTP_ACCEPT_ENCODING="gzip")
+            _, _, cached_body = self._invoke(HTTP_ACCEPT_ENCODING="gzip")
+
+            self.assertEqual(1, zlib.compressobj.call_count)
+        finally:
+            zlib.compressobj = compressobj
+
+        self.assertEqual('"v1-gzip"', headers["ETag"])
+        self.assertEqual(body, cached_body)
+
+    def test_etag_matches(self):
+        '''This test case ensures ETags of compressed representations match the identity ETag and weak ETags are ignored
+        by strong comparison.'''
+
+        self.assertTrue(etag_matches('"v1"', '"v1-gzip"'))
+        self.assertTrue(etag_matches('"v1-deflate"', '"other", "v1"'))
+        self.assertTrue(etag_matches('"v1"', "*"))
+        self.assertFalse(etag_matches('"v1"', 'W/"v1"'))
+        self.assertTrue(etag_matches('"v1"', 'W/"v1"', strong=False))
+        self.assertFalse(etag_matches('"v1"', '"v2-gzip"'))
+
+    def test_lazy_start_response(self):
+        '''This test case ensures applications which call start_response while their body is iterated are forwarded
+        unchanged.'''
+
+        def app(environ, start_response):
+            write = start_response("200 OK", list(self._response_headers))
+            write(b"written ")
+
+            yield self._body
+
+        self._middleware._app = app # pylint: disable=W0212
+
+        start_response = Mock()
+        result = self._middleware({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}, start_response)
+
+        self.assertEqual(0, start_response.call_count)
+        self.assertEqual(b"written " + self._body, b"".join(result))
+
+        start_response.assert_called_once_with("200 OK", self._response_headers)
@@ -0,0 +1,178 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_conditional_middleware
+'''
+from fantastico.middleware.conditional_middleware import ConditionalGetMiddleware, compute_etag, is_not_modified
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+
+class ConditionalGetMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for conditional GET middleware.'''
+
+    def init(self):
+        self._config = {"max_body_size": 1024}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "conditional_config" else None
+
+        self._registry = MetricsRegistry()
+        self._status = "200 OK"
+        self._response_headers = [("Content-Type", "application/json"), ("Cache-Control", "max-age=60"),
+                                  ("Content-Length", "13")]
+        self._body = b'{"id": "abc"}'
+
+        self._middleware = ConditionalGetMiddleware(self._app, Mock(return_value=settings_facade),
+                                                    metrics_registry=self._registry)
+
+    def _app(self, environ, start_response):
+        '''This method provides an application which returns the configured response.'''
+
+        start_response(self._status, list(self._response_headers))
+
+        return [self._body]
+
+    def _invoke(self, method="GET", **headers):
+        '''This method invokes the middleware and returns response status, headers and body.'''
+
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": "/api/resources"}
+        environ.update(headers)
+
+        start_response = Mock()
+        body = b"".join(self._middleware(environ, start_response))
+
+        status, headers = start_response.call_args[0][:2]
+
+        return status, dict(headers), body
+
+    def test_etag_added(self):
+        '''This test case ensures a strong etag computed from body is added to successful GET responses.'''
+
+        status, headers, body = self._invoke()
+
+        self.assertEqual(("200 OK", self._body), (status, body))
+        self.assertEqual(compute_etag(self._body), headers["ETag"])
+        self.assertEqual(headers["ETag"], self._invoke()[1]["ETag"])
+        self.assertTrue(headers["ETag"].startswith('"'))
+
+    def test_if_none_match(self):
+        '''This test case ensures a bodiless 304 is returned when the client etag matches.'''
+
+        etag = compute_etag(self._body)
+
+        for if_none_match in [etag, 'W/%s' % etag, '"other", %s' % etag, "*"]:
+            status, headers, body = self._invoke(HTTP_IF_NONE_MATCH=if_none_match)
+
+            self.assertEqual(("304 Not Modified", b""), (status, body))
+            self.assertEqual({"ETag": etag, "Cache-Control": "max-age=60"}, headers)
+
+        self.assertEqual("200 OK", self._invoke(HTTP_IF_NONE_MATCH='"other"')[0])
+        self.assertIn("fantastico_not_modified_total 4", self._registry.render())
+
+    def test_controller_etag(self):
+        '''This test case ensures etags set by controllers are kept and validated (also for HEAD requests).'''
+
+        self._response_headers.append(("ETag", '"v1"'))
+
+        self.assertEqual('"v1"', self._invoke()[1]["ETag"])
+        self.assertEqual("304 Not Modified", self._invoke(HTTP_IF_NONE_MATCH='"v1"')[0])
+        self.assertEqual("304 Not Modified", self._invoke(method="HEAD", HTTP_IF_NONE_MATCH='"v1"')[0])
+
+    def test_if_modified_since(self):
+        '''This test case ensures If-Modified-Since is honoured when the response has Last-Modified header.'''
+
+        self._response_headers.append(("Last-Modified", "Tue, 15 Nov 1994 12:45:26 GMT"))
+
+        self.assertEqual("304 Not Modified", self._invoke(HTTP_IF_MODIFIED_SINCE="Tue, 15 Nov 1994 12:45:26 GMT")[0])
+        self.assertEqual("200 OK", self._invoke(HTTP_IF_MODIFIED_SINCE="Mon, 14 Nov 1994 12:45:26 GMT")[0])
+        self.assertEqual("200 OK", self._invoke(HTTP_IF_MODIFIED_SINCE="invalid date")[0])
+        self.assertEqual("200 OK", self._invoke(HTTP_IF_MODIFIED_SINCE="Tue, 15 Nov 1994 12:45:26 GMT",
+                                                HTTP_IF_NONE_MATCH='"other"')[0])
+
+    def test_passthrough(self):
+        '''This test case ensures unsafe methods, unsuccessful and big responses are not altered.'''
+
+        self.assertNotIn("ETag", self._invoke(method="POST", HTTP_IF_NONE_MATCH="*")[1])
+
+        self._response_headers[2] = ("Content-Length", "2048")
+
+        self.assertEqual("200 OK", self._invoke(HTTP_IF_NONE_MATCH="*")[0])
+
+        self._status = "404 Not Found"
+        self._response_headers[2] = ("Content-Length", "13")
+
+        status, headers, body = self._invoke(HTTP_IF_NONE_MATCH="*")
+
+        self.assertEqual(("404 Not Found", self._body), (status, body))
+        self.assertNotIn("ETag", headers)
+
+    def test_streamed_passthrough(self):
+        '''This test case ensures streamed responses without Content-Length are returned unchanged (not read into memory) and
+        their own validators are still checked.'''
+
+        file_wrapper = iter([self._body])
+        file_wrapper_close = Mock()
+
+        def app(environ, start_response):
+            start_response(self._status, list(self._response_headers))
+
+            return file_wrapper
+
+        self._middleware._app = app
+        self._response_headers = [("Content-Type", "application/javascript")]
+
+        environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/static/app.js", "HTTP_IF_NONE_MATCH": "*"}
+
+        self.assertIs(file_wrapper, self._middleware(environ, Mock()))
+
+        self._response_headers = [("Content-Type", "application/javascript"), ("ETag", '"v1"'), ("Content-Length", "4096")]
+
+        file_wrapper = Mock()
+        file_wrapper.close = file_wrapper_close
+        start_response = Mock()
+
+        self.assertEqual([], self._middleware(dict(environ, HTTP_IF_NONE_MATCH='"v1"'), start_response))
+        self.assertEqual("304 Not Modified", start_response.call_args[0][0])
+        file_wrapper_close.assert_called_once_with()
+
+    def test_lazy_start_response(self):
+        '''This test case ensures applications which call start_response while their body is iterated are forwarded
+        unchanged.'''
+
+        def app(environ, start_response):
+            write = start_response(self._status, list(self._response_headers))
+            write(b"written ")
+
+            yield self._body
+
+        self._middleware._app = app
+
+        start_response = Mock()
+        result = self._middleware({"REQUEST_METHOD": "GET", "HTTP_IF_NONE_MATCH": "*"}, start_response)
+
+        self.assertEqual(0, start_response.call_count)
+        self.assertEqual(b"written " + self._body, b"".join(result))
+
+        start_response.assert_called_once_with(self._status, self._response_headers)
+
+    def test_is_not_modified(self):
+        '''This test case ensures validators comparison works without a response body.'''
+
+        self.assertTrue(is_not_modified({"HTTP_IF_NONE_MATCH": '"abc"'}, 'W/"abc"'))
+        self.assertFalse(is_not_modified({"HTTP_IF_NONE_MATCH": '"abc"'}, None, "Tue, 15 Nov 1994 12:45:26 GMT"))
+        self.assertFalse(is_not_modified({}, '"abc"'))
@@ -0,0 +1,196 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_cors_middleware
+'''
+from fantastico.exceptions import FantasticoNotSupportedError
+from fantastico.middleware.cors_middleware import CorsMiddleware
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+
+class CorsMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for cors middleware.'''
+
+    def init(self):
+        self._config = {"paths": ["/api", "/roa"],
+                        "allowed_origins": ["*"],
+                        "allowed_methods": ["OPTIONS", "GET", "POST", "PUT", "DELETE"],
+                        "allowed_headers": None,
+                        "expose_headers": ["Location"],
+                        "allow_credentials": False,
+                        "max_age": 3600}
+
+        self._registry = MetricsRegistry()
+        self._app = Mock(side_effect=self._mock_app)
+        self._response_headers = [("Content-Type", "application/json")]
+
+    def _mock_app(self, environ, start_response):
+        '''This method provides an application which returns the configured response.'''
+
+        start_response("200 OK", list(self._response_headers))
+
+        return [b"{}"]
+
+    def _build_middleware(self):
+        '''This method builds the middleware using the current configuration.'''
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "cors_config" else None
+
+        return CorsMiddleware(self._app, Mock(return_value=settings_facade), metrics_registry=self._registry)
+
+    def _invoke(self, method="GET", path="/api/1.0/resources", **headers):
+        '''This method invokes the middleware and returns response status and headers.'''
+
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": path}
+        environ.update(headers)
+
+        start_response = Mock()
+        b"".join(self._build_middleware()(environ, start_response))
+
+        status, headers = start_response.call_args[0][:2]
+
+        return status, headers
+
+    def test_preflight(self):
+        '''This test case ensures preflight requests are answered without executing the application.'''
+
+        status, headers = self._invoke("OPTIONS", HTTP_ORIGIN="https://app.com", HTTP_ACCESS_CONTROL_REQUEST_METHOD="PUT",
+                                       HTTP_ACCESS_CONTROL_REQUEST_HEADERS="Authorization, Content-Type")
+        headers = dict(headers)
+
+        self.assertEqual("200 OK", status)
+        self.assertEqual("*", headers["Access-Control-Allow-Origin"])
+        self.assertEqual("OPTIONS,GET,POST,PUT,DELETE", headers["Access-Control-Allow-Methods"])
+        self.assertEqual("Authorization, Content-Type", headers["Access-Control-Allow-Headers"])
+        self.assertEqual("3600", headers["Access-Control-Max-Age"])
+        self.assertEqual("Access-Control-Request-Headers", headers["Vary"])
+        self.assertEqual("0", headers["Content-Length"])
+        self.assertFalse(self._app.called)
+        self.assertIn('fantastico_cors_preflights_total{result="allowed"} 1', self._registry.render())
+
+    def test_preflight_rejected(self):
+        '''This test case ensures preflight requests from origins or for methods which are not allowed are rejected.'''
+
+        self._config["allowed_origins"] = ["https://app.com"]
+        self._config["allowed_headers"] = ["Content-Type"]
+
+        for origin, method in [("https://evil.com", "GET"), (None, "GET"), ("https://app.com", "PATCH")]:
+            headers = {"HTTP_ACCESS_CONTROL_REQUEST_METHOD": method}
+
+            if origin:
+                headers["HTTP_ORIGIN"] = origin
+
+            status, headers = self._invoke("OPTIONS", **headers)
+
+            self.assertEqual("403 Forbidden", status)
+            self.assertNotIn("Access-Control-Allow-Origin", dict(headers))
+
+        status, headers = self._invoke("OPTIONS", HTTP_ORIGIN="https://app.com", HTTP_ACCESS_CONTROL_REQUEST_METHOD="GET")
+        headers = dict(headers)
+
+        self.assertEqual("200 OK", status)
+        self.assertEqual("https://app.com", headers["Access-Control-Allow-Origin"])
+        self.assertEqual("Content-Type", headers["Access-Control-Allow-Headers"])
+        self.assertEqual("Origin", headers["Vary"])
+        self.assertFalse(self._app.called)
+        self.assertIn('fantastico_cors_preflights_total{result="rejected"} 3', self._registry.render())
+
+    def test_actual_request(self):
+        '''This test case ensures cors headers are added to responses (replacing the ones set by controllers).'''
+
+        self._response_headers.append(("Access-Control-Allow-Origin", "*"))
+
+        status, headers = self._invoke(HTTP_ORIGIN="https://app.com")
+
+        self.assertEqual("200 OK", status)
+        self.assertEqual([("Content-Type", "application/json"), ("Access-Control-Allow-Origin", "*"),
+                          ("Access-Control-Expose-Headers", "Location")], headers)
+
+        status, headers = self._invoke("OPTIONS")
+
+        self.assertEqual("200 OK", status)
+        self.assertTrue(self._app.called)
+
+    def test_actual_request_origins(self):
+        '''This test case ensures only allowed origins receive cors headers and responses vary on Origin.'''
+
+        self._config["allowed_origins"] = ["https://app.com"]
+        self._response_headers.append(("Vary", "Accept-Encoding"))
+
+        headers = dict(self._invoke(HTTP_ORIGIN="https://app.com")[1])
+
+        self.assertEqual("https://app.com", headers["Access-Control-Allow-Origin"])
+        self.assertEqual("Accept-Encoding, Origin", headers["Vary"])
+
+        headers = dict(self._invoke(HTTP_ORIGIN="https://evil.com")[1])
+
+        self.assertNotIn("Access-Control-Allow-Origin", headers)
+        self.assertEqual("Accept-Encoding", headers["Vary"])
+
+    def test_credentials(self):
+        '''This test case ensures credentials are allowed only for explicitly listed origins.'''
+
+        self._config["allow_credentials"] = True
+        self._config["allowed_origins"] = ["https://app.com"]
+
+        headers = dict(self._invoke(HTTP_ORIGIN="https://app.com")[1])
+
+        self.assertEqual("https://app.com", headers["Access-Control-Allow-Origin"])
+        self.assertEqual("true", headers["Access-Control-Allow-Credentials"])
+        self.assertEqual("Origin", headers["Vary"])
+
+        self.assertNotIn("Access-Control-Allow-Origin", dict(self._invoke(HTTP_ORIGIN="https://evil.com")[1]))
+        self.assertNotIn("Access-Control-Allow-Origin", dict(self._invoke()[1]))
+
+    def test_credentials_any_origin(self):
+        '''This test case ensures credentials can not be allowed for any origin.'''
+
+        self._config["allow_credentials"] = True
+
+        self.assertRaises(FantasticoNotSupportedError, self._build_middleware)
+
+    def test_paths(self):
+        '''This test case ensures cors is enabled only for the configured paths.'''
+
+        for path in ["/", "/apis", "/mvc/hello"]:
+            status, headers = self._invoke("OPTIONS", path=path, HTTP_ORIGIN="https://app.com",
+                                           HTTP_ACCESS_CONTROL_REQUEST_METHOD="GET")
+
+            self.assertEqual([("Content-Type", "application/json")], headers)
+
+        self.assertEqual(3, self._app.call_count)
+        self.assertIn(("Access-Control-Allow-Origin", "*"), self._invoke(path="/roa")[1])
+
+    def test_default_paths(self):
+        '''This test case ensures cors is enabled by default for roa api (as configured in settings), roa discovery and
+        oauth2 urls.'''
+
+        self._config["paths"] = None
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: {"cors_config": self._config, "roa_api": "/rest"}.get(key)
+
+        middleware = CorsMiddleware(self._app, Mock(return_value=settings_facade), metrics_registry=self._registry)
+
+        for path, allowed in [("/rest/1.0/resources", True), ("/roa/resources", True), ("/oauth/tokens", True),
+                              ("/api/1.0/resources", False)]:
+            start_response = Mock()
+            middleware({"REQUEST_METHOD": "GET", "PATH_INFO": path}, start_response)
+
+            self.assertEqual(allowed, ("Access-Control-Allow-Origin", "*") in start_response.call_args[0][1])
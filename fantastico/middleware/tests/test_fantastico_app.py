@@ -19,10 +19,15 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 from fantastico.exceptions import FantasticoClassNotFoundError, FantasticoContentTypeError, FantasticoNoRequestError, \
     FantasticoRouteNotFoundError
 from fantastico.middleware.fantastico_app import FantasticoApp
+from fantastico.mvc.static_assets_controller import StaticAssetsController, HotFilesCache
+from fantastico.settings import BasicSettings
 from fantastico.tests.base_case import FantasticoUnitTestsCase
 from mock import Mock
 from webob.request import Request
 from webob.response import Response
+import os
+import shutil
+import tempfile
 
 class FantasticoAppTests(FantasticoUnitTestsCase):
     '''Class that provides the test suite for ensuring that fantastico wsgi app is working as expected.'''
@@ -87,6 +92,29 @@ class FantasticoAppTests(FantasticoUnitTestsCase):
         self.assertEqual(3, len(chained_resp))
         self.assertEqual(["middleware", "middleware2", "middleware3"], chained_resp)
         
+    def test_two_apps_same_process(self):
+        '''Test case that ensures building an application does not change middleware classes so multiple applications can
+        coexist in the same process.'''
+
+        def get(key):
+            if key == "installed_middleware":
+                return ["fantastico.middleware.tests.test_fantastico_app.MockedMiddleware"]
+
+        self._settings_facade.get = get
+
+        old_middleware_call = MockedMiddleware.__call__
+
+        app1 = FantasticoApp(self._settings_facade_cls)
+        app2 = FantasticoApp(self._settings_facade_cls)
+
+        self.assertEqual(old_middleware_call, MockedMiddleware.__call__)
+        self.assertEqual(self._old_call, FantasticoApp.__call__)
+
+        app1(self._environ, Mock())
+        app2(self._environ, Mock())
+
+        self.assertEqual(["middleware", "middleware"], self._environ["middlewares_responses"])
+
     def test_wrap_no_middleware(self):
         '''Test case that ensures the app entry point works as expected even if no middlewares are installed.'''
         
@@ -259,6 +287,62 @@ class FantasticoAppTests(FantasticoUnitTestsCase):
         self.assertRaises(FantasticoContentTypeError, app_middleware, *[self._environ, Mock()])            
         self.assertTrue(self._environ["test_wrapped_ok"])
         
+    def test_not_modified_response(self):
+        '''This test case makes sure 304 responses (which do not have a content type) are not validated against accepted
+        content types.'''
+
+        self._settings_facade.get = lambda key: ["fantastico.middleware.tests.test_fantastico_app.MockedMiddleware"] \
+                                                if key == "installed_middleware" else None
+
+        response = Response(status=304)
+
+        self._controller.exec_logic = lambda request: response
+
+        app_middleware = FantasticoApp(self._settings_facade_cls)
+        start_response = Mock()
+
+        self.assertEqual([b""], app_middleware(self._environ, start_response))
+        self.assertEqual("304 Not Modified", start_response.call_args[0][0])
+
+    def test_static_asset_file_wrapper(self):
+        '''This test case makes sure static assets sent through wsgi.file_wrapper are returned unchanged to the server (so
+        files are not read into memory).'''
+
+        self._settings_facade.get = lambda key: ["fantastico.middleware.tests.test_fantastico_app.MockedMiddleware"] \
+                                                if key == "installed_middleware" else None
+        self._settings_facade.get_config = Mock(return_value=TestProfileNotUsed())
+
+        assets_folder = tempfile.mkdtemp(dir=os.path.dirname(__file__))
+
+        try:
+            os.mkdir("%s/static" % assets_folder)
+
+            with open("%s/static/app.js" % assets_folder, "wb") as asset_file:
+                asset_file.write(b"var a = 1;")
+
+            component_name = os.path.basename(assets_folder)
+            file_wrapper = Mock(return_value=object())
+
+            request = Request.blank("/%s/static/app.js" % component_name, environ={"wsgi.file_wrapper": file_wrapper})
+
+            environ = {"fantastico.request": request,
+                       "route_%s_handler" % request.path: {
+                                "controller": StaticAssetsController(self._settings_facade,
+                                                                     hot_files=HotFilesCache(max_files=0)),
+                                "method": "serve_asset",
+                                "url_params": {"component_name": component_name, "asset_path": "app.js"}}}
+
+            app_middleware = FantasticoApp(self._settings_facade_cls)
+
+            self.assertIs(file_wrapper.return_value, app_middleware(environ, Mock()))
+
+            file_wrapper.call_args[0][0].close()
+        finally:
+            shutil.rmtree(assets_folder)
+
+class TestProfileNotUsed(BasicSettings):
+    '''This class is used only for locating static assets created near this test module.'''
+
 class MockedMiddleware(object):
     '''This is a mocked middleware used for unit testing purposes.'''
     
@@ -0,0 +1,309 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_http_cache_middleware
+'''
+from fantastico.middleware.http_cache_middleware import HttpCacheMiddleware, parse_cache_control, path_topics, \
+    purge_url_prefix
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.invalidation_bus import InvalidationBus
+from fantastico.utils.lru_cache import LruCache
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+import threading
+
+class HttpCacheMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for http semantics response cache middleware.'''
+
+    def init(self):
+        self._config = {"backend": None, "max_entry_size": 1024, "refresh_threads": 1}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "http_cache_config" else None
+
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=1000)
+
+        self._backend = LruCache()
+        caches = Mock()
+        caches.get_backend = Mock(return_value=self._backend)
+
+        self._bus = InvalidationBus()
+        self._registry = MetricsRegistry()
+        self._calls = []
+        self._refreshed = threading.Event()
+        self._status = "200 OK"
+        self._response_headers = [("Content-Type", "application/json"), ("Cache-Control", "max-age=60")]
+
+        self._middleware = HttpCacheMiddleware(self._app, Mock(return_value=settings_facade), metrics_registry=self._registry,
+                                               time_provider=self._time_provider, caches=caches,
+                                               invalidation_bus=self._bus, refresh_app=self._refresh_app)
+
+    def _app(self, environ, start_response):
+        '''This method provides an application which counts its invocations.'''
+
+        self._calls.append(environ)
+
+        start_response(self._status, list(self._response_headers))
+
+        return [b"body %s" % str(len(self._calls)).encode()]
+
+    def _refresh_app(self, environ, start_response):
+        '''This method provides the application used for background refreshes.'''
+
+        try:
+            return self._app(environ, start_response)
+        finally:
+            self._refreshed.set()
+
+    def _invoke(self, path="/api/resources", query="", method="GET", **headers):
+        '''This method invokes the middleware and returns response status, headers and body.'''
+
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query}
+        environ.update(headers)
+
+        start_response = Mock()
+        body = b"".join(self._middleware(environ, start_response))
+
+        status, headers = start_response.call_args[0][:2]
+
+        return status, dict(headers), body
+
+    def test_fresh_hit(self):
+        '''This test case ensures fresh responses are served from cache with Age and X-Cache headers.'''
+
+        status, headers, body = self._invoke(query="b=2&a=1")
+
+        self.assertEqual(("200 OK", b"body 1"), (status, body))
+        self.assertNotIn("X-Cache", headers)
+
+        self._time_provider.time.return_value = 1010
+
+        status, headers, body = self._invoke(query="a=1&b=2")
+
+        self.assertEqual(("200 OK", b"body 1"), (status, body))
+        self.assertEqual("10", headers["Age"])
+        self.assertEqual("HIT", headers["X-Cache"])
+        self.assertEqual("application/json", headers["Content-Type"])
+
+        self.assertEqual(b"", self._invoke(method="HEAD", query="a=1&b=2")[2])
+        self.assertEqual(b"body 2", self._invoke(query="a=2")[2])
+        self.assertEqual(2, len(self._calls))
+        self.assertIn('fantastico_http_cache_requests_total{result="hit"} 2', self._registry.render())
+
+    def test_expired(self):
+        '''This test case ensures expired responses are not served.'''
+
+        self._invoke()
+
+        self._time_provider.time.return_value = 1060
+
+        self.assertEqual(b"body 2", self._invoke()[2])
+
+    def test_uncacheable_responses(self):
+        '''This test case ensures responses which do not allow caching are never stored.'''
+
+        scenarios = [("200 OK", [("Cache-Control", "no-store, max-age=60")]),
+                     ("200 OK", [("Cache-Control", "private, max-age=60")]),
+                     ("200 OK", [("Cache-Control", "no-cache")]),
+                     ("200 OK", [("Cache-Control", "max-age=0")]),
+                     ("200 OK", []),
+                     ("200 OK", [("Cache-Control", "max-age=60"), ("Set-Cookie", "session=123")]),
+                     ("200 OK", [("Cache-Control", "max-age=60"), ("Vary", "*")]),
+                     ("500 Internal Server Error", [("Cache-Control", "max-age=60")])]
+
+        for status, headers in scenarios:
+            self._status, self._response_headers = status, headers
+
+            self._invoke()
+            self._invoke()
+
+        self._status, self._response_headers = "200 OK", [("Cache-Control", "max-age=60")]
+
+        self._invoke(method="POST")
+        self._invoke(method="POST")
+        self._invoke(HTTP_CACHE_CONTROL="no-store")
+        self._invoke(HTTP_CACHE_CONTROL="no-store")
+
+        self.assertEqual(2 * len(scenarios) + 4, len(self._calls))
+
+    def test_request_no_cache(self):
+        '''This test case ensures requests sending no-cache bypass the lookup and refresh the cached response.'''
+
+        self._invoke()
+
+        self.assertEqual(b"body 2", self._invoke(HTTP_CACHE_CONTROL="no-cache")[2])
+        self.assertEqual(b"body 2", self._invoke()[2])
+
+    def test_vary(self):
+        '''This test case ensures cached responses are selected using the request headers listed in Vary header.'''
+
+        self._response_headers = [("Cache-Control", "max-age=60"), ("Vary", "Accept-Language, Accept")]
+
+        self._invoke(HTTP_ACCEPT_LANGUAGE="ro")
+        self._invoke(HTTP_ACCEPT_LANGUAGE="en")
+
+        self.assertEqual(b"body 1", self._invoke(HTTP_ACCEPT_LANGUAGE="ro")[2])
+        self.assertEqual(b"body 2", self._invoke(HTTP_ACCEPT_LANGUAGE="en", HTTP_USER_AGENT="test")[2])
+        self.assertEqual(b"body 3", self._invoke(HTTP_ACCEPT_LANGUAGE="en", HTTP_ACCEPT="text/html")[2])
+
+    def test_vary_unambiguous(self):
+        '''This test case ensures vary header values containing separators do not collide with other variants.'''
+
+        self._response_headers = [("Cache-Control", "max-age=60"), ("Vary", "Accept-Language, Accept")]
+
+        self._invoke(HTTP_ACCEPT_LANGUAGE="ro|accept=en")
+
+        self.assertEqual(b"body 2", self._invoke(HTTP_ACCEPT_LANGUAGE="ro", HTTP_ACCEPT="en")[2])
+
+    def test_vary_accept_encoding(self):
+        '''This test case ensures compressed variants are shared by all clients which negotiate the same content coding.'''
+
+        self._response_headers = [("Cache-Control", "max-age=60"), ("Vary", "Accept-Encoding")]
+
+        self._invoke(HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(b"body 1", self._invoke(HTTP_ACCEPT_ENCODING="deflate,gzip, br")[2])
+        self.assertEqual(b"body 2", self._invoke(HTTP_ACCEPT_ENCODING="gzip")[2])
+        self.assertEqual(b"body 3", self._invoke()[2])
+
+    def test_authorization(self):
+        '''This test case ensures responses for requests carrying Authorization are cached only if they are public.'''
+
+        self._invoke(HTTP_AUTHORIZATION="Bearer abc")
+
+        self.assertEqual(b"body 2", self._invoke(HTTP_AUTHORIZATION="Bearer abc")[2])
+        self.assertEqual(b"body 3", self._invoke(path="/api/other", HTTP_AUTHORIZATION="Bearer abc")[2])
+
+        self._invoke(path="/api/anonymous")
+
+        self.assertEqual(b"body 5", self._invoke(path="/api/anonymous", HTTP_AUTHORIZATION="Bearer abc")[2])
+
+        self._response_headers = [("Cache-Control", "public, max-age=60")]
+
+        self._invoke(path="/api/public", HTTP_AUTHORIZATION="Bearer abc")
+
+        self.assertEqual(b"body 6", self._invoke(path="/api/public", HTTP_AUTHORIZATION="Bearer xyz")[2])
+        self.assertEqual(b"body 6", self._invoke(path="/api/public")[2])
+
+    def test_stale_while_revalidate(self):
+        '''This test case ensures stale responses are served while they are refreshed in background.'''
+
+        self._response_headers = [("Cache-Control", "max-age=60, stale-while-revalidate=30")]
+
+        self._invoke()
+
+        self._time_provider.time.return_value = 1070
+
+        status, headers, body = self._invoke(HTTP_COOKIE="abc")
+
+        self.assertEqual(b"body 1", body)
+        self.assertEqual("STALE", headers["X-Cache"])
+        self.assertTrue(self._refreshed.wait(5))
+
+        self._wait_for_refresh()
+
+        status, headers, body = self._invoke()
+
+        self.assertEqual(("200 OK", b"body 2", "HIT"), (status, body, headers["X-Cache"]))
+        self.assertEqual("abc", self._calls[1]["HTTP_COOKIE"])
+
+        self._time_provider.time.return_value = 1200
+
+        self.assertEqual(b"body 3", self._invoke()[2])
+
+    def test_purge_url_prefix(self):
+        '''This test case ensures cached responses are purged by url prefix (segment by segment).'''
+
+        for path in ["/api/resources/1", "/api/resources/2", "/api/resources-old", "/blog"]:
+            self._invoke(path=path)
+
+        purge_url_prefix("/api/resources", invalidation_bus=self._bus)
+
+        self.assertEqual(b"body 5", self._invoke(path="/api/resources/1")[2])
+        self.assertEqual(b"body 6", self._invoke(path="/api/resources/2")[2])
+        self.assertEqual(b"body 3", self._invoke(path="/api/resources-old")[2])
+        self.assertEqual(b"body 4", self._invoke(path="/blog")[2])
+
+        purge_url_prefix("/", invalidation_bus=self._bus)
+
+        self.assertEqual(b"body 7", self._invoke(path="/blog")[2])
+
+    def test_max_entry_size(self):
+        '''This test case ensures responses bigger than max entry size are not stored.'''
+
+        self._middleware._max_entry_size = 2
+
+        self._invoke()
+
+        self.assertEqual(b"body 2", self._invoke()[2])
+
+    def test_not_storable_passthrough(self):
+        '''This test case ensures responses which can not be stored (decided from status and headers) are returned unchanged
+        without reading their body.'''
+
+        file_wrapper = iter([b"file content"])
+
+        scenarios = [("200 OK", [("Cache-Control", "no-store")]),
+                     ("200 OK", [("Cache-Control", "max-age=60"), ("Content-Length", "2048")])]
+
+        for status, headers in scenarios:
+            def app(environ, start_response, status=status, headers=headers):
+                start_response(status, headers)
+
+                return file_wrapper
+
+            self._middleware._app = app
+
+            result = self._middleware({"REQUEST_METHOD": "GET", "PATH_INFO": "/static/file.js", "QUERY_STRING": ""}, Mock())
+
+            self.assertIs(file_wrapper, result)
+
+    def test_streamed_body_stored(self):
+        '''This test case ensures bodies of applications which start the response lazily are streamed and stored once they are
+        completely sent.'''
+
+        def app(environ, start_response):
+            self._calls.append(environ)
+
+            start_response("200 OK", [("Cache-Control", "max-age=60")])
+
+            yield b"chunk1"
+            yield b"chunk2"
+
+        self._middleware._app = app
+
+        self.assertEqual(b"chunk1chunk2", self._invoke()[2])
+        self.assertEqual(b"chunk1chunk2", self._invoke()[2])
+        self.assertEqual(1, len(self._calls))
+
+    def test_helpers(self):
+        '''This test case ensures cache control parsing and path topics work as expected.'''
+
+        self.assertEqual({"public": True, "max-age": "60", "stale-while-revalidate": "30"},
+                         parse_cache_control('Public, max-age=60, stale-while-revalidate="30"'))
+        self.assertEqual({}, parse_cache_control(None))
+        self.assertEqual(["http:/", "http:/api", "http:/api/resources"], path_topics("/api/resources/"))
+
+    def _wait_for_refresh(self):
+        '''This method waits until the background refresh completes.'''
+
+        for _ in range(500):
+            if not self._middleware._refreshing:
+                return
+
+            threading.Event().wait(0.01)
@@ -0,0 +1,70 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_pipeline
+'''
+from fantastico.middleware.pipeline import MiddlewarePipeline
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+
+class MiddlewarePipelineTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for middleware pipeline builder.'''
+
+    _MIDDLEWARES = ["fantastico.middleware.tests.test_fantastico_app.MockedMiddleware",
+                    "fantastico.middleware.tests.test_fantastico_app.MockedMiddleware2"]
+
+    def test_build_ok(self):
+        '''This test case ensures middlewares are chained in the configured order and the controller executor runs last.'''
+
+        app = Mock(return_value=[b"response"])
+        environ = {}
+
+        pipeline = MiddlewarePipeline(self._MIDDLEWARES, app)
+
+        self.assertEqual([b"response"], pipeline.build()(environ, Mock()))
+        self.assertEqual(["middleware", "middleware2"], environ["middlewares_responses"])
+        self.assertEqual({}, pipeline.timings)
+        app.assert_called_once_with(environ, app.call_args[0][1])
+
+    def test_build_timed(self):
+        '''This test case ensures each stage records only the time spent in the stage itself.'''
+
+        time_provider = Mock()
+        time_provider.time = Mock(side_effect=[0.0, 1.0, 3.0, 6.0, 10.0, 20.0])
+
+        registry = MetricsRegistry()
+
+        pipeline = MiddlewarePipeline(self._MIDDLEWARES, Mock(return_value=[]), timed=True, time_provider=time_provider,
+                                      registry=registry)
+
+        environ = {}
+        pipeline.build()(environ, Mock())
+
+        timings = pipeline.timings
+
+        self.assertEqual(3, len(timings))
+        self.assertEqual(3.0, timings[MiddlewarePipeline.CONTROLLER_STAGE].sum)
+        self.assertEqual(6.0, timings[self._MIDDLEWARES[1]].sum)
+        self.assertEqual(11.0, timings[self._MIDDLEWARES[0]].sum)
+
+        for histogram in timings.values():
+            self.assertEqual(1, histogram.count)
+
+        self.assertEqual({"test_wrapped_ok", "middlewares_responses"}, set(environ.keys()))
+        self.assertIs(timings[MiddlewarePipeline.CONTROLLER_STAGE],
+                      registry.histogram("fantastico_pipeline_stage_seconds", labels={"stage": "controller"}))
@@ -0,0 +1,174 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.middleware.tests.test_profiling_middleware
+'''
+from fantastico.middleware.profiling_middleware import ProfilingMiddleware
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+import os
+import shutil
+import tempfile
+
+class ProfilingMiddlewareTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for on demand profiling middleware.'''
+
+    _SECRET = "simple secret"
+
+    def init(self):
+        '''This method is invoked automatically in order to set common dependencies for all test cases.'''
+
+        self._spool_folder = tempfile.mkdtemp()
+        self._app = Mock(return_value=[b"response"])
+
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=1000)
+
+        self._profiler = Mock()
+        self._profiler.dump_stats = Mock(side_effect=self._dump_stats)
+        self._profiler_cls = Mock(return_value=self._profiler)
+
+    def cleanup(self):
+        '''This method removes the spool folder used by test cases.'''
+
+        shutil.rmtree(self._spool_folder)
+
+    def _build_middleware(self, sample_every=0, secret=_SECRET, max_profiles=100, min_interval=0):
+        '''This method builds a profiling middleware using the given configuration.'''
+
+        settings_facade = Mock()
+        settings_facade.get = Mock(return_value={"spool_folder": self._spool_folder,
+                                                 "sample_every": sample_every,
+                                                 "secret": secret,
+                                                 "signature_ttl": 300,
+                                                 "max_profiles": max_profiles,
+                                                 "min_interval": min_interval})
+
+        return ProfilingMiddleware(self._app, Mock(return_value=settings_facade), self._profiler_cls, self._time_provider)
+
+    def _dump_stats(self, profile_file):
+        '''This method simulates a profile dump by writing the given file with the current mocked time.'''
+
+        with open(profile_file, "wb") as profile:
+            profile.write(b"profile")
+
+        os.utime(profile_file, (self._time_provider.time(), self._time_provider.time()))
+
+    def test_not_triggered(self):
+        '''This test case ensures requests without a valid header are not profiled.'''
+
+        middleware = self._build_middleware()
+
+        for header_value in [None, "invalid", "1000:abcd", ProfilingMiddleware.sign(self._SECRET, "/simple/path", 100),
+                             ProfilingMiddleware.sign("another secret", "/simple/path", 1000),
+                             ProfilingMiddleware.sign(self._SECRET, "/another/path", 1000)]:
+            environ = {"PATH_INFO": "/simple/path"}
+
+            if header_value:
+                environ[ProfilingMiddleware.PROFILE_HEADER] = header_value
+
+            self.assertEqual([b"response"], middleware(environ, Mock()))
+
+        self.assertEqual(0, self._profiler_cls.call_count)
+        self.assertEqual([], os.listdir(self._spool_folder))
+
+    def test_header_triggered(self):
+        '''This test case ensures requests with a valid signed header are profiled and dumped in the route spool folder.'''
+
+        middleware = self._build_middleware()
+
+        controller = SampleController()
+        environ = {"PATH_INFO": "/simple/path",
+                   ProfilingMiddleware.PROFILE_HEADER: ProfilingMiddleware.sign(self._SECRET, "/simple/path", 1000),
+                   "route_/simple/path_handler": {"controller": controller, "method": "handle"}}
+
+        self.assertEqual([b"response"], middleware(environ, Mock()))
+
+        self._profiler.enable.assert_called_once_with()
+        self._profiler.disable.assert_called_once_with()
+
+        route_folder = os.path.join(self._spool_folder,
+                                    "fantastico.middleware.tests.test_profiling_middleware.SampleController.handle")
+
+        self.assertEqual(["%s-1000-1.prof" % os.getpid()], os.listdir(route_folder))
+
+    def test_dump_failure(self):
+        '''This test case ensures profile dump failures are logged, the response is returned and no partial profile is
+        kept.'''
+
+        def dump_stats(profile_file):
+            self._dump_stats(profile_file)
+
+            raise IOError("Disk full.")
+
+        self._profiler.dump_stats = Mock(side_effect=dump_stats)
+
+        middleware = self._build_middleware(sample_every=1)
+
+        self.assertEqual([b"response"], middleware({"PATH_INFO": "/simple/path"}, Mock()))
+
+        self.assertEqual([], os.listdir(os.path.join(self._spool_folder, "simple_path")))
+
+    def test_sampling_triggered(self):
+        '''This test case ensures one in sample_every requests is profiled (even if the request fails).'''
+
+        self._app.side_effect = ValueError("Unexpected error")
+
+        middleware = self._build_middleware(sample_every=3, secret=None)
+
+        for _ in range(6):
+            with self.assertRaises(ValueError):
+                middleware({"PATH_INFO": "/simple/path"}, Mock())
+
+        self.assertEqual(2, self._profiler_cls.call_count)
+        self.assertEqual(2, self._profiler.dump_stats.call_count)
+        self.assertEqual(["simple_path"], os.listdir(self._spool_folder))
+
+    def test_rate_limited(self):
+        '''This test case ensures a worker profiles at most one request every min_interval seconds.'''
+
+        middleware = self._build_middleware(sample_every=1, min_interval=10)
+
+        for now in [1000, 1005, 1009, 1010, 1011]:
+            self._time_provider.time = Mock(return_value=now)
+
+            self.assertEqual([b"response"], middleware({"PATH_INFO": "/simple/path"}, Mock()))
+
+        self.assertEqual(2, self._profiler_cls.call_count)
+        self.assertEqual(2, self._profiler.dump_stats.call_count)
+
+    def test_old_profiles_removed(self):
+        '''This test case ensures only the newest max_profiles profiles of a route are kept.'''
+
+        route_folder = os.path.join(self._spool_folder, "simple_path")
+        os.makedirs(route_folder)
+
+        with open(os.path.join(route_folder, "notes.txt"), "w") as notes:
+            notes.write("not a profile")
+
+        middleware = self._build_middleware(sample_every=1, max_profiles=2)
+
+        for now in range(1000, 1004):
+            self._time_provider.time = Mock(return_value=now)
+
+            middleware({"PATH_INFO": "/simple/path"}, Mock())
+
+        self.assertEqual(["%s-1002-3.prof" % os.getpid(), "%s-1003-4.prof" % os.getpid(), "notes.txt"],
+                         sorted(os.listdir(route_folder)))
+
+class SampleController(object):
+    '''This class provides a controller used to check profiles are grouped by controller method.'''
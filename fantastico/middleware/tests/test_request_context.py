@@ -47,3 +47,53 @@ class RequestContextTests(FantasticoUnitTestsCase):
         self.assertIsNone(context.settings)
         self.assertIsNone(context.language)
         self.assertEqual(expected_app, context.wsgi_app)
+
+    def test_request_context_lazy_fields(self):
+        '''This test case ensures language and security context resolvers are invoked only once, on first access.'''
+
+        expected_language = Mock()
+        expected_security = Mock()
+
+        language_resolver = Mock(return_value=expected_language)
+        security_resolver = Mock(return_value=expected_security)
+
+        context = RequestContext(Mock(), language_resolver=language_resolver)
+        context.security_resolver = security_resolver
+
+        self.assertEqual(0, language_resolver.call_count)
+        self.assertEqual(0, security_resolver.call_count)
+
+        for _ in range(2):
+            self.assertEqual(expected_language, context.language)
+            self.assertEqual(expected_security, context.security)
+
+        language_resolver.assert_called_once_with()
+        security_resolver.assert_called_once_with()
+
+    def test_request_context_security_override(self):
+        '''This test case ensures an explicitly set security context replaces the registered resolver.'''
+
+        security_resolver = Mock()
+        expected_security = Mock()
+
+        context = RequestContext(Mock(), Mock())
+        context.security_resolver = security_resolver
+        context.security = expected_security
+
+        self.assertEqual(expected_security, context.security)
+        self.assertEqual(0, security_resolver.call_count)
+
+    def test_request_context_security_resolver_fails(self):
+        '''This test case ensures the security resolver is kept when it fails so that later accesses do not return None.'''
+
+        expected_security = Mock()
+        security_resolver = Mock(side_effect=[RuntimeError("Invalid token."), expected_security])
+
+        context = RequestContext(Mock(), Mock())
+        context.security_resolver = security_resolver
+
+        self.assertRaises(RuntimeError, getattr, context, "security")
+
+        self.assertEqual(expected_security, context.security)
+        self.assertEqual(expected_security, context.security)
+        self.assertEqual(2, security_resolver.call_count)
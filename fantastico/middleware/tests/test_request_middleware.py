@@ -21,6 +21,7 @@ from fantastico import mvc
 from fantastico.middleware.request_middleware import RequestMiddleware
 from fantastico.settings import BasicSettings
 from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.lru_cache import LruCache
 from mock import Mock
 import os
 from fantastico.routing_engine.custom_responses import RedirectResponse
@@ -136,6 +137,38 @@ class RequestMiddlewareTests(FantasticoUnitTestsCase):
         self.assertIsNotNone(context.language)
         self.assertEqual("en_us", str(context.language))
 
+    def test_context_language_cached(self):
+        '''Test case that ensures language negotiation runs once per distinct Accept-Language header and that detected
+        language objects are shared between requests.'''
+
+        languages_cache = LruCache(2)
+        middleware = RequestMiddleware(self._app, languages_cache=languages_cache)
+        middleware._get_supported_lang = Mock(wraps=middleware._get_supported_lang)
+
+        languages = []
+
+        for _ in range(3):
+            environ = dict(self._environ)
+            middleware(environ, self._start_response)
+
+            languages.append(environ["fantastico.request"].context.language)
+
+        self.assertEqual("en_us", str(languages[0]))
+        self.assertIs(languages[0], languages[1])
+        self.assertIs(languages[0], languages[2])
+        self.assertEqual(1, middleware._get_supported_lang.call_count)
+        self.assertEqual(1, len(languages_cache))
+
+    def test_context_language_lazy(self):
+        '''Test case that ensures language negotiation is skipped for requests which never read the language.'''
+
+        middleware = RequestMiddleware(self._app)
+        middleware._get_supported_lang = Mock()
+
+        middleware(self._environ, self._start_response)
+
+        self.assertEqual(0, middleware._get_supported_lang.call_count)
+
     def test_connection_closed(self):
         '''This test case ensures connection is closed once the request is done.'''
 
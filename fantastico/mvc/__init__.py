@@ -18,6 +18,8 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 '''
 
 from fantastico.exceptions import FantasticoDbError
+from fantastico.utils import metrics
+from fantastico.utils.fork_hooks import POST_FORK_HOOKS
 from fantastico.utils.singleton import Singleton
 from sqlalchemy import create_engine
 from sqlalchemy.engine.url import URL
@@ -33,8 +35,9 @@ class DbSessionManager(object):
 
     ENGINE = None
     SESSION = None
+    FORKED_ENGINES = []
 
-    def __init__(self, db_config, echo=False, create_engine_fn=None, create_session_fn=None):
+    def __init__(self, db_config, echo=False, create_engine_fn=None, create_session_fn=None, metrics_registry=None):
         try:
             self._conn_props = self._build_conn_props(db_config)
         except Exception as ex:
@@ -47,6 +50,9 @@ class DbSessionManager(object):
 
         self._cached_conns = {}
 
+        self._metrics = metrics_registry or metrics.METRICS
+        self._sessions_gauge = self._metrics.gauge("fantastico_db_sessions_active", "Database sessions opened by requests.")
+
     def _build_conn_props(self, db_config):
         '''This method is used to build the connection properties required for connecting to fantastico configured database.'''
 
@@ -56,7 +62,7 @@ class DbSessionManager(object):
                       "host": db_config["host"],
                       "port": db_config["port"],
                       "database": db_config["database"],
-                      "query": db_config["additional_params"]}
+                      "query": dict(db_config["additional_params"])}
 
         return conn_props
 
@@ -69,16 +75,12 @@ class DbSessionManager(object):
             return session
 
         try:
-            conn_data = URL(**self._conn_props)
-
-            if not DbSessionManager.ENGINE:
-                DbSessionManager.ENGINE = self._create_engine_fn(conn_data,
-                                                                 echo=self._echo, **self._engine_params)
-                DbSessionManager.SESSION = sessionmaker(bind=DbSessionManager.ENGINE)
+            self._ensure_engine()
 
             session = self._create_session_fn(DbSessionManager.SESSION, lambda: request_id)
 
             self._cached_conns[request_id] = session
+            self._sessions_gauge.inc()
 
             return session
         except Exception as ex:
@@ -86,6 +88,60 @@ class DbSessionManager(object):
 
             raise FantasticoDbError(ex)
 
+    def open_pool(self, connections=1):
+        '''This method creates the engine (if necessary) and opens the given number of pooled connections so that first
+        requests do not pay for connecting to database. Connections are returned to the pool immediately.'''
+
+        try:
+            self._ensure_engine()
+
+            conns = [DbSessionManager.ENGINE.connect() for _ in range(connections)]
+
+            for conn in conns:
+                conn.close()
+        except Exception as ex:
+            raise FantasticoDbError(ex)
+
+    def discard_connections(self):
+        '''This method forgets all cached sessions without closing them. It is used in forked workers for discarding the
+        sessions inherited from the master process.'''
+
+        self._cached_conns = {}
+
+    @staticmethod
+    def dispose_engine(close=True):
+        '''This method discards the sqlalchemy engine of the current process; a new engine is created when a connection is
+        requested. When close is False, pooled connections are not closed (their sockets belong to the process which opened
+        them); this is the behavior required in forked workers.'''
+
+        engine = DbSessionManager.ENGINE
+
+        DbSessionManager.ENGINE = None
+        DbSessionManager.SESSION = None
+
+        if engine is None:
+            return
+
+        if close:
+            engine.dispose()
+            return
+
+        DbSessionManager.FORKED_ENGINES.append(engine)
+
+    def _ensure_engine(self):
+        '''This method creates the sqlalchemy engine and session factory once per process.'''
+
+        if DbSessionManager.ENGINE:
+            return
+
+        conn_data = URL(**self._conn_props)
+
+        DbSessionManager.ENGINE = self._create_engine_fn(conn_data, echo=self._echo, **self._engine_params)
+        DbSessionManager.SESSION = sessionmaker(bind=DbSessionManager.ENGINE)
+
+        self._metrics.gauge("fantastico_db_pool_checkedout", "Database pool connections currently in use.",
+                            callback=DbSessionManager.get_pool_checkedout)
+
     def close_connection(self, request_id):
         '''This method is used to close the active session for a given request. It is recommended to invoke this only
         once per request cycle. Fantastico framework does this automatically at the end of each request cycle so you don't have
@@ -101,6 +157,20 @@ class DbSessionManager(object):
 
         del self._cached_conns[request_id]
 
+        self._sessions_gauge.dec()
+
+    @staticmethod
+    def get_pool_checkedout():
+        '''This method returns the number of connections currently checked out from the engine pool (0 if the engine is not
+        created yet or its pool does not track checked out connections).'''
+
+        pool = getattr(DbSessionManager.ENGINE, "pool", None)
+
+        if not hasattr(pool, "checkedout"):
+            return 0
+
+        return pool.checkedout()
+
 CONN_MANAGER = None
 
 def init_dm_db_engine(db_config, echo=False, create_engine_fn=None, create_session_fn=None):
@@ -111,3 +181,12 @@ def init_dm_db_engine(db_config, echo=False, create_engine_fn=None, create_sessi
     create_session_fn = create_session_fn or scoped_session
 
     return Singleton()(DbSessionManager(db_config, echo, create_engine_fn, create_session_fn))
+
+@POST_FORK_HOOKS.register
+def reset_after_fork():
+    '''This method discards the database engine and sessions inherited from the master process.'''
+
+    DbSessionManager.dispose_engine(close=False)
+
+    if CONN_MANAGER:
+        CONN_MANAGER.discard_connections()
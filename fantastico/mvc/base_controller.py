@@ -18,7 +18,9 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.mvc.base_controller
 '''
 from fantastico.exceptions import FantasticoTemplateNotFoundError, FantasticoError
+from fantastico.rendering import bytecode_cache, assets_manifest
 from fantastico.utils import instantiator
+from fantastico.utils.metrics import METRICS
 from jinja2.environment import Environment
 from jinja2.exceptions import TemplateNotFound
 from jinja2.loaders import FileSystemLoader
@@ -57,9 +59,24 @@ class BaseController(object):
         views_folder = ("%s%s/views/" % (self._settings_facade.get_root_folder(), self.get_component_folder()))
 
         self._tpl_loader = FileSystemLoader(searchpath=views_folder)
-        self._tpl_env = Environment(loader=self._tpl_loader, **self._settings_facade.get("templates_config"))
+        self._tpl_env = BaseController.build_templates_env(self._tpl_loader, self._settings_facade.get("templates_config"))
         self._tpl_env.fantastico_request = self._curr_request
 
+    @staticmethod
+    def build_templates_env(tpl_loader, templates_config):
+        '''This method builds a jinja environment using the given loader and templates configuration. Unless the configuration
+        specifies a different bytecode cache, compiled templates are shared through
+        :py:data:`fantastico.rendering.bytecode_cache.BYTECODE_CACHE`. Fingerprinted asset urls are resolved in templates using
+        **asset_url** global (see :py:class:`fantastico.rendering.assets_manifest.AssetsManifest`).'''
+
+        templates_config = dict(templates_config)
+        templates_config.setdefault("bytecode_cache", bytecode_cache.BYTECODE_CACHE)
+
+        tpl_env = Environment(loader=tpl_loader, **templates_config)
+        tpl_env.globals["asset_url"] = assets_manifest.ASSETS_MANIFEST.get_url
+
+        return tpl_env
+
     def get_component_folder(self):
         '''This method is used to retrieve the component folder name under which this controller is defined.'''
 
@@ -97,7 +114,9 @@ class BaseController(object):
                 self._tpl_loader.searchpath.append(parent_path)
 
         try:
-            return get_template(self._tpl_env, tpl_name).render(model_data)
+            with METRICS.timer("fantastico_template_render_seconds", "Time spent loading and rendering templates.",
+                               category="template"):
+                return get_template(self._tpl_env, tpl_name).render(model_data)
         except TemplateNotFound as ex:
             raise FantasticoTemplateNotFoundError(ex)
         except Exception as ex:
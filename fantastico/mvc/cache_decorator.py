@@ -0,0 +1,184 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.mvc.cache_decorator
+'''
+from fantastico.utils.cache_backends import CACHES, model_tag
+from urllib.parse import urlencode
+from webob.response import Response
+import functools
+import json
+
+class Cached(object):
+    '''This class provides a decorator which memoizes the responses rendered by a controller. It must be placed below
+    :py:class:`fantastico.mvc.controller_decorators.Controller` so that cache hits are served right after security context
+    validation: no database connection is checked out and no model is injected.
+
+    .. code-block:: python
+
+        @ControllerProvider()
+        class TrackingController(BaseController):
+            @Controller(url="/tracking-codes/ui/codes/$",
+                        models={"TrackingCode": "fantastico.contrib.tracking_codes.models.codes.TrackingCode"})
+            @Cached(ttl=300, vary=["Accept-Language"])
+            def list_codes_ui(self, request):
+                # your logic comes here
+
+    Only **GET** and **HEAD** requests are cached and only **200** responses which do not set cookies are stored. The cache
+    key is built from controller name, request path, query string and the values of the headers listed in vary; a callable
+    key(request, url_params) can replace path and query string. The default vary list is empty: controllers whose response
+    depends on the current user must add **Authorization** to vary (or use a key which includes the user), otherwise a
+    response rendered for one user is served to all users. Entries are stored (status, headers, body) into the backend
+    named by backend argument (default_backend from **cache_config** setting if not given).
+
+    Each entry depends on a list of tags: the models declared on the controller, the models given to this decorator and
+    any custom tags. Writes executed through :py:class:`fantastico.mvc.model_facade.ModelFacade` invalidate the tag of the
+    written model so all dependent entries are discarded. Custom tags can be invalidated using
+    :py:meth:`fantastico.utils.cache_backends.CacheRegistry.invalidate`.
+
+    Cached routes without a custom key are also micro cached by nginx for ttl seconds when the nginx configuration is generated
+    by :py:class:`fantastico.deployment.config_nginx.ConfigNginx`.'''
+
+    CACHEABLE_METHODS = ["GET", "HEAD"]
+
+    @property
+    def ttl(self):
+        '''This property returns the number of seconds a response is kept in cache.'''
+
+        return self._ttl
+
+    @property
+    def vary(self):
+        '''This property returns the request headers whose values are part of the cache key.'''
+
+        return list(self._vary)
+
+    @property
+    def key(self):
+        '''This property returns the custom cache key callable (or None if the key is built from path and query string).'''
+
+        return self._key
+
+    @property
+    def tags(self):
+        '''This property returns the tags cached responses depend on.'''
+
+        return list(self._tags)
+
+    def __init__(self, ttl=60, key=None, vary=None, tags=None, models=None, backend=None, caches=None):
+        self._ttl = ttl
+        self._key = key
+        self._vary = vary or []
+        self._tags = list(tags or [])
+        self._backend_name = backend
+        self._caches = caches or CACHES
+        self._fn_name = None
+
+        for model in models or []:
+            self.add_model(model)
+
+    def add_model(self, model):
+        '''This method marks cached responses as dependent on the given model (class or class full name).'''
+
+        tag = model_tag(model)
+
+        if tag not in self._tags:
+            self._tags.append(tag)
+
+    def __call__(self, orig_fn):
+        '''This method marks the given controller method as cacheable.'''
+
+        self._fn_name = "%s.%s" % (orig_fn.__module__, orig_fn.__qualname__)
+
+        @functools.wraps(orig_fn)
+        def cached_fn(*args, **kwargs):
+            '''This method is used when the controller is invoked without Controller decorator (e.g: unit tests).'''
+
+            return orig_fn(*args, **kwargs)
+
+        setattr(cached_fn, "cache_policy", self)
+        setattr(cached_fn, "uncached_fn", orig_fn)
+
+        return cached_fn
+
+    def get_versions(self, request):
+        '''This method returns the current versions of the tags cached responses depend on (or None if the request is not
+        cacheable). Versions must be read before the controller is executed so that a write committed while the response is
+        rendered makes the stored entry stale.'''
+
+        if not self._is_cacheable(request):
+            return None
+
+        backend = self._caches.get_backend(self._backend_name)
+
+        return self._caches.get_tags_versions(backend, self._tags)
+
+    def lookup(self, request, url_params=None, versions=None):
+        '''This method returns the cached response for the given request or None if the request is not cached (or not
+        cacheable). The entry is valid only if it was stored with the given tags versions (current versions if not given).'''
+
+        if not self._is_cacheable(request):
+            return None
+
+        backend = self._caches.get_backend(self._backend_name)
+
+        entry = backend.get(self.build_key(request, url_params))
+
+        if entry is None:
+            return None
+
+        entry_versions, status, headerlist, body = entry
+
+        if entry_versions != (versions or self._caches.get_tags_versions(backend, self._tags)):
+            return None
+
+        return Response(status=status, headerlist=list(headerlist), body=body)
+
+    def store(self, request, url_params, response, versions=None):
+        '''This method stores the given response for the given request (if both are cacheable) together with the tags versions
+        read before the response was rendered (see :py:meth:`get_versions`). The response is returned unchanged.'''
+
+        if not self._is_cacheable(request) or not isinstance(response, Response):
+            return response
+
+        if response.status_int != 200 or "Set-Cookie" in response.headers:
+            return response
+
+        backend = self._caches.get_backend(self._backend_name)
+
+        versions = versions or self._caches.get_tags_versions(backend, self._tags)
+
+        backend.set(self.build_key(request, url_params),
+                    (versions, response.status, response.headerlist, response.body), ttl=self._ttl)
+
+        return response
+
+    def build_key(self, request, url_params=None):
+        '''This method builds the cache key of the given request.'''
+
+        if self._key:
+            request_key = str(self._key(request, url_params or {}))
+        else:
+            request_key = "%s?%s" % (request.path, urlencode(sorted(request.GET.items())))
+
+        vary_values = json.dumps([[header, request.headers.get(header, "")] for header in self._vary])
+
+        return "fantastico.cached:%s:%s:%s:%s" % (self._fn_name, request.method, request_key, vary_values)
+
+    def _is_cacheable(self, request):
+        '''This method determines if the given request can be served from cache.'''
+
+        return getattr(request, "method", None) in self.CACHEABLE_METHODS
@@ -0,0 +1,103 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.mvc.conditional_decorator
+'''
+from fantastico.middleware.conditional_middleware import is_not_modified
+from webob.response import Response
+import functools
+
+class ConditionalGet(object):
+    '''This class provides a decorator which lets a controller supply its validators (**ETag** and / or **Last-Modified**)
+    before it is executed. It must be placed below :py:class:`fantastico.mvc.controller_decorators.Controller`; when the
+    client copy is still valid a **304 Not Modified** response is returned right after security context validation, without
+    rendering the response, checking out a database connection or looking up cached responses.
+
+    .. code-block:: python
+
+        def menu_etag(request, url_params):
+            return "menu-%s-%s" % (url_params["menu_id"], INVALIDATION_BUS.generation("table:menu_items"))
+
+        @Controller(url="/menus/(?P<menu_id>\\\\d+)/items/$")
+        @ConditionalGet(etag=menu_etag)
+        def retrieve_menu_items(self, request, menu_id):
+            # your logic comes here
+
+    Validator functions receive the current request and the url parameters and return None when validators can not be
+    computed. Computed validators are set on the rendered response (unless the controller set them itself).'''
+
+    CONDITIONAL_METHODS = ["GET", "HEAD"]
+
+    def __init__(self, etag=None, last_modified=None):
+        self._etag = etag
+        self._last_modified = last_modified
+
+    def __call__(self, orig_fn):
+        '''This method marks the given controller method as supporting conditional requests.'''
+
+        @functools.wraps(orig_fn)
+        def conditional_fn(*args, **kwargs):
+            '''This method is used when the controller is invoked without Controller decorator (e.g: unit tests).'''
+
+            return orig_fn(*args, **kwargs)
+
+        setattr(conditional_fn, "conditional_policy", self)
+
+        return conditional_fn
+
+    def get_validators(self, request, url_params=None):
+        '''This method returns the validators (etag, last_modified) of the given request. The etag is quoted.'''
+
+        if getattr(request, "method", None) not in self.CONDITIONAL_METHODS:
+            return None, None
+
+        etag = self._etag(request, url_params or {}) if self._etag else None
+        last_modified = self._last_modified(request, url_params or {}) if self._last_modified else None
+
+        if etag and not etag.endswith('"'):
+            etag = '"%s"' % etag
+
+        return etag, last_modified
+
+    def not_modified(self, request, validators):
+        '''This method returns a **304 Not Modified** response if the client copy matches the given validators (None
+        otherwise).'''
+
+        etag, last_modified = validators
+
+        if not (etag or last_modified) or not is_not_modified(request.environ, etag, last_modified):
+            return None
+
+        response = Response(status=304)
+        self.apply(response, validators)
+
+        return response
+
+    def apply(self, response, validators):
+        '''This method sets the given validators on the given response (unless the response already has them).'''
+
+        etag, last_modified = validators
+
+        if not isinstance(response, Response) or response.status_int not in (200, 304):
+            return response
+
+        if etag and not response.etag:
+            response.headers["ETag"] = etag
+
+        if last_modified and not response.last_modified:
+            response.last_modified = last_modified
+
+        return response
@@ -20,9 +20,11 @@ import inspect
 
 from fantastico import mvc
 from fantastico.exceptions import FantasticoControllerInvalidError
+from fantastico.middleware.cors_middleware import CorsPolicy
 from fantastico.mvc.base_controller import BaseController
 from fantastico.mvc.model_facade import ModelFacade
 from fantastico.oauth2.exceptions import OAuth2UnauthorizedError, OAuth2Error
+from fantastico.settings import SettingsFacade
 from fantastico.utils import instantiator
 from webob.response import Response
 
@@ -68,6 +70,30 @@ class Controller(object):
     #. As developer you create the method that knows how to handle **/blog/** url.
     #. Write your view.
 
+    Controllers which are expensive (or depend on slow resources) can limit the number of requests which concurrently
+    execute them; requests waiting longer than queue_timeout seconds are rejected with 503 by
+    :py:class:`fantastico.middleware.admission_middleware.AdmissionControlMiddleware`:
+
+    .. code-block:: python
+
+        @Controller(url="/reports/monthly$", max_concurrency=4, queue_timeout=0.2)
+        def monthly_report(self, request):
+            # your logic comes here
+
+    Responses of expensive read only controllers can be memoized using :py:class:`fantastico.mvc.cache_decorator.Cached`
+    (placed below Controller). Cache hits are returned before a database connection is obtained and models are injected:
+
+    .. code-block:: python
+
+        @Controller(url="/blogs/$", models={"Blog": "fantastico.plugins.blog.models.blog.Blog"})
+        @Cached(ttl=300)
+        def list_blogs(self, request):
+            # your logic comes here
+
+    Controllers which can cheaply compute validators (ETag / Last-Modified) can use
+    :py:class:`fantastico.mvc.conditional_decorator.ConditionalGet` (placed below Controller) so that **304 Not Modified**
+    responses are returned without executing the controller.
+
     You can also map multiple routes for the same controller:
 
     .. code-block python
@@ -131,6 +157,8 @@ class Controller(object):
         self._models = models
         self._model_facade = kwargs.get("model_facade", ModelFacade)
         self._conn_manager = kwargs.get("conn_manager")
+        self._admission = {"max_concurrency": kwargs.get("max_concurrency"),
+                           "queue_timeout": kwargs.get("queue_timeout")}
 
         self._fn_handler = None
 
@@ -166,6 +194,13 @@ class Controller(object):
     def __call__(self, orig_fn):
         '''This method takes care of registering the controller when the class is first loaded by python vm.'''
 
+        cache_policy = getattr(orig_fn, "cache_policy", None)
+        conditional_policy = getattr(orig_fn, "conditional_policy", None)
+
+        if cache_policy:
+            for model in self.models.values():
+                cache_policy.add_model(model)
+
         def new_handler(*args, **kwargs):
             '''This method is the one that replaces the original decorated method.'''
 
@@ -173,17 +208,37 @@ class Controller(object):
 
             self._validate_security_context(request)
 
-            conn_manager = self._conn_manager or mvc.CONN_MANAGER
-            db_conn = conn_manager.get_connection(request.request_id)
+            if conditional_policy:
+                validators = conditional_policy.get_validators(request, kwargs)
+                response = conditional_policy.not_modified(request, validators)
+
+                if response is not None:
+                    return response
 
-            self._inject_models(request, db_conn)
+            versions = cache_policy.get_versions(request) if cache_policy else None
+            response = cache_policy.lookup(request, kwargs, versions) if cache_policy else None
 
-            return orig_fn(*args, **kwargs)
+            if response is None:
+                conn_manager = self._conn_manager or mvc.CONN_MANAGER
+                db_conn = conn_manager.get_connection(request.request_id)
+
+                self._inject_models(request, db_conn)
+
+                if cache_policy:
+                    response = cache_policy.store(request, kwargs, orig_fn.uncached_fn(*args, **kwargs), versions)
+                else:
+                    response = orig_fn(*args, **kwargs)
+
+            if conditional_policy:
+                response = conditional_policy.apply(response, validators)
+
+            return response
 
         new_handler.__name__ = orig_fn.__name__
         new_handler.__doc__ = orig_fn.__doc__
         new_handler.__module__ = orig_fn.__module__
         setattr(new_handler, "orig_fn", orig_fn)
+        setattr(new_handler, "admission", self._admission)
 
         self._fn_handler = new_handler
 
@@ -256,22 +311,45 @@ class CorsEnabled(object):
         def upload_file_options(self, request, filename):        
             pass
         
-    As you can see there is no need to implement cors controller methods because the decorator does all the job.
+    As you can see there is no need to implement cors controller methods because the decorator does all the job. The response
+    headers are built by the :py:class:`fantastico.middleware.cors_middleware.CorsPolicy` configured through **cors_config**
+    setting. When :py:class:`fantastico.middleware.cors_middleware.CorsMiddleware` is installed, preflight requests are
+    answered by the middleware and never reach the decorated method.
     '''
-    
+
+    def __init__(self, settings_facade=SettingsFacade):
+        self._settings_facade = settings_facade
+        self._policy = None
+
+    def _get_policy(self):
+        '''This method returns the cors policy used by this decorator (it is built on first usage).'''
+
+        if self._policy is None:
+            self._policy = CorsPolicy(self._settings_facade().get("cors_config"))
+
+        return self._policy
+
     def __call__(self, orig_fn):
+        decorator = self
+
         def cors_enabled_fn(self, request, *args, **kwargs): # pylint: disable=W0613
             '''This method provides the algorithm for building a generic cors response for the current request.'''
-            
-            kwargs = kwargs or {}
-    
+
+            cors_headers = decorator._get_policy().get_preflight_headers( # pylint: disable=W0212
+                                    request.headers.get("Origin"),
+                                    request.headers.get("Access-Control-Request-Method") or "OPTIONS",
+                                    request.headers.get("Access-Control-Request-Headers", ""))
+
+            if cors_headers is None:
+                return Response(status_code=403, content_type="text/plain")
+
             response = Response(content_type="application/json", status_code=200)
             response.headers["Content-Length"] = "0"
             response.headers["Cache-Control"] = "private"
-            response.headers["Access-Control-Allow-Origin"] = "*"
-            response.headers["Access-Control-Allow-Methods"] = "OPTIONS,GET,POST,PUT,DELETE"
-            response.headers["Access-Control-Allow-Headers"] = request.headers.get("Access-Control-Request-Headers", "")
-    
+
+            for header_name, header_value in cors_headers:
+                response.headers[header_name] = header_value
+
             return response
 
         cors_enabled_fn.__name__ = orig_fn.__name__
@@ -16,9 +16,16 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
 .. py:module:: fantastico.mvc.model_facade
 '''
-from fantastico.exceptions import FantasticoIncompatibleClassError, FantasticoDbError, FantasticoDbNotFoundError
+from fantastico.exceptions import FantasticoIncompatibleClassError, FantasticoDbError, FantasticoDbNotFoundError, \
+    FantasticoDbConflictError
+from fantastico.utils.cache_backends import CACHES, model_tag
+from fantastico.utils.invalidation_bus import INVALIDATION_BUS, table_topic
+from fantastico.utils.metrics import METRICS
 from sqlalchemy.ext.declarative.api import DeclarativeMeta
 from sqlalchemy.orm.util import class_mapper
+from sqlalchemy.sql.functions import func
+from sqlalchemy.types import Integer, Numeric
+import logging
 
 class ModelFacade(object):
     '''This class provides a generic model facade factory. In order to work **Fantastico** base model it is recommended
@@ -94,6 +101,8 @@ class ModelFacade(object):
 
         return class_mapper(self.model_cls).primary_key
 
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "create"}, category="db")
     def create(self, model):
         '''This method add the given model in the database.
 
@@ -124,12 +133,45 @@ class ModelFacade(object):
             self._session.add(model)
             self._session.commit()
 
-            return [getattr(model, pk_key.name) for pk_key in self._model_pk]
+            pk_values = [getattr(model, pk_key.name) for pk_key in self._model_pk]
         except Exception as ex:
             self._session.rollback()
 
             raise FantasticoDbError(ex)
 
+        self._invalidate_cache()
+
+        return pk_values
+
+    def _invalidate_cache(self):
+        '''This method invalidates all cached entries (e.g: controller responses cached through
+        :py:class:`fantastico.mvc.cache_decorator.Cached`) which depend on the model class of this facade and announces the
+        table change on :py:data:`fantastico.utils.invalidation_bus.INVALIDATION_BUS`. It is invoked after the write is committed
+        so failures are only logged (the write succeeded).'''
+
+        try:
+            CACHES.invalidate(model_tag(self._model_cls))
+            INVALIDATION_BUS.publish(table_topic(self._model_cls))
+        except Exception: # pylint: disable=W0703
+            logging.getLogger(__name__).exception("Cache invalidation failed for model %s." % self._model_cls.__name__)
+
+    def _get_conditional_query(self, pk_values, expected_values):
+        '''This method builds a query selecting the row with the given primary key values only if it holds the given expected
+        values.'''
+
+        query = self._session.query(self.model_cls)
+
+        for col, value in list(pk_values.items()) + list(expected_values.items()):
+            query = query.filter(col == value)
+
+        return query
+
+    def _check_affected(self, rows_count):
+        '''This method makes sure a conditional write affected a row.'''
+
+        if not rows_count:
+            raise FantasticoDbConflictError("Model %s was changed meanwhile." % self.model_cls.__name__)
+
     def _get_pk_values(self, model):
         '''This method returns the dictionary of pk values from the given model.'''
 
@@ -140,8 +182,12 @@ class ModelFacade(object):
 
         return pk_values
 
-    def update(self, model):
-        '''This method updates an existing model from the database based on primary key.
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "update"}, category="db")
+    def update(self, model, expected_values=None):
+        '''This method updates an existing model from the database based on primary key. When expected_values (a dictionary
+        of columns and values) are given, the row is updated only if it still holds these values (e.g: the version column
+        read before) in a single conditional UPDATE statement.
 
         .. code-block:: python
 
@@ -161,23 +207,45 @@ class ModelFacade(object):
             model = facade.new_model("John", last_name="Doe")
             model.id = 5
             facade.update(model)
+            facade.update(model, expected_values={PersonModel.version: 3})
 
         :raises fantastico.exceptions.FantasticoDbNotFoundError: Raised when the given model does not exist in database.
             By default, session is rollback automatically so that other consumers can still work as expected.
+        :raises fantastico.exceptions.FantasticoDbConflictError: Raised when expected values are given and no row holding
+            them exists anymore (the row was changed or removed meanwhile).
         :raises fantastico.exceptions.FantasticoDbError: Raised when an unhandled exception occurs. By default, session
             is rollback automatically so that other consumers can still work as expected.
         '''
 
-        self.find_by_pk(self._get_pk_values(model))
+        pk_values = self._get_pk_values(model)
+
+        if not expected_values:
+            self.find_by_pk(pk_values)
 
         try:
-            self._session.merge(model)
+            if expected_values:
+                values = {attr.key: getattr(model, attr.key) for attr in class_mapper(self.model_cls).column_attrs
+                          if attr.key in vars(model)}
+
+                self._check_affected(self._get_conditional_query(pk_values, expected_values).update(
+                                                                                    values, synchronize_session=False))
+            else:
+                self._session.merge(model)
+
             self._session.commit()
+        except FantasticoDbConflictError:
+            self._session.rollback()
+
+            raise
         except Exception as ex:
             self._session.rollback()
 
             raise FantasticoDbError(ex)
 
+        self._invalidate_cache()
+
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "find_by_pk"}, category="db")
     def find_by_pk(self, pk_values):
         '''This method returns the entity which matches the given primary key values.
 
@@ -214,8 +282,11 @@ class ModelFacade(object):
 
         return results[0]
 
-    def delete(self, model):
-        '''This method deletes a given model from database. Below you can find a simple example of how to use this:
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "delete"}, category="db")
+    def delete(self, model, expected_values=None):
+        '''This method deletes a given model from database. When expected_values (a dictionary of columns and values) are
+        given, the row is deleted only if it still holds these values. Below you can find a simple example of how to use this:
 
         .. code-block:: python
 
@@ -234,18 +305,33 @@ class ModelFacade(object):
             model = facade.find_by_pk({PersonModel.id: 1})
             facade.delete(model)
 
+        :raises fantastico.exceptions.FantasticoDbConflictError: Raised when expected values are given and no row holding
+            them exists anymore (the row was changed or removed meanwhile).
         :raises fantastico.exceptions.FantasticoDbError: Raised when an unhandled exception occurs. By default, session
             is rollback automatically so that other consumers can still work as expected.
         '''
 
         try:
-            self._session.delete(model)
+            if expected_values:
+                self._check_affected(self._get_conditional_query(self._get_pk_values(model), expected_values).delete(
+                                                                                    synchronize_session=False))
+            else:
+                self._session.delete(model)
+
             self._session.commit()
+        except FantasticoDbConflictError:
+            self._session.rollback()
+
+            raise
         except Exception as ex:
             self._session.rollback()
 
             raise FantasticoDbError(ex)
 
+        self._invalidate_cache()
+
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "get_records_paged"}, category="db")
     def get_records_paged(self, start_record, end_record, filter_expr=None, sort_expr=None):
         '''This method retrieves all records matching the given filters sorted by the given expression.
 
@@ -294,6 +380,8 @@ class ModelFacade(object):
 
             raise FantasticoDbError(ex)
 
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "count_records"}, category="db")
     def count_records(self, filter_expr=None):
         '''This method is used for counting the number of records from underlining facade. In addition it applies the
         filter expressions specified (if any).
@@ -325,3 +413,92 @@ class ModelFacade(object):
             self._session.rollback()
 
             raise FantasticoDbError(ex)
+
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "find_row_version"}, category="db")
+    def find_row_version(self, pk_values, version_col, filter_expr=None):
+        '''This method selects only the version column of the entity which matches the given primary key values. It is
+        much cheaper than :py:meth:`find_by_pk` when we only want to know if an entity changed.
+
+        .. code-block:: python
+
+            version = facade.find_row_version({Blog.id: 1}, Blog.updated_at)
+
+        :param pk_values: A dictionary holding the primary key columns and their values.
+        :type pk_values: dict
+        :param version_col: The column (version counter or last update timestamp) which changes each time the row changes.
+        :param filter_expr: A list of :py:class:`fantastico.mvc.models.model_filter.ModelFilterAbstract` which are applied
+            in order.
+        :type filter_expr: list
+        :returns: The version of the matching row or None if no row matches.
+        :raises fantastico.exceptions.FantasticoDbError: Raised when an unhandled exception occurs. The underlining session is
+            automatically rollbacked.
+        '''
+
+        if filter_expr and not isinstance(filter_expr, list):
+            filter_expr = [filter_expr]
+
+        try:
+            query = self._session.query(version_col)
+
+            for pk_col in pk_values.keys():
+                query = query.filter(pk_col == pk_values[pk_col])
+
+            for model_filter in filter_expr or []:
+                query = query.filter(model_filter.get_expression())
+
+            row = query.first()
+        except Exception as ex:
+            self._session.rollback()
+
+            raise FantasticoDbError(ex)
+
+        if row is None:
+            return None
+
+        return row[0]
+
+    @METRICS.timed("fantastico_model_facade_seconds", "Time spent in model facade operations.",
+                   {"operation": "aggregate_version"}, category="db")
+    def aggregate_version(self, version_col, filter_expr=None):
+        '''This method computes, in a single query, the greatest version and the number of records matching the given filter
+        expressions. For numeric version columns (per row version counters) the sum of versions is computed as well: the
+        greatest version alone does not change when a row which does not hold it is updated. Together they change whenever a
+        matching row is added, removed or updated.
+
+        .. code-block:: python
+
+            max_version, records_count, versions_sum = facade.aggregate_version(
+                                                            Blog.updated_at,
+                                                            filter_expr=ModelFilter(Blog.id, 5, ModelFilter.LT))
+
+        :param version_col: The column (version counter or last update timestamp) which changes each time a row changes.
+        :param filter_expr: A list of :py:class:`fantastico.mvc.models.model_filter.ModelFilterAbstract` which are applied
+            in order.
+        :type filter_expr: list
+        :returns: A tuple (max version, records count, versions sum). Versions sum is None for non numeric version columns.
+        :raises fantastico.exceptions.FantasticoDbError: Raised when an unhandled exception occurs. The underlining session is
+            automatically rollbacked.
+        '''
+
+        if filter_expr and not isinstance(filter_expr, list):
+            filter_expr = [filter_expr]
+
+        columns = [func.max(version_col), func.count()]
+
+        if isinstance(version_col.type, (Integer, Numeric)):
+            columns.append(func.sum(version_col))
+
+        try:
+            query = self._session.query(*columns).select_from(self.model_cls)
+
+            for model_filter in filter_expr or []:
+                query = query.filter(model_filter.get_expression())
+
+            row = tuple(query.one())
+        except Exception as ex:
+            self._session.rollback()
+
+            raise FantasticoDbError(ex)
+
+        return (row + (None,))[:3]
@@ -16,79 +16,293 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
 .. py:module:: fantastico.mvc.static_assets_controller
 '''
+from fantastico.middleware.compression_middleware import negotiate_encoding
+from fantastico.middleware.conditional_middleware import is_not_modified
 from fantastico.mvc.base_controller import BaseController
 from fantastico.utils import instantiator
+from fantastico.utils.lru_cache import LruCache
+from webob.byterange import Range
+from webob.datetime_utils import serialize_date
 from webob.response import Response
+from webob.static import FileIter
 import mimetypes
+import mmap
 import os
+import re
+import stat
+import threading
+
+FINGERPRINT_SIZE = 10
+FINGERPRINT_REGEX = re.compile(r"\.[0-9a-f]{%s}\.[^./]+$" % FINGERPRINT_SIZE)
+
+_CONTENT_TYPES = {}
+
+def guess_content_type(file_path):
+    '''This function returns the content type of the given file. Content types are guessed only once per file extension.'''
+
+    extension = os.path.splitext(file_path)[1].lower()
+    content_type = _CONTENT_TYPES.get(extension)
+
+    if content_type is None:
+        content_type = _CONTENT_TYPES[extension] = mimetypes.guess_type("asset%s" % extension)[0] or "application/octet-stream"
+
+    return content_type
+
+def is_fingerprinted(file_path):
+    '''This function returns True if the given file name contains a content fingerprint of **FINGERPRINT_SIZE** hex digits
+    right before its extension, as built by **fsdk assets** (e.g **app.3f2a9c1b0d.css**). Such files never change so they
+    can be cached by clients forever.'''
+
+    return FINGERPRINT_REGEX.search(file_path) is not None
+
+class HotFilesCache(object):
+    '''This class holds small static files memory mapped so that frequently requested assets are not read from disk on each
+    request. At most **max_files** files, each one having at most **max_file_size** bytes, are mapped. Each lookup receives
+    the current stat result of the file and the file is mapped again if its size or modification time changed.
+
+    Assets must be deployed by replacing files (e.g rename) and not by rewriting them in place because a mapped file
+    truncated in place can not be read anymore.'''
+
+    def __init__(self, max_files=256, max_file_size=65536, metrics_registry=None):
+        self._max_file_size = max_file_size
+        self._files = LruCache(max_size=max_files, name="static_assets", metrics_registry=metrics_registry)
+
+    def accepts(self, file_size):
+        '''This method returns True if a file with the given size can be held by this cache.'''
+
+        return self._files.max_size > 0 and 0 < file_size <= self._max_file_size
+
+    def get(self, file_path, file_stat, file_opener=open):
+        '''This method returns the memory map of the given file. The file is mapped again if it changed according to the
+        given stat result.'''
+
+        version = (file_stat.st_mtime, file_stat.st_size)
+        entry = self._files.get(file_path)
+
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        with file_opener(file_path, "rb") as file_obj:
+            content = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._files.set(file_path, (version, content))
+
+        return content
 
 class StaticAssetsController(BaseController):
-    '''This class provides a generic handler for static assets. It is used only by dev server and it does not
-    ensure correct http client side caching. In production, only the web server serves static assets and
-    Fantastico wsgi server is bypassed.'''
-    
+    '''This class provides a generic handler for static assets. Each asset is located using a single stat call and it is sent
+    together with **ETag**, **Last-Modified** and **Cache-Control** headers. Conditional requests receive **304 Not
+    Modified** responses and single **Range** requests receive **206 Partial Content** responses. Fingerprinted assets
+    (e.g **app.3f2a9c1b0d.css**) are cached by clients forever.
+
+    In production, the behavior is tuned using **static_assets_config** setting:
+
+    * **x_accel_redirect** - when set, file transfer is delegated to nginx using **X-Accel-Redirect** header.
+    * **precompressed** - when True, **.gz** siblings of assets are sent to clients accepting gzip.
+    * **hot_cache_size** / **hot_file_max_size** - small files are kept memory mapped (see
+      :py:class:`fantastico.mvc.static_assets_controller.HotFilesCache`); other files are sent using **wsgi.file_wrapper**
+      (sendfile when the wsgi server supports it).'''
+
+    _HOT_FILES = None
+    _HOT_FILES_LOCK = threading.Lock()
+
+    def __init__(self, settings_facade, hot_files=None):
+        super(StaticAssetsController, self).__init__(settings_facade)
+
+        self._hot_files = hot_files
+
     @property
     def static_folder(self):
-        '''This property returns the static folder locatio for fantastico framework. Currently this is set to 
+        '''This property returns the static folder locatio for fantastico framework. Currently this is set to
         **static**.'''
-        
+
         return "static"
-    
+
     def serve_asset(self, request, component_name, asset_path, **kwargs):
         '''This method is invoked whenever a request to a static asset is done.'''
 
-        file_path = "%s%s/%s/%s" % (instantiator.get_class_abslocation(self._settings_facade.get_config().__class__), 
+        file_path = "%s%s/%s/%s" % (instantiator.get_class_abslocation(self._settings_facade.get_config().__class__),
                                     component_name, self.static_folder, asset_path)
         err_content_type = "text/html; charset=UTF-8"
-        
+
         if not component_name or len(component_name.strip()) == 0:
             return Response(status=400, content_type=err_content_type, text="No component name provided.")
-        
+
         if not asset_path or len(asset_path.strip()) == 0:
             return Response(status=400, content_type=err_content_type, text="No asset path provided.")
-        
-        os_provider = kwargs.get("os_provider") or os        
-        
-        if not self._is_asset_available(file_path, os_provider):
+
+        if ".." in asset_path.split("/"):
+            return Response(status=400, content_type=err_content_type, text="Asset path %s is not valid." % asset_path)
+
+        config = self._settings_facade.get("static_assets_config") or {}
+
+        if config.get("x_accel_redirect"):
+            return self._offload_asset(file_path, "%s/%s/%s" % (component_name, self.static_folder, asset_path), config)
+
+        os_provider = kwargs.get("os_provider") or os
+        file_stat = self._stat_asset(file_path, os_provider)
+
+        if not file_stat:
             return Response(status=404, content_type=err_content_type, text="Asset %s not found." % file_path)
-         
-        return self._load_file_from_disk(request, file_path, **kwargs)
-    
+
+        return self._load_file_from_disk(request, file_path, file_stat, config, **kwargs)
+
     def handle_favicon(self, request, **kwargs):
         '''This method is used to handle favicon requests coming from browsers.'''
-        
+
         os_provider = kwargs.get("os_provider") or os
 
-        file_path = "%sstatic/%s" % (instantiator.get_class_abslocation(self._settings_facade.get_config().__class__), 
+        file_path = "%sstatic/%s" % (instantiator.get_class_abslocation(self._settings_facade.get_config().__class__),
                                  "favicon.ico")
-        
-        if not os_provider.path.exists(file_path):
+
+        file_stat = self._stat_asset(file_path, os_provider)
+
+        if not file_stat:
             return Response(app_iter=[], content_type="image/x-icon")
-        
-        return self._load_file_from_disk(request, file_path, **kwargs)
-    
-    def _is_asset_available(self, file_path, os_provider=os):
-        '''This method detects if an asset exists on disk or not.'''
 
-        if not os_provider.path.exists(file_path):
+        config = self._settings_facade.get("static_assets_config") or {}
+
+        return self._load_file_from_disk(request, file_path, file_stat, config, **kwargs)
+
+    def _stat_asset(self, file_path, os_provider=os):
+        '''This method returns the stat result of the given asset or None if the asset is not a regular file.'''
+
+        try:
+            file_stat = os_provider.stat(file_path)
+        except OSError:
+            return None
+
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+
+        return file_stat
+
+    def _get_hot_files(self, config):
+        '''This method returns the hot files cache used by this controller. By default, the cache is shared by all
+        controller instances from the current process.'''
+
+        if self._hot_files:
+            return self._hot_files
+
+        with StaticAssetsController._HOT_FILES_LOCK:
+            if StaticAssetsController._HOT_FILES is None:
+                StaticAssetsController._HOT_FILES = HotFilesCache(config.get("hot_cache_size", 256),
+                                                                  config.get("hot_file_max_size", 65536))
+
+        self._hot_files = StaticAssetsController._HOT_FILES
+
+        return self._hot_files
+
+    def _get_cache_control(self, file_path, config):
+        '''This method returns the **Cache-Control** header value for the given asset.'''
+
+        if is_fingerprinted(file_path):
+            return "public, max-age=%s, immutable" % config.get("fingerprinted_max_age", 31536000)
+
+        max_age = config.get("max_age", 0)
+
+        if not max_age:
+            return "no-cache"
+
+        return "public, max-age=%s" % max_age
+
+    def _offload_asset(self, file_path, asset_location, config):
+        '''This method builds a response which asks nginx to send the given asset using **X-Accel-Redirect** header. Nginx
+        takes care of conditional and range requests.'''
+
+        response = Response(content_type=guess_content_type(file_path))
+        response.headers["Cache-Control"] = self._get_cache_control(file_path, config)
+        response.headers["X-Accel-Redirect"] = "%s%s" % (config["x_accel_redirect"], asset_location)
+
+        return response
+
+    def _get_byte_range(self, environ, etag, last_modified, file_size):
+        '''This method returns the (start, stop) byte range requested by the client, None if the whole file must be sent or
+        False if the requested range can not be satisfied.'''
+
+        byte_range = Range.parse(environ.get("HTTP_RANGE"))
+
+        if byte_range is None:
+            return None
+
+        if_range = environ.get("HTTP_IF_RANGE")
+
+        if if_range and if_range not in (etag, last_modified):
+            return None
+
+        start, stop = byte_range.start, byte_range.end
+
+        if stop is None:
+            stop = file_size
+
+            if start < 0:
+                start = max(0, file_size + start)
+
+        if start >= file_size or start >= stop:
             return False
-        
-        return True
-    
-    def _load_file_from_disk(self, request, file_path, **kwargs):
-        '''This method is used to load a file from disk if it exists.'''
-        
+
+        return start, min(stop, file_size)
+
+    def _load_file_from_disk(self, request, file_path, file_stat, config, **kwargs):
+        '''This method is used to load a file from disk using the given stat result. The precompressed sibling of the file is
+        used if available and accepted by the client.'''
+
+        environ = request.environ
         os_provider = kwargs.get("os_provider") or os
-        err_content_type = "text/html; charset=UTF-8"
-        
-        if not self._is_asset_available(file_path, os_provider):
-            return Response(status=404, content_type=err_content_type, text="Asset %s not found." % file_path)
-         
-        file_loader = kwargs.get("file_loader") or request.environ.get("wsgi.file_wrapper")
-        
-        file_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
-        
+
+        response = Response(content_type=guess_content_type(file_path))
+        response.headers["Cache-Control"] = self._get_cache_control(file_path, config)
+        response.headers["Accept-Ranges"] = "bytes"
+
+        if config.get("precompressed"):
+            response.headers["Vary"] = "Accept-Encoding"
+
+            gz_stat = negotiate_encoding(environ.get("HTTP_ACCEPT_ENCODING"), ("gzip",)) and \
+                        self._stat_asset("%s.gz" % file_path, os_provider)
+
+            if gz_stat:
+                file_path, file_stat = "%s.gz" % file_path, gz_stat
+                response.headers["Content-Encoding"] = "gzip"
+
+        etag = '"%x-%x"' % (int(file_stat.st_mtime), file_stat.st_size)
+        last_modified = serialize_date(int(file_stat.st_mtime))
+
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = last_modified
+
+        if is_not_modified(environ, etag, last_modified):
+            response.status = 304
+            response.app_iter = []
+
+            return response
+
+        file_size = file_stat.st_size
+        byte_range = self._get_byte_range(environ, etag, last_modified, file_size)
+
+        if byte_range is False:
+            response.status = 416
+            response.headers["Content-Range"] = "bytes */%s" % file_size
+            response.app_iter = []
+
+            return response
+
+        start, stop = byte_range or (0, file_size)
+
+        if byte_range:
+            response.status = 206
+            response.headers["Content-Range"] = "bytes %s-%s/%s" % (start, stop - 1, file_size)
+
         file_opener = kwargs.get("file_opener") or open
-        file_content = file_loader(file_opener(file_path, "rb"))
-        
-        return Response(app_iter=file_content, content_type=file_type)
\ No newline at end of file
+        hot_files = self._get_hot_files(config)
+
+        if hot_files.accepts(file_size):
+            response.app_iter = [hot_files.get(file_path, file_stat, file_opener)[start:stop]]
+        elif byte_range:
+            response.app_iter = FileIter(file_opener(file_path, "rb")).app_iter_range(seek=start, limit=stop)
+        else:
+            file_loader = kwargs.get("file_loader") or environ.get("wsgi.file_wrapper") or FileIter
+            response.app_iter = file_loader(file_opener(file_path, "rb"))
+
+        response.content_length = stop - start
+
+        return response
@@ -0,0 +1,200 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.mvc.tests.test_cache_decorator
+'''
+from fantastico.mvc import controller_decorators
+from fantastico.mvc.cache_decorator import Cached
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.cache_backends import CacheRegistry, model_tag
+from fantastico.utils.lru_cache import LruCache
+from mock import Mock
+from webob.request import Request
+from webob.response import Response
+
+class CachedTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for controller responses cache decorator.'''
+
+    @classmethod
+    def setup_once(cls):
+        '''We rebind original Controller decorator to its module.'''
+
+        super(CachedTests, cls).setup_once()
+
+        controller_decorators.Controller = cls._old_controller_decorator
+
+    def init(self):
+        '''This method builds a cache registry containing a single in process backend.'''
+
+        self._caches = CacheRegistry(settings_facade=Mock())
+        self._backend = self._caches.register("memory", LruCache())
+        self._caches.get_backend = Mock(return_value=self._backend)
+
+        self._conn_manager = Mock()
+        self._invocations = []
+        self._registered_routes = list(controller_decorators.Controller.get_registered_routes())
+
+    def cleanup(self):
+        '''This method unregisters the controllers created by test cases.'''
+
+        controller_decorators.Controller.get_registered_routes()[:] = self._registered_routes
+
+    def _build_controller(self, response=None, **kwargs):
+        '''This method builds a cached controller which counts its invocations.'''
+
+        response = response or Response(b"Hello world.", content_type="text/plain")
+
+        @controller_decorators.Controller(url="/cached/hello", method="GET", conn_manager=self._conn_manager,
+                                          models={"Model1": "fantastico.mvc.tests.test_controller_decorator.Model1"},
+                                          model_facade=Mock())
+        @Cached(ttl=60, caches=self._caches, **kwargs)
+        def say_hello(request):
+            self._invocations.append(request)
+
+            return response
+
+        return say_hello
+
+    def _build_request(self, url="/cached/hello", method="GET", headers=None):
+        '''This method builds a request which passes security validation.'''
+
+        request = Request.blank(url, method=method, headers=headers or {})
+        request.request_id = 1
+        request.context = Mock()
+        request.context.security.validate_context = Mock(return_value=True)
+
+        return request
+
+    def test_cache_hit(self):
+        '''This test case ensures a cached response is returned without checking out a db connection.'''
+
+        say_hello = self._build_controller()
+
+        response = say_hello(self._build_request())
+
+        self.assertEqual(b"Hello world.", response.body)
+        self.assertEqual(1, self._conn_manager.get_connection.call_count)
+
+        request = self._build_request()
+        response = say_hello(request)
+
+        self.assertIsInstance(response, Response)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(b"Hello world.", response.body)
+        self.assertEqual("text/plain", response.content_type)
+        self.assertEqual(1, len(self._invocations))
+        self.assertEqual(1, self._conn_manager.get_connection.call_count)
+        self.assertFalse(hasattr(request, "models"))
+
+    def test_cache_key_query_vary(self):
+        '''This test case ensures query string and vary headers are part of the cache key.'''
+
+        say_hello = self._build_controller(vary=["Accept-Language"])
+
+        say_hello(self._build_request("/cached/hello?b=2&a=1"))
+        say_hello(self._build_request("/cached/hello?a=1&b=2"))
+        say_hello(self._build_request("/cached/hello?a=2"))
+        say_hello(self._build_request("/cached/hello?a=2", headers={"Accept-Language": "ro"}))
+
+        self.assertEqual(3, len(self._invocations))
+
+    def test_cache_key_unambiguous(self):
+        '''This test case ensures encoded query string values and vary values never collide with other requests keys.'''
+
+        cached = Cached(ttl=60, vary=["Accept-Language", "Accept"], caches=self._caches)
+
+        keys = set(cached.build_key(self._build_request(url, headers=headers)) for url, headers in [
+                   ("/cached/hello?x=1%26y%3D2", {}),
+                   ("/cached/hello?x=1&y=2", {}),
+                   ("/cached/hello", {"Accept-Language": "ro|en"}),
+                   ("/cached/hello", {"Accept-Language": "ro", "Accept": "en"})])
+
+        self.assertEqual(4, len(keys))
+
+    def test_cache_bypassed(self):
+        '''This test case ensures unsafe requests and uncacheable responses are not cached.'''
+
+        for method in ["POST", "GET"]:
+            say_hello = self._build_controller(Response(b"Hello world.", status=404 if method == "GET" else 200))
+
+            say_hello(self._build_request(method=method))
+            say_hello(self._build_request(method=method))
+
+        response = Response(b"Hello world.")
+        response.set_cookie("session", "123")
+
+        say_hello = self._build_controller(response)
+
+        say_hello(self._build_request())
+        say_hello(self._build_request())
+
+        self.assertEqual(6, len(self._invocations))
+
+    def test_model_write_invalidates(self):
+        '''This test case ensures cached responses are discarded once a model they depend on is changed.'''
+
+        say_hello = self._build_controller(tags=["custom"])
+
+        self.assertEqual(["custom", model_tag("fantastico.mvc.tests.test_controller_decorator.Model1")],
+                         say_hello.orig_fn.cache_policy.tags)
+
+        say_hello(self._build_request())
+        say_hello(self._build_request())
+
+        self._caches.invalidate(model_tag("fantastico.mvc.tests.test_controller_decorator.Model1"))
+
+        say_hello(self._build_request())
+        say_hello(self._build_request())
+
+        self._caches.invalidate("custom")
+
+        say_hello(self._build_request())
+
+        self.assertEqual(3, len(self._invocations))
+
+    def test_custom_key(self):
+        '''This test case ensures a custom key function replaces path and query string in cache key.'''
+
+        say_hello = self._build_controller(key=lambda request, url_params: request.GET.get("id"))
+
+        say_hello(self._build_request("/cached/hello?id=1&ts=1"))
+        say_hello(self._build_request("/cached/hello?id=1&ts=2"))
+
+        self.assertEqual(1, len(self._invocations))
+
+    def test_write_during_rendering(self):
+        '''This test case ensures a response rendered while a model it depends on is changed is not served after the write.'''
+
+        tag = model_tag("fantastico.mvc.tests.test_controller_decorator.Model1")
+        response = Response(b"Hello world.", content_type="text/plain")
+
+        @controller_decorators.Controller(url="/cached/hello", method="GET", conn_manager=self._conn_manager,
+                                          models={"Model1": "fantastico.mvc.tests.test_controller_decorator.Model1"},
+                                          model_facade=Mock())
+        @Cached(ttl=60, caches=self._caches)
+        def say_hello(request):
+            self._invocations.append(request)
+
+            if len(self._invocations) == 1:
+                self._caches.invalidate(tag)
+
+            return response
+
+        say_hello(self._build_request())
+        say_hello(self._build_request())
+        say_hello(self._build_request())
+
+        self.assertEqual(2, len(self._invocations))
@@ -0,0 +1,136 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.mvc.tests.test_conditional_decorator
+'''
+from fantastico.mvc import controller_decorators
+from fantastico.mvc.cache_decorator import Cached
+from fantastico.mvc.conditional_decorator import ConditionalGet
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.cache_backends import CacheRegistry
+from fantastico.utils.lru_cache import LruCache
+from mock import Mock
+from webob.request import Request
+from webob.response import Response
+import datetime
+
+class ConditionalGetTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for controller conditional requests decorator.'''
+
+    @classmethod
+    def setup_once(cls):
+        '''We rebind original Controller decorator to its module.'''
+
+        super(ConditionalGetTests, cls).setup_once()
+
+        controller_decorators.Controller = cls._old_controller_decorator
+
+    def init(self):
+        '''This method prepares the dependencies of a conditional controller.'''
+
+        self._conn_manager = Mock()
+        self._invocations = []
+        self._registered_routes = list(controller_decorators.Controller.get_registered_routes())
+
+    def cleanup(self):
+        '''This method unregisters the controllers created by test cases.'''
+
+        controller_decorators.Controller.get_registered_routes()[:] = self._registered_routes
+
+    def _build_controller(self, *decorators):
+        '''This method builds a controller decorated with the given decorators which counts its invocations.'''
+
+        def get_item(request, item_id):
+            self._invocations.append(item_id)
+
+            return Response(b"Item %s." % item_id.encode(), content_type="text/plain")
+
+        for decorator in reversed(decorators):
+            get_item = decorator(get_item)
+
+        return controller_decorators.Controller(url="/items/(?P<item_id>\\d+)$", method="GET",
+                                                conn_manager=self._conn_manager)(get_item)
+
+    def _build_request(self, method="GET", headers=None):
+        '''This method builds a request which passes security validation.'''
+
+        request = Request.blank("/items/1", method=method, headers=headers or {})
+        request.request_id = 1
+        request.context = Mock()
+        request.context.security.validate_context = Mock(return_value=True)
+
+        return request
+
+    def test_not_modified(self):
+        '''This test case ensures a 304 is returned without executing the controller when the client etag matches.'''
+
+        get_item = self._build_controller(ConditionalGet(etag=lambda request, url_params: "item-%s" % url_params["item_id"]))
+
+        response = get_item(self._build_request(headers={"If-None-Match": '"item-1"'}), item_id="1")
+
+        self.assertEqual(304, response.status_int)
+        self.assertEqual('"item-1"', response.headers["ETag"])
+        self.assertEqual([], self._invocations)
+        self.assertEqual(0, self._conn_manager.get_connection.call_count)
+
+        response = get_item(self._build_request(headers={"If-None-Match": '"item-0"'}), item_id="1")
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(b"Item 1.", response.body)
+        self.assertEqual('"item-1"', response.headers["ETag"])
+        self.assertEqual(["1"], self._invocations)
+
+    def test_last_modified(self):
+        '''This test case ensures last modified validator is honoured and set on rendered responses.'''
+
+        last_modified = datetime.datetime(2013, 11, 15, 12, 45, 26, tzinfo=datetime.timezone.utc)
+
+        get_item = self._build_controller(ConditionalGet(last_modified=lambda request, url_params: last_modified))
+
+        response = get_item(self._build_request(headers={"If-Modified-Since": "Fri, 15 Nov 2013 12:45:26 GMT"}), item_id="1")
+
+        self.assertEqual(304, response.status_int)
+
+        response = get_item(self._build_request(), item_id="1")
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(last_modified, response.last_modified)
+
+    def test_unsafe_methods(self):
+        '''This test case ensures validators are not computed for unsafe requests.'''
+
+        etag = Mock(return_value="item-1")
+
+        get_item = self._build_controller(ConditionalGet(etag=etag))
+
+        response = get_item(self._build_request(method="POST", headers={"If-None-Match": '"item-1"'}), item_id="1")
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(0, etag.call_count)
+
+    def test_compose_cached(self):
+        '''This test case ensures conditional requests are evaluated before cached responses lookup.'''
+
+        caches = CacheRegistry(settings_facade=Mock())
+        caches.get_backend = Mock(return_value=LruCache())
+
+        get_item = self._build_controller(ConditionalGet(etag=lambda request, url_params: "item-1"),
+                                          Cached(caches=caches))
+
+        self.assertEqual(200, get_item(self._build_request(), item_id="1").status_int)
+        self.assertEqual('"item-1"', get_item(self._build_request(), item_id="1").headers["ETag"])
+        self.assertEqual(304, get_item(self._build_request(headers={"If-None-Match": '"item-1"'}), item_id="1").status_int)
+        self.assertEqual(["1"], self._invocations)
@@ -145,6 +145,20 @@ class ControllerDecoratorTests(FantasticoUnitTestsCase):
         with self.assertRaises(FantasticoControllerInvalidError):
             do_stuff()
 
+    def test_controller_admission_limits(self):
+        '''This test case ensures admission limits declared on a controller are exposed on the registered handler.'''
+
+        @controller_decorators.Controller(url="/simple/report", method="GET", max_concurrency=4, queue_timeout=0.2)
+        def report(request):
+            pass
+
+        @controller_decorators.Controller(url="/simple/unlimited", method="GET")
+        def unlimited(request):
+            pass
+
+        self.assertEqual({"max_concurrency": 4, "queue_timeout": 0.2}, report.admission)
+        self.assertEqual({"max_concurrency": None, "queue_timeout": None}, unlimited.admission)
+
     def test_controller_invalid_method(self):
         '''This test case ensures an empty method given for a controller raises a fantastico error.'''
 
@@ -107,3 +107,28 @@ class DbSessionManagerTests(FantasticoUnitTestsCase):
 
         self._db_manager.close_connection(request_id)
         self.assertEqual(1, self._session.remove.call_count)
+
+    def test_open_pool_ok(self):
+        '''This test case ensures open pool creates the engine once and returns opened connections to the pool.'''
+
+        conns = [Mock(), Mock()]
+
+        engine = Mock()
+        engine.connect = Mock(side_effect=conns)
+        self._create_engine_fn.return_value = engine
+
+        self._db_manager.open_pool(2)
+        self._db_manager.get_connection(1)
+
+        self.assertEqual(1, self._create_engine_fn.call_count)
+        self.assertEqual(2, engine.connect.call_count)
+
+        for conn in conns:
+            conn.close.assert_called_once_with()
+
+    def test_open_pool_error(self):
+        '''This test case ensures database errors raised while opening the pool are converted to fantastico db errors.'''
+
+        self._create_engine_fn.return_value.connect = Mock(side_effect=Exception("Unexpected error"))
+
+        self.assertRaises(FantasticoDbError, self._db_manager.open_pool)
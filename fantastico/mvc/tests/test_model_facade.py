@@ -16,13 +16,14 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
 .. py:module:: fantastico.mvc.tests.test_model_facade
 '''
-from fantastico.exceptions import FantasticoIncompatibleClassError, FantasticoDbError, FantasticoDbNotFoundError
-from fantastico.mvc import BASEMODEL
+from fantastico.exceptions import FantasticoIncompatibleClassError, FantasticoDbError, FantasticoDbNotFoundError, \
+    FantasticoDbConflictError
+from fantastico.mvc import BASEMODEL, model_facade
 from fantastico.mvc.model_facade import ModelFacade
 from fantastico.mvc.models.model_filter import ModelFilter
 from fantastico.mvc.models.model_sort import ModelSort
 from fantastico.tests.base_case import FantasticoUnitTestsCase
-from mock import Mock
+from mock import Mock, patch
 from sqlalchemy.schema import Column
 from sqlalchemy.types import Integer, String
 
@@ -204,6 +205,63 @@ class ModelFacadeTests(FantasticoUnitTestsCase):
         
         self.assertFalse(self._rollbacked)
 
+    def test_conditional_writes(self):
+        '''This test case ensures update and delete with expected values run a single conditional statement and raise a
+        conflict error (rolling back the session) when no row is affected.'''
+
+        model = PersonModelTest(first_name="John", last_name="Doe")
+        model.id = 1
+
+        self._session.query = Mock(return_value=self._session)
+        self._session.filter = Mock(return_value=self._session)
+        self._session.update = Mock(return_value=1)
+        self._session.delete = Mock(return_value=1)
+
+        self._facade.update(model, expected_values={PersonModelTest.last_name: "Doe"})
+        self._facade.delete(model, expected_values={PersonModelTest.last_name: "Doe"})
+
+        self._session.update.assert_called_once_with({"id": 1, "first_name": "John", "last_name": "Doe"},
+                                                     synchronize_session=False)
+        self._session.delete.assert_called_once_with(synchronize_session=False)
+        self.assertEqual(4, self._session.filter.call_count)
+        self.assertEqual(2, self._session.commit.call_count)
+        self.assertFalse(self._session.merge.called)
+        self.assertFalse(self._session.all.called)
+
+        self._session.update.return_value = 0
+        self._session.delete.return_value = 0
+
+        with self.assertRaises(FantasticoDbConflictError):
+            self._facade.update(model, expected_values={PersonModelTest.last_name: "Doe"})
+
+        with self.assertRaises(FantasticoDbConflictError):
+            self._facade.delete(model, expected_values={PersonModelTest.last_name: "Doe"})
+
+        self.assertEqual(2, self._session.rollback.call_count)
+        self.assertEqual(2, self._session.commit.call_count)
+
+    def test_invalidation_failure_not_rollbacked(self):
+        '''This test case ensures cache invalidation failures do not rollback (or fail) writes which were committed.'''
+
+        model = PersonModelTest(first_name="John", last_name="Doe")
+        model.id = 1
+
+        self._session.rollback = Mock()
+        self._session.query = Mock(return_value=self._session)
+        self._session.filter = Mock(return_value=self._session)
+        self._session.all = Mock(return_value=[model])
+
+        with patch.object(model_facade, "CACHES") as caches:
+            caches.invalidate = Mock(side_effect=Exception("Cache backend not available."))
+
+            self.assertEqual([1], self._facade.create(model))
+            self._facade.update(model)
+            self._facade.delete(model)
+
+        self.assertEqual(3, caches.invalidate.call_count)
+        self.assertEqual(3, self._session.commit.call_count)
+        self._session.rollback.assert_not_called()
+
     def test_delete_exception_unhandled(self):
         '''This test case ensures unhandled exceptions are gracefully handled by delete method.'''
         
@@ -373,4 +431,72 @@ class ModelFacadeTests(FantasticoUnitTestsCase):
         with self.assertRaises(FantasticoDbError):
             self._facade.count_records(self._model_filter)
 
-        self.assertTrue(self._rollbacked)        
\ No newline at end of file
+        self.assertTrue(self._rollbacked)        
+    def test_find_row_version_ok(self):
+        '''This test case ensures only the version column of the matching row is selected.'''
+
+        self._session.query = Mock(return_value=self._session)
+        self._session.filter = Mock(return_value=self._session)
+        self._session.first = Mock(return_value=(7,))
+
+        self.assertEqual(7, self._facade.find_row_version({PersonModelTest.id: 1}, PersonModelTest.last_name))
+
+        self._session.query.assert_called_once_with(PersonModelTest.last_name)
+        self.assertEqual(1, self._session.filter.call_count)
+
+    def test_find_row_version_notfound(self):
+        '''This test case ensures find row version returns None when no row matches.'''
+
+        self._model_filter = ModelFilter(PersonModelTest.first_name, "John", ModelFilter.EQ)
+
+        self._session.query = Mock(return_value=self._session)
+        self._session.filter = Mock(return_value=self._session)
+        self._session.first = Mock(return_value=None)
+
+        self.assertIsNone(self._facade.find_row_version({PersonModelTest.id: 1}, PersonModelTest.last_name,
+                                                        filter_expr=self._model_filter))
+
+        self.assertEqual(2, self._session.filter.call_count)
+
+    def test_aggregate_version_ok(self):
+        '''This test case ensures max version, records count and versions sum of a numeric version column are computed in a
+        single query.'''
+
+        self._model_filter = ModelFilter(PersonModelTest.id, 1, ModelFilter.GT)
+
+        self._session.query = Mock(return_value=self._session)
+        self._session.select_from = Mock(return_value=self._session)
+        self._session.filter = Mock(return_value=self._session)
+        self._session.one = Mock(return_value=(7, 20, 95))
+
+        self.assertEqual((7, 20, 95), self._facade.aggregate_version(PersonModelTest.id, filter_expr=self._model_filter))
+
+        self.assertEqual(3, len(self._session.query.call_args[0]))
+        self._session.select_from.assert_called_once_with(PersonModelTest)
+        self.assertEqual(1, self._session.filter.call_count)
+        self.assertEqual(1, self._session.one.call_count)
+
+    def test_aggregate_version_not_numeric(self):
+        '''This test case ensures versions sum is not computed for non numeric version columns (e.g timestamps).'''
+
+        self._session.query = Mock(return_value=self._session)
+        self._session.select_from = Mock(return_value=self._session)
+        self._session.one = Mock(return_value=("john", 20))
+
+        self.assertEqual(("john", 20, None), self._facade.aggregate_version(PersonModelTest.first_name))
+
+        self.assertEqual(2, len(self._session.query.call_args[0]))
+
+    def test_aggregate_version_unhandled_exception(self):
+        '''This test case ensures aggregate version gracefully handles unexpected exceptions.'''
+
+        def rollback():
+            self._rollbacked = True
+
+        self._session.query = Mock(side_effect=Exception("Unhandled exception"))
+        self._session.rollback = rollback
+
+        with self.assertRaises(FantasticoDbError):
+            self._facade.aggregate_version(PersonModelTest.id)
+
+        self.assertTrue(self._rollbacked)
@@ -17,11 +17,18 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.mvc.tests.test_static_assets_controller
 '''
 
-from fantastico.mvc.static_assets_controller import StaticAssetsController
+from fantastico.mvc.static_assets_controller import StaticAssetsController, HotFilesCache, guess_content_type, \
+    is_fingerprinted
 from fantastico.tests.base_case import FantasticoUnitTestsCase
 from mock import Mock
 from sqlalchemy.exc import NotSupportedError
 from fantastico.settings import BasicSettings
+from webob.datetime_utils import serialize_date
+import gzip
+import os
+import shutil
+import stat
+import tempfile
 
 class StaticAssetsControllerTests(FantasticoUnitTestsCase):
     '''This class provides the test suite for checking static assets are correctly handled by static controller.'''
@@ -29,8 +36,14 @@ class StaticAssetsControllerTests(FantasticoUnitTestsCase):
     def init(self):
         self._settings_facade = Mock()
         self._settings_facade.get_config = Mock(return_value=TestProfileNotUsed())
-        self._assets_contr = StaticAssetsController(self._settings_facade)
+        self._settings_facade.get = Mock(return_value=None)
+        self._assets_contr = StaticAssetsController(self._settings_facade, hot_files=HotFilesCache(max_files=0))
         self._os_provider = Mock()
+        self._assets_folder = None
+
+    def cleanup(self):
+        if self._assets_folder:
+            shutil.rmtree(self._assets_folder)
         
     def test_serve_asset_no_component(self):
         '''This test case makes sure serve asset returns bad request if no component name is provided.'''
@@ -164,27 +177,211 @@ class StaticAssetsControllerTests(FantasticoUnitTestsCase):
         self.assertTrue(response.content_type in ["image/vnd.microsoft.icon", "image/x-icon"])
         self.assertEqual(0, len(response.app_iter))        
     
+    def test_serve_asset_invalid_path(self):
+        '''This test case ensures assets located outside of component static folder can not be requested.'''
+
+        response = self._assets_contr.serve_asset(Mock(), "component1", "../../settings.py")
+
+        self.assertEqual(400, response.status_code)
+
+    def test_serve_asset_validators(self):
+        '''This test case ensures assets are sent with validators and not modified assets receive 304 responses.'''
+
+        component_name = self._create_asset("app.css", b"body {}")
+        file_stat = os.stat("%s/static/app.css" % self._assets_folder)
+        etag = '"%x-%x"' % (int(file_stat.st_mtime), file_stat.st_size)
+
+        response = self._serve(component_name, "app.css")
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("text/css", response.content_type)
+        self.assertEqual(b"body {}", b"".join(response.app_iter))
+        self.assertEqual(etag, response.headers["ETag"])
+        self.assertEqual(serialize_date(int(file_stat.st_mtime)), response.headers["Last-Modified"])
+        self.assertEqual("no-cache", response.headers["Cache-Control"])
+
+        for headers in [{"HTTP_IF_NONE_MATCH": etag}, {"HTTP_IF_MODIFIED_SINCE": response.headers["Last-Modified"]}]:
+            response = self._serve(component_name, "app.css", **headers)
+
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(b"", b"".join(response.app_iter))
+
+        self.assertEqual(200, self._serve(component_name, "app.css", HTTP_IF_NONE_MATCH='"abc"').status_code)
+
+    def test_serve_asset_cache_control(self):
+        '''This test case ensures fingerprinted assets are cached forever while other assets are cached for max age seconds.'''
+
+        component_name = self._create_asset("app.3f2a9c1b0d.css", b"body {}")
+        self._create_asset("app.css", b"body {}")
+
+        config = {"max_age": 3600, "fingerprinted_max_age": 31536000}
+
+        self.assertEqual("public, max-age=31536000, immutable",
+                         self._serve(component_name, "app.3f2a9c1b0d.css", config).headers["Cache-Control"])
+        self.assertEqual("public, max-age=3600", self._serve(component_name, "app.css", config).headers["Cache-Control"])
+
+    def test_serve_asset_ranges(self):
+        '''This test case ensures single byte ranges are served from memory mapped files and from disk.'''
+
+        component_name = self._create_asset("movie.mp4", b"0123456789")
+        etag = self._serve(component_name, "movie.mp4").headers["ETag"]
+
+        for hot_files in [HotFilesCache(max_files=0), HotFilesCache()]:
+            self._assets_contr = StaticAssetsController(self._settings_facade, hot_files=hot_files)
+
+            for range_header, content_range, body in [("bytes=2-4", "bytes 2-4/10", b"234"),
+                                                      ("bytes=7-", "bytes 7-9/10", b"789"),
+                                                      ("bytes=-3", "bytes 7-9/10", b"789"),
+                                                      ("bytes=8-100", "bytes 8-9/10", b"89")]:
+                response = self._serve(component_name, "movie.mp4", HTTP_RANGE=range_header)
+
+                self.assertEqual(206, response.status_code)
+                self.assertEqual(content_range, response.headers["Content-Range"])
+                self.assertEqual(len(body), response.content_length)
+                self.assertEqual(body, b"".join(response.app_iter))
+
+            response = self._serve(component_name, "movie.mp4", HTTP_RANGE="bytes=10-")
+
+            self.assertEqual(416, response.status_code)
+            self.assertEqual("bytes */10", response.headers["Content-Range"])
+
+            response = self._serve(component_name, "movie.mp4", HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE='"abc"')
+
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(b"0123456789", b"".join(response.app_iter))
+
+            response = self._serve(component_name, "movie.mp4", HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE=etag)
+
+            self.assertEqual(206, response.status_code)
+
+    def test_serve_asset_precompressed(self):
+        '''This test case ensures gzip siblings of assets are sent only to clients which accept gzip.'''
+
+        content = b"function hello() {}"
+
+        component_name = self._create_asset("app.js", content)
+        self._create_asset("app.js.gz", gzip.compress(content))
+        self._create_asset("app.css", b"body {}")
+
+        config = {"precompressed": True}
+
+        response = self._serve(component_name, "app.js", config, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", response.headers["Vary"])
+        self.assertIn("javascript", response.content_type)
+        self.assertEqual(content, gzip.decompress(b"".join(response.app_iter)))
+
+        for headers in [{}, {"HTTP_ACCEPT_ENCODING": "deflate"}, {"HTTP_ACCEPT_ENCODING": "gzip;q=0"}]:
+            response = self._serve(component_name, "app.js", config, **headers)
+
+            self.assertNotIn("Content-Encoding", response.headers)
+            self.assertEqual(content, b"".join(response.app_iter))
+
+        response = self._serve(component_name, "app.css", config, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(b"body {}", b"".join(response.app_iter))
+
+    def test_serve_asset_xaccel_redirect(self):
+        '''This test case ensures asset transfer is delegated to nginx when x accel redirect location is configured.'''
+
+        response = self._serve("component1", "images/image.png", {"x_accel_redirect": "/_static/", "max_age": 60})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("image/png", response.content_type)
+        self.assertEqual("/_static/component1/static/images/image.png", response.headers["X-Accel-Redirect"])
+        self.assertEqual("public, max-age=60", response.headers["Cache-Control"])
+        self.assertEqual(b"", response.body)
+
+    def test_hot_files_cache(self):
+        '''This test case ensures hot files are mapped only once and they are mapped again when they change on disk.'''
+
+        self._create_asset("app.css", b"body {}")
+
+        file_path = "%s/static/app.css" % self._assets_folder
+        hot_files = HotFilesCache(max_files=2, max_file_size=8)
+
+        content = hot_files.get(file_path, os.stat(file_path))
+
+        self.assertEqual(b"body {}", content[:])
+        self.assertIs(content, hot_files.get(file_path, os.stat(file_path)))
+
+        self._create_asset("app.css", b"a {}")
+
+        self.assertEqual(b"a {}", hot_files.get(file_path, os.stat(file_path))[:])
+
+        self.assertTrue(hot_files.accepts(8))
+        self.assertFalse(hot_files.accepts(9))
+        self.assertFalse(hot_files.accepts(0))
+        self.assertFalse(HotFilesCache(max_files=0).accepts(8))
+
+    def test_content_type_helpers(self):
+        '''This test case ensures content types are guessed by extension and fingerprinted names are detected.'''
+
+        self.assertEqual("text/css", guess_content_type("/static/APP.CSS"))
+        self.assertEqual("image/png", guess_content_type("/static/logo.png"))
+        self.assertEqual("application/octet-stream", guess_content_type("/static/file.unknown"))
+
+        self.assertTrue(is_fingerprinted("/static/app.3f2a9c1b0d.css"))
+        self.assertFalse(is_fingerprinted("/static/app.3f2a9c1b.css"))
+        self.assertFalse(is_fingerprinted("/static/app-3f2a9c1b0d.js"))
+        self.assertFalse(is_fingerprinted("/static/font.3f2a9c1b0d12.woff"))
+        self.assertFalse(is_fingerprinted("/static/jquery.3f2a9c1b0d.min.js"))
+        self.assertFalse(is_fingerprinted("/static/release-2024.deadbeef00/app.js"))
+        self.assertFalse(is_fingerprinted("/static/app.css"))
+        self.assertFalse(is_fingerprinted("/static/jquery.min.js"))
+
     def _mock_os_provider(self, component_name, asset_path, file_exists=True, static_local=True):
         '''This method correctly mocks the os provider based on the component name and asset path.'''
 
         self._os_provider.path = Mock(return_value=self._os_provider)
-        
+
         def exists(filename):
             if static_local:
                 computed_path = "/mvc/tests/%(component_name)s/static/%(asset_path)s" %\
-                                {"component_name": component_name, 
+                                {"component_name": component_name,
                                  "asset_path": asset_path}
             else:
                 computed_path = "/mvc/tests/%(component_name)s/%(asset_path)s" %\
-                                {"component_name": component_name, 
-                                 "asset_path": asset_path}                
+                                {"component_name": component_name,
+                                 "asset_path": asset_path}
 
             if filename.endswith(computed_path):
                 return file_exists
-            
+
             raise NotSupportedError()
-            
+
+        def stat_file(filename):
+            if not exists(filename):
+                raise FileNotFoundError(filename)
+
+            return Mock(st_mode=stat.S_IFREG, st_size=11, st_mtime=1380000000)
+
         self._os_provider.path.exists = exists
+        self._os_provider.stat = stat_file
+
+    def _create_asset(self, asset_path, content):
+        '''This method creates a real asset file (and its component) in a temporary folder located near this test module.'''
+
+        if not self._assets_folder:
+            self._assets_folder = tempfile.mkdtemp(dir=os.path.dirname(__file__))
+            os.mkdir("%s/static" % self._assets_folder)
+
+        with open("%s/static/%s" % (self._assets_folder, asset_path), "wb") as asset_file:
+            asset_file.write(content)
+
+        return os.path.basename(self._assets_folder)
+
+    def _serve(self, component_name, asset_path, config=None, **headers):
+        '''This method serves the given asset using the given static assets configuration and request headers.'''
+
+        self._settings_facade.get = Mock(return_value=config)
+
+        request = Mock()
+        request.environ = headers
+
+        return self._assets_contr.serve_asset(request, component_name, asset_path)
 
 class TestProfileNotUsed(BasicSettings):
-    '''This class is used only for correctly mocking a settings profile.'''
\ No newline at end of file
+    '''This class is used only for correctly mocking a settings profile.'''
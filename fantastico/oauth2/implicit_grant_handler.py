@@ -126,9 +126,7 @@ class ImplicitGrantHandler(GrantHandler):
         '''This method ensures the given redirect uri is valid for specified client. If this is not the case a 401 response
         object is returned.'''
 
-        client = self._client_repo.load_client_by_returnurl(redirect_uri)
-
-        if client:
+        if self._client_repo.is_returnurl_registered(redirect_uri):
             return None
 
         msg = "%s redirect_uri is not supported by any registered client." % redirect_uri
@@ -91,7 +91,8 @@ class TokensMiddlewareTests(FantasticoUnitTestsCase):
         start_response = Mock()
         self._middleware(self._environ, start_response, conn_manager=self._conn_manager)
 
-        self.assertTrue(hasattr(self._request.context, "security"))
+        self.assertEqual(0, self._tokens_service.decrypt.call_count)
+        self.assertIsNotNone(self._request.context.security_resolver)
 
         security_ctx = self._request.context.security
         self.assertIsInstance(security_ctx, SecurityContext)
@@ -26,7 +26,11 @@ class OAuth2TokensMiddleware(object):
     is extremely import to configure this middleware to run after
     :py:class:`fantastico.middleware.request_middleware.RequestMiddleware` and after
     :py:class:`fantastico.middleware.model_session_middleware.ModelSessionMiddleware` because
-    it needs a valid request and connection manager saved in the current pipeline execution.'''
+    it needs a valid request and connection manager saved in the current pipeline execution.
+
+    The access token is decrypted and validated only when the security context is first accessed (usually by
+    :py:class:`fantastico.oauth2.oauth2_decorators.RequiredScopes` or by controllers). Routes which do not use the security
+    context do not pay for decrypting the token.'''
 
     TOKEN_QPARAM = "token"
     AUTHORIZATION_FORMAT = "Bearer %s"
@@ -46,14 +50,15 @@ class OAuth2TokensMiddleware(object):
         if not conn_manager.CONN_MANAGER:
             raise FantasticoDbError(msg="OAuth2TokensMiddleware must execute after ModelSessionMiddleware.")
 
-        db_conn = conn_manager.CONN_MANAGER.get_connection(request.request_id)
-
         encrypted_token = request.params.get(self.TOKEN_QPARAM, self._get_token_from_header(request))
         if not encrypted_token:
             request.context.security = SecurityContext(None)
             return self._app(environ, start_response)
 
-        request.context.security = self._build_security_context(encrypted_token, db_conn)
+        conn_manager = conn_manager.CONN_MANAGER
+
+        request.context.security_resolver = lambda: self._build_security_context(
+                                                            encrypted_token, conn_manager.get_connection(request.request_id))
 
         return self._app(environ, start_response)
 
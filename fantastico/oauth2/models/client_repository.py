@@ -16,18 +16,25 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
 .. py:module:: fantastico.oauth2.models.client_repository
 '''
+from fantastico.exceptions import FantasticoDbNotFoundError
 from fantastico.mvc.model_facade import ModelFacade
-from fantastico.mvc.models.model_filter import ModelFilter
 from fantastico.oauth2.models.clients import Client
 from fantastico.oauth2.models.return_urls import ClientReturnUrl
+from fantastico.oauth2.models.return_urls_index import RETURN_URLS_INDEX
+from fantastico.utils.invalidation_bus import INVALIDATION_BUS, client_topic
 
 class ClientRepository(object):
-    '''This class provides data access methods which can be used when working with Client objects.'''
+    '''This class provides data access methods which can be used when working with Client objects. Return urls lookups are
+    served from :py:class:`fantastico.oauth2.models.return_urls_index.ClientReturnUrlsIndex` so that they do not query the
+    database on each request. Client changes are published on
+    :py:data:`fantastico.utils.invalidation_bus.INVALIDATION_BUS` so that all workers discard their cached client data.'''
 
-    def __init__(self, db_conn, model_facade_cls=ModelFacade):
+    def __init__(self, db_conn, model_facade_cls=ModelFacade, urls_index=None, invalidation_bus=None):
         self._db_conn = db_conn
         self._client_facade = model_facade_cls(Client, self._db_conn)
         self._url_facade = model_facade_cls(ClientReturnUrl, self._db_conn)
+        self._urls_index = urls_index or RETURN_URLS_INDEX
+        self._invalidation_bus = invalidation_bus or INVALIDATION_BUS
 
     def load(self, client_id):
         '''This method is used to load a client by primary key.'''
@@ -40,17 +47,29 @@ class ClientRepository(object):
         '''This method load the first available client descriptor which has the specified return url. Please make sure
         return url is decoded before invoking this method or it will not work otherwise.'''
 
-        qmark_pos = return_url.find("?")
-        if qmark_pos == -1:
-            qmark_pos = len(return_url)
+        client_ids = self._urls_index.find_client_ids(return_url, self._url_facade)
 
-        return_url = return_url[:qmark_pos]
+        if not client_ids:
+            return None
+
+        client_id = sorted(client_ids)[0]
 
-        results = self._url_facade.get_records_paged(
-                                    start_record=0, end_record=1,
-                                    filter_expr=ModelFilter(ClientReturnUrl.return_url, return_url, ModelFilter.EQ))
+        try:
+            return self.load(client_id)
+        except FantasticoDbNotFoundError:
+            self._urls_index.invalidate()
+            self.invalidate(client_id)
 
-        if not results:
             return None
 
-        return results[0].client
+    def invalidate(self, client_id):
+        '''This method announces (to all workers) that the given client changed so that cached client data (e.g return urls
+        index) is rebuilt.'''
+
+        self._invalidation_bus.publish(client_topic(client_id))
+
+    def is_returnurl_registered(self, return_url, client_id=None):
+        '''This method returns True if the given return url is registered for any client (or for the given client_id). It does
+        not load the client descriptor so it is the recommended way to validate return urls.'''
+
+        return self._urls_index.is_registered(return_url, self._url_facade, client_id)
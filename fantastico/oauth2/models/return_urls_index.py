@@ -0,0 +1,223 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.oauth2.models.return_urls_index
+'''
+from fantastico.utils.fork_hooks import POST_FORK_HOOKS
+from fantastico.utils.invalidation_bus import INVALIDATION_BUS
+from fantastico.utils.metrics import METRICS
+from urllib.parse import urlsplit
+import posixpath
+import re
+import threading
+import time
+
+class ClientReturnUrlsIndex(object):
+    '''This class provides an in memory index of all registered client return urls. It is used by OAuth2 login and authorize
+    endpoints in order to validate return urls without querying the database on each request. The index is built once per
+    worker from **oauth2_client_returnurls** table and it is rebuilt when it is explicitly invalidated or when it is older
+    than **reload_interval** seconds. The index is also invalidated when clients or return urls change in any worker (see
+    :py:class:`fantastico.utils.invalidation_bus.InvalidationBus`).
+
+    Registered return urls can be matched in two ways:
+
+    * exact match - the return url (without query string and fragment) is identical with the registered one.
+    * prefix match - the registered return url ends with **/\\***. In this case every return url located under the registered
+      path is accepted (e.g **http://app.com/cb/\\*** accepts **http://app.com/cb/login** but not **http://app.com/cbx**).
+      Dot segments are resolved before matching (the way browsers do), so **http://app.com/cb/../admin** is not accepted;
+      return urls which still contain dot segments after normalization never match a prefix.
+
+    .. code-block:: python
+
+        urls_index = ClientReturnUrlsIndex()
+
+        client_ids = urls_index.find_client_ids("/oauth/idp/ui/cb?state=xyz", url_facade)
+        is_valid = urls_index.is_registered("/oauth/idp/ui/cb", url_facade, client_id="my-client")
+    '''
+
+    PREFIX_WILDCARD = "/*"
+    ENCODED_DOT_REGEX = re.compile("%2e", re.IGNORECASE)
+
+    class TrieNode(object):
+        '''This class describes a node from the path segments trie used for prefix matching return urls.'''
+
+        __slots__ = ("children", "client_ids")
+
+        def __init__(self):
+            self.children = {}
+            self.client_ids = set()
+
+    def __init__(self, reload_interval=300, time_provider=time):
+        self._reload_interval = reload_interval
+        self._time_provider = time_provider
+        self._reload_lock = threading.Lock()
+        self._loaded_at = None
+
+        self._exact_urls = {}
+        self._prefix_trie = ClientReturnUrlsIndex.TrieNode()
+
+    @property
+    def loaded(self):
+        '''This property returns True if the index holds a fresh copy of the registered return urls.'''
+
+        if self._loaded_at is None:
+            return False
+
+        return self._time_provider.time() - self._loaded_at < self._reload_interval
+
+    def invalidate(self):
+        '''This method marks the current index as stale. Next lookup will rebuild the index from database.'''
+
+        self._loaded_at = None
+
+    def reset(self):
+        '''This method discards the index and its reload lock. It is invoked in forked workers so that each worker builds its
+        own index.'''
+
+        self._reload_lock = threading.Lock()
+        self._loaded_at = None
+
+        self._exact_urls = {}
+        self._prefix_trie = ClientReturnUrlsIndex.TrieNode()
+
+    def reload(self, url_facade):
+        '''This method rebuilds the index from the database using the given client return urls model facade. The new
+        structures are built aside and swapped at the end so that concurrent lookups never see a partial index.'''
+
+        records = url_facade.get_records_paged(start_record=0, end_record=url_facade.count_records())
+
+        exact_urls = {}
+        prefix_trie = ClientReturnUrlsIndex.TrieNode()
+
+        for record in records:
+            return_url = record.return_url.strip()
+
+            if return_url.endswith(self.PREFIX_WILDCARD):
+                self._add_prefix(prefix_trie, return_url[:-len(self.PREFIX_WILDCARD)], record.client_id)
+                continue
+
+            exact_urls.setdefault(return_url, set()).add(record.client_id)
+
+        self._exact_urls, self._prefix_trie = exact_urls, prefix_trie
+        self._loaded_at = self._time_provider.time()
+
+        METRICS.counter("fantastico_oauth2_returnurls_reloads_total", "Reloads of client return urls index.").inc()
+
+    def find_client_ids(self, return_url, url_facade):
+        '''This method returns a set of client identifiers which registered the given return url. Query string and fragment
+        are ignored. If the index is stale it is rebuilt using the given model facade.'''
+
+        self._ensure_loaded(url_facade)
+
+        return_url = self._get_base_url(return_url)
+
+        client_ids = set(self._exact_urls.get(return_url, ()))
+
+        return_url = self._get_normalized_url(return_url)
+
+        if return_url is None:
+            return client_ids
+
+        node = self._prefix_trie
+        segments = return_url.split("/")
+
+        for idx, segment in enumerate(segments):
+            node = node.children.get(segment)
+
+            if not node:
+                break
+
+            if node.client_ids and idx < len(segments) - 1:
+                client_ids.update(node.client_ids)
+
+        return client_ids
+
+    def is_registered(self, return_url, url_facade, client_id=None):
+        '''This method returns True if the given return url is registered. When client_id is specified, the return url must
+        be registered for that client.'''
+
+        client_ids = self.find_client_ids(return_url, url_facade)
+
+        if client_id is None:
+            return len(client_ids) > 0
+
+        return client_id in client_ids
+
+    def _ensure_loaded(self, url_facade):
+        '''This method rebuilds the index if it is stale. Only one thread rebuilds the index; the others reuse the previous
+        index if it exists or wait for the rebuild to finish.'''
+
+        if self.loaded:
+            return
+
+        if not self._reload_lock.acquire(blocking=self._loaded_at is None):
+            return
+
+        try:
+            if not self.loaded:
+                self.reload(url_facade)
+        finally:
+            self._reload_lock.release()
+
+    def _add_prefix(self, prefix_trie, prefix, client_id):
+        '''This method adds the given path prefix into the segments trie.'''
+
+        node = prefix_trie
+
+        for segment in prefix.split("/"):
+            node = node.children.setdefault(segment, ClientReturnUrlsIndex.TrieNode())
+
+        node.client_ids.add(client_id)
+
+    def _get_base_url(self, return_url):
+        '''This method strips query string and fragment from the given return url.'''
+
+        for separator in ("?", "#"):
+            sep_pos = return_url.find(separator)
+
+            if sep_pos > -1:
+                return_url = return_url[:sep_pos]
+
+        return return_url
+
+    def _get_normalized_url(self, return_url):
+        '''This method resolves the dot segments (including percent encoded ones) from the path of the given return url. It
+        returns None if the normalized path still contains dot segments.'''
+
+        path = urlsplit(return_url).path
+        origin = return_url[:len(return_url) - len(path)]
+
+        path = self.ENCODED_DOT_REGEX.sub(".", path.replace("\\", "/"))
+
+        if not path:
+            return return_url
+
+        normalized_path = posixpath.normpath(path)
+
+        if path.endswith("/") and not normalized_path.endswith("/"):
+            normalized_path += "/"
+
+        if any(segment in (".", "..") for segment in normalized_path.split("/")):
+            return None
+
+        return origin + normalized_path
+
+RETURN_URLS_INDEX = ClientReturnUrlsIndex()
+
+POST_FORK_HOOKS.register(RETURN_URLS_INDEX.reset)
+
+for _topic in ("client:*", "table:oauth2_clients", "table:oauth2_client_returnurls"):
+    INVALIDATION_BUS.subscribe(_topic, RETURN_URLS_INDEX.invalidate)
@@ -17,8 +17,6 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.oauth2.models.tests.test_client_repository
 '''
 from fantastico.exceptions import FantasticoDbNotFoundError
-from fantastico.mvc.models.model_filter import ModelFilter
-from fantastico.mvc.models.model_filter_compound import ModelFilterAnd
 from fantastico.oauth2.models.client_repository import ClientRepository
 from fantastico.oauth2.models.clients import Client
 from fantastico.oauth2.models.return_urls import ClientReturnUrl
@@ -32,6 +30,7 @@ class ClientRepositoryTests(FantasticoUnitTestsCase):
     _repo = None
     _client_facade = None
     _url_facade = None
+    _urls_index = None
 
     def init(self):
         '''This method is invoked automatically in order to set common dependencies for all test cases.'''
@@ -39,8 +38,12 @@ class ClientRepositoryTests(FantasticoUnitTestsCase):
         self._client_facade = Mock()
         self._url_facade = Mock()
 
+        self._urls_index = Mock()
+        self._invalidation_bus = Mock()
+
         self._db_conn = Mock()
-        self._repo = ClientRepository(self._db_conn, model_facade_cls=self._get_facade_instance)
+        self._repo = ClientRepository(self._db_conn, model_facade_cls=self._get_facade_instance, urls_index=self._urls_index,
+                                      invalidation_bus=self._invalidation_bus)
 
     def _get_facade_instance(self, facade_cls, db_conn):
         '''This method builds a model facade based on given facade cls.'''
@@ -84,41 +87,45 @@ class ClientRepositoryTests(FantasticoUnitTestsCase):
     def test_load_clienturl_ok(self):
         '''This test case ensures client return urls can be loaded correctly using client repository.'''
 
-        return_url = "/abcd"
+        return_url = "/abcd?q=1#x=a"
+        client = Client(client_id="abc")
+
+        self._urls_index.find_client_ids = Mock(return_value={"abc"})
+        self._client_facade.find_by_pk = Mock(return_value=client)
 
-        self._test_load_clienturl_template(return_url)
+        result = self._repo.load_client_by_returnurl(return_url)
 
-    def test_load_clienturl_withqparams(self):
-        '''This test case ensures only base url (without query parameters) is used for loading the client.'''
+        self.assertEqual(client, result)
 
-        return_url = "/abcd?q=1#x=a"
-        base_url = "/abcd"
+        self._urls_index.find_client_ids.assert_called_once_with(return_url, self._url_facade)
+        self._client_facade.find_by_pk.assert_called_once_with({Client.client_id: "abc"})
 
-        self._test_load_clienturl_template(return_url, base_url)
+    def test_load_clienturl_notfound(self):
+        '''This test case ensures None is returned when given return url is not found.'''
 
-    def _test_load_clienturl_template(self, return_url, base_url=None, client_id="abc"):
-        '''This method provides a template for testing load_client_by_returnurl success scenarios.'''
+        self._urls_index.find_client_ids = Mock(return_value=set())
+        self._client_facade.find_by_pk = Mock()
 
-        base_url = base_url or return_url
+        self.assertIsNone(self._repo.load_client_by_returnurl("/abc"))
 
-        client = Client(client_id=client_id)
+        self.assertEqual(0, self._client_facade.find_by_pk.call_count)
 
-        url = ClientReturnUrl()
-        url.client = client
+    def test_load_clienturl_staleindex(self):
+        '''This test case ensures the return urls index is invalidated if it references a client which no longer exists.'''
 
-        self._url_facade.get_records_paged = Mock(return_value=[url])
+        self._urls_index.find_client_ids = Mock(return_value={"abc"})
+        self._client_facade.find_by_pk = Mock(side_effect=FantasticoDbNotFoundError("Client not found."))
 
-        result = self._repo.load_client_by_returnurl(return_url)
+        self.assertIsNone(self._repo.load_client_by_returnurl("/abc"))
 
-        self.assertEqual(client, result)
+        self._urls_index.invalidate.assert_called_once_with()
+        self._invalidation_bus.publish.assert_called_once_with("client:abc")
 
-        self._url_facade.get_records_paged.assert_called_once_with(
-                    start_record=0, end_record=1,
-                    filter_expr=ModelFilter(ClientReturnUrl.return_url, base_url, ModelFilter.EQ))
+    def test_is_returnurl_registered(self):
+        '''This test case ensures return urls validation is delegated to return urls index without loading the client.'''
 
-    def test_load_clienturl_notfound(self):
-        '''This test case ensures None is returned when given return url is not found.'''
+        self._urls_index.is_registered = Mock(return_value=True)
 
-        self._url_facade.get_records_paged = Mock(return_value=[])
+        self.assertTrue(self._repo.is_returnurl_registered("/abc", "client-id"))
 
-        self.assertIsNone(self._repo.load_client_by_returnurl("/abc"))
+        self._urls_index.is_registered.assert_called_once_with("/abc", self._url_facade, "client-id")
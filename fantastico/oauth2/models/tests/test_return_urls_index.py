@@ -0,0 +1,97 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.oauth2.models.tests.test_return_urls_index
+'''
+from fantastico.oauth2.models.return_urls import ClientReturnUrl
+from fantastico.oauth2.models.return_urls_index import ClientReturnUrlsIndex
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+
+class ClientReturnUrlsIndexTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for in memory client return urls index.'''
+
+    _url_facade = None
+    _time_provider = None
+    _index = None
+
+    def init(self):
+        '''This method is invoked automatically in order to set common dependencies for all test cases.'''
+
+        records = [ClientReturnUrl("client1", "/oauth/idp/ui/cb"),
+                   ClientReturnUrl("client2", "http://app.com/cb/*"),
+                   ClientReturnUrl("client3", "/oauth/idp/ui/cb")]
+
+        self._url_facade = Mock()
+        self._url_facade.count_records = Mock(return_value=len(records))
+        self._url_facade.get_records_paged = Mock(return_value=records)
+
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=1000)
+
+        self._index = ClientReturnUrlsIndex(reload_interval=60, time_provider=self._time_provider)
+
+    def test_exact_match_ok(self):
+        '''This test case ensures exact return urls are matched correctly and query string / fragment are ignored.'''
+
+        self.assertEqual({"client1", "client3"}, self._index.find_client_ids("/oauth/idp/ui/cb", self._url_facade))
+        self.assertEqual({"client1", "client3"}, self._index.find_client_ids("/oauth/idp/ui/cb?a=b#c=d", self._url_facade))
+        self.assertEqual(set(), self._index.find_client_ids("/oauth/idp/ui/cb/x", self._url_facade))
+
+        self._url_facade.get_records_paged.assert_called_once_with(start_record=0, end_record=3)
+
+    def test_prefix_match_ok(self):
+        '''This test case ensures prefix registered return urls match only urls located under the registered path.'''
+
+        self.assertTrue(self._index.is_registered("http://app.com/cb/login", self._url_facade, "client2"))
+        self.assertTrue(self._index.is_registered("http://app.com/cb/a/b?x=1", self._url_facade))
+        self.assertFalse(self._index.is_registered("http://app.com/cb", self._url_facade))
+        self.assertFalse(self._index.is_registered("http://app.com/cbx/login", self._url_facade))
+        self.assertFalse(self._index.is_registered("http://app.com/cb/login", self._url_facade, "client1"))
+
+    def test_prefix_match_dot_segments(self):
+        '''This test case ensures dot segments are resolved before prefix matching so they can not escape the registered
+        path.'''
+
+        self.assertTrue(self._index.is_registered("http://app.com/cb/a/../login", self._url_facade, "client2"))
+        self.assertTrue(self._index.is_registered("http://app.com/cb/./login/", self._url_facade, "client2"))
+
+        for return_url in ["http://app.com/cb/../admin", "http://app.com/cb/..", "http://app.com/cb/%2E%2e/admin",
+                           "http://app.com/cb/..\\admin", "http://app.com/cb/a/../../admin?x=/cb/login"]:
+            self.assertFalse(self._index.is_registered(return_url, self._url_facade), return_url)
+
+        self.assertIsNone(self._index._get_normalized_url("cb/../../login")) # pylint: disable=W0212
+
+    def test_reload_when_stale(self):
+        '''This test case ensures the index is rebuilt only when it expires or when it is invalidated.'''
+
+        for _ in range(3):
+            self._index.is_registered("/oauth/idp/ui/cb", self._url_facade)
+
+        self.assertEqual(1, self._url_facade.get_records_paged.call_count)
+
+        self._time_provider.time = Mock(return_value=1060)
+        self._index.is_registered("/oauth/idp/ui/cb", self._url_facade)
+
+        self.assertEqual(2, self._url_facade.get_records_paged.call_count)
+
+        self._index.invalidate()
+        self.assertFalse(self._index.loaded)
+
+        self._index.is_registered("/oauth/idp/ui/cb", self._url_facade)
+
+        self.assertEqual(3, self._url_facade.get_records_paged.call_count)
+        self.assertTrue(self._index.loaded)
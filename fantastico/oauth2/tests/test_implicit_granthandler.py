@@ -180,7 +180,7 @@ class ImplicitGrantHandlerTests(FantasticoUnitTestsCase):
                           "state": "xyz",
                           "scope": "a b c"}
 
-        self._client_repo.load_client_by_returnurl = Mock(return_value=None)
+        self._client_repo.is_returnurl_registered = Mock(return_value=False)
 
         response = self._handler.handle_grant(request)
 
@@ -188,7 +188,7 @@ class ImplicitGrantHandlerTests(FantasticoUnitTestsCase):
         self.assertEqual(401, response.status_code)
         self.assertTrue(response.body.decode().find(redirect_uri) > -1)
 
-        self._client_repo.load_client_by_returnurl.assert_called_once_with(redirect_uri)
+        self._client_repo.is_returnurl_registered.assert_called_once_with(redirect_uri)
 
     def test_error_redirect(self):
         '''This test case ensures a redirect response is sent if the implicit handler request contains error query parameter.
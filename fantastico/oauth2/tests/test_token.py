@@ -43,3 +43,39 @@ class TokenTests(FantasticoUnitTestsCase):
         self.assertEqual(token_desc["user_id"], token.user_id)
         self.assertEqual(token_desc["creation_time"], token.creation_time)
         self.assertEqual(token_desc["expiration_time"], token.expiration_time)
+
+    def test_token_immutable(self):
+        '''This test case ensures tokens can not be changed once built.'''
+
+        token = Token({"client_id": "abcd", "type": "access"})
+
+        def change_token(token):
+            token.client_id = "changed"
+
+        self.assertRaises(AttributeError, change_token, token)
+        self.assertRaises(AttributeError, lambda: token.user_id)
+        self.assertFalse(hasattr(token, "__dict__"))
+
+    def test_token_dictionary_extra(self):
+        '''This test case ensures attributes which are not well known token fields are still available.'''
+
+        token_desc = {"client_id": "abcd",
+                      "scopes": ["scope1", "scope2"],
+                      "encrypted": "xyz"}
+
+        token = Token(token_desc)
+
+        self.assertEqual("xyz", token.encrypted)
+        self.assertEqual(token_desc, token.dictionary)
+
+    def test_token_eq_hash(self):
+        '''This test case ensures tokens built from equal dictionaries are equal and have the same hash code.'''
+
+        token1 = Token({"client_id": "abcd", "scopes": ["scope1"]})
+        token2 = Token({"client_id": "abcd", "scopes": ["scope1"]})
+        token3 = Token({"client_id": "abcd", "scopes": ["scope2"]})
+
+        self.assertEqual(token1, token2)
+        self.assertEqual(hash(token1), hash(token2))
+        self.assertNotEqual(token1, token3)
+        self.assertEqual(1, len({token1, token2}))
@@ -16,8 +16,99 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
 .. py:module:: fantastico.oauth2.token
 '''
-from fantastico.utils.dictionary_object import DictionaryObject
 
-class Token(DictionaryObject):
+class Token(object):
     '''This class provides a token model which can be built from a generic dictionary. All dictionary keys become token
-    members.'''
+    members. Tokens are immutable records: well known token attributes are stored in slots (no per instance dictionary) and
+    the hash code is computed once, when the token is built. This keeps tokens cheap to access on each request and cheap to
+    keep in tokens caches.
+
+    .. code-block:: python
+
+        token = Token({"client_id": "my-client", "type": "access", "scopes": ["user.profile.read"]})
+
+        print(token.client_id)
+        print(token.dictionary)'''
+
+    FIELDS = ("client_id", "type", "user_id", "scopes", "creation_time", "expiration_time")
+
+    __slots__ = FIELDS + ("_extra", "_hash")
+
+    def __init__(self, desc):
+        desc = desc or {}
+        extra = {}
+
+        for key, value in desc.items():
+            if key in Token.FIELDS:
+                object.__setattr__(self, key, value)
+            else:
+                extra[key] = value
+
+        object.__setattr__(self, "_extra", extra or None)
+        object.__setattr__(self, "_hash", hash(Token._freeze(desc)))
+
+    @property
+    def dictionary(self):
+        '''This property returns a dictionary representation of this token. The dictionary is built on each call so it can be
+        safely changed by callers.'''
+
+        result = {}
+
+        for field in Token.FIELDS:
+            try:
+                result[field] = getattr(self, field)
+            except AttributeError:
+                continue
+
+        result.update(self._extra or {})
+
+        return result
+
+    def __getattr__(self, attr_name):
+        '''This method is invoked only for attributes which are not well known token fields.'''
+
+        extra = object.__getattribute__(self, "_extra")
+
+        if extra and attr_name in extra:
+            return extra[attr_name]
+
+        raise AttributeError("Attribute %s is not found." % attr_name)
+
+    def __setattr__(self, attr_name, attr_value):
+        '''Tokens are immutable so this method always raises an exception.'''
+
+        raise AttributeError("Token is immutable so you can not set %s attribute." % attr_name)
+
+    def __eq__(self, obj):
+        '''Two tokens are equal if they are built from equal dictionaries.'''
+
+        if not isinstance(obj, Token):
+            return False
+
+        return self._hash == obj._hash and self.dictionary == obj.dictionary
+
+    def __hash__(self):
+        '''This method returns the precomputed hash code of this token.'''
+
+        return self._hash
+
+    def __reduce__(self):
+        '''Slots based immutable objects must tell pickle how to rebuild them.'''
+
+        return (Token, (self.dictionary,))
+
+    def __repr__(self):
+        return "Token(%s)" % self.dictionary
+
+    @staticmethod
+    def _freeze(value):
+        '''This method converts the given value into a hashable structure (lists become tuples and dictionaries become
+        frozensets of items).'''
+
+        if isinstance(value, dict):
+            return frozenset((key, Token._freeze(item)) for key, item in value.items())
+
+        if isinstance(value, (list, tuple, set)):
+            return tuple(Token._freeze(item) for item in value)
+
+        return value
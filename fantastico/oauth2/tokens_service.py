@@ -20,6 +20,7 @@ from fantastico.oauth2.exceptions import OAuth2InvalidTokenTypeError, OAuth2Erro
 from fantastico.oauth2.models.client_repository import ClientRepository
 from fantastico.oauth2.token_encryption import PublicTokenEncryption, AesTokenEncryption
 from fantastico.oauth2.tokengenerator_factory import TokenGeneratorFactory
+from fantastico.utils.metrics import METRICS
 import base64
 
 class TokensService(object):
@@ -40,6 +41,8 @@ class TokensService(object):
 
         return self._db_conn
 
+    @METRICS.timed("fantastico_oauth2_tokens_seconds", "Time spent in OAuth2 tokens operations.",
+                   {"operation": "generate"})
     def generate(self, token_desc, token_type):
         '''This method generates a concrete token from the given token descriptor. It uses token_type in order to choose the right
         token generator.
@@ -69,6 +72,8 @@ class TokensService(object):
             raise OAuth2InvalidTokenTypeError(token_type, "An exception occured while generating token %s: %s" % \
                                               (token_type, str(ex)))
 
+    @METRICS.timed("fantastico_oauth2_tokens_seconds", "Time spent in OAuth2 tokens operations.",
+                   {"operation": "validate"})
     def validate(self, token):
         '''This method validates a given token object. Internally, a generator is selected to validate the given token based on
         the given token type.
@@ -91,6 +96,8 @@ class TokensService(object):
         except Exception as ex:
             raise OAuth2InvalidTokenTypeError(token.type, "Unable to validate token: %s" % str(ex))
 
+    @METRICS.timed("fantastico_oauth2_tokens_seconds", "Time spent in OAuth2 tokens operations.",
+                   {"operation": "invalidate"})
     def invalidate(self, token):
         '''This method invalidates a given token object. For instance, authorization codes can be invalidated. In order to
         invalidate a token you can use the code snippet below:
@@ -113,6 +120,8 @@ class TokensService(object):
         except Exception as ex:
             raise OAuth2InvalidTokenTypeError(token.type, "Unable to invalidate token: %s" % str(ex))
 
+    @METRICS.timed("fantastico_oauth2_tokens_seconds", "Time spent in OAuth2 tokens operations.",
+                   {"operation": "encrypt"})
     def encrypt(self, token, client_id):
         '''This method encrypts a given token and returns the encrypted string representation. Client id is required in order
         to obtain the encryption keys.'''
@@ -127,6 +136,8 @@ class TokensService(object):
 
         return self._encryptor.encrypt_token(token, token_iv, token_key)
 
+    @METRICS.timed("fantastico_oauth2_tokens_seconds", "Time spent in OAuth2 tokens operations.",
+                   {"operation": "decrypt"})
     def decrypt(self, encrypted_str):
         '''This method decrypts a given string and returns a concrete token object.'''
 
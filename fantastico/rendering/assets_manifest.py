@@ -0,0 +1,113 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.rendering.assets_manifest
+'''
+
+from fantastico.settings import SettingsFacade
+from fantastico.utils import instantiator
+import json
+import os
+import threading
+import time
+
+class AssetsManifest(object):
+    '''This class resolves logical asset names to the fingerprinted urls generated by
+    :py:class:`fantastico.sdk.commands.command_assets.SdkCommandAssets`. Logical names are the urls of assets as served by
+    :py:class:`fantastico.mvc.static_assets_controller.StaticAssetsController` (e.g **blog/static/css/app.css**). Each jinja
+    environment built by fantastico exposes this resolver as **asset_url** global:
+
+    .. code-block:: html
+
+        <link rel="stylesheet" href="{{asset_url('blog/static/css/app.css')}}" />
+
+        <!-- rendered as /blog/static/css/app.3f2a9c1b0d.css -->
+
+    Assets which are not listed in manifest (or all assets if the manifest does not exist) are resolved to their logical
+    urls. The manifest location and the url prefix are taken from **assets_config** setting. The manifest file is checked
+    for changes at most once every **check_interval** seconds (None means the manifest is loaded only once).'''
+
+    def __init__(self, settings_facade=SettingsFacade, os_lib=os, time_provider=time):
+        self._settings_facade_cls = settings_facade
+        self._os_lib = os_lib
+        self._time_provider = time_provider
+        self._lock = threading.Lock()
+
+        self._manifest_file = None
+        self._url_prefix = "/"
+        self._check_interval = None
+        self._mtime = None
+        self._next_check = 0
+        self._assets = {}
+
+    def get_url(self, asset_name):
+        '''This method returns the url of the given logical asset name.'''
+
+        if self._next_check is not None and self._next_check <= self._time_provider.time():
+            self._refresh()
+
+        asset_name = asset_name.lstrip("/")
+
+        return "%s%s" % (self._url_prefix, self._assets.get(asset_name, asset_name))
+
+    def clear(self):
+        '''This method discards the loaded manifest. Next resolved asset loads the manifest again.'''
+
+        with self._lock:
+            self._manifest_file = None
+            self._mtime = None
+            self._next_check = 0
+            self._assets = {}
+
+    def _configure(self):
+        '''This method reads manifest location, url prefix and check interval from **assets_config** setting.'''
+
+        settings_facade = self._settings_facade_cls()
+        config = settings_facade.get("assets_config") or {}
+
+        self._manifest_file = os.path.join(instantiator.get_class_abslocation(settings_facade.get_config().__class__),
+                                           config.get("manifest", "assets_manifest.json"))
+        self._url_prefix = config.get("url_prefix", "/")
+        self._check_interval = config.get("check_interval")
+
+    def _refresh(self):
+        '''This method loads the manifest again if it changed on disk.'''
+
+        with self._lock:
+            if self._next_check is None or self._next_check > self._time_provider.time():
+                return
+
+            if self._manifest_file is None:
+                self._configure()
+
+            try:
+                mtime = self._os_lib.stat(self._manifest_file).st_mtime
+            except OSError:
+                mtime = None
+
+            if mtime != self._mtime:
+                self._assets = self._load_manifest() if mtime is not None else {}
+                self._mtime = mtime
+
+            self._next_check = self._time_provider.time() + self._check_interval if self._check_interval is not None else None
+
+    def _load_manifest(self):
+        '''This method returns the logical names to fingerprinted names mapping stored in manifest.'''
+
+        with open(self._manifest_file, "r") as manifest:
+            return json.load(manifest)
+
+ASSETS_MANIFEST = AssetsManifest()
@@ -0,0 +1,63 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.rendering.bytecode_cache
+'''
+
+from jinja2.bccache import BytecodeCache
+import threading
+
+class InMemoryBytecodeCache(BytecodeCache):
+    '''This class provides a process wide cache for compiled templates. Controllers are instantiated for each request and each
+    controller builds its own jinja environment; sharing compiled templates through this cache avoids compiling the same
+    template on every request. Templates are identified by their absolute file name so the same template is compiled only
+    once no matter the name used for loading it. Changed templates are recompiled automatically because jinja validates
+    the checksum of the template source.'''
+
+    def __init__(self):
+        self._bytecodes = {}
+        self._lock = threading.Lock()
+
+    def get_cache_key(self, name, filename=None):
+        '''This method identifies templates by their absolute file name (or by name if the template is not loaded from a
+        file).'''
+
+        return filename or name
+
+    def load_bytecode(self, bucket):
+        '''This method loads the compiled template into the given bucket (if it was previously compiled).'''
+
+        bytecode = self._bytecodes.get(bucket.key)
+
+        if bytecode is not None:
+            bucket.bytecode_from_string(bytecode)
+
+    def dump_bytecode(self, bucket):
+        '''This method stores the compiled template from the given bucket.'''
+
+        with self._lock:
+            self._bytecodes[bucket.key] = bucket.bytecode_to_string()
+
+    def clear(self):
+        '''This method discards all compiled templates.'''
+
+        with self._lock:
+            self._bytecodes.clear()
+
+    def __len__(self):
+        return len(self._bytecodes)
+
+BYTECODE_CACHE = InMemoryBytecodeCache()
@@ -26,6 +26,7 @@ from jinja2.nodes import Const
 from webob.request import Request
 import json
 from fantastico.utils import instantiator
+from fantastico.utils.metrics import METRICS
 
 class Component(Extension):
     '''In fantastico, components are defined as a collection of classes and scripts grouped together as described in
@@ -184,7 +185,9 @@ class Component(Extension):
         request.cookies = curr_request.cookies
 
         url_invoker = self._url_invoker_cls(curr_request.context.wsgi_app, request.environ)
-        response = url_invoker.invoke_url(url, request.headers)[0]
+
+        with METRICS.timer("fantastico_component_calls_seconds", "Time spent invoking urls internally from components."):
+            response = url_invoker.invoke_url(url, request.headers)[0]
 
         try:
             json_response = None
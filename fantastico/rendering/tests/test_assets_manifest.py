@@ -0,0 +1,96 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.rendering.tests.test_assets_manifest
+'''
+from fantastico.mvc.base_controller import BaseController
+from fantastico.rendering.assets_manifest import AssetsManifest
+from fantastico.settings import BasicSettings
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from jinja2.loaders import DictLoader
+from mock import Mock
+import json
+import os
+import shutil
+import tempfile
+
+class AssetsManifestTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for ensuring logical asset names are resolved to fingerprinted urls.'''
+
+    def init(self):
+        self._folder = tempfile.mkdtemp()
+        self._config = {"manifest": os.path.join(self._folder, "assets_manifest.json"),
+                        "url_prefix": "//cdn/",
+                        "check_interval": 2}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "assets_config" else None
+        settings_facade.get_config = Mock(return_value=BasicSettings())
+
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=1000)
+
+        self._manifest = AssetsManifest(Mock(return_value=settings_facade), time_provider=self._time_provider)
+
+    def cleanup(self):
+        shutil.rmtree(self._folder)
+
+    def _write_manifest(self, assets, mtime):
+        '''This method writes the given assets into manifest file and sets the manifest modification time.'''
+
+        with open(self._config["manifest"], "w") as manifest:
+            json.dump(assets, manifest)
+
+        os.utime(self._config["manifest"], (mtime, mtime))
+
+    def test_get_url(self):
+        '''This test case ensures assets are resolved from manifest and unknown assets are resolved to their logical url.'''
+
+        self._write_manifest({"blog/static/app.css": "blog/static/app.3f2a9c1b0d.css"}, 100)
+
+        self.assertEqual("//cdn/blog/static/app.3f2a9c1b0d.css", self._manifest.get_url("/blog/static/app.css"))
+        self.assertEqual("//cdn/blog/static/app.js", self._manifest.get_url("blog/static/app.js"))
+
+    def test_manifest_reload(self):
+        '''This test case ensures the manifest is reloaded when it changes, at most once every check interval.'''
+
+        self.assertEqual("//cdn/blog/static/app.css", self._manifest.get_url("blog/static/app.css"))
+
+        self._write_manifest({"blog/static/app.css": "blog/static/app.3f2a9c1b0d.css"}, 100)
+
+        self.assertEqual("//cdn/blog/static/app.css", self._manifest.get_url("blog/static/app.css"))
+
+        self._time_provider.time.return_value = 1002
+
+        self.assertEqual("//cdn/blog/static/app.3f2a9c1b0d.css", self._manifest.get_url("blog/static/app.css"))
+
+        self._write_manifest({"blog/static/app.css": "blog/static/app.0000000000.css"}, 200)
+        self._config["check_interval"] = None
+        self._manifest.clear()
+
+        self.assertEqual("//cdn/blog/static/app.0000000000.css", self._manifest.get_url("blog/static/app.css"))
+
+        self._write_manifest({}, 300)
+        self._time_provider.time.return_value = 2000
+
+        self.assertEqual("//cdn/blog/static/app.0000000000.css", self._manifest.get_url("blog/static/app.css"))
+
+    def test_templates_asset_url(self):
+        '''This test case ensures asset_url global is available in templates rendered by fantastico.'''
+
+        tpl_env = BaseController.build_templates_env(DictLoader({"page.html": "{{asset_url('blog/static/app.css')}}"}), {})
+
+        self.assertEqual("/blog/static/app.css", tpl_env.get_template("page.html").render())
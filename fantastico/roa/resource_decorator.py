@@ -55,6 +55,27 @@ class Resource(object):
 
     If you do not define a user_id property for user dependent resources a runtime exception is raised. In order to find out more
     about OAuth2 authorization implemented into fantastico please read: :doc:`/features/oauth2`.
+
+    Resources can also declare a version column (a version counter or a last update timestamp). When declared, ROA api answers
+    conditional requests (**If-None-Match** / **If-Match**) without loading and rendering the resources:
+
+    .. code-block:: python
+
+        @Resource(name="app-setting", url="/app-settings", version_column="updated_at")
+        class AppSetting(BASEMODEL):
+            id = Column("id", Integer, primary_key=True, autoincrement=True)
+            name = Column("name", String(50), unique=True, nullable=False)
+            value = Column("value", Text, nullable=False)
+            updated_at = Column("updated_at", DateTime, default=datetime.now, onupdate=datetime.now)
+
+    Resources which are not user dependent can be micro cached by nginx for **cache_ttl** seconds. Only anonymous **GET**
+    requests are served from nginx cache; requests carrying an **Authorization** header always reach Fantastico:
+
+    .. code-block:: python
+
+        @Resource(name="app-setting", url="/app-settings", cache_ttl=5)
+        class AppSetting(BASEMODEL):
+            pass
     '''
 
     @property
@@ -127,7 +148,23 @@ class Resource(object):
 
         return self._validator
 
-    def __init__(self, name, url, version=1.0, subresources=None, validator=None, user_dependent=False):
+    @property
+    def version_column(self):
+        '''This read only property holds the name of the model attribute which changes each time a resource changes (e.g
+        a version counter or a last update timestamp). It is None if the resource does not declare one.'''
+
+        return self._version_column
+
+    @property
+    def cache_ttl(self):
+        '''This read only property holds the number of seconds anonymous GET responses of this resource can be cached by the
+        web server located in front of Fantastico (see :py:class:`fantastico.deployment.config_nginx.ConfigNginx`). It is None
+        if responses must not be cached.'''
+
+        return self._cache_ttl
+
+    def __init__(self, name, url, version=1.0, subresources=None, validator=None, user_dependent=False, version_column=None,
+                 cache_ttl=None):
         self._name = name
         self._url = url
         self._version = float(version)
@@ -135,6 +172,8 @@ class Resource(object):
         self._subresources = subresources or {}
         self._validator = validator
         self._user_dependent = user_dependent
+        self._version_column = version_column
+        self._cache_ttl = cache_ttl
 
     def __call__(self, model_cls, resources_registry=None):
         '''This method is invoked when the model class is first imported into python virtual machine.'''
@@ -82,7 +82,7 @@ class ResourceValidator(object):
         resources = resources or []
 
         for resource in resources:
-            self.format_resource(DictionaryObject(resource, immutable=False), request)
+            self.format_resource(DictionaryObject.view(resource, immutable=False), request)
 
     def format_resource(self, resource, request): # pylint: disable=W0613
         '''This method must be overriden by each subclass in order to provide custom logic which must be executed after a resource
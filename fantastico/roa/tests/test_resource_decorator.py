@@ -44,6 +44,13 @@ class ResourceDecoratorTests(FantasticoUnitTestsCase):
         self.assertEqual(resource.version, expected_version)
         self.assertEqual(resource.subresources, expected_subresources)
         self.assertIsNone(resource.model)
+        self.assertIsNone(resource.version_column)
+        self.assertIsNone(resource.cache_ttl)
+
+        resource = Resource(name=expected_name, url=expected_url, version_column="updated_at", cache_ttl=5)
+
+        self.assertEqual("updated_at", resource.version_column)
+        self.assertEqual(5, resource.cache_ttl)
 
     def test_check_call(self):
         '''This test case ensures call method correctly registers a resource to a given resource.'''
@@ -0,0 +1,84 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.routing_engine.metrics_routeloader
+'''
+from fantastico.routing_engine.routing_loaders import RouteLoader
+from fantastico.utils import metrics
+from webob.response import Response
+import hmac
+
+class MetricsRouteLoader(RouteLoader):
+    '''This class provides the **/__metrics** route which exposes all framework metrics in
+    `Prometheus text format <https://prometheus.io/docs/instrumenting/exposition_formats/>`_. Metrics are read from
+    :py:data:`fantastico.utils.metrics.METRICS` registry; when **metrics_config** setting specifies a shared memory file, the
+    metrics of all workers are aggregated.
+
+    The route is registered only if **expose** is True in **metrics_config** setting. Requests which do not carry the
+    configured bearer **token** or do not come from one of **allowed_ips** receive **403 Forbidden**.'''
+
+    METRICS_ROUTE = "^/__metrics$"
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self, settings_facade, metrics_registry=None):
+        super(MetricsRouteLoader, self).__init__(settings_facade)
+
+        self._metrics = metrics_registry or metrics.METRICS
+
+        metrics_config = settings_facade.get("metrics_config")
+        metrics_config = metrics_config if isinstance(metrics_config, dict) else {}
+
+        self._expose = metrics_config.get("expose", False)
+        self._token = metrics_config.get("token")
+        self._allowed_ips = metrics_config.get("allowed_ips")
+
+    def load_routes(self):
+        if not self._expose:
+            return {}
+
+        routes = {MetricsRouteLoader.METRICS_ROUTE:
+                    {"http_verbs": {"GET": "fantastico.routing_engine.metrics_routeloader.MetricsRouteLoader.render_metrics"}}}
+
+        return routes
+
+    def render_metrics(self, request):
+        '''This method handles **/__metrics** route. It returns the aggregated metrics as plain text.'''
+
+        if not self._is_allowed(request):
+            return Response(status_code=403, content_type="text/plain")
+
+        response = Response(content_type=MetricsRouteLoader.CONTENT_TYPE, charset="UTF-8")
+        response.text = self._metrics.render()
+
+        return response
+
+    def _is_allowed(self, request):
+        '''This method returns True if the given request can read the metrics (metrics are exposed, the request carries the
+        configured token and comes from an allowed address).'''
+
+        if not self._expose:
+            return False
+
+        if self._allowed_ips and request.environ.get("REMOTE_ADDR") not in self._allowed_ips:
+            return False
+
+        if self._token:
+            authorization = request.headers.get("Authorization") or ""
+
+            return hmac.compare_digest(authorization.encode(), ("Bearer %s" % self._token).encode())
+
+        return True
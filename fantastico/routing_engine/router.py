@@ -20,15 +20,16 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 from fantastico.exceptions import FantasticoDuplicateRouteError, FantasticoNoRoutesError, FantasticoRouteNotFoundError, \
     FantasticoHttpVerbNotSupported
 from fantastico.settings import SettingsFacade
-from fantastico.utils import instantiator
+from fantastico.utils import instantiator, metrics
 import re
 import threading
 
 class Router(object):
     '''This class is used for registering all available routes by using all registered loaders.'''
 
-    def __init__(self, settings_facade=SettingsFacade):
+    def __init__(self, settings_facade=SettingsFacade, metrics_registry=None):
         self._settings_facade = settings_facade()
+        self._metrics = metrics_registry or metrics.METRICS
         self._loaders = []
         self._loader_lock = None
         self._routes_lock = None
@@ -100,7 +101,13 @@ class Router(object):
         '''Method used to identify the given url method handler. It enrich the environ dictionary with a new entry that
         holds a controller instance and a function to be executed from that controller.'''
 
-        route_configs = self._find_url_regex(url)
+        with self._metrics.timer("fantastico_router_resolve_seconds", "Time spent resolving urls to controllers."):
+            try:
+                route_configs = self._find_url_regex(url)
+            except FantasticoRouteNotFoundError:
+                self._metrics.counter("fantastico_router_not_found_total", "Requests for unregistered urls.").inc()
+                raise
+
         route_config = None
 
         http_verb = environ.get("REQUEST_METHOD").upper()
@@ -117,6 +124,9 @@ class Router(object):
 
         http_verb_config = route_config["http_verbs"][http_verb]
 
+        self._metrics.counter("fantastico_router_requests_total", "Requests routed to each controller method.",
+                              {"handler": http_verb_config, "verb": http_verb}).inc()
+
         last_dot = http_verb_config.rfind(".")
 
         if last_dot == -1:
@@ -128,7 +138,8 @@ class Router(object):
         environ["route_%s_handler" % url] = {"controller": instantiator.instantiate_class(controller_cls,
                                                                                           [self._settings_facade]),
                                              "method": controller_meth,
-                                             "url_params": route_config.get("url_params")}
+                                             "url_params": route_config.get("url_params"),
+                                             "route": route_config.get("route")}
 
     def _find_url_regex(self, url):
         '''This method is used to obtain route configuration starting from a given url.
@@ -151,6 +162,7 @@ class Router(object):
             route_config = self._routes[route_pat]
 
             route_config["url_params"] = match.groupdict()
+            route_config["route"] = route_pat
 
             route_configs.append(route_config)
 
@@ -0,0 +1,95 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.routing_engine.tests.test_metrics_routeloader
+'''
+from fantastico.routing_engine.metrics_routeloader import MetricsRouteLoader
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry
+from mock import Mock
+from webob.request import Request
+
+class MetricsRouteLoaderTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for metrics route loader.'''
+
+    def init(self):
+        self._registry = MetricsRegistry()
+        self._config = {"expose": True, "token": None, "allowed_ips": None}
+
+    def _build_loader(self):
+        '''This method builds a metrics route loader using the current metrics configuration.'''
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: self._config if key == "metrics_config" else None
+
+        return MetricsRouteLoader(settings_facade, metrics_registry=self._registry)
+
+    def _build_request(self, remote_addr="127.0.0.1", authorization=None):
+        '''This method builds a metrics request coming from the given address.'''
+
+        request = Request.blank("/__metrics", environ={"REMOTE_ADDR": remote_addr})
+
+        if authorization:
+            request.headers["Authorization"] = authorization
+
+        return request
+
+    def test_load_routes_ok(self):
+        '''This test case ensures metrics route is mapped to render_metrics method.'''
+
+        routes = self._build_loader().load_routes()
+
+        self.assertEqual(1, len(routes))
+        self.assertEqual("fantastico.routing_engine.metrics_routeloader.MetricsRouteLoader.render_metrics",
+                         routes[MetricsRouteLoader.METRICS_ROUTE]["http_verbs"]["GET"])
+
+    def test_not_exposed_by_default(self):
+        '''This test case ensures metrics route is not registered unless it is explicitly exposed.'''
+
+        for config in [{}, {"expose": False}, None]:
+            self._config = config
+
+            loader = self._build_loader()
+
+            self.assertEqual({}, loader.load_routes())
+            self.assertEqual(403, loader.render_metrics(self._build_request()).status_code)
+
+    def test_render_metrics_ok(self):
+        '''This test case ensures metrics are rendered as plain text in prometheus format.'''
+
+        self._registry.counter("requests_total", "Requests.").inc()
+
+        response = self._build_loader().render_metrics(self._build_request())
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("text/plain", response.content_type)
+        self.assertEqual("UTF-8", response.charset)
+        self.assertEqual(self._registry.render(), response.text)
+        self.assertTrue("requests_total 1.0" in response.text)
+
+    def test_render_metrics_guarded(self):
+        '''This test case ensures metrics are rendered only for requests carrying the token from allowed addresses.'''
+
+        self._config.update({"token": "secret", "allowed_ips": ["10.0.0.5"]})
+
+        loader = self._build_loader()
+
+        for request, status in [(self._build_request("10.0.0.5", "Bearer secret"), 200),
+                                (self._build_request("10.0.0.6", "Bearer secret"), 403),
+                                (self._build_request("10.0.0.5", "Bearer other"), 403),
+                                (self._build_request("10.0.0.5"), 403)]:
+            self.assertEqual(status, loader.render_metrics(request).status_code)
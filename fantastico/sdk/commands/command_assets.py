@@ -0,0 +1,454 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.sdk.commands.command_assets
+'''
+
+from fantastico.mvc.static_assets_controller import FINGERPRINT_SIZE, is_fingerprinted
+from fantastico.sdk import sdk_decorators
+from fantastico.sdk.sdk_core import SdkCommand, SdkCommandArgument
+from fantastico.sdk.sdk_exceptions import FantasticoSdkCommandError
+from fantastico.settings import SettingsFacade
+from fantastico.utils import instantiator
+import gzip
+import hashlib
+import json
+import os
+import re
+
+CSS_COMMENTS_REGEX = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.S)
+CSS_SEPARATORS_REGEX = re.compile(r"\s*([{};,])\s*")
+
+JS_REGEX_PREFIXES = "(,=:[!&|?{};+-*%<>~^"
+JS_REGEX_KEYWORDS = re.compile(r"(^|[^\w$])(return|typeof|case|do|else|in|of|void|delete|new|throw)$")
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".html", ".htm", ".json", ".txt", ".xml", ".map")
+
+def _replace_css_code(source, code_fn, comment_fn):
+    '''This function applies code_fn to css code located outside of strings and comments and comment_fn to comments.'''
+
+    chunks = []
+    position = 0
+
+    for match in CSS_COMMENTS_REGEX.finditer(source):
+        chunks.append(code_fn(source[position:match.start()]))
+        chunks.append(match.group(1) or comment_fn(match.group(2)))
+
+        position = match.end()
+
+    chunks.append(code_fn(source[position:]))
+
+    return "".join(chunks)
+
+def minify_css(source):
+    '''This function removes comments (except **/*! ... */** license comments) and redundant whitespace from the given css
+    source. Strings are never changed.'''
+
+    source = _replace_css_code(source, lambda code: code, lambda comment: comment if comment.startswith("/*!") else " ")
+
+    def minify_code(code):
+        code = CSS_SEPARATORS_REGEX.sub(r"\1", re.sub(r"\s+", " ", code))
+
+        return code.replace(": ", ":").replace(";}", "}")
+
+    return _replace_css_code(source, minify_code, lambda comment: comment).strip()
+
+def _find_js_string_end(source, position):
+    '''This function returns the position right after the string (or template literal) starting at the given position.'''
+
+    quote = source[position]
+    index = position + 1
+
+    while index < len(source):
+        char = source[index]
+
+        if char == "\\":
+            index += 2
+            continue
+
+        if char == quote:
+            return index + 1
+
+        if quote == "`" and source.startswith("${", index):
+            index = _find_js_expression_end(source, index + 2)
+            continue
+
+        if char == "\n" and quote != "`":
+            return index
+
+        index += 1
+
+    return len(source)
+
+def _find_js_expression_end(source, position):
+    '''This function returns the position right after the **}** which closes the template literal expression starting at the
+    given position.'''
+
+    depth = 0
+    index = position
+
+    while index < len(source):
+        char = source[index]
+
+        if char in "'\"`":
+            index = _find_js_string_end(source, index)
+            continue
+
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            if depth == 0:
+                return index + 1
+
+            depth -= 1
+
+        index += 1
+
+    return len(source)
+
+def _find_js_regex_end(source, position):
+    '''This function returns the position right after the regular expression literal (including flags) starting at the given
+    position.'''
+
+    index = position + 1
+    in_class = False
+
+    while index < len(source):
+        char = source[index]
+
+        if char == "\\":
+            index += 2
+            continue
+
+        if char == "\n":
+            return position + 1
+
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            index += 1
+
+            while index < len(source) and (source[index].isalnum() or source[index] in "_$"):
+                index += 1
+
+            return index
+
+        index += 1
+
+    return position + 1
+
+def _is_js_word_char(char):
+    '''This function returns True if the given character can be part of a javascript identifier or number.'''
+
+    return char.isalnum() or char in "_$\\" or ord(char) > 127
+
+def _tokenize_js(source):
+    '''This function splits the given javascript source into (kind, text) tokens. Comments are replaced by whitespace tokens
+    (except **/*! ... */** license comments).'''
+
+    tokens = []
+    index, length = 0, len(source)
+
+    def last_code():
+        for kind, text in reversed(tokens):
+            if kind != "space":
+                return kind, text
+
+        return None, ""
+
+    while index < length:
+        char = source[index]
+        kind = "code"
+
+        if char in "'\"`":
+            end = _find_js_string_end(source, index)
+            kind = "string"
+        elif source.startswith("//", index):
+            end = source.find("\n", index)
+            end = length if end == -1 else end
+            kind = "space"
+        elif source.startswith("/*", index):
+            end = source.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+            kind = "string" if source.startswith("/*!", index) else "space"
+        elif char == "/" and (last_code()[1] == "" or last_code()[1][-1] in JS_REGEX_PREFIXES or
+                              (last_code()[0] == "code" and JS_REGEX_KEYWORDS.search(last_code()[1]))):
+            end = _find_js_regex_end(source, index)
+            kind = "regex" if end > index + 1 else "code"
+        elif char.isspace():
+            end = index + 1
+
+            while end < length and source[end].isspace():
+                end += 1
+
+            kind = "space"
+        else:
+            end = index + 1
+
+            while end < length and not source[end].isspace() and source[end] not in "'\"`/":
+                end += 1
+
+        text = source[index:end]
+
+        if kind == "space":
+            text = "\n" if "\n" in text or text.startswith("//") else " "
+
+        tokens.append((kind, text))
+        index = end
+
+    return tokens
+
+def minify_js(source):
+    '''This function removes comments (except **/*! ... */** license comments) and redundant whitespace from the given
+    javascript source. Line breaks are kept where they may end a statement so automatic semicolon insertion is not affected.
+    Strings, template literals and regular expression literals are never changed.'''
+
+    tokens = _tokenize_js(source)
+    output = []
+
+    for index, (kind, text) in enumerate(tokens):
+        if kind != "space":
+            output.append((kind, text))
+            continue
+
+        if not output:
+            continue
+
+        next_token = next((token for token in tokens[index + 1:] if token[0] != "space"), None)
+
+        if next_token is None:
+            break
+
+        if output[-1][0] == "space":
+            if text == "\n":
+                output[-1] = (kind, text)
+
+            continue
+
+        prev_kind, prev_text = output[-1]
+        prev_char, next_char = prev_text[-1], next_token[1][0]
+
+        if text == "\n" and prev_char not in "{;,([" and next_char not in ")]},;.":
+            output.append((kind, text))
+        elif (_is_js_word_char(prev_char) or prev_kind == "regex") and _is_js_word_char(next_char):
+            output.append((kind, " "))
+        elif prev_char + next_char in ("++", "--", "//", "/*"):
+            output.append((kind, " "))
+
+    return "".join(text for _, text in output)
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+@sdk_decorators.SdkCommand(name="assets", target="fantastico",
+                           help="Builds fingerprinted, minified and precompressed static assets together with their manifest.")
+class SdkCommandAssets(SdkCommand):
+    '''This class provides the static assets build pipeline of fantastico projects. It walks the **static** folder of each
+    component (see :doc:`/features/component_model`) and for each asset it:
+
+    #. minifies css and javascript files (files already minified, e.g **jquery.min.js**, are copied unchanged).
+    #. writes the asset content under a fingerprinted name (e.g **css/app.css** is written as **css/app.3f2a9c1b0d.css**).
+    #. writes a gzip compressed sibling of text assets (e.g **css/app.3f2a9c1b0d.css.gz**) if it is smaller.
+    #. writes the manifest which maps logical asset names to fingerprinted names.
+
+    Fingerprinted files never change so they are cached by browsers forever (see
+    :py:class:`fantastico.mvc.static_assets_controller.StaticAssetsController`) and templates reference them using
+    **asset_url** global (see :py:class:`fantastico.rendering.assets_manifest.AssetsManifest`). Fingerprinted files of the
+    previous builds remain available so that pages rendered before a deploy (or by workers not restarted yet) still load
+    them; only fingerprinted files which are not referenced by any of the last **--keep-builds** builds are removed. The
+    fingerprinted names of kept builds are stored next to the manifest (e.g **assets_manifest.json.history**).
+
+    .. code-block:: bash
+
+        # build the assets of all components located in the folder where the active settings profile is defined
+        fsdk assets
+
+        # build the assets of all components from the given folder into a custom manifest
+        fsdk assets --comp-root /path/to/project --manifest /path/to/project/assets_manifest.json
+
+        # keep the fingerprinted assets of the last 3 builds
+        fsdk assets --keep-builds 3
+    '''
+
+    HASH_SIZE = FINGERPRINT_SIZE // 2
+    DEFAULT_KEEP_BUILDS = 2
+
+    def __init__(self, argv, cmd_factory, settings_facade_cls=SettingsFacade):
+        super(SdkCommandAssets, self).__init__(argv, cmd_factory)
+
+        self._settings_facade_cls = settings_facade_cls
+
+    def get_arguments(self):
+        '''This method returns support arguments for **assets**:
+
+        #. -p --comp-root component root folder (default is the folder where the active settings profile is defined).
+        #. -m --manifest manifest location (default is taken from **assets_config** setting).
+        #. -k --keep-builds the number of builds (including the current one) whose fingerprinted assets are kept (default 2).
+        '''
+
+        return [SdkCommandArgument("-p", "--comp-root", str,
+                                   "Holds the name of the folder where project components are placed."),
+                SdkCommandArgument("-m", "--manifest", str, "Holds the location of the generated assets manifest."),
+                SdkCommandArgument("-k", "--keep-builds", int,
+                                   "Holds the number of builds whose fingerprinted assets are kept.")]
+
+    def exec(self, print_fn=print):
+        '''This method builds the assets of all components and writes their manifest.
+
+        :raises fantastico.sdk.sdk_exceptions.FantasticoSdkCommandError: When components root folder does not exist.
+        '''
+
+        comp_root, manifest_file = self._get_locations()
+
+        if not os.path.isdir(comp_root):
+            raise FantasticoSdkCommandError("Components root folder %s does not exist." % comp_root)
+
+        history = self._load_history(manifest_file)
+        manifest = {}
+
+        for component_name in sorted(os.listdir(comp_root)):
+            static_folder = os.path.join(comp_root, component_name, "static")
+
+            if not os.path.isdir(static_folder) or component_name == "static":
+                continue
+
+            for folder, _, filenames in os.walk(static_folder):
+                for filename in sorted(filenames):
+                    if filename.endswith((".gz", ".tmp")) or is_fingerprinted(filename):
+                        continue
+
+                    asset_file = os.path.join(folder, filename)
+                    asset_name = os.path.relpath(asset_file, comp_root).replace(os.sep, "/")
+
+                    manifest[asset_name] = self._build_asset(comp_root, asset_name)
+
+        generation = sorted(set(manifest.values()))
+
+        if not history or history[0] != generation:
+            history.insert(0, generation)
+
+        keep_builds = max(self._arguments.keep_builds or self.DEFAULT_KEEP_BUILDS, 1)
+
+        self._write_manifest(manifest_file, manifest)
+        self._write_file("%s.history" % manifest_file, json.dumps(history[:keep_builds], indent=4).encode())
+        self._remove_stale_assets(comp_root, history[:keep_builds], history[keep_builds:])
+
+        print_fn("%s assets built into %s." % (len(manifest), manifest_file))
+
+    def _get_locations(self):
+        '''This method returns the components root folder and the manifest location.'''
+
+        comp_root = self._arguments.comp_root
+        manifest_file = self._arguments.manifest
+
+        if not comp_root or not manifest_file:
+            settings_facade = self._settings_facade_cls()
+
+            comp_root = comp_root or instantiator.get_class_abslocation(settings_facade.get_config().__class__)
+            manifest_file = manifest_file or os.path.join(comp_root, (settings_facade.get("assets_config") or {}).get(
+                                                                        "manifest", "assets_manifest.json"))
+
+        return comp_root, manifest_file
+
+    def _build_asset(self, comp_root, asset_name):
+        '''This method writes the fingerprinted (and gzip compressed) version of the given asset and returns its name.'''
+
+        with open(os.path.join(comp_root, asset_name), "rb") as asset_file:
+            content = asset_file.read()
+
+        base_name, extension = os.path.splitext(asset_name)
+        minifier = MINIFIERS.get(extension.lower())
+
+        if minifier and not base_name.endswith(".min"):
+            try:
+                content = minifier(content.decode("utf-8")).encode("utf-8")
+            except UnicodeDecodeError:
+                pass
+
+        fingerprint = hashlib.blake2b(content, digest_size=self.HASH_SIZE).hexdigest()
+        fingerprinted_name = "%s.%s%s" % (base_name, fingerprint, extension)
+        fingerprinted_file = os.path.join(comp_root, fingerprinted_name)
+
+        if os.path.exists(fingerprinted_file) and os.path.getsize(fingerprinted_file) == len(content):
+            return fingerprinted_name
+
+        if extension.lower() in COMPRESSIBLE_EXTENSIONS:
+            compressed_content = gzip.compress(content, compresslevel=9, mtime=0)
+
+            if len(compressed_content) < len(content):
+                self._write_file("%s.gz" % fingerprinted_file, compressed_content)
+
+        self._write_file(fingerprinted_file, content)
+
+        return fingerprinted_name
+
+    def _remove_stale_assets(self, comp_root, kept_builds, old_builds):
+        '''This method removes the fingerprinted files (and their gzip siblings) of old builds which are not referenced by
+        any kept build.'''
+
+        kept_names = set(name for build in kept_builds for name in build)
+        old_names = set(name for build in old_builds for name in build)
+
+        for fingerprinted_name in old_names - kept_names:
+            for filename in [fingerprinted_name, "%s.gz" % fingerprinted_name]:
+                filename = os.path.join(comp_root, filename)
+
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def _load_manifest(self, manifest_file):
+        '''This method returns the content of the given manifest or an empty manifest if it does not exist.'''
+
+        if not os.path.exists(manifest_file):
+            return {}
+
+        with open(manifest_file, "r") as manifest:
+            return json.load(manifest)
+
+    def _load_history(self, manifest_file):
+        '''This method returns the fingerprinted names of the kept builds (most recent first). When no history exists yet,
+        the build described by the current manifest is the only kept build.'''
+
+        history_file = "%s.history" % manifest_file
+
+        if os.path.exists(history_file):
+            with open(history_file, "r") as history:
+                return json.load(history)
+
+        manifest = self._load_manifest(manifest_file)
+
+        return [sorted(set(manifest.values()))] if manifest else []
+
+    def _write_manifest(self, manifest_file, manifest):
+        '''This method replaces the given manifest file atomically so running workers never read a partial manifest.'''
+
+        self._write_file(manifest_file, json.dumps(manifest, indent=4, sort_keys=True).encode())
+
+    def _write_file(self, filename, content):
+        '''This method writes the given content into a temporary file and atomically replaces the given file with it, so a
+        file is never seen partially written (even if the build is interrupted).'''
+
+        tmp_file = "%s.%s.tmp" % (filename, os.getpid())
+
+        try:
+            with open(tmp_file, "wb") as file_content:
+                file_content.write(content)
+
+            os.replace(tmp_file, filename)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
@@ -0,0 +1,99 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.sdk.commands.command_profiles
+'''
+
+from fantastico.middleware.profiling_middleware import ProfilingMiddleware
+from fantastico.sdk import sdk_decorators
+from fantastico.sdk.sdk_core import SdkCommand, SdkCommandArgument
+from fantastico.sdk.sdk_exceptions import FantasticoSdkCommandError
+from fantastico.settings import SettingsFacade
+import io
+import os
+import pstats
+
+@sdk_decorators.SdkCommand(name="profiles", target="fantastico",
+                           help="Merges spooled request profiles and displays the hot paths of each route.")
+class SdkCommandProfiles(SdkCommand):
+    '''This class provides the command for analyzing the profiles dumped by
+    :py:class:`fantastico.middleware.profiling_middleware.ProfilingMiddleware`. All profiles of a route (collected by all
+    workers) are merged and the functions with the highest cumulative time are displayed.
+
+    .. code-block:: bash
+
+        # display top 20 hot paths for all profiled routes from the configured spool folder
+        fsdk profiles
+
+        # display top 10 hot paths for routes matching the given text from a custom spool folder
+        fsdk profiles --spool-folder /tmp/fantastico-profiles --top 10 --route SampleController
+    '''
+
+    DEFAULT_TOP = 20
+
+    def __init__(self, argv, cmd_factory, settings_facade_cls=SettingsFacade):
+        super(SdkCommandProfiles, self).__init__(argv, cmd_factory)
+
+        self._settings_facade_cls = settings_facade_cls
+
+    def get_arguments(self):
+        '''This method returns support arguments for **profiles**:
+
+        #. -s --spool-folder the folder where profiles are spooled (default is taken from **profiling_config** setting).
+        #. -t --top the number of hot paths displayed for each route.
+        #. -r --route displays only the routes containing the given text.
+        '''
+
+        return [SdkCommandArgument("-s", "--spool-folder", str, "Holds the folder where request profiles are spooled."),
+                SdkCommandArgument("-t", "--top", int, "Holds the number of hot paths displayed for each route."),
+                SdkCommandArgument("-r", "--route", str, "Displays only the routes containing the given text.")]
+
+    def exec(self, print_fn=print, os_lib=os, stats_cls=pstats.Stats):
+        '''This method merges the profiles of each route and prints the top hot paths sorted by cumulative time.
+
+        :raises fantastico.sdk.sdk_exceptions.FantasticoSdkCommandError: When the spool folder does not exist.
+        '''
+
+        spool_folder = self._arguments.spool_folder or \
+                            (self._settings_facade_cls().get("profiling_config") or {}).get("spool_folder")
+
+        if not spool_folder or not os_lib.path.isdir(spool_folder):
+            raise FantasticoSdkCommandError("Profiles spool folder %s does not exist." % spool_folder)
+
+        top = self._arguments.top or self.DEFAULT_TOP
+
+        for route_name in sorted(os_lib.listdir(spool_folder)):
+            if self._arguments.route and self._arguments.route not in route_name:
+                continue
+
+            route_folder = os_lib.path.join(spool_folder, route_name)
+
+            if not os_lib.path.isdir(route_folder):
+                continue
+
+            profiles = [os_lib.path.join(route_folder, filename) for filename in sorted(os_lib.listdir(route_folder))
+                        if filename.endswith(ProfilingMiddleware.PROFILE_EXTENSION)]
+
+            if not profiles:
+                continue
+
+            output = io.StringIO()
+
+            stats = stats_cls(*profiles, stream=output)
+            stats.sort_stats("cumulative").print_stats(top)
+
+            print_fn("Route %s (%s profiled requests)" % (route_name, len(profiles)))
+            print_fn(output.getvalue())
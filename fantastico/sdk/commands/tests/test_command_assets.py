@@ -0,0 +1,192 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.sdk.commands.tests.test_command_assets
+'''
+from fantastico.sdk.commands.command_assets import SdkCommandAssets, minify_css, minify_js
+from fantastico.sdk.sdk_exceptions import FantasticoSdkCommandError
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+class SdkCommandAssetsTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for ensuring sdk assets command builds fingerprinted assets and their manifest.'''
+
+    CSS = "/* main */\nbody {\n    color : red;\n    margin: 0 auto;\n}\n" * 20
+
+    def init(self):
+        '''This method creates a project with two components holding static assets.'''
+
+        self._comp_root = tempfile.mkdtemp()
+        self._manifest_file = os.path.join(self._comp_root, "assets_manifest.json")
+
+        self._write("blog/static/css/app.css", self.CSS.encode())
+        self._write("blog/static/js/jquery.min.js", b"var a = 1;  var b = 2;")
+        self._write("blog/static/images/logo.png", b"\x89PNG\x00\x01")
+        self._write("shop/static/app.js", b"// shop\nvar total = 1 + 2;\n")
+        self._write("shop/models/__init__.py", b"")
+        self._write("static/favicon.ico", b"icon")
+
+    def cleanup(self):
+        '''This method removes the project used by test cases.'''
+
+        shutil.rmtree(self._comp_root)
+
+    def _write(self, asset_name, content):
+        '''This method writes the given content into the given project file.'''
+
+        filename = os.path.join(self._comp_root, asset_name)
+
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        with open(filename, "wb") as asset_file:
+            asset_file.write(content)
+
+    def _read(self, asset_name):
+        '''This method returns the content of the given project file.'''
+
+        with open(os.path.join(self._comp_root, asset_name), "rb") as asset_file:
+            return asset_file.read()
+
+    def _build(self):
+        '''This method executes assets command and returns the generated manifest.'''
+
+        cmd = SdkCommandAssets(["assets", "--comp-root", self._comp_root, "--manifest", self._manifest_file], Mock())
+        cmd.exec(Mock())
+
+        with open(self._manifest_file, "r") as manifest:
+            return json.load(manifest)
+
+    def test_assets_ok(self):
+        '''This test case ensures assets are minified, fingerprinted and precompressed and manifest lists all of them.'''
+
+        manifest = self._build()
+
+        self.assertEqual(["blog/static/css/app.css", "blog/static/images/logo.png", "blog/static/js/jquery.min.js",
+                          "shop/static/app.js"], sorted(manifest.keys()))
+
+        for asset_name, fingerprinted_name in manifest.items():
+            self.assertRegex(fingerprinted_name, r"^%s\.[0-9a-f]{10}%s$" % tuple(os.path.splitext(asset_name)))
+
+        css = self._read(manifest["blog/static/css/app.css"])
+
+        self.assertEqual(b"body{color :red;margin:0 auto}" * 20, css)
+        self.assertEqual(css, gzip.decompress(self._read("%s.gz" % manifest["blog/static/css/app.css"])))
+        self.assertEqual(b"var total=1+2;", self._read(manifest["shop/static/app.js"]))
+        self.assertEqual(b"var a = 1;  var b = 2;", self._read(manifest["blog/static/js/jquery.min.js"]))
+        self.assertFalse(os.path.exists(os.path.join(self._comp_root, "%s.gz" % manifest["blog/static/images/logo.png"])))
+        self.assertFalse(os.path.exists(os.path.join(self._comp_root, "%s.gz" % manifest["shop/static/app.js"])))
+
+    def test_assets_rebuild(self):
+        '''This test case ensures unchanged assets are not written again, the previous build is kept and older fingerprinted
+        assets are removed.'''
+
+        old_manifest = self._build()
+        logo_file = os.path.join(self._comp_root, old_manifest["blog/static/images/logo.png"])
+        old_css = old_manifest["blog/static/css/app.css"]
+
+        os.utime(logo_file, (1000, 1000))
+
+        self._write("blog/static/css/app.css", b"a { color: blue; }")
+
+        manifest = self._build()
+
+        self.assertEqual(old_manifest["blog/static/images/logo.png"], manifest["blog/static/images/logo.png"])
+        self.assertEqual(1000, os.stat(logo_file).st_mtime)
+        self.assertNotEqual(old_css, manifest["blog/static/css/app.css"])
+        self.assertEqual(b"a{color:blue}", self._read(manifest["blog/static/css/app.css"]))
+        self.assertTrue(os.path.exists(os.path.join(self._comp_root, old_css)))
+        self.assertTrue(os.path.exists(os.path.join(self._comp_root, "%s.gz" % old_css)))
+
+        self._build()
+        self.assertTrue(os.path.exists(os.path.join(self._comp_root, old_css)))
+
+        self._write("blog/static/css/app.css", b"a { color: green; }")
+
+        manifest = self._build()
+
+        self.assertFalse(os.path.exists(os.path.join(self._comp_root, old_css)))
+        self.assertFalse(os.path.exists(os.path.join(self._comp_root, "%s.gz" % old_css)))
+        self.assertEqual(old_manifest["blog/static/images/logo.png"], manifest["blog/static/images/logo.png"])
+        self.assertTrue(os.path.exists(logo_file))
+
+    def test_assets_keep_builds(self):
+        '''This test case ensures only the current build is kept when requested.'''
+
+        old_manifest = self._build()
+
+        self._write("blog/static/css/app.css", b"a { color: blue; }")
+
+        cmd = SdkCommandAssets(["assets", "-p", self._comp_root, "-m", self._manifest_file, "-k", "1"], Mock())
+        cmd.exec(Mock())
+
+        self.assertFalse(os.path.exists(os.path.join(self._comp_root, old_manifest["blog/static/css/app.css"])))
+        self.assertTrue(os.path.exists(os.path.join(self._comp_root, old_manifest["blog/static/images/logo.png"])))
+
+    def test_assets_partial_rewritten(self):
+        '''This test case ensures a partially written fingerprinted asset is written again and no temporary files remain.'''
+
+        manifest = self._build()
+        css_name = manifest["blog/static/css/app.css"]
+
+        self._write(css_name, b"body{")
+
+        self._build()
+
+        self.assertEqual(b"body{color :red;margin:0 auto}" * 20, self._read(css_name))
+        self.assertEqual([], [filename for _, _, filenames in os.walk(self._comp_root)
+                              for filename in filenames if filename.endswith(".tmp")])
+
+    def test_assets_missing_folder(self):
+        '''This test case ensures a concrete exception is raised if components root folder does not exist.'''
+
+        cmd = SdkCommandAssets(["assets", "-p", os.path.join(self._comp_root, "missing"), "-m", self._manifest_file], Mock())
+
+        self.assertRaises(FantasticoSdkCommandError, cmd.exec, Mock())
+
+    def test_minify_css(self):
+        '''This test case ensures css comments and whitespace are removed without changing strings and selectors.'''
+
+        source = '/*! license */\na , b  {\n  content : "a  /* b */" ; /* c */\n}\n.x :hover{width: calc(1px + 2px);}\na/**/b{}'
+
+        self.assertEqual('/*! license */ a,b{content :"a  /* b */"}.x :hover{width:calc(1px + 2px)}a b{}', minify_css(source))
+
+    def test_minify_js(self):
+        '''This test case ensures javascript comments and whitespace are removed without changing literals or statements
+        separated by line breaks.'''
+
+        source = "\n".join(["/*! license */",
+                            "// comment",
+                            "var a = 1 + +b, c = \"x  // y\" ; /* inline */",
+                            "function f (x) {",
+                            "    return /ab+ c\\//g.test(x) // regex",
+                            "}",
+                            "var t = `a  ${ `b  c` }  d`;",
+                            "x = a / b / c",
+                            "i++",
+                            "++j",
+                            "var re = /[/]x/ instanceof RegExp;"])
+
+        self.assertEqual("\n".join(["/*! license */",
+                                    "var a=1+ +b,c=\"x  // y\";function f(x){return/ab+ c\\//g.test(x)}",
+                                    "var t=`a  ${ `b  c` }  d`;x=a/b/c",
+                                    "i++",
+                                    "++j",
+                                    "var re=/[/]x/ instanceof RegExp;"]), minify_js(source))
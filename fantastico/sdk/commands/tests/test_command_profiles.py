@@ -0,0 +1,84 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.sdk.commands.tests.test_command_profiles
+'''
+from fantastico.sdk.commands.command_profiles import SdkCommandProfiles
+from fantastico.sdk.sdk_exceptions import FantasticoSdkCommandError
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+import cProfile
+import os
+import shutil
+import tempfile
+
+def sample_hot_path():
+    '''This function is profiled by the test cases below.'''
+
+    return sum(range(100))
+
+class SdkCommandProfilesTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for ensuring sdk profiles command merges spooled profiles per route.'''
+
+    def init(self):
+        '''This method spools two profiles for a route and one profile for another route.'''
+
+        self._spool_folder = tempfile.mkdtemp()
+
+        for route_name, profile_name in [("route1", "1-1-1.prof"), ("route1", "2-1-1.prof"), ("route2", "1-1-2.prof")]:
+            os.makedirs(os.path.join(self._spool_folder, route_name), exist_ok=True)
+
+            profiler = cProfile.Profile()
+            profiler.runcall(sample_hot_path)
+            profiler.dump_stats(os.path.join(self._spool_folder, route_name, profile_name))
+
+    def cleanup(self):
+        '''This method removes the spool folder used by test cases.'''
+
+        shutil.rmtree(self._spool_folder)
+
+    def test_profiles_ok(self):
+        '''This test case ensures profiles of each route are merged and printed.'''
+
+        cmd = SdkCommandProfiles(["profiles", "--spool-folder", self._spool_folder, "--top", "5"], Mock())
+
+        print_fn = Mock()
+
+        cmd.exec(print_fn)
+
+        self.assertEqual(4, print_fn.call_count)
+        self.assertEqual("Route route1 (2 profiled requests)", print_fn.call_args_list[0][0][0])
+        self.assertTrue("sample_hot_path" in print_fn.call_args_list[1][0][0])
+        self.assertEqual("Route route2 (1 profiled requests)", print_fn.call_args_list[2][0][0])
+
+    def test_profiles_route_filter(self):
+        '''This test case ensures only routes matching the given filter are printed.'''
+
+        cmd = SdkCommandProfiles(["profiles", "-s", self._spool_folder, "-r", "route2"], Mock())
+
+        print_fn = Mock()
+
+        cmd.exec(print_fn)
+
+        self.assertEqual(2, print_fn.call_count)
+        self.assertEqual("Route route2 (1 profiled requests)", print_fn.call_args_list[0][0][0])
+
+    def test_profiles_missing_folder(self):
+        '''This test case ensures a concrete exception is raised if the spool folder does not exist.'''
+
+        cmd = SdkCommandProfiles(["profiles", "-s", os.path.join(self._spool_folder, "missing")], Mock())
+
+        self.assertRaises(FantasticoSdkCommandError, cmd.exec, Mock())
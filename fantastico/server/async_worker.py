@@ -0,0 +1,393 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.async_worker
+'''
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from fantastico.server.http_worker import build_environ, call_app
+from http.server import BaseHTTPRequestHandler
+import asyncio
+import logging
+import socket
+
+class AsyncWsgiServer(object):
+    '''This class provides an asyncio HTTP/1.1 front end for WSGI applications. Connections, request parsing and writing
+    responses to slow clients are handled on the event loop while the application (e.g
+    :py:class:`fantastico.middleware.fantastico_app.FantasticoApp` with all its middlewares) runs in a pool of **threads**
+    threads. A single process can hold thousands of idle keep alive connections without a thread for each connection.
+
+    .. code-block:: python
+
+        server = AsyncWsgiServer(("0.0.0.0", 12000), FantasticoApp(), threads=10, max_pending=100)
+        server.serve_forever()
+
+    Backpressure: at most **threads** + **max_pending** requests are read (body included) and dispatched to the pool at any
+    time. Other request bodies are not read until a slot becomes free (clients are throttled by TCP flow control) and the
+    event loop never queues unbounded work. Request bodies bigger than **max_body_size** bytes are rejected (413) and
+    requests whose client does not send any body data for **body_timeout** seconds are rejected (408); slow but steady
+    uploads are not interrupted.
+
+    The server provides the same interface as :py:class:`fantastico.server.http_worker.ThreadPoolWsgiServer` so it can be
+    used by :py:class:`fantastico.server.multiprocess_server.MultiprocessServer` workers (**frontend** key of
+    **prod_server_config** setting).'''
+
+    READ_LIMIT = 65536
+    SERVER_VERSION = "Fantastico"
+
+    def __init__(self, server_address, app, threads=10, backlog=1024, keepalive_timeout=5, max_requests=0,
+                 listen_socket=None, reuse_port=False, multiprocess=False, on_max_requests=None, max_pending=None,
+                 max_body_size=10485760, body_timeout=30, executor_cls=ThreadPoolExecutor):
+        self.app = app
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body_size = max_body_size
+        self.body_timeout = body_timeout
+        self.multiprocess = multiprocess
+        self.request_queue_size = backlog
+
+        self._max_requests = max_requests
+        self._on_max_requests = on_max_requests
+        self._requests = 0
+        self._max_inflight = threads + (threads * 10 if max_pending is None else max_pending)
+        self._executor = executor_cls(max_workers=threads)
+        self._logger = logging.getLogger(__name__)
+
+        self._loop = None
+        self._stopped = None
+        self._inflight = None
+        self._draining = False
+        self._idle = set()
+        self._connections = set()
+
+        self._owns_socket = listen_socket is None
+        self.socket = listen_socket if listen_socket is not None else \
+                            self._create_socket(server_address, backlog, reuse_port)
+
+        self.server_address = self.socket.getsockname()
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+
+    @property
+    def draining(self):
+        '''This property returns True if the server stopped accepting new requests.'''
+
+        return self._draining
+
+    @property
+    def requests(self):
+        '''This property returns the number of requests handled by this server.'''
+
+        return self._requests
+
+    def request_handled(self):
+        '''This method is invoked (on the event loop) for each request before its response is written. It returns True if the
+        connection must be closed because the server is draining.'''
+
+        self._requests += 1
+
+        if self._max_requests and self._requests == self._max_requests:
+            if self._on_max_requests:
+                self._on_max_requests()
+            else:
+                self.drain()
+
+        return self._draining
+
+    def drain(self):
+        '''This method stops accepting new connections. Requests in progress are completed, idle keep alive connections are
+        closed and busy connections are closed after their current request. It can be invoked from any thread (including
+        signal handlers).'''
+
+        if self._draining:
+            return
+
+        self._draining = True
+
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def serve_forever(self, poll_interval=None): # pylint: disable=W0613
+        '''This method runs the event loop until the server is drained and all connections are closed.'''
+
+        self._loop = asyncio.new_event_loop()
+
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    def server_close(self):
+        '''This method closes the listening socket and waits for all requests dispatched to the threads pool.'''
+
+        self.socket.close()
+
+        self._executor.shutdown(wait=True)
+
+    def handle_error(self, environ):
+        '''This method logs unexpected application errors.'''
+
+        self._logger.exception("Unexpected error while serving %s %s.", environ.get("REQUEST_METHOD"),
+                               environ.get("PATH_INFO"))
+
+    @staticmethod
+    def _create_socket(server_address, backlog, reuse_port):
+        '''This method creates a listening socket bound to the given address.'''
+
+        family = socket.AF_INET6 if ":" in server_address[0] else socket.AF_INET
+
+        sock = socket.socket(family, socket.SOCK_STREAM)
+
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+            if reuse_port and hasattr(socket, "SO_REUSEPORT"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+            sock.bind(server_address)
+            sock.listen(backlog)
+        except Exception:
+            sock.close()
+            raise
+
+        return sock
+
+    async def _serve(self):
+        '''This coroutine accepts connections until the server is drained and then waits for all connections to complete.'''
+
+        self._stopped = asyncio.Event()
+        self._inflight = asyncio.Semaphore(self._max_inflight)
+
+        if self._draining:
+            self._stopped.set()
+
+        # asyncio closes the sockets it serves on; the original socket keeps listening until queued connections are accepted.
+        server = await asyncio.start_server(self._handle_connection, sock=self.socket.dup(), limit=self.READ_LIMIT,
+                                            backlog=self.request_queue_size)
+
+        await self._stopped.wait()
+
+        server.close()
+
+        if self._owns_socket:
+            for conn in self._accept_pending():
+                reader, writer = await asyncio.open_connection(sock=conn, limit=self.READ_LIMIT)
+
+                self._connections.add(asyncio.ensure_future(self._handle_connection(reader, writer)))
+
+        for writer in list(self._idle):
+            writer.close()
+
+        while self._connections:
+            await asyncio.wait(list(self._connections))
+
+    def _accept_pending(self):
+        '''This method accepts (at most backlog) connections which are already queued on the listening socket.'''
+
+        connections = []
+
+        self.socket.setblocking(False)
+
+        for _ in range(self.request_queue_size):
+            try:
+                conn, _ = self.socket.accept()
+            except OSError:
+                break
+
+            connections.append(conn)
+
+        return connections
+
+    async def _handle_connection(self, reader, writer):
+        '''This coroutine serves all requests received on a connection.'''
+
+        task = asyncio.current_task()
+        self._connections.add(task)
+
+        try:
+            client_address = writer.get_extra_info("peername") or ("", 0)
+
+            keep_alive = True
+
+            while keep_alive and not self._draining:
+                self._idle.add(writer)
+
+                try:
+                    request = await self._read_request(reader)
+                finally:
+                    self._idle.discard(writer)
+
+                if request is None:
+                    break
+
+                if isinstance(request, int):
+                    await self._write_error(writer, request)
+                    break
+
+                keep_alive = await self._serve_request(reader, writer, request, client_address)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+            self._connections.discard(task)
+
+    async def _read_request(self, reader):
+        '''This coroutine reads the head of the next request of a connection. It returns None if the connection was closed
+        (or is idle for more than keepalive timeout), an http error code if the request is not supported or a (method, uri,
+        version, headers, content length) tuple. The body is read only after an inflight slot is acquired.'''
+
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+        except asyncio.LimitOverrunError:
+            return 431
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+        lines = head.decode("iso-8859-1").split("\r\n")
+        request_line = lines[0].split()
+
+        if len(request_line) != 3:
+            return 400
+
+        method, uri, version = request_line
+
+        if version not in ("HTTP/1.0", "HTTP/1.1"):
+            return 505
+
+        headers = []
+
+        for line in lines[1:]:
+            if not line:
+                continue
+
+            name, sep, value = line.partition(":")
+
+            if not sep:
+                return 400
+
+            headers.append((name.strip(), value.strip()))
+
+        header_values = {name.lower(): value for name, value in headers}
+
+        if "chunked" in header_values.get("transfer-encoding", "").lower():
+            return 411
+
+        try:
+            content_length = int(header_values.get("content-length") or 0)
+        except ValueError:
+            return 400
+
+        if content_length < 0:
+            return 400
+
+        if content_length > self.max_body_size:
+            return 413
+
+        return method, uri, version, headers, content_length
+
+    async def _read_body(self, reader, content_length):
+        '''This coroutine reads a request body of the given length. It raises :py:class:`asyncio.TimeoutError` if the client
+        does not send any data for **body_timeout** seconds.'''
+
+        chunks = []
+        remaining = content_length
+
+        while remaining > 0:
+            chunk = await asyncio.wait_for(reader.read(min(remaining, self.READ_LIMIT)), self.body_timeout)
+
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"".join(chunks), content_length)
+
+            chunks.append(chunk)
+            remaining -= len(chunk)
+
+        return b"".join(chunks)
+
+    async def _serve_request(self, reader, writer, request, client_address):
+        '''This coroutine reads the body of the given request, dispatches the request to the threads pool and writes the
+        response. It returns True if the connection can be kept alive.'''
+
+        method, uri, version, headers, content_length = request
+
+        connection = {name.lower(): value.lower() for name, value in headers}.get("connection", "")
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+        async with self._inflight:
+            try:
+                body = await self._read_body(reader, content_length)
+            except asyncio.TimeoutError:
+                await self._write_error(writer, 408)
+                return False
+
+            environ = build_environ(self, method, uri, version, headers, body, client_address)
+
+            try:
+                status, response_headers, response_body = \
+                            await self._loop.run_in_executor(self._executor, call_app, self.app, environ)
+            except Exception: # pylint: disable=W0703
+                self.handle_error(environ)
+                self.request_handled()
+
+                await self._write_error(writer, 500)
+                return False
+
+        if self.request_handled():
+            keep_alive = False
+
+        for header_name, header_value in response_headers:
+            if header_name.lower() == "connection" and header_value.lower() == "close":
+                keep_alive = False
+
+        self._write_head(writer, version, status, response_headers, len(response_body), keep_alive)
+
+        if method != "HEAD":
+            writer.write(response_body)
+
+        await writer.drain()
+
+        return keep_alive
+
+    def _write_head(self, writer, version, status, headers, content_length, keep_alive):
+        '''This method writes the status line and headers of a response.'''
+
+        lines = ["%s %s" % (version, status),
+                 "Server: %s" % self.SERVER_VERSION,
+                 "Date: %s" % formatdate(usegmt=True)]
+
+        has_length = False
+
+        for header_name, header_value in headers:
+            if header_name.lower() == "content-length":
+                has_length = True
+
+            lines.append("%s: %s" % (header_name, header_value))
+
+        if not has_length:
+            lines.append("Content-Length: %s" % content_length)
+
+        lines.append("Connection: %s" % ("keep-alive" if keep_alive else "close"))
+
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1"))
+
+    async def _write_error(self, writer, code):
+        '''This coroutine writes an empty error response and closes the connection.'''
+
+        message = BaseHTTPRequestHandler.responses.get(code, ("Error",))[0]
+
+        self._write_head(writer, "HTTP/1.1", "%s %s" % (code, message), [], 0, False)
+
+        await writer.drain()
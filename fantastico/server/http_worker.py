@@ -0,0 +1,481 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.http_worker
+'''
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import unquote
+import io
+import itertools
+import socket
+import socketserver
+import sys
+import threading
+
+class FileWrapper(object):
+    '''This class provides **wsgi.file_wrapper**: applications return it in order to serve a file. The threaded frontend
+    sends the file using :py:meth:`socket.socket.sendfile` (without copying its content into the process) when the response
+    has a **Content-Length** header; otherwise the file is read in blocks of **blksize** bytes.
+
+    .. code-block:: python
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Length", str(os.path.getsize(file_path)))])
+
+            return environ["wsgi.file_wrapper"](open(file_path, "rb"))
+    '''
+
+    def __init__(self, filelike, blksize=65536):
+        self.filelike = filelike
+        self.blksize = blksize
+
+        if hasattr(filelike, "close"):
+            self.close = filelike.close
+
+    def __iter__(self):
+        while True:
+            data = self.filelike.read(self.blksize)
+
+            if not data:
+                break
+
+            yield data
+
+    def fileno(self):
+        '''This method returns the file descriptor of the wrapped file or None if it is not backed by a file.'''
+
+        try:
+            return self.filelike.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def sendfile(self, sock, count):
+        '''This method sends at most count bytes of the wrapped file (starting from its current position) into the given
+        socket. It returns the number of bytes sent.'''
+
+        return sock.sendfile(self.filelike, offset=self.filelike.tell(), count=count)
+
+def build_environ(server, request_method, request_uri, request_version, headers, body, client_address):
+    '''This function builds the WSGI environ of a request received by the given server. Headers are given as a list of
+    (name, value) tuples and body is the complete request body.'''
+
+    path, _, query_string = request_uri.partition("?")
+
+    environ = {"wsgi.version": (1, 0),
+               "wsgi.url_scheme": "http",
+               "wsgi.input": io.BytesIO(body),
+               "wsgi.errors": sys.stderr,
+               "wsgi.multithread": True,
+               "wsgi.multiprocess": server.multiprocess,
+               "wsgi.run_once": False,
+               "wsgi.file_wrapper": FileWrapper,
+               "REQUEST_METHOD": request_method,
+               "SCRIPT_NAME": "",
+               "PATH_INFO": unquote(path, "iso-8859-1"),
+               "QUERY_STRING": query_string,
+               "CONTENT_TYPE": "",
+               "CONTENT_LENGTH": str(len(body)) if body else "",
+               "SERVER_NAME": server.server_name,
+               "SERVER_PORT": str(server.server_port),
+               "SERVER_PROTOCOL": request_version,
+               "REMOTE_ADDR": client_address[0]}
+
+    for header_name, header_value in headers:
+        key = "HTTP_%s" % header_name.upper().replace("-", "_")
+
+        if key == "HTTP_CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = header_value
+            continue
+
+        if key == "HTTP_CONTENT_LENGTH":
+            continue
+
+        if key in environ:
+            environ[key] = "%s,%s" % (environ[key], header_value)
+        else:
+            environ[key] = header_value
+
+    return environ
+
+def start_app(app, environ):
+    '''This function invokes the given WSGI application and returns a (status, headers, body, result) tuple as soon as the
+    response is started. Body is an iterable of the response chunks (the application result itself unless it had to be
+    iterated in order to start the response) and result must be closed after body was consumed.'''
+
+    response_state = {"status": None, "headers": None}
+
+    def start_response(status, headers, exc_info=None):
+        '''This function stores the response status and headers of the current request.'''
+
+        if exc_info and response_state["status"]:
+            raise exc_info[1].with_traceback(exc_info[2])
+
+        response_state["status"] = status
+        response_state["headers"] = list(headers)
+
+    result = app(environ, start_response)
+    body = result
+
+    try:
+        if response_state["status"] is None:
+            chunks = []
+            iterator = iter(result)
+
+            for chunk in iterator:
+                chunks.append(chunk)
+
+                if response_state["status"] is not None:
+                    break
+            else:
+                raise RuntimeError("Application returned without starting the response.")
+
+            body = itertools.chain(chunks, iterator)
+    except Exception:
+        close_result(result)
+        raise
+
+    return response_state["status"], response_state["headers"], body, result
+
+def close_result(result):
+    '''This function closes the given WSGI application result (if it can be closed).'''
+
+    if hasattr(result, "close"):
+        result.close()
+
+def call_app(app, environ):
+    '''This function invokes the given WSGI application and returns a (status, headers, body) tuple. The response body is
+    completely read so that it can be written from an event loop without holding application resources.'''
+
+    status, headers, body, result = start_app(app, environ)
+
+    try:
+        body = b"".join(body)
+    finally:
+        close_result(result)
+
+    return status, headers, body
+
+class WsgiRequestHandler(BaseHTTPRequestHandler):
+    '''This class serves WSGI applications over HTTP/1.1. Connections are kept alive between requests (unless the client or
+    the application closes them, or the server is draining) and idle connections are closed after the server
+    **keepalive_timeout** seconds.'''
+
+    protocol_version = "HTTP/1.1"
+    server_version = "Fantastico"
+
+    def setup(self):
+        self.timeout = self.server.keepalive_timeout
+
+        super(WsgiRequestHandler, self).setup()
+
+    def handle_one_request(self):
+        '''This method reads one request from the connection and dispatches it to the WSGI application.'''
+
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except socket.timeout:
+            self.close_connection = True
+            return
+
+        if len(self.raw_requestline) > 65536:
+            self.send_error(414)
+            return
+
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+
+        if not self.parse_request():
+            return
+
+        self._handle_wsgi()
+
+        self.wfile.flush()
+
+    def log_message(self, format, *args): # pylint: disable=W0622
+        '''Access logging is provided by :py:class:`fantastico.middleware.access_log_middleware.AccessLogMiddleware`.'''
+
+    def _handle_wsgi(self):
+        '''This method builds the WSGI environ of the current request, invokes the application and writes the response.'''
+
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.send_error(411)
+            self.close_connection = True
+            return
+
+        try:
+            content_length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            content_length = -1
+
+        if content_length < 0 or content_length > self.server.max_body_size:
+            self.send_error(400 if content_length < 0 else 413)
+            self.close_connection = True
+            return
+
+        try:
+            self.connection.settimeout(self.server.body_timeout)
+
+            body = self.rfile.read(content_length) if content_length > 0 else b""
+        except socket.timeout:
+            self.send_error(408)
+            self.close_connection = True
+            return
+        finally:
+            self.connection.settimeout(self.timeout)
+
+        environ = build_environ(self.server, self.command, self.path, self.request_version, self.headers.items(), body,
+                                self.client_address)
+
+        try:
+            status, headers, body, result = start_app(self.server.app, environ)
+        except Exception: # pylint: disable=W0703
+            self.server.handle_error(self.request, self.client_address)
+            self.server.request_handled()
+
+            self.send_error(500)
+            self.close_connection = True
+            return
+
+        if self.server.request_handled():
+            self.close_connection = True
+
+        try:
+            self._write_response(status, headers, body)
+        except OSError:
+            self.close_connection = True
+        except Exception: # pylint: disable=W0703
+            self.server.handle_error(self.request, self.client_address)
+            self.close_connection = True
+        finally:
+            close_result(result)
+
+    def _write_response(self, status, headers, body):
+        '''This method writes the given response status, headers and body into the connection. The body is streamed chunk by
+        chunk: when its length is unknown, chunked transfer encoding is used for HTTP/1.1 clients (HTTP/1.0 connections are
+        closed after the body). **wsgi.file_wrapper** bodies with a known length are sent using sendfile.'''
+
+        code, _, message = status.partition(" ")
+        code = int(code)
+
+        self.send_response(code, message)
+
+        content_length = None
+
+        for header_name, header_value in headers:
+            if header_name.lower() == "content-length":
+                content_length = int(header_value)
+
+            if header_name.lower() == "connection" and header_value.lower() == "close":
+                self.close_connection = True
+
+            self.send_header(header_name, header_value)
+
+        has_body = self.command != "HEAD" and code not in (204, 304)
+        chunked = False
+
+        if content_length is None and isinstance(body, (list, tuple)):
+            body = [b"".join(body)]
+            content_length = len(body[0])
+
+            self.send_header("Content-Length", str(content_length))
+        elif content_length is None and has_body:
+            if self.request_version == "HTTP/1.1":
+                chunked = True
+
+                self.send_header("Transfer-Encoding", "chunked")
+            else:
+                self.close_connection = True
+
+        if self.close_connection:
+            self.send_header("Connection", "close")
+
+        self.end_headers()
+
+        if not has_body:
+            return
+
+        if isinstance(body, FileWrapper) and content_length is not None and body.fileno() is not None:
+            self.wfile.flush()
+
+            if body.sendfile(self.connection, content_length) < content_length:
+                self.close_connection = True
+
+            return
+
+        for chunk in body:
+            if not chunk:
+                continue
+
+            if chunked:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            else:
+                self.wfile.write(chunk)
+
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+class ThreadPoolWsgiServer(socketserver.TCPServer):
+    '''This class provides a HTTP/1.1 WSGI server which handles connections using a bounded pool of threads. The server can
+    be asked to stop after a given number of requests (so that the worker process can be recycled) or drained from another
+    thread by invoking :py:meth:`fantastico.server.http_worker.ThreadPoolWsgiServer.drain`. When **on_max_requests** callback
+    is given, it is invoked (once) instead of draining the server when **max_requests** is reached: the callback owner is
+    then responsible for draining the server (e.g after a replacement worker is ready to accept connections).
+
+    At most **max_pending** accepted connections (by default, **threads**) wait for a free thread; once this limit is reached
+    the server stops accepting connections, so new clients queue in the socket backlog instead of the process memory. Request
+    bodies bigger than **max_body_size** bytes are rejected (413) without being read and requests whose client does not send
+    any body data for **body_timeout** seconds are rejected (408).
+
+    .. code-block:: python
+
+        server = ThreadPoolWsgiServer(("0.0.0.0", 12000), FantasticoApp(), threads=10, backlog=1024)
+        server.serve_forever()
+    '''
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, app, threads=10, backlog=1024, keepalive_timeout=5, max_requests=0,
+                 listen_socket=None, reuse_port=False, multiprocess=False, on_max_requests=None, max_pending=None,
+                 max_body_size=10485760, body_timeout=30, handler_cls=WsgiRequestHandler):
+        self.request_queue_size = backlog
+        self.app = app
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body_size = max_body_size
+        self.body_timeout = body_timeout
+        self.multiprocess = multiprocess
+
+        self._max_requests = max_requests
+        self._on_max_requests = on_max_requests
+        self._requests = 0
+        self._requests_lock = threading.Lock()
+        self._draining = False
+        self._slots = threading.BoundedSemaphore(threads + (threads if max_pending is None else max_pending))
+        self._owns_socket = listen_socket is None
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+        bind_and_activate = listen_socket is None
+
+        if ":" in server_address[0]:
+            self.address_family = socket.AF_INET6
+
+        super(ThreadPoolWsgiServer, self).__init__(server_address, handler_cls, bind_and_activate=False)
+
+        if listen_socket is not None:
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
+        elif bind_and_activate:
+            if reuse_port and hasattr(socket, "SO_REUSEPORT"):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+            try:
+                self.server_bind()
+                self.server_activate()
+            except Exception:
+                self.server_close()
+                raise
+
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+
+    @property
+    def draining(self):
+        '''This property returns True if the server stopped accepting new requests.'''
+
+        return self._draining
+
+    @property
+    def requests(self):
+        '''This property returns the number of requests handled by this server.'''
+
+        return self._requests
+
+    def request_handled(self):
+        '''This method is invoked for each request before its response is written. It returns True if the connection must be
+        closed because the server is draining.'''
+
+        with self._requests_lock:
+            self._requests += 1
+
+            if self._max_requests and self._requests == self._max_requests:
+                if self._on_max_requests:
+                    self._on_max_requests()
+                else:
+                    self.drain()
+
+        return self._draining
+
+    def drain(self):
+        '''This method stops accepting new connections. Requests in progress are completed and kept alive connections are
+        closed after their current request. It can be invoked from any thread (including signal handlers).'''
+
+        if self._draining:
+            return
+
+        self._draining = True
+
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def process_request(self, request, client_address):
+        '''This method dispatches the given connection to the threads pool. It blocks while the pool and its pending queue
+        are full.'''
+
+        self._slots.acquire()
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    def server_close(self):
+        '''This method closes the listening socket and waits for all requests in progress to complete. Connections already
+        queued on a socket owned by this server (e.g a **SO_REUSEPORT** socket) are accepted and served before closing it;
+        otherwise, the kernel resets them.'''
+
+        if self._owns_socket:
+            self._accept_pending()
+
+        super(ThreadPoolWsgiServer, self).server_close()
+
+        self._executor.shutdown(wait=True)
+
+    def _accept_pending(self):
+        '''This method accepts (at most backlog) connections which are already queued on the listening socket.'''
+
+        try:
+            self.socket.setblocking(False)
+        except OSError:
+            return
+
+        for _ in range(self.request_queue_size):
+            try:
+                request, client_address = self.get_request()
+            except OSError:
+                break
+
+            request.setblocking(True)
+
+            self.process_request(request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        '''This method handles the given connection on a pool thread.'''
+
+        try:
+            self.finish_request(request, client_address)
+        except Exception: # pylint: disable=W0703
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
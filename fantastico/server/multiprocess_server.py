@@ -0,0 +1,458 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.multiprocess_server
+'''
+from fantastico.server.async_worker import AsyncWsgiServer
+from fantastico.server.http_worker import ThreadPoolWsgiServer
+from fantastico.server.warmup import AppWarmUp
+from fantastico.settings import SettingsFacade
+import errno
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+class MultiprocessServer(object):
+    '''This class provides the built in production server of fantastico. It does not require uWSGI: a master process forks
+    a pool of worker processes which share the listening socket and each worker serves
+    :py:class:`fantastico.middleware.fantastico_app.FantasticoApp` over HTTP/1.1 (with keep alive) using a pool of threads.
+    The server is configured through **prod_server_config** setting; its **frontend** key selects how workers handle
+    connections:
+
+    * **threads** - each connection is served by a thread of the pool
+      (:py:class:`fantastico.server.http_worker.ThreadPoolWsgiServer`).
+    * **asyncio** - connections are handled by an event loop and only requests are dispatched to the pool
+      (:py:class:`fantastico.server.async_worker.AsyncWsgiServer`); use it when many clients keep idle connections open.
+
+    .. code-block:: python
+
+        MultiprocessServer().start()
+
+    The master process only supervises the workers:
+
+    #. workers which exit unexpectedly are replaced. Workers which exit before they are ready to accept connections (e.g
+       the application can not be built) are replaced with an exponential delay (at most **max_respawn_delay** seconds), so
+       a broken deploy does not fork workers in a tight loop.
+    #. a worker which served **max_requests** requests is recycled: it keeps serving until its replacement is ready to accept
+       connections and then it stops accepting connections and exits after completing the requests in progress.
+    #. **SIGHUP** triggers a graceful reload: all workers are recycled.
+    #. **SIGTERM** / **SIGINT** trigger a graceful stop. Workers which do not stop in **graceful_timeout** seconds are killed.
+
+    When **prefork** key of **warmup_config** setting is True, the application is built and warmed up once in the master
+    process and shared copy-on-write by all workers; each worker runs :py:data:`fantastico.utils.fork_hooks.POST_FORK_HOOKS`
+    and opens its own database pool. Otherwise, each worker builds and warms up its own application (a reload then picks up
+    code changes of the project).'''
+
+    SUPERVISE_INTERVAL = 0.5
+    MAX_RESPAWN_DELAY = 30
+    FRONTENDS = {"threads": ThreadPoolWsgiServer,
+                 "asyncio": AsyncWsgiServer}
+    MSG_READY = b"R"
+    MSG_MAX_REQUESTS = b"M"
+
+    def __init__(self, settings_facade=SettingsFacade, warmup_cls=AppWarmUp, server_cls=None, os_lib=os, signal_lib=signal,
+                 socket_lib=socket, time_provider=time):
+        self._settings_facade_cls = settings_facade
+        self._warmup_cls = warmup_cls
+        self._os_lib = os_lib
+        self._signal_lib = signal_lib
+        self._socket_lib = socket_lib
+        self._time_provider = time_provider
+        self._logger = logging.getLogger(__name__)
+
+        settings_facade = settings_facade()
+
+        self._config = settings_facade.get("prod_server_config") or {}
+        self._warmup_config = settings_facade.get("warmup_config") or {}
+
+        self._server_cls = server_cls or self.FRONTENDS[self._config.get("frontend") or "threads"]
+
+        self._app = None
+        self._listen_socket = None
+        self._pipe_read = None
+        self._pipe_write = None
+        self._workers = {}
+        self._ready = set()
+        self._startup_failures = 0
+        self._next_spawn = 0.0
+        self._recycling = []
+        self._retiring = {}
+        self._running = False
+        self._reload_requested = False
+
+    @property
+    def host(self):
+        '''This property returns the address on which the server listens.'''
+
+        return self._config.get("host") or "0.0.0.0"
+
+    @property
+    def port(self):
+        '''This property returns the port on which the server listens.'''
+
+        return int(self._config.get("port") or 12000)
+
+    @property
+    def workers_count(self):
+        '''This property returns the number of worker processes. By default, one worker is started for each cpu.'''
+
+        return int(self._config.get("workers") or os.cpu_count() or 1)
+
+    @property
+    def reuse_port(self):
+        '''This property returns True if each worker binds its own listening socket using **SO_REUSEPORT** (connections are
+        then balanced by the kernel). It is always False on platforms which do not support **SO_REUSEPORT**.'''
+
+        return self._config.get("reuse_port") is True and hasattr(self._socket_lib, "SO_REUSEPORT")
+
+    @property
+    def prefork(self):
+        '''This property returns True if the application is built in the master process before forking workers.'''
+
+        return self._warmup_config.get("prefork") is True
+
+    @property
+    def workers(self):
+        '''This property returns the pids of the workers which are not scheduled for recycling.'''
+
+        return list(self._workers.keys())
+
+    @property
+    def running(self):
+        '''This property returns True while the master process supervises its workers.'''
+
+        return self._running
+
+    def start(self):
+        '''This method starts the server: it binds the listening socket, (optionally) builds the application, forks the workers
+        and supervises them until the server is stopped.'''
+
+        self._listen_socket = self._create_socket()
+
+        if self.reuse_port:
+            # the socket was created only for validating the address; each worker binds its own socket.
+            self._listen_socket.close()
+            self._listen_socket = None
+
+        self._pipe_read, self._pipe_write = self._os_lib.pipe()
+        self._os_lib.set_blocking(self._pipe_read, False)
+
+        if self.prefork:
+            self._app = self._warmup_cls(self._settings_facade_cls).run(open_db_pool=False)
+
+            if hasattr(gc, "freeze"):
+                gc.collect()
+                gc.freeze()
+
+        self._signal_lib.signal(self._signal_lib.SIGTERM, self._handle_stop)
+        self._signal_lib.signal(self._signal_lib.SIGINT, self._handle_stop)
+        self._signal_lib.signal(self._signal_lib.SIGHUP, self._handle_reload)
+
+        self._running = True
+
+        self._logger.info("Fantastico production server listens on %s:%s (%s workers).", self.host, self.port,
+                          self.workers_count)
+
+        try:
+            while self._running:
+                self.supervise()
+                self._time_provider.sleep(self.SUPERVISE_INTERVAL)
+        finally:
+            self._shutdown()
+
+    def stop(self):
+        '''This method requests a graceful stop of the server. It is safe to invoke it from signal handlers.'''
+
+        self._running = False
+
+    def reload(self):
+        '''This method requests a graceful reload of all workers. It is safe to invoke it from signal handlers.'''
+
+        self._reload_requested = True
+
+    def supervise(self):
+        '''This method executes one supervision step: exited workers are reaped, messages sent by workers are processed,
+        missing workers are forked and retiring workers which exceeded **graceful_timeout** are killed.'''
+
+        self._reap_workers()
+
+        if self._reload_requested:
+            self._reload_requested = False
+            self._recycle_workers(list(self._workers.keys()))
+
+        self._read_messages()
+
+        if self._time_provider.time() >= self._next_spawn:
+            while self._running and len(self._workers) < self.workers_count:
+                self._spawn_worker()
+
+        self._kill_expired()
+
+    def _handle_stop(self, signum, frame): # pylint: disable=W0613
+        '''This method handles stop signals received by the master process.'''
+
+        self.stop()
+
+    def _handle_reload(self, signum, frame): # pylint: disable=W0613
+        '''This method handles reload signals received by the master process.'''
+
+        self.reload()
+
+    def _create_socket(self):
+        '''This method creates and binds a listening socket using the configured address and backlog.'''
+
+        family = self._socket_lib.AF_INET6 if ":" in self.host else self._socket_lib.AF_INET
+
+        sock = self._socket_lib.socket(family, self._socket_lib.SOCK_STREAM)
+
+        try:
+            sock.setsockopt(self._socket_lib.SOL_SOCKET, self._socket_lib.SO_REUSEADDR, 1)
+
+            if self.reuse_port:
+                sock.setsockopt(self._socket_lib.SOL_SOCKET, self._socket_lib.SO_REUSEPORT, 1)
+
+            sock.bind((self.host, self.port))
+            sock.listen(int(self._config.get("backlog") or 1024))
+        except Exception:
+            sock.close()
+            raise
+
+        return sock
+
+    def _spawn_worker(self):
+        '''This method forks a new worker process. In the child process, it serves requests and never returns.'''
+
+        pid = self._os_lib.fork()
+
+        if pid == 0:
+            exit_code = 1
+
+            try:
+                exit_code = self._run_worker()
+            except Exception as ex: # pylint: disable=W0703
+                self._logger.exception("Fantastico worker %s failed: %s", os.getpid(), ex)
+            finally:
+                self._os_lib._exit(exit_code) # pylint: disable=W0212
+
+        self._workers[pid] = self._time_provider.time()
+
+        return pid
+
+    def _run_worker(self):
+        '''This method builds the worker http server and serves requests until the worker is drained by the master process.
+        It returns the worker exit code.'''
+
+        self._signal_lib.signal(self._signal_lib.SIGINT, self._signal_lib.SIG_IGN)
+        self._signal_lib.signal(self._signal_lib.SIGHUP, self._signal_lib.SIG_IGN)
+        self._signal_lib.signal(self._signal_lib.SIGTERM, self._signal_lib.SIG_DFL)
+
+        if self._pipe_read is not None:
+            self._os_lib.close(self._pipe_read)
+
+        warmup = self._warmup_cls(self._settings_facade_cls)
+
+        if self._app is not None:
+            app = self._app
+            warmup.open_db_pool()
+        else:
+            app = warmup.run()
+
+        server = self._server_cls((self.host, self.port), app,
+                                  threads=int(self._config.get("threads") or 10),
+                                  backlog=int(self._config.get("backlog") or 1024),
+                                  keepalive_timeout=self._config.get("keepalive_timeout", 5),
+                                  max_requests=int(self._config.get("max_requests") or 0),
+                                  listen_socket=self._listen_socket,
+                                  reuse_port=self.reuse_port,
+                                  multiprocess=True,
+                                  max_pending=self._config.get("max_pending"),
+                                  max_body_size=int(self._config.get("max_body_size") or 10485760),
+                                  body_timeout=self._config.get("body_timeout", 30),
+                                  on_max_requests=lambda: self._notify_master(self.MSG_MAX_REQUESTS))
+
+        self._signal_lib.signal(self._signal_lib.SIGTERM, lambda signum, frame: server.drain())
+
+        self._notify_master(self.MSG_READY)
+
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+        return 0
+
+    def _notify_master(self, message):
+        '''This method sends the given message (tagged with the current worker pid) to the master process.'''
+
+        if self._pipe_write is None:
+            return
+
+        try:
+            self._os_lib.write(self._pipe_write, b"%s%d\n" % (message, os.getpid()))
+        except OSError as ex:
+            self._logger.warning("Fantastico worker %s can not notify master: %s", os.getpid(), ex)
+
+    def _read_messages(self):
+        '''This method processes all messages sent by workers since the previous supervision step. A worker which reached
+        max requests is recycled and each ready worker allows one recycling worker to retire.'''
+
+        if self._pipe_read is None:
+            return
+
+        data = b""
+
+        while True:
+            try:
+                chunk = self._os_lib.read(self._pipe_read, 65536)
+            except (BlockingIOError, InterruptedError):
+                break
+
+            if not chunk:
+                break
+
+            data += chunk
+
+        for line in data.splitlines():
+            message, pid = line[:1], int(line[1:])
+
+            if message == self.MSG_READY:
+                self._ready.add(pid)
+                self._startup_failures = 0
+
+            if message == self.MSG_MAX_REQUESTS:
+                self._recycle_workers([pid])
+            elif message == self.MSG_READY and self._recycling:
+                self._retire_workers([self._recycling.pop(0)])
+
+    def _recycle_workers(self, pids):
+        '''This method schedules the given workers for recycling: they are replaced by new workers and they keep serving
+        requests until the replacements are ready.'''
+
+        for pid in pids:
+            if self._workers.pop(pid, None) is not None:
+                self._recycling.append(pid)
+
+    def _reap_workers(self):
+        '''This method collects the exit status of all terminated workers.'''
+
+        while self._workers or self._recycling or self._retiring:
+            try:
+                pid, status = self._os_lib.waitpid(-1, self._os_lib.WNOHANG)
+            except ChildProcessError:
+                self._workers.clear()
+                self._ready.clear()
+                self._recycling.clear()
+                self._retiring.clear()
+                break
+
+            if pid == 0:
+                break
+
+            if pid in self._recycling:
+                self._recycling.remove(pid)
+
+            self._retiring.pop(pid, None)
+
+            was_ready = pid in self._ready
+            self._ready.discard(pid)
+
+            if self._workers.pop(pid, None) is None or not self._running:
+                continue
+
+            if was_ready:
+                self._logger.warning("Fantastico worker %s exited unexpectedly (status %s); replacing it.", pid, status)
+                continue
+
+            self._delay_respawn(pid, status)
+
+    def _delay_respawn(self, pid, status):
+        '''This method delays the next fork after the given worker failed to start. The delay doubles with each consecutive
+        failure (up to **max_respawn_delay** seconds) and it is reset once a worker is ready.'''
+
+        self._startup_failures += 1
+
+        max_delay = self._config.get("max_respawn_delay", self.MAX_RESPAWN_DELAY)
+        delay = min(self.SUPERVISE_INTERVAL * 2 ** self._startup_failures, max_delay)
+
+        self._next_spawn = self._time_provider.time() + delay
+
+        self._logger.error("Fantastico worker %s exited before accepting connections (status %s); replacing it in %s "
+                           "seconds.", pid, status, delay)
+
+    def _retire_workers(self, pids):
+        '''This method asks the given workers to stop gracefully and schedules their kill after **graceful_timeout**.'''
+
+        deadline = self._time_provider.time() + self._config.get("graceful_timeout", 30)
+
+        for pid in pids:
+            self._retiring[pid] = deadline
+
+            self._send_signal(pid, self._signal_lib.SIGTERM)
+
+    def _kill_expired(self):
+        '''This method kills all retiring workers which did not stop in **graceful_timeout** seconds.'''
+
+        now = self._time_provider.time()
+
+        for pid, deadline in list(self._retiring.items()):
+            if now >= deadline:
+                self._logger.warning("Fantastico worker %s did not stop gracefully; killing it.", pid)
+                self._send_signal(pid, self._signal_lib.SIGKILL)
+                self._retiring[pid] = float("inf")
+
+    def _send_signal(self, pid, signum):
+        '''This method sends the given signal to the given worker ignoring workers which already exited.'''
+
+        try:
+            self._os_lib.kill(pid, signum)
+        except OSError as ex:
+            if ex.errno != errno.ESRCH:
+                raise
+
+    def _shutdown(self):
+        '''This method gracefully stops all workers and closes the listening socket.'''
+
+        self._running = False
+
+        pids = list(self._workers.keys()) + self._recycling
+
+        self._workers.clear()
+        self._recycling = []
+        self._retire_workers(pids)
+
+        while self._retiring:
+            self._reap_workers()
+            self._kill_expired()
+
+            if self._retiring:
+                self._time_provider.sleep(self.SUPERVISE_INTERVAL)
+
+        if self._listen_socket is not None:
+            self._listen_socket.close()
+            self._listen_socket = None
+
+        for pipe_fd in (self._pipe_read, self._pipe_write):
+            if pipe_fd is not None:
+                self._os_lib.close(pipe_fd)
+
+        self._pipe_read = self._pipe_write = None
+
+if __name__ == "__main__":
+    SERVER = MultiprocessServer()
+    SERVER.start()
@@ -16,29 +16,90 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
 .. py:module:: fantastico.server.prod_server
 '''
-
-from fantastico.middleware.fantastico_app import FantasticoApp
+from fantastico.server.warmup import AppWarmUp
+from fantastico.settings import SettingsFacade
+from fantastico.utils.fork_hooks import POST_FORK_HOOKS
+import gc
 import threading
 
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
 class WsgiFantasticoStarter(object):
-    '''This class is a wrapper used to start fantastico production server.'''
-    
-    def __init__(self):
+    '''This class is a wrapper used to start fantastico production server. The application is built and warmed up by
+    :py:class:`fantastico.server.warmup.AppWarmUp` exactly once per process. When **eager** key of **warmup_config** setting
+    is True, the warm up runs when this module is imported (before the worker accepts traffic). Otherwise, it runs on the
+    first request and concurrent requests wait for it to complete.
+
+    When **prefork** key of **warmup_config** is True (use it together with uWSGI **master** mode and without **lazy-apps**),
+    the application is built in the master process: routes, resources registry, compiled templates and settings are shared
+    copy-on-write by all workers. Database connections are not opened in master; after fork, each worker runs
+    :py:data:`fantastico.utils.fork_hooks.POST_FORK_HOOKS` (engine and per process caches are discarded) and opens its own
+    database pool.'''
+
+    def __init__(self, settings_facade=SettingsFacade, warmup_cls=AppWarmUp):
+        self._settings_facade = settings_facade
+        self._warmup_cls = warmup_cls
         self._fantastico = None
-        self._instantiator_lock = None
-    
+        self._instantiator_lock = threading.Lock()
+
+        self._warmup_config = settings_facade().get("warmup_config") or {}
+
+    @property
+    def eager(self):
+        '''This property returns True if the application must be warmed up before accepting traffic.'''
+
+        return self._warmup_config.get("eager") is True
+
+    @property
+    def prefork(self):
+        '''This property returns True if the application is built in a master process which forks the workers.'''
+
+        return self._warmup_config.get("prefork") is True
+
+    @property
+    def ready(self):
+        '''This property returns True once the application is built and warmed up.'''
+
+        return self._fantastico is not None
+
+    def warm_up(self):
+        '''This method builds and warms up the application (only once) and returns it. In prefork mode, all objects created so
+        far are moved into the permanent generation of the garbage collector so that collections in workers do not touch
+        (and copy) the pages shared with the master.'''
+
+        with self._instantiator_lock:
+            if self._fantastico is None:
+                self._fantastico = self._warmup_cls(self._settings_facade).run(open_db_pool=not self.prefork)
+
+                if self.prefork and hasattr(gc, "freeze"):
+                    gc.collect()
+                    gc.freeze()
+
+        return self._fantastico
+
+    def post_fork(self):
+        '''This method is invoked in each worker right after it is forked from the master process. Post fork hooks are run
+        only if :py:func:`os.register_at_fork` did not already run them in this worker.'''
+
+        self._instantiator_lock = threading.Lock()
+
+        POST_FORK_HOOKS.run()
+
+        if self.ready:
+            self._warmup_cls(self._settings_facade).open_db_pool()
+
     def __call__(self, environ, start_response):
-        if self._fantastico is None:
-            if not self._instantiator_lock:
-                self._instantiator_lock = threading.Lock()
-                self._instantiator_lock.acquire()
-                
-                self._fantastico = FantasticoApp()
-                
-                self._instantiator_lock.release()
-            else:
-                self._instantiator_lock.acquire()
-        
-        return self._fantastico(environ, start_response)
-    
-application = WsgiFantasticoStarter()
\ No newline at end of file
+        fantastico = self._fantastico or self.warm_up()
+
+        return fantastico(environ, start_response)
+
+application = WsgiFantasticoStarter()
+
+if uwsgi is not None:
+    uwsgi.post_fork_hook = application.post_fork
+
+if application.eager:
+    application.warm_up()
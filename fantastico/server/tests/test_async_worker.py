@@ -0,0 +1,220 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.tests.test_async_worker
+'''
+from fantastico.server.async_worker import AsyncWsgiServer
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+import http.client
+import socket
+import threading
+import time
+
+class AsyncWsgiServerTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for the asyncio front end which dispatches requests to a threads pool.'''
+
+    def init(self):
+        self._environs = []
+        self._server = None
+        self._thread = None
+
+    def cleanup(self):
+        if self._thread and self._thread.is_alive():
+            self._server.drain()
+            self._thread.join(5)
+
+        if self._server:
+            self._server.server_close()
+
+    def _app(self, environ, start_response):
+        '''This method is a simple wsgi application which echoes the request body.'''
+
+        self._environs.append(environ)
+
+        if environ["PATH_INFO"] == "/error":
+            raise Exception("Unexpected error.")
+
+        body = environ["wsgi.input"].read()
+
+        start_response("200 OK", [("Content-Type", "text/plain")])
+
+        return [b"echo:", body]
+
+    def _start_server(self, max_requests=0, threads=2, keepalive_timeout=2, **kwargs):
+        '''This method starts the server on a random port in a background thread.'''
+
+        self._server = AsyncWsgiServer(("127.0.0.1", 0), self._app, threads=threads, backlog=16,
+                                       keepalive_timeout=keepalive_timeout, max_requests=max_requests, **kwargs)
+        self._server.handle_error = lambda environ: None
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.start()
+
+        return http.client.HTTPConnection("127.0.0.1", self._server.server_port, timeout=5)
+
+    def test_keepalive_ok(self):
+        '''This test case ensures multiple requests are served over the same connection and the wsgi environ is correctly
+        built.'''
+
+        conn = self._start_server()
+
+        try:
+            for idx in range(3):
+                conn.request("POST", "/simple/url%%20%s?a=b" % idx, body=b"body",
+                             headers={"Content-Type": "text/plain", "X-Custom": "custom"})
+                response = conn.getresponse()
+
+                self.assertEqual(200, response.status)
+                self.assertEqual("9", response.getheader("Content-Length"))
+                self.assertEqual("keep-alive", response.getheader("Connection"))
+                self.assertEqual(b"echo:body", response.read())
+        finally:
+            conn.close()
+
+        self.assertEqual(3, self._server.requests)
+
+        environ = self._environs[-1]
+
+        self.assertEqual("POST", environ["REQUEST_METHOD"])
+        self.assertEqual("/simple/url 2", environ["PATH_INFO"])
+        self.assertEqual("a=b", environ["QUERY_STRING"])
+        self.assertEqual("text/plain", environ["CONTENT_TYPE"])
+        self.assertEqual("4", environ["CONTENT_LENGTH"])
+        self.assertEqual("custom", environ["HTTP_X_CUSTOM"])
+        self.assertEqual("HTTP/1.1", environ["SERVER_PROTOCOL"])
+
+    def test_idle_connections_no_threads(self):
+        '''This test case ensures idle keep alive connections do not hold pool threads.'''
+
+        conn = self._start_server(threads=1)
+        idle_conns = [socket.create_connection(("127.0.0.1", self._server.server_port)) for _ in range(20)]
+
+        try:
+            conn.request("GET", "/")
+            response = conn.getresponse()
+
+            self.assertEqual(200, response.status)
+            self.assertEqual(b"echo:", response.read())
+        finally:
+            conn.close()
+
+            for idle_conn in idle_conns:
+                idle_conn.close()
+
+    def test_max_requests_drain(self):
+        '''This test case ensures the server closes the connection and stops serving once max requests is reached.'''
+
+        conn = self._start_server(max_requests=2)
+
+        try:
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read()
+
+            self.assertEqual("keep-alive", response.getheader("Connection"))
+
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read()
+
+            self.assertEqual("close", response.getheader("Connection"))
+        finally:
+            conn.close()
+
+        self._thread.join(5)
+
+        self.assertTrue(self._server.draining)
+        self.assertFalse(self._thread.is_alive())
+
+    def test_app_error(self):
+        '''This test case ensures unexpected application errors are converted to 500 responses and the connection is closed.'''
+
+        conn = self._start_server()
+
+        try:
+            conn.request("GET", "/error")
+            response = conn.getresponse()
+            response.read()
+
+            self.assertEqual(500, response.status)
+            self.assertEqual("close", response.getheader("Connection"))
+        finally:
+            conn.close()
+
+    def test_chunked_not_supported(self):
+        '''This test case ensures chunked request bodies are rejected.'''
+
+        self._start_server()
+
+        with socket.create_connection(("127.0.0.1", self._server.server_port), timeout=5) as sock:
+            sock.sendall(b"POST / HTTP/1.1\r\nHost: localhost\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+            self.assertIn(b" 411 ", sock.recv(1024).split(b"\r\n")[0] + b" ")
+
+        self.assertEqual([], self._environs)
+
+    def test_head_no_body(self):
+        '''This test case ensures HEAD responses contain the headers but no body.'''
+
+        conn = self._start_server()
+
+        try:
+            conn.request("HEAD", "/")
+            response = conn.getresponse()
+
+            self.assertEqual(200, response.status)
+            self.assertEqual("5", response.getheader("Content-Length"))
+            self.assertEqual(b"", response.read())
+        finally:
+            conn.close()
+
+    def test_body_limits(self):
+        '''This test case ensures invalid or too large content lengths are rejected and bodies which are not received in time
+        are answered with 408 (the connection task does not fail).'''
+
+        self._start_server(body_timeout=0.5, max_body_size=8)
+
+        for content_length, status in [("100", b" 413 "), ("abc", b" 400 "), ("-1", b" 400 "), ("4", b" 408 ")]:
+            with socket.create_connection(("127.0.0.1", self._server.server_port), timeout=5) as sock:
+                sock.sendall(b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: %s\r\n\r\nab" % content_length.encode())
+
+                self.assertIn(status, sock.recv(1024).split(b"\r\n")[0] + b" ")
+
+        self.assertEqual([], self._environs)
+
+    def test_slow_body(self):
+        '''This test case ensures bodies which are received slowly but steadily are not interrupted by body timeout.'''
+
+        self._start_server(body_timeout=0.3)
+
+        with socket.create_connection(("127.0.0.1", self._server.server_port), timeout=5) as sock:
+            sock.sendall(b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 8\r\nConnection: close\r\n\r\n")
+
+            for chunk in [b"ab", b"cd", b"ef", b"gh"]:
+                time.sleep(0.15)
+                sock.sendall(chunk)
+
+            response = b""
+
+            while True:
+                data = sock.recv(1024)
+
+                if not data:
+                    break
+
+                response += data
+
+        self.assertIn(b" 200 ", response.split(b"\r\n")[0] + b" ")
+        self.assertTrue(response.endswith(b"echo:abcdefgh"))
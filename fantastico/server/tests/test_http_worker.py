@@ -0,0 +1,309 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.tests.test_http_worker
+'''
+from fantastico.server.http_worker import FileWrapper, ThreadPoolWsgiServer
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+import http.client
+import os
+import socket
+import tempfile
+import threading
+
+class ThreadPoolWsgiServerTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for the thread pool HTTP/1.1 wsgi server used by production workers.'''
+
+    def init(self):
+        self._environs = []
+        self._file_path = None
+        self._server = None
+        self._thread = None
+
+    def cleanup(self):
+        if self._thread and self._thread.is_alive():
+            self._server.drain()
+            self._thread.join(5)
+
+        if self._server:
+            self._server.server_close()
+
+        if self._file_path:
+            os.remove(self._file_path)
+
+    def _app(self, environ, start_response):
+        '''This method is a simple wsgi application which echoes the request body.'''
+
+        self._environs.append(environ)
+
+        if environ["PATH_INFO"] == "/error":
+            raise Exception("Unexpected error.")
+
+        if environ["PATH_INFO"] == "/stream":
+            return self._stream(start_response)
+
+        if environ["PATH_INFO"] == "/file":
+            start_response("200 OK", [("Content-Length", "4")])
+
+            return environ["wsgi.file_wrapper"](open(self._file_path, "rb"))
+
+        body = environ["wsgi.input"].read()
+
+        start_response("200 OK", [("Content-Type", "text/plain")])
+
+        return [b"echo:", body]
+
+    def _stream(self, start_response):
+        '''This method is a generator response which starts the response lazily and yields chunks of unknown length.'''
+
+        start_response("200 OK", [("Content-Type", "text/plain")])
+
+        yield b""
+        yield b"chunk1,"
+        yield b"chunk2"
+
+    def _start_server(self, max_requests=0, **kwargs):
+        '''This method starts the server on a random port in a background thread.'''
+
+        self._server = ThreadPoolWsgiServer(("127.0.0.1", 0), self._app, threads=2, backlog=16, keepalive_timeout=2,
+                                            max_requests=max_requests, **kwargs)
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05})
+        self._thread.start()
+
+        return http.client.HTTPConnection("127.0.0.1", self._server.server_port, timeout=5)
+
+    def test_keepalive_ok(self):
+        '''This test case ensures multiple requests are served over the same connection and the wsgi environ is correctly
+        built.'''
+
+        conn = self._start_server()
+
+        try:
+            for idx in range(3):
+                conn.request("POST", "/simple/url%%20%s?a=b" % idx, body=b"body",
+                             headers={"Content-Type": "text/plain", "X-Custom": "custom"})
+                response = conn.getresponse()
+
+                self.assertEqual(200, response.status)
+                self.assertEqual("9", response.getheader("Content-Length"))
+                self.assertEqual(b"echo:body", response.read())
+        finally:
+            conn.close()
+
+        self.assertEqual(3, self._server.requests)
+
+        environ = self._environs[-1]
+
+        self.assertEqual("POST", environ["REQUEST_METHOD"])
+        self.assertEqual("/simple/url 2", environ["PATH_INFO"])
+        self.assertEqual("a=b", environ["QUERY_STRING"])
+        self.assertEqual("text/plain", environ["CONTENT_TYPE"])
+        self.assertEqual("4", environ["CONTENT_LENGTH"])
+        self.assertEqual("custom", environ["HTTP_X_CUSTOM"])
+        self.assertEqual("HTTP/1.1", environ["SERVER_PROTOCOL"])
+        self.assertNotIn("HTTP_CONTENT_TYPE", environ)
+        self.assertTrue(environ["wsgi.multithread"])
+
+    def test_max_requests_drain(self):
+        '''This test case ensures the server closes the connection and stops serving once max requests is reached.'''
+
+        conn = self._start_server(max_requests=2)
+
+        try:
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read()
+
+            self.assertIsNone(response.getheader("Connection"))
+            self.assertFalse(self._server.draining)
+
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read()
+
+            self.assertEqual("close", response.getheader("Connection"))
+        finally:
+            conn.close()
+
+        self._thread.join(5)
+
+        self.assertTrue(self._server.draining)
+        self.assertFalse(self._thread.is_alive())
+
+    def test_app_error(self):
+        '''This test case ensures unexpected application errors are converted to 500 responses and the connection is closed.'''
+
+        conn = self._start_server()
+
+        self._server.handle_error = lambda request, client_address: None
+
+        try:
+            conn.request("GET", "/error")
+            response = conn.getresponse()
+            response.read()
+
+            self.assertEqual(500, response.status)
+            self.assertEqual("close", response.getheader("Connection"))
+        finally:
+            conn.close()
+
+    def test_head_no_body(self):
+        '''This test case ensures HEAD responses contain the headers but no body.'''
+
+        conn = self._start_server()
+
+        try:
+            conn.request("HEAD", "/")
+            response = conn.getresponse()
+
+            self.assertEqual(200, response.status)
+            self.assertEqual("5", response.getheader("Content-Length"))
+            self.assertEqual(b"", response.read())
+        finally:
+            conn.close()
+
+    def test_stream_chunked(self):
+        '''This test case ensures lazily started responses of unknown length are streamed using chunked transfer encoding
+        and the connection is kept alive.'''
+
+        conn = self._start_server()
+
+        try:
+            for _ in range(2):
+                conn.request("GET", "/stream")
+                response = conn.getresponse()
+
+                self.assertEqual(200, response.status)
+                self.assertEqual("chunked", response.getheader("Transfer-Encoding"))
+                self.assertIsNone(response.getheader("Content-Length"))
+                self.assertEqual(b"chunk1,chunk2", response.read())
+        finally:
+            conn.close()
+
+        self.assertEqual(2, self._server.requests)
+
+    def test_stream_http10(self):
+        '''This test case ensures responses of unknown length are delimited by closing the connection for HTTP/1.0
+        clients.'''
+
+        self._start_server()
+
+        with socket.create_connection(("127.0.0.1", self._server.server_port), timeout=5) as sock:
+            sock.sendall(b"GET /stream HTTP/1.0\r\n\r\n")
+
+            response = b""
+
+            while True:
+                data = sock.recv(4096)
+
+                if not data:
+                    break
+
+                response += data
+
+        head, body = response.split(b"\r\n\r\n", 1)
+
+        self.assertIn(b"Connection: close", head)
+        self.assertNotIn(b"Transfer-Encoding", head)
+        self.assertEqual(b"chunk1,chunk2", body)
+
+    def test_file_wrapper_sendfile(self):
+        '''This test case ensures wsgi.file_wrapper responses are sent using sendfile and the file is closed.'''
+
+        fd, self._file_path = tempfile.mkstemp()
+        os.write(fd, b"file")
+        os.close(fd)
+
+        conn = self._start_server()
+
+        try:
+            conn.request("GET", "/file")
+            response = conn.getresponse()
+
+            self.assertEqual(200, response.status)
+            self.assertEqual(b"file", response.read())
+        finally:
+            conn.close()
+
+        self.assertIs(FileWrapper, self._environs[-1]["wsgi.file_wrapper"])
+
+        with open(self._file_path, "rb") as file_obj:
+            file_obj.read(1)
+
+            sock = Mock()
+            sock.sendfile = Mock(return_value=3)
+
+            self.assertEqual(3, FileWrapper(file_obj).sendfile(sock, 3))
+
+            sock.sendfile.assert_called_once_with(file_obj, offset=1, count=3)
+
+        file_obj = Mock()
+        file_obj.read = Mock(side_effect=[b"ab", b"c", b""])
+        file_obj.fileno = Mock(side_effect=OSError())
+
+        file_wrapper = FileWrapper(file_obj, blksize=2)
+
+        self.assertEqual([b"ab", b"c"], list(file_wrapper))
+        self.assertIsNone(file_wrapper.fileno())
+
+        file_wrapper.close()
+
+        file_obj.read.assert_called_with(2)
+        file_obj.close.assert_called_once_with()
+
+    def test_body_limits(self):
+        '''This test case ensures invalid or too large content lengths are rejected without reading the body and bodies which
+        are not received in time are answered with 408.'''
+
+        self._start_server(max_body_size=8)
+
+        for content_length, status in [("100", 413), ("abc", 400), ("-1", 400)]:
+            conn = http.client.HTTPConnection("127.0.0.1", self._server.server_port, timeout=5)
+
+            try:
+                conn.putrequest("POST", "/")
+                conn.putheader("Content-Length", content_length)
+                conn.endheaders()
+
+                response = conn.getresponse()
+                response.read()
+
+                self.assertEqual(status, response.status)
+                self.assertEqual("close", response.getheader("Connection"))
+            finally:
+                conn.close()
+
+        self._server.body_timeout = 0.3
+
+        with socket.create_connection(("127.0.0.1", self._server.server_port), timeout=5) as sock:
+            sock.sendall(b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 4\r\n\r\nab")
+
+            self.assertIn(b" 408 ", sock.recv(1024).split(b"\r\n")[0] + b" ")
+
+        self.assertEqual([], self._environs)
+
+    def test_max_requests_callback(self):
+        '''This test case ensures the max requests callback is invoked once (instead of draining the server).'''
+
+        self._server = ThreadPoolWsgiServer(("127.0.0.1", 0), self._app, max_requests=2,
+                                            on_max_requests=lambda: self._environs.append("max requests"))
+
+        for _ in range(3):
+            self.assertFalse(self._server.request_handled())
+
+        self.assertEqual(["max requests"], self._environs)
+        self.assertFalse(self._server.draining)
@@ -0,0 +1,368 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.tests.test_multiprocess_server
+'''
+from fantastico.server.async_worker import AsyncWsgiServer
+from fantastico.server.http_worker import ThreadPoolWsgiServer
+from fantastico.server.multiprocess_server import MultiprocessServer
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+import errno
+import gc
+import os
+import signal
+import socket
+
+class MultiprocessServerTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for the built in multi process production server.'''
+
+    def init(self):
+        self._config = {"host": "127.0.0.1",
+                        "port": 12001,
+                        "workers": 2,
+                        "threads": 4,
+                        "backlog": 128,
+                        "keepalive_timeout": 3,
+                        "body_timeout": 20,
+                        "max_requests": 100,
+                        "reuse_port": False,
+                        "graceful_timeout": 10}
+        self._warmup_config = {"prefork": False}
+
+        settings_facade = Mock()
+        settings_facade.get = lambda key: {"prod_server_config": self._config,
+                                           "warmup_config": self._warmup_config}.get(key)
+        self._settings_facade_cls = Mock(return_value=settings_facade)
+
+        self._app = Mock()
+        self._warmup = Mock()
+        self._warmup.run = Mock(return_value=self._app)
+        self._warmup_cls = Mock(return_value=self._warmup)
+
+        self._http_server = Mock()
+        self._server_cls = Mock(return_value=self._http_server)
+
+        self._next_pid = 100
+        self._exited = []
+
+        self._os_lib = Mock()
+        self._os_lib.WNOHANG = 1
+        self._os_lib.fork = self._fork
+        self._os_lib.waitpid = self._waitpid
+        self._os_lib.pipe = Mock(return_value=(10, 11))
+        self._os_lib.read = Mock(side_effect=BlockingIOError())
+
+        self._socket = Mock()
+        self._socket_lib = Mock()
+        self._socket_lib.AF_INET = socket.AF_INET
+        self._socket_lib.AF_INET6 = socket.AF_INET6
+        self._socket_lib.socket = Mock(return_value=self._socket)
+        del self._socket_lib.SO_REUSEPORT
+
+        self._signal_lib = Mock()
+        self._signal_lib.SIGTERM = signal.SIGTERM
+        self._signal_lib.SIGKILL = signal.SIGKILL
+
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=1000)
+
+        self._server = self._build_server()
+
+    def _build_server(self):
+        '''This method builds a server instance which uses mocked os, signal, socket and time libraries.'''
+
+        return MultiprocessServer(self._settings_facade_cls, warmup_cls=self._warmup_cls, server_cls=self._server_cls,
+                                  os_lib=self._os_lib, signal_lib=self._signal_lib, socket_lib=self._socket_lib,
+                                  time_provider=self._time_provider)
+
+    def _fork(self):
+        self._next_pid += 1
+
+        return self._next_pid
+
+    def _waitpid(self, pid, options):
+        self.assertEqual(-1, pid)
+        self.assertEqual(self._os_lib.WNOHANG, options)
+
+        if self._exited:
+            return self._exited.pop(0), 0
+
+        return 0, 0
+
+    def _mock_messages(self, *messages):
+        '''This method makes the mocked pipe return the given messages once and then report it is empty.'''
+
+        messages = list(messages)
+
+        def read(fd, size):
+            if messages:
+                return messages.pop(0)
+
+            raise BlockingIOError()
+
+        self._os_lib.read = Mock(side_effect=read)
+
+    def test_config_ok(self):
+        '''This test case ensures server configuration is correctly read from settings.'''
+
+        self.assertEqual("127.0.0.1", self._server.host)
+        self.assertEqual(12001, self._server.port)
+        self.assertEqual(2, self._server.workers_count)
+        self.assertFalse(self._server.reuse_port)
+        self.assertFalse(self._server.prefork)
+        self.assertFalse(self._server.running)
+
+    def test_reuse_port_supported(self):
+        '''This test case ensures reuse port is enabled only if the platform supports it.'''
+
+        self._config["reuse_port"] = True
+
+        self.assertFalse(self._build_server().reuse_port)
+
+        self._socket_lib.SO_REUSEPORT = 15
+
+        self.assertTrue(self._build_server().reuse_port)
+
+    def test_create_socket(self):
+        '''This test case ensures the listening socket is bound using the configured address and backlog.'''
+
+        sock = self._server._create_socket()
+
+        self.assertEqual(self._socket, sock)
+        self._socket_lib.socket.assert_called_once_with(socket.AF_INET, self._socket_lib.SOCK_STREAM)
+        self._socket.bind.assert_called_once_with(("127.0.0.1", 12001))
+        self._socket.listen.assert_called_once_with(128)
+
+    def test_create_socket_bind_error(self):
+        '''This test case ensures the socket is closed if it can not be bound.'''
+
+        self._socket.bind = Mock(side_effect=OSError(errno.EADDRINUSE, "Address in use"))
+
+        with self.assertRaises(OSError):
+            self._server._create_socket()
+
+        self._socket.close.assert_called_once_with()
+
+    def test_supervise_spawns_workers(self):
+        '''This test case ensures supervise forks the missing workers and replaces the exited ones.'''
+
+        self._server._running = True
+
+        self._server.supervise()
+
+        self.assertEqual([101, 102], sorted(self._server.workers))
+
+        self._server._pipe_read = 10
+        self._mock_messages(b"R101\nR102\n")
+        self._server.supervise()
+
+        self._exited.append(101)
+
+        self._server.supervise()
+
+        self.assertEqual([102, 103], sorted(self._server.workers))
+
+    def test_startup_failures_backoff(self):
+        '''This test case ensures workers which exit before they are ready are replaced with an exponential delay which is
+        reset once a worker is ready.'''
+
+        self._config["workers"] = 1
+        self._server._running = True
+        self._server._pipe_read = 10
+
+        self._server.supervise()
+
+        for failure, delay in [(1, 1.0), (2, 2.0), (3, 4.0)]:
+            self._exited.append(self._next_pid)
+            self._server.supervise()
+
+            self.assertEqual([], self._server.workers, failure)
+
+            self._time_provider.time = Mock(return_value=self._time_provider.time() + delay - 0.1)
+            self._server.supervise()
+            self.assertEqual([], self._server.workers)
+
+            self._time_provider.time = Mock(return_value=self._time_provider.time() + 0.1)
+            self._server.supervise()
+            self.assertEqual([self._next_pid], self._server.workers)
+
+        self._mock_messages(b"R%d\n" % self._next_pid)
+        self._server.supervise()
+
+        self._exited.append(self._next_pid)
+        self._server.supervise()
+
+        self.assertEqual([self._next_pid], self._server.workers)
+
+    def test_reload_recycles_workers(self):
+        '''This test case ensures a reload starts a new generation of workers and gracefully stops each old worker once a new
+        worker is ready.'''
+
+        self._server._running = True
+        self._server._pipe_read = 10
+        self._server.supervise()
+
+        self._server.reload()
+        self._server.supervise()
+
+        self.assertEqual([103, 104], sorted(self._server.workers))
+        self.assertEqual([101, 102], self._server._recycling)
+        self.assertEqual(0, self._os_lib.kill.call_count)
+
+        self._os_lib.read = Mock(side_effect=[b"R103\n", b"", BlockingIOError()])
+
+        self._server.supervise()
+
+        self._os_lib.kill.assert_called_once_with(101, signal.SIGTERM)
+        self.assertEqual([102], self._server._recycling)
+
+        self._time_provider.time = Mock(return_value=1011)
+        self._exited.append(101)
+
+        self._server.supervise()
+
+        self.assertEqual(1, self._os_lib.kill.call_count)
+        self.assertNotIn(101, self._server._retiring)
+
+    def test_max_requests_recycles_worker(self):
+        '''This test case ensures a worker which reached max requests is replaced and killed if it does not stop gracefully.'''
+
+        self._server._running = True
+        self._server._pipe_read = 10
+        self._server.supervise()
+
+        self._os_lib.read = Mock(side_effect=[b"M101\n", BlockingIOError(), b"R103\n", BlockingIOError(),
+                                             BlockingIOError()])
+
+        self._server.supervise()
+
+        self.assertEqual([102, 103], sorted(self._server.workers))
+        self.assertEqual([101], self._server._recycling)
+
+        self._server.supervise()
+
+        self.assertEqual([], self._server._recycling)
+        self._os_lib.kill.assert_called_once_with(101, signal.SIGTERM)
+
+        self._time_provider.time = Mock(return_value=1011)
+
+        self._server.supervise()
+
+        self._os_lib.kill.assert_called_with(101, signal.SIGKILL)
+
+    def test_start_stop(self):
+        '''This test case ensures start supervises workers until stop is requested and then gracefully stops all workers.'''
+
+        def sleep(interval):
+            self._server.stop()
+            self._exited.extend(self._server._retiring.keys())
+
+        self._time_provider.sleep = sleep
+
+        self._server.start()
+
+        self.assertFalse(self._server.running)
+        self.assertEqual([], self._server.workers)
+        self.assertEqual({}, self._server._retiring)
+        self._os_lib.kill.assert_any_call(101, signal.SIGTERM)
+        self._os_lib.kill.assert_any_call(102, signal.SIGTERM)
+        self._socket.close.assert_called_once_with()
+
+    def test_start_prefork(self):
+        '''This test case ensures the application is built in master when prefork is enabled.'''
+
+        self._warmup_config["prefork"] = True
+
+        def sleep(interval):
+            self._server.stop()
+            self._exited.extend(self._server._retiring.keys())
+
+        self._time_provider.sleep = sleep
+
+        self._server.start()
+
+        if hasattr(gc, "unfreeze"):
+            gc.unfreeze()
+
+        self._warmup.run.assert_called_once_with(open_db_pool=False)
+        self.assertEqual(self._app, self._server._app)
+
+    def test_run_worker(self):
+        '''This test case ensures a worker builds its application and serves it using the configured http server.'''
+
+        self._server._listen_socket = self._socket
+        self._server._pipe_read, self._server._pipe_write = 10, 11
+
+        self.assertEqual(0, self._server._run_worker())
+
+        self._warmup.run.assert_called_once_with()
+        self._os_lib.close.assert_called_once_with(10)
+        self._os_lib.write.assert_called_once_with(11, ("R%s\n" % os.getpid()).encode())
+
+        args, kwargs = self._server_cls.call_args
+
+        self.assertEqual((("127.0.0.1", 12001), self._app), args)
+        self.assertEqual(4, kwargs["threads"])
+        self.assertEqual(128, kwargs["backlog"])
+        self.assertEqual(3, kwargs["keepalive_timeout"])
+        self.assertEqual(20, kwargs["body_timeout"])
+        self.assertEqual(100, kwargs["max_requests"])
+        self.assertEqual(self._socket, kwargs["listen_socket"])
+        self.assertFalse(kwargs["reuse_port"])
+        self.assertTrue(kwargs["multiprocess"])
+
+        kwargs["on_max_requests"]()
+
+        self._os_lib.write.assert_called_with(11, ("M%s\n" % os.getpid()).encode())
+        self._http_server.serve_forever.assert_called_once_with()
+        self._http_server.server_close.assert_called_once_with()
+
+    def test_run_worker_prefork(self):
+        '''This test case ensures a worker forked from a master which built the application only opens its database pool.'''
+
+        self._server._app = self._app
+
+        self._server._run_worker()
+
+        self.assertEqual(0, self._warmup.run.call_count)
+        self._warmup.open_db_pool.assert_called_once_with()
+        self.assertEqual(self._app, self._server_cls.call_args[0][1])
+
+    def test_spawn_worker_child_exits(self):
+        '''This test case ensures the forked child process always exits after serving requests.'''
+
+        self._os_lib.fork = Mock(return_value=0)
+        self._server._run_worker = Mock(side_effect=Exception("Unexpected error"))
+
+        self._server._spawn_worker()
+
+        self._os_lib._exit.assert_called_once_with(1)
+
+    def test_frontend_selection(self):
+        '''This test case ensures workers http server is selected using frontend configuration.'''
+
+        self._config["frontend"] = "asyncio"
+
+        server = MultiprocessServer(self._settings_facade_cls)
+
+        self.assertEqual(AsyncWsgiServer, server._server_cls)
+
+        del self._config["frontend"]
+
+        server = MultiprocessServer(self._settings_facade_cls)
+
+        self.assertEqual(ThreadPoolWsgiServer, server._server_cls)
@@ -0,0 +1,134 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.tests.test_prod_server
+'''
+from fantastico.settings import BasicSettings
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock, patch
+import importlib
+import sys
+
+class WsgiFantasticoStarterTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for the production wsgi entry point. The module is always imported with mocked
+    settings and warm up so that the real application is never built.'''
+
+    MODULE_NAME = "fantastico.server.prod_server"
+
+    def init(self):
+        self._warmup_config = {"eager": False, "prefork": False}
+
+        self._settings_facade = Mock()
+        self._settings_facade.get = lambda key: self._warmup_config if key == "warmup_config" else None
+        self._settings_facade_cls = Mock(return_value=self._settings_facade)
+
+        self._fantastico = Mock(return_value=[b"response"])
+
+        self._warmup = Mock()
+        self._warmup.run = Mock(return_value=self._fantastico)
+        self._warmup_cls = Mock(return_value=self._warmup)
+
+    def _import_prod_server(self, uwsgi=None):
+        '''This method imports a fresh copy of prod server module using mocked settings, warm up and uwsgi modules. The
+        previously imported modules are restored afterwards. When uwsgi is None, importing uwsgi module fails.'''
+
+        old_modules = {name: sys.modules.pop(name) for name in [self.MODULE_NAME, "uwsgi"] if name in sys.modules}
+
+        sys.modules["uwsgi"] = uwsgi
+
+        try:
+            with patch("fantastico.settings.SettingsFacade", self._settings_facade_cls), \
+                 patch("fantastico.server.warmup.AppWarmUp", self._warmup_cls):
+                return importlib.import_module(self.MODULE_NAME)
+        finally:
+            sys.modules.pop(self.MODULE_NAME, None)
+            sys.modules.pop("uwsgi", None)
+            sys.modules.update(old_modules)
+
+    def test_eager_default(self):
+        '''This test case ensures the application is warmed up when the module is imported using default settings.'''
+
+        self._warmup_config = BasicSettings().warmup_config
+
+        prod_server = self._import_prod_server()
+
+        self.assertTrue(prod_server.application.eager)
+        self.assertTrue(prod_server.application.ready)
+        self._warmup.run.assert_called_once_with(open_db_pool=True)
+
+    def test_lazy_warmup(self):
+        '''This test case ensures a lazy application is warmed up (once) on the first request.'''
+
+        application = self._import_prod_server().application
+
+        self.assertFalse(application.ready)
+        self.assertEqual(0, self._warmup_cls.call_count)
+
+        start_response = Mock()
+
+        for _ in range(2):
+            self.assertEqual([b"response"], application({"PATH_INFO": "/"}, start_response))
+
+        self.assertTrue(application.ready)
+        self._warmup.run.assert_called_once_with(open_db_pool=True)
+        self.assertEqual(2, self._fantastico.call_count)
+
+    def test_prefork_freezes_gc(self):
+        '''This test case ensures prefork applications are built without database pools and the garbage collector is frozen
+        after warm up.'''
+
+        self._warmup_config = {"eager": True, "prefork": True}
+
+        gc_lib = Mock()
+
+        with patch("gc.collect", gc_lib.collect), patch("gc.freeze", gc_lib.freeze, create=True):
+            application = self._import_prod_server().application
+
+        self.assertTrue(application.prefork)
+        self._warmup.run.assert_called_once_with(open_db_pool=False)
+        gc_lib.collect.assert_called_once_with()
+        gc_lib.freeze.assert_called_once_with()
+
+    def test_post_fork(self):
+        '''This test case ensures post fork hooks are run in workers and the database pool is opened only if the application
+        was already built.'''
+
+        prod_server = self._import_prod_server()
+        application = prod_server.application
+
+        with patch.object(prod_server, "POST_FORK_HOOKS") as post_fork_hooks:
+            application.post_fork()
+
+            post_fork_hooks.run.assert_called_once_with()
+            self.assertEqual(0, self._warmup.open_db_pool.call_count)
+
+            application.warm_up()
+            application.post_fork()
+
+            self.assertEqual(2, post_fork_hooks.run.call_count)
+            self._warmup.open_db_pool.assert_called_once_with()
+
+    def test_uwsgi_post_fork_hook(self):
+        '''This test case ensures the application post fork method is registered as uWSGI post fork hook.'''
+
+        uwsgi = Mock()
+
+        prod_server = self._import_prod_server(uwsgi)
+
+        self.assertIs(uwsgi, prod_server.uwsgi)
+        self.assertEqual(prod_server.application.post_fork, uwsgi.post_fork_hook)
+
+        self.assertIsNone(self._import_prod_server().uwsgi)
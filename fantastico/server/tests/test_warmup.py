@@ -0,0 +1,100 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.tests.test_warmup
+'''
+from fantastico.rendering.bytecode_cache import InMemoryBytecodeCache
+from fantastico.server.warmup import AppWarmUp
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from mock import Mock
+import os
+import shutil
+import tempfile
+
+class AppWarmUpTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for application warm up executed before production workers accept traffic.'''
+
+    def init(self):
+        '''This method builds a project root folder containing a valid and an invalid template.'''
+
+        self._root_folder = tempfile.mkdtemp()
+
+        views_folder = os.path.join(self._root_folder, "component", "views")
+        os.makedirs(views_folder)
+
+        with open(os.path.join(views_folder, "hello.html"), "w") as tpl_file:
+            tpl_file.write("Hello {{name}}.")
+
+        with open(os.path.join(views_folder, "broken.html"), "w") as tpl_file:
+            tpl_file.write("{% if %}")
+
+        with open(os.path.join(views_folder, "logo.png"), "w") as tpl_file:
+            tpl_file.write("{% if %}")
+
+        self._bytecode_cache = InMemoryBytecodeCache()
+        self._warmup_config = {"db_connections": 0, "templates": True, "urls": []}
+
+        self._settings_facade = Mock()
+        self._settings_facade.get_root_folder = Mock(return_value=self._root_folder)
+        self._settings_facade.get = lambda key: {"warmup_config": self._warmup_config,
+                                                 "templates_config": {"bytecode_cache": self._bytecode_cache}}.get(key)
+        self._settings_facade_cls = Mock(return_value=self._settings_facade)
+
+        self._app = Mock()
+        self._app_cls = Mock(return_value=self._app)
+
+    def cleanup(self):
+        '''This method removes the project root folder used by test cases.'''
+
+        shutil.rmtree(self._root_folder)
+
+    def test_run_templates_compiled(self):
+        '''This test case ensures the application is built and all templates are compiled into the bytecode cache.'''
+
+        warmup = AppWarmUp(self._settings_facade_cls, self._app_cls)
+
+        self.assertEqual(self._app, warmup.run())
+
+        self._app_cls.assert_called_once_with(self._settings_facade_cls)
+
+        self.assertEqual(1, len(self._bytecode_cache))
+        self.assertEqual(1, len(warmup.errors))
+        self.assertTrue(warmup.errors[0][0].endswith("broken.html"))
+
+    def test_run_urls_invoked(self):
+        '''This test case ensures configured urls are invoked through the application and failed urls are reported.'''
+
+        self._warmup_config = {"templates": False, "urls": ["/ok/url", "/failing/url", "/missing/url"]}
+
+        statuses = {"/ok/url": "200 OK", "/failing/url": Exception("Unexpected error"), "/missing/url": "404 Not Found"}
+
+        def build_invoker(app, environ):
+            self.assertEqual(self._app, app)
+
+            status = statuses[environ["PATH_INFO"]]
+
+            invoker = Mock()
+            invoker.http_status = status
+            invoker.invoke_url = Mock(side_effect=status if isinstance(status, Exception) else None)
+
+            return invoker
+
+        warmup = AppWarmUp(self._settings_facade_cls, self._app_cls, build_invoker)
+        warmup.run()
+
+        self.assertEqual([("url /failing/url", "Unexpected error"),
+                          ("url /missing/url", "Unexpected http status 404 Not Found.")], warmup.errors)
+        self.assertEqual(0, len(self._bytecode_cache))
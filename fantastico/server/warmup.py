@@ -0,0 +1,143 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated 
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation 
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, 
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE 
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR 
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, 
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.server.warmup
+'''
+from fantastico import mvc
+from fantastico.middleware.fantastico_app import FantasticoApp
+from fantastico.mvc.base_controller import BaseController
+from fantastico.rendering.url_invoker import FantasticoUrlInternalInvoker
+from fantastico.settings import SettingsFacade
+from jinja2.loaders import FileSystemLoader
+from webob.request import Request
+import logging
+import os
+
+class AppWarmUp(object):
+    '''This class builds a fantastico application and prepares it for serving traffic before the worker accepts requests.
+    The warm up is configured through **warmup_config** setting and it executes the following steps:
+
+    #. builds the application (all middlewares are instantiated, all routes loaders are scanned and routes are registered).
+    #. opens **db_connections** pooled database connections.
+    #. compiles all templates found in **views** folders of the project (when **templates** is True).
+    #. invokes each of the configured **urls** through the internal url invoker.
+
+    Failures of the optional steps (database, templates and urls) do not prevent the application from starting; they are
+    logged and made available through :py:attr:`fantastico.server.warmup.AppWarmUp.errors`.
+
+    .. code-block:: python
+
+        fantastico_app = AppWarmUp().run()'''
+
+    TEMPLATES_FOLDER = "views"
+    TEMPLATES_EXTENSIONS = (".html", ".htm", ".xml", ".json", ".txt")
+
+    def __init__(self, settings_facade=SettingsFacade, app_cls=FantasticoApp, url_invoker_cls=FantasticoUrlInternalInvoker,
+                 os_lib=os):
+        self._settings_facade_cls = settings_facade
+        self._settings_facade = settings_facade()
+        self._app_cls = app_cls
+        self._url_invoker_cls = url_invoker_cls
+        self._os_lib = os_lib
+        self._logger = logging.getLogger(__name__)
+        self._errors = []
+
+    @property
+    def errors(self):
+        '''This property returns a list of (step, error message) tuples describing all failed warm up steps.'''
+
+        return self._errors
+
+    def run(self, open_db_pool=True):
+        '''This method executes all warm up steps and returns the application ready to serve traffic. Database pool is not
+        opened when open_db_pool is False (e.g when the warm up runs in a master process which forks workers).'''
+
+        warmup_config = self._settings_facade.get("warmup_config") or {}
+
+        fantastico_app = self._app_cls(self._settings_facade_cls)
+
+        if open_db_pool:
+            self.open_db_pool()
+
+        if warmup_config.get("templates"):
+            self._compile_templates()
+
+        for url in warmup_config.get("urls") or []:
+            self._invoke_url(fantastico_app, url)
+
+        return fantastico_app
+
+    def open_db_pool(self):
+        '''This method initializes the connection manager and opens **db_connections** pooled connections.'''
+
+        connections = (self._settings_facade.get("warmup_config") or {}).get("db_connections")
+
+        if not connections:
+            return
+
+        db_config = self._settings_facade.get("database_config")
+
+        try:
+            mvc.CONN_MANAGER = mvc.init_dm_db_engine(db_config, echo=db_config.get("show_sql", False))
+            mvc.CONN_MANAGER.open_pool(connections)
+        except Exception as ex:
+            self._add_error("database", ex)
+
+    def _compile_templates(self):
+        '''This method compiles all templates from project views folders into the shared templates bytecode cache.'''
+
+        templates_config = self._settings_facade.get("templates_config")
+
+        for dir_path, dir_names, _ in self._os_lib.walk(self._settings_facade.get_root_folder()):
+            dir_names[:] = [dir_name for dir_name in dir_names if not dir_name.startswith((".", "__"))]
+
+            if self._os_lib.path.basename(dir_path) != self.TEMPLATES_FOLDER:
+                continue
+
+            tpl_env = BaseController.build_templates_env(FileSystemLoader(searchpath=dir_path), templates_config)
+            tpl_env.fantastico_request = None
+
+            for tpl_name in tpl_env.loader.list_templates():
+                if not tpl_name.endswith(self.TEMPLATES_EXTENSIONS):
+                    continue
+
+                try:
+                    tpl_env.get_template(tpl_name)
+                except Exception as ex:
+                    self._add_error("template %s" % self._os_lib.path.join(dir_path, tpl_name), ex)
+
+    def _invoke_url(self, fantastico_app, url):
+        '''This method invokes the given url through the whole application pipeline.'''
+
+        url_invoker = self._url_invoker_cls(fantastico_app, Request.blank(url).environ)
+
+        try:
+            url_invoker.invoke_url(url, {})
+        except Exception as ex:
+            self._add_error("url %s" % url, ex)
+            return
+
+        http_status = str(url_invoker.http_status)
+
+        if not http_status.startswith(("2", "3")):
+            self._add_error("url %s" % url, "Unexpected http status %s." % http_status)
+
+    def _add_error(self, step, error):
+        '''This method records a failed warm up step.'''
+
+        self._errors.append((step, str(error)))
+
+        self._logger.warning("Fantastico warm up step %s failed: %s", step, error)
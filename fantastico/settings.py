@@ -18,10 +18,11 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 .. py:module:: fantastico.settings
 '''
 
-from fantastico.exceptions import FantasticoSettingNotFoundError
+from fantastico.exceptions import FantasticoSettingNotFoundError, FantasticoNotSupportedError
 from fantastico.rendering.component import Component
 from fantastico.utils import instantiator
 import os
+import threading
 
 class BasicSettings(object):
     '''This is the core class that describes all available settings of fantastico framework. For convenience all options
@@ -39,11 +40,375 @@ class BasicSettings(object):
         '''Property that holds all installed middlewares.'''
 
         return ["fantastico.middleware.request_middleware.RequestMiddleware",
+                "fantastico.middleware.cors_middleware.CorsMiddleware",
                 "fantastico.middleware.model_session_middleware.ModelSessionMiddleware",
                 "fantastico.middleware.routing_middleware.RoutingMiddleware",
                 "fantastico.oauth2.middleware.exceptions_middleware.OAuth2ExceptionsMiddleware",
                 "fantastico.oauth2.middleware.tokens_middleware.OAuth2TokensMiddleware"]
 
+    @property
+    def middleware_timing(self):
+        '''Property that enables latency histograms for each installed middleware (and for controllers execution). Histograms
+        are available through :py:attr:`fantastico.middleware.fantastico_app.FantasticoApp.pipeline`. By default, this is
+        disabled.'''
+
+        return False
+
+    @property
+    def metrics_config(self):
+        '''This property holds the configuration of :py:data:`fantastico.utils.metrics.METRICS` registry. **/__metrics** route
+        is registered only when **expose** is True; requests must then send **Authorization: Bearer <token>** (if **token**
+        is configured) and come from one of **allowed_ips** (if configured). When **mmap_file** is specified, each worker
+        publishes its metrics (at most once every **publish_interval** seconds) into a slot of the shared memory file and
+        **/__metrics** aggregates all workers. Snapshots larger than **slot_size** bytes are not published (an error is
+        logged), so increase it for many labeled metrics. By default, metrics are not exposed.
+
+        .. code-block:: python
+
+            config = {"expose": True,
+                      "token": "my secret token",
+                      "allowed_ips": ["127.0.0.1", "10.0.0.5"],
+                      "mmap_file": "/tmp/fantastico-metrics.mmap",
+                      "slots": 64,
+                      "slot_size": 65536,
+                      "publish_interval": 1.0}
+        '''
+
+        return {"expose": False,
+                "token": None,
+                "allowed_ips": None,
+                "mmap_file": None,
+                "slots": 64,
+                "slot_size": 65536,
+                "publish_interval": 1.0}
+
+    @property
+    def invalidation_config(self):
+        '''This property holds the configuration of :py:data:`fantastico.utils.invalidation_bus.INVALIDATION_BUS`. When
+        **mmap_file** is specified, invalidations published by a worker (model writes, client changes, purged cache tags) are
+        visible to all workers of the host; each worker checks for invalidations at most once every **poll_interval** seconds
+        which bounds the staleness of data cached by subscribers. Cached controller responses check their tags on every
+        lookup so they are never served stale. By default, invalidations are visible only in the worker which published them
+        so **mmap_file** must be set when running multiple workers. The file must be private to the user running the workers;
+        True places it into the private folder of the current user.
+
+        .. code-block:: python
+
+            config = {"mmap_file": True,
+                      "slots": 4096,
+                      "poll_interval": 1.0}
+        '''
+
+        return {"mmap_file": None,
+                "slots": 4096,
+                "poll_interval": 1.0}
+
+    @property
+    def profiling_config(self):
+        '''This property holds the configuration of
+        :py:class:`fantastico.middleware.profiling_middleware.ProfilingMiddleware`. Profiles are written into **spool_folder**
+        for requests carrying a signed profiling header (signed with **secret** and valid for **signature_ttl** seconds) and
+        for 1 in **sample_every** requests (0 disables sampling). Each worker profiles at most one request every
+        **min_interval** seconds and at most **max_profiles** profiles are kept for each route (the oldest are removed). By
+        default, sampling and signed headers are disabled.'''
+
+        return {"spool_folder": "/tmp/fantastico-profiles",
+                "sample_every": 0,
+                "secret": None,
+                "signature_ttl": 300,
+                "max_profiles": 100,
+                "min_interval": 1.0}
+
+    @property
+    def access_log_config(self):
+        '''This property holds the configuration of
+        :py:class:`fantastico.middleware.access_log_middleware.AccessLogMiddleware`. Access log is written into **file_path**
+        by all workers. It is not rotated by fantastico: use an external tool (e.g logrotate) because the file is reopened
+        once it was moved. At most **queue_size** records are kept in memory; they are written in batches of at most
+        **batch_size** records. By default, access log is disabled.'''
+
+        return {"file_path": None,
+                "queue_size": 10000,
+                "batch_size": 256,
+                "flush_interval": 1.0}
+
+    @property
+    def admission_config(self):
+        '''This property holds the configuration of
+        :py:class:`fantastico.middleware.admission_middleware.AdmissionControlMiddleware`. At most **max_concurrency**
+        requests (None means unlimited) execute concurrently and each configured route pattern has its own limit. Requests
+        waiting more than **queue_timeout** seconds (or when more than **max_queue** requests already wait for the same lane)
+        are rejected with 503 and **Retry-After** set to **retry_after** seconds. **reserved** routes execute in a separate
+        lane which is not affected by the other limits.
+
+        .. code-block:: python
+
+            config = {"max_concurrency": 40,
+                      "queue_timeout": 1.0,
+                      "max_queue": 200,
+                      "retry_after": 1,
+                      "routes": [{"pattern": "^/api/", "max_concurrency": 20, "queue_timeout": 0.5}],
+                      "reserved": {"patterns": ["^/.*/static/", "^/favicon.ico$", "^/__metrics$"],
+                                   "max_concurrency": 8}}
+        '''
+
+        return {"max_concurrency": None,
+                "queue_timeout": 1.0,
+                "max_queue": None,
+                "retry_after": 1,
+                "routes": [],
+                "reserved": {"patterns": ["^/.*/static/", "^/favicon.ico$", "^/__metrics$"],
+                             "max_concurrency": None}}
+
+    @property
+    def coalescing_config(self):
+        '''This property holds the configuration of
+        :py:class:`fantastico.middleware.coalescing_middleware.RequestCoalescingMiddleware`. Identical concurrent GET requests
+        for urls matching one of **routes** patterns are executed only once. Requests are identical when they have the same
+        path, query string and **vary_headers** values. Waiting requests execute the controller themselves if the first
+        request does not complete in **timeout** seconds. By default, no route is coalesced.
+
+        .. code-block:: python
+
+            config = {"routes": ["^/api/latest/", "^/dynamic/"],
+                      "vary_headers": ["Accept", "Accept-Encoding", "Accept-Language", "Authorization", "Cookie"],
+                      "timeout": 5.0}
+        '''
+
+        return {"routes": [],
+                "vary_headers": ["Accept", "Accept-Encoding", "Accept-Language", "Authorization", "Cookie"],
+                "timeout": 5.0}
+
+    @property
+    def cache_config(self):
+        '''This property holds the cache backends used by :py:class:`fantastico.mvc.cache_decorator.Cached` (and other
+        components relying on :py:data:`fantastico.utils.cache_backends.CACHES`). Each backend is described by the full
+        name of its class (**backend**) and the keyword arguments passed to its constructor. **default_backend** is used
+        when no backend is explicitly requested. **memory** entries are private to each worker process while **file** and
+        **shared** (memory mapped, see :py:class:`fantastico.utils.shared_cache.SharedMemoryCache`) entries are shared by all
+        workers of a host. Their files must be private to the user running the workers (a private folder is used by default).
+
+        .. code-block:: python
+
+            config = {"default_backend": "memory",
+                      "backends": {"memory": {"backend": "fantastico.utils.lru_cache.LruCache", "max_size": 1024},
+                                   "file": {"backend": "fantastico.utils.cache_backends.FileCacheBackend",
+                                            "folder": "/var/cache/my-app"},
+                                   "shared": {"backend": "fantastico.utils.shared_cache.SharedMemoryCache",
+                                              "path": "/dev/shm/fantastico-cache",
+                                              "slabs": [(1024, 4096), (16384, 512), (65536, 64)]}}}
+        '''
+
+        return {"default_backend": "memory",
+                "backends": {"memory": {"backend": "fantastico.utils.lru_cache.LruCache", "max_size": 1024,
+                                        "name": "responses"},
+                             "file": {"backend": "fantastico.utils.cache_backends.FileCacheBackend",
+                                      "folder": None},
+                             "shared": {"backend": "fantastico.utils.shared_cache.SharedMemoryCache",
+                                        "name": "shared"}}}
+
+    @property
+    def http_cache_config(self):
+        '''This property holds the configuration of :py:class:`fantastico.middleware.http_cache_middleware.HttpCacheMiddleware`.
+        Responses are stored into **backend** (one of the backends from **cache_config** setting; None means the default
+        backend) if their body is not bigger than **max_entry_size** bytes. At most **refresh_threads** stale responses are
+        refreshed concurrently in background by each worker.
+
+        .. code-block:: python
+
+            config = {"backend": "shared",
+                      "max_entry_size": 1048576,
+                      "refresh_threads": 2}
+        '''
+
+        return {"backend": None,
+                "max_entry_size": 1048576,
+                "refresh_threads": 2}
+
+    @property
+    def conditional_config(self):
+        '''This property holds the configuration of
+        :py:class:`fantastico.middleware.conditional_middleware.ConditionalGetMiddleware`. ETags are computed only for responses
+        which are not bigger than **max_body_size** bytes.
+
+        .. code-block:: python
+
+            config = {"max_body_size": 10485760}
+        '''
+
+        return {"max_body_size": 10485760}
+
+    @property
+    def cors_config(self):
+        '''This property holds the configuration of :py:class:`fantastico.middleware.cors_middleware.CorsMiddleware`. CORS is
+        enabled for urls located under the given **paths** (by default **roa_api** setting, **/roa** and **/oauth**). Cross
+        origin requests are accepted from **allowed_origins** (**\*** means any origin; it can not be combined with
+        **allow_credentials**) for the given **allowed_methods**. When **allowed_headers** is None, all headers requested by
+        preflight requests are allowed. **max_age** is the number of seconds browsers can cache preflight responses.
+
+        .. code-block:: python
+
+            config = {"paths": ["/api", "/roa", "/oauth"],
+                      "allowed_origins": ["https://app.fantastico.com"],
+                      "allowed_methods": ["OPTIONS", "GET", "POST", "PUT", "DELETE"],
+                      "allowed_headers": ["Authorization", "Content-Type"],
+                      "expose_headers": ["Location"],
+                      "allow_credentials": False,
+                      "max_age": 86400}
+        '''
+
+        return {"paths": None,
+                "allowed_origins": ["*"],
+                "allowed_methods": ["OPTIONS", "GET", "POST", "PUT", "DELETE"],
+                "allowed_headers": None,
+                "expose_headers": ["Location"],
+                "allow_credentials": False,
+                "max_age": 86400}
+
+    @property
+    def compression_config(self):
+        '''This property holds the configuration of
+        :py:class:`fantastico.middleware.compression_middleware.CompressionMiddleware`. Responses are compressed using one of the
+        **encodings** accepted by the client (in the given order of preference) if their content type is listed in
+        **content_types** and their body has at least **min_size** bytes. **level** is the zlib compression level. Compressed
+        bodies of responses which carry an **ETag** are remembered (at most **etag_cache_size** of them) so that they are
+        compressed only once.
+
+        .. code-block:: python
+
+            config = {"encodings": ["gzip", "deflate"],
+                      "min_size": 1024,
+                      "level": 6,
+                      "etag_cache_size": 256,
+                      "content_types": ["text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+                                        "application/json", "application/xml", "image/svg+xml"]}
+        '''
+
+        return {"encodings": ["gzip", "deflate"],
+                "min_size": 1024,
+                "level": 6,
+                "etag_cache_size": 256,
+                "content_types": ["text/html", "text/css", "text/plain", "text/javascript", "application/javascript",
+                                  "application/json", "application/xml", "image/svg+xml"]}
+
+    @property
+    def static_assets_config(self):
+        '''This property holds the configuration of :py:class:`fantastico.mvc.static_assets_controller.StaticAssetsController`.
+        Assets are cached by clients for **max_age** seconds (0 means clients must revalidate them on each usage) while
+        fingerprinted assets are cached for **fingerprinted_max_age** seconds. When **precompressed** is True, **.gz** siblings
+        of assets are sent to clients which accept gzip. Files having at most **hot_file_max_size** bytes are kept memory mapped
+        (at most **hot_cache_size** of them). When **x_accel_redirect** is set, assets are sent by nginx from the given internal
+        location.
+
+        .. code-block:: python
+
+            config = {"max_age": 3600,
+                      "fingerprinted_max_age": 31536000,
+                      "precompressed": True,
+                      "hot_cache_size": 256,
+                      "hot_file_max_size": 65536,
+                      "x_accel_redirect": "/_static/"}
+        '''
+
+        return {"max_age": 0,
+                "fingerprinted_max_age": 31536000,
+                "precompressed": True,
+                "hot_cache_size": 256,
+                "hot_file_max_size": 65536,
+                "x_accel_redirect": None}
+
+    @property
+    def assets_config(self):
+        '''This property holds the configuration of :py:class:`fantastico.rendering.assets_manifest.AssetsManifest` and
+        :py:class:`fantastico.sdk.commands.command_assets.SdkCommandAssets`. **manifest** is the location of the assets
+        manifest relative to the folder where the settings profile is defined. Asset urls are prefixed with **url_prefix**
+        (e.g a cdn location). The manifest is checked for changes at most once every **check_interval** seconds (None means
+        the manifest is loaded only once per process).
+
+        .. code-block:: python
+
+            config = {"manifest": "assets_manifest.json",
+                      "url_prefix": "https://cdn.fantastico.com/",
+                      "check_interval": None}
+        '''
+
+        return {"manifest": "assets_manifest.json",
+                "url_prefix": "/",
+                "check_interval": 2}
+
+    @property
+    def warmup_config(self):
+        '''This property holds the configuration of the warm up executed by
+        :py:class:`fantastico.server.warmup.AppWarmUp` before a production worker accepts traffic. When **eager** is True,
+        the application is built and warmed up when the production wsgi module is imported. **db_connections** pooled
+        connections are opened, all templates are compiled (if **templates** is True) and each of the given **urls** is
+        invoked internally. When **prefork** is True, the application is built in the master process and shared by all forked
+        workers (see :py:class:`fantastico.server.prod_server.WsgiFantasticoStarter` for uWSGI and
+        :py:class:`fantastico.server.multiprocess_server.MultiprocessServer`).
+
+        .. code-block:: python
+
+            config = {"eager": True,
+                      "prefork": False,
+                      "db_connections": 5,
+                      "templates": True,
+                      "urls": ["/mvc/hello-world"]}
+        '''
+
+        return {"eager": True,
+                "prefork": False,
+                "db_connections": 1,
+                "templates": True,
+                "urls": []}
+
+    @property
+    def prod_server_config(self):
+        '''This property holds the configuration of the built in multi process production server
+        (:py:class:`fantastico.server.multiprocess_server.MultiprocessServer`). **workers** processes (by default, one for
+        each cpu) share the listening socket (each worker binds its own **SO_REUSEPORT** socket when **reuse_port** is True and
+        the platform supports it) and each worker serves requests using a pool of **threads** threads. Connections are handled
+        by the pool threads (**frontend** is **threads**) or by an event loop (**frontend** is **asyncio**); at most
+        **max_pending** requests (by default, derived from **threads**) wait for a free thread. **backlog** is the
+        size of the pending connections queue and idle keep alive connections are closed after **keepalive_timeout**
+        seconds. Request bodies bigger than **max_body_size** bytes are rejected (413) and requests whose client does not send
+        any body data for **body_timeout** seconds are rejected (408). A worker is gracefully recycled
+        (replaced by a new worker) after it handled **max_requests** requests (0 means never). On stop, reload or recycle,
+        workers are given **graceful_timeout** seconds to complete the requests in progress. Workers which fail to start are
+        replaced with an exponential delay of at most **max_respawn_delay** seconds.
+
+        .. code-block:: python
+
+            config = {"host": "0.0.0.0",
+                      "port": 12000,
+                      "workers": 4,
+                      "frontend": "asyncio",
+                      "threads": 10,
+                      "max_pending": 100,
+                      "max_body_size": 10485760,
+                      "body_timeout": 30,
+                      "backlog": 1024,
+                      "keepalive_timeout": 5,
+                      "max_requests": 10000,
+                      "reuse_port": True,
+                      "graceful_timeout": 30,
+                      "max_respawn_delay": 30}
+        '''
+
+        return {"host": "0.0.0.0",
+                "port": 12000,
+                "workers": None,
+                "frontend": "threads",
+                "threads": 10,
+                "max_pending": None,
+                "max_body_size": 10485760,
+                "body_timeout": 30,
+                "backlog": 1024,
+                "keepalive_timeout": 5,
+                "max_requests": 0,
+                "reuse_port": True,
+                "graceful_timeout": 30,
+                "max_respawn_delay": 30}
+
     @property
     def supported_languages(self):
         '''Property that holds all supported languages by this fantastico instance.'''
@@ -55,6 +420,7 @@ class BasicSettings(object):
         '''This property holds all routes loaders available.'''
 
         return ["fantastico.routing_engine.dummy_routeloader.DummyRouteLoader",
+                "fantastico.routing_engine.metrics_routeloader.MetricsRouteLoader",
                 "fantastico.mvc.controller_registrator.ControllerRouteLoader",
                 "fantastico.roa.resources_registrator.ResourcesRegistrator"]
 
@@ -207,6 +573,123 @@ class AwsStageSettings(BasicSettings):
 
         return db_config
 
+class ReadOnlyDict(dict):
+    '''This class provides a dictionary which can not be changed once built. It is used by settings snapshots so that setting
+    values shared by all requests can not be altered by accident.'''
+
+    def _readonly(self, *args, **kwargs):
+        '''This method is used to replace all dictionary methods which change the dictionary.'''
+
+        raise FantasticoNotSupportedError("Settings values are read only.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+class ReadOnlyList(list):
+    '''This class provides a list which can not be changed once built. It is used by settings snapshots so that setting
+    values shared by all requests can not be altered by accident.'''
+
+    def _readonly(self, *args, **kwargs):
+        '''This method is used to replace all list methods which change the list.'''
+
+        raise FantasticoNotSupportedError("Settings values are read only.")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+class SettingsSnapshot(object):
+    '''This class provides an immutable snapshot of a settings profile. All public attributes of the profile are computed
+    once, when the snapshot is built, and are exposed as read only values (dictionaries and lists are converted to
+    :py:class:`fantastico.settings.ReadOnlyDict` and :py:class:`fantastico.settings.ReadOnlyList`). Attributes which raise
+    an exception are remembered and the exception is reported each time the attribute is requested.
+
+    In addition, the snapshot validates the profile and precomputes values derived from settings. Derived values are
+    available like any other setting:
+
+    * **supported_languages_lookup** - a dictionary which maps every prefix of every supported language to the first
+      supported language starting with that prefix. It is used for detecting the language of each request.'''
+
+    def __init__(self, config):
+        self._config = config
+        self._values = {}
+        self._errors = {}
+
+        for attr_name in dir(config.__class__):
+            if attr_name.startswith("_"):
+                continue
+
+            try:
+                self._values[attr_name] = self._freeze(getattr(config, attr_name))
+            except Exception as ex:
+                self._errors[attr_name] = ex
+
+        self._values.update(self._build_derived_values())
+
+    @property
+    def config(self):
+        '''This property returns the settings profile instance from which this snapshot was built.'''
+
+        return self._config
+
+    def get(self, name):
+        '''This method returns the precomputed value of the given setting.'''
+
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+
+        ex = self._errors.get(name)
+
+        if ex:
+            raise FantasticoSettingNotFoundError("Exception thrown for attribute %s : %s" % (name, str(ex)))
+
+        try:
+            return getattr(self._config, name)
+        except AttributeError as ex:
+            raise FantasticoSettingNotFoundError("Attribute %s could not be obtained: %s" % (name, str(ex)))
+        except Exception as ex:
+            raise FantasticoSettingNotFoundError("Exception thrown for attribute %s : %s" % (name, str(ex)))
+
+    def _build_derived_values(self):
+        '''This method validates the settings profile and builds all values derived from settings.'''
+
+        derived = {}
+
+        supported_langs = self._values.get("supported_languages")
+
+        if supported_langs is not None:
+            if len(supported_langs) == 0:
+                raise FantasticoSettingNotFoundError("Settings profile %s must support at least one language." % \
+                                                     self._config.__class__.__name__)
+
+            derived["supported_languages_lookup"] = self._build_languages_lookup(supported_langs)
+
+        return derived
+
+    def _build_languages_lookup(self, supported_langs):
+        '''This method builds a dictionary which maps every prefix of every supported language to the first supported language
+        which starts with the prefix.'''
+
+        lookup = {}
+
+        for lang in supported_langs:
+            for idx in range(1, len(lang) + 1):
+                lookup.setdefault(lang[:idx], lang)
+
+        return ReadOnlyDict(lookup)
+
+    def _freeze(self, value):
+        '''This method recursively converts dictionaries and lists into read only structures.'''
+
+        if isinstance(value, dict):
+            return ReadOnlyDict((key, self._freeze(item)) for key, item in value.items())
+
+        if isinstance(value, list):
+            return ReadOnlyList(self._freeze(item) for item in value)
+
+        return value
+
 class SettingsFacade(object):
     '''For using a specific fantastico configuration you need to do two simple steps:
 
@@ -219,9 +702,17 @@ class SettingsFacade(object):
 
          print(SettingsFacade().get("installed_middleware"))
 
-    If no active configuration is set in the :py:class:`fantastico.settings.BasicSettings` will be used.'''
+    If no active configuration is set in the :py:class:`fantastico.settings.BasicSettings` will be used.
+
+    The active configuration is resolved only once per process into a :py:class:`fantastico.settings.SettingsSnapshot` which
+    is shared by all facades using the same configuration. This means **get** method is a simple dictionary lookup.'''
 
     __ENV_ACTIVE_CONFIG = "FANTASTICO_ACTIVE_CONFIG"
+    __DEFAULT_CONFIG = "fantastico.settings.BasicSettings"
+
+    _SNAPSHOTS = {}
+    _SNAPSHOTS_LOCK = threading.Lock()
+    _FACADES = {}
 
     def __init__(self, environ=None):
         self._environ = environ
@@ -229,7 +720,30 @@ class SettingsFacade(object):
         if self._environ is None:
             self._environ = os.environ
 
-        self._cached_config = None
+        self._snapshot = None
+
+    @classmethod
+    def for_environ(cls, environ):
+        '''This method returns a shared settings facade for the active configuration described by the given environ. It
+        is recommended to use it on hot paths (e.g once per request) instead of building new facades.'''
+
+        active_config = environ.get(cls.__ENV_ACTIVE_CONFIG) or cls.__DEFAULT_CONFIG
+
+        facade = cls._FACADES.get(active_config)
+
+        if not facade:
+            facade = cls._FACADES[active_config] = cls({cls.__ENV_ACTIVE_CONFIG: active_config})
+
+        return facade
+
+    @classmethod
+    def clear_snapshots(cls):
+        '''This method discards all settings snapshots built in the current process. Next facade usage will resolve and
+        snapshot the active configuration again.'''
+
+        with cls._SNAPSHOTS_LOCK:
+            cls._SNAPSHOTS.clear()
+            cls._FACADES.clear()
 
     def get(self, name):
         '''Method used to retrieve a setting value.
@@ -239,14 +753,7 @@ class SettingsFacade(object):
         :returns: The setting value.
         :rtype: object'''
 
-        try:
-            self._cached_config = self._cached_config or self.get_config()
-
-            return getattr(self._cached_config, name)
-        except AttributeError as ex:
-            raise FantasticoSettingNotFoundError("Attribute %s could not be obtained: %s" % (name, str(ex)))
-        except Exception as ex:
-            raise FantasticoSettingNotFoundError("Exception thrown for attribute %s : %s" % (name, str(ex)))
+        return (self._snapshot or self.get_snapshot()).get(name)
 
     def get_config(self):
         '''Method used to return the active configuration which is used by this facade.
@@ -254,11 +761,32 @@ class SettingsFacade(object):
         :rtype: :py:class:`fantastico.settings.BasicSettings`
         :returns: Active configuration currently used.'''
 
-        active_config = self._environ.get(self.__ENV_ACTIVE_CONFIG) or "fantastico.settings.BasicSettings"
+        return self.get_snapshot().config
+
+    def get_snapshot(self):
+        '''Method used to return the immutable snapshot of the active configuration. The snapshot is built only once per
+        process for each configuration.
+
+        :rtype: :py:class:`fantastico.settings.SettingsSnapshot`'''
+
+        if self._snapshot:
+            return self._snapshot
+
+        active_config = self._environ.get(self.__ENV_ACTIVE_CONFIG) or self.__DEFAULT_CONFIG
+
+        snapshot = SettingsFacade._SNAPSHOTS.get(active_config)
+
+        if not snapshot:
+            with SettingsFacade._SNAPSHOTS_LOCK:
+                snapshot = SettingsFacade._SNAPSHOTS.get(active_config)
+
+                if not snapshot:
+                    snapshot = SettingsSnapshot(instantiator.instantiate_class(active_config))
+                    SettingsFacade._SNAPSHOTS[active_config] = snapshot
 
-        self._cached_config = self._cached_config or instantiator.instantiate_class(active_config)
+        self._snapshot = snapshot
 
-        return self._cached_config
+        return snapshot
 
     def get_root_folder(self):
         '''Method used to return the root folder of the current fantastico project (detected starting from settings)
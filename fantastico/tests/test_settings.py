@@ -19,8 +19,8 @@ ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEAL
 '''
 
 from fantastico.exceptions import FantasticoClassNotFoundError, \
-    FantasticoSettingNotFoundError
-from fantastico.settings import SettingsFacade, BasicSettings
+    FantasticoSettingNotFoundError, FantasticoNotSupportedError
+from fantastico.settings import SettingsFacade, BasicSettings, SettingsSnapshot
 from fantastico.tests.base_case import FantasticoUnitTestsCase
 
 class SampleSettings(BasicSettings):
@@ -30,6 +30,13 @@ class SampleSettings(BasicSettings):
     def installed_middleware(self):
         raise Exception("Internal error")
 
+class MultiLanguageSettings(BasicSettings):
+    '''Just a simple settings implementation which supports multiple languages.'''
+
+    @property
+    def supported_languages(self):
+        return ["en_us", "ro_ro", "en"]
+
 class TestSettingsFacadeSuite(FantasticoUnitTestsCase):
     '''Test suite for settings facade functionality.'''
 
@@ -65,6 +72,7 @@ class TestSettingsFacadeSuite(FantasticoUnitTestsCase):
 
         self.assertGreaterEqual(len(installed_middleware), 3)
         self.assertEqual(["fantastico.middleware.request_middleware.RequestMiddleware",
+                          "fantastico.middleware.cors_middleware.CorsMiddleware",
                           "fantastico.middleware.model_session_middleware.ModelSessionMiddleware",
                           "fantastico.middleware.routing_middleware.RoutingMiddleware",
                           "fantastico.oauth2.middleware.exceptions_middleware.OAuth2ExceptionsMiddleware",
@@ -93,3 +101,39 @@ class TestSettingsFacadeSuite(FantasticoUnitTestsCase):
         root_folder = self._settings.get_root_folder()
 
         self.assertEqual(expected_root, root_folder)
+
+    def test_get_snapshot_shared(self):
+        '''Test case that ensures the active configuration is resolved only once per process.'''
+
+        self._environ["FANTASTICO_ACTIVE_CONFIG"] = "fantastico.settings.BasicSettings"
+
+        snapshot = self._settings.get_snapshot()
+
+        self.assertIsInstance(snapshot, SettingsSnapshot)
+        self.assertIs(snapshot, SettingsFacade({"FANTASTICO_ACTIVE_CONFIG": "fantastico.settings.BasicSettings"}).get_snapshot())
+        self.assertIs(snapshot.config, self._settings.get_config())
+        self.assertIs(SettingsFacade.for_environ(self._environ), SettingsFacade.for_environ(self._environ))
+
+    def test_get_setting_readonly(self):
+        '''Test case that ensures settings values obtained from the facade can not be changed.'''
+
+        installed_middleware = self._settings.get("installed_middleware")
+        db_config = self._settings.get("database_config")
+
+        self.assertEqual(BasicSettings().database_config, db_config)
+
+        self.assertRaises(FantasticoNotSupportedError, installed_middleware.append, "new.Middleware")
+        self.assertRaises(FantasticoNotSupportedError, db_config.__setitem__, "host", "new-host")
+        self.assertRaises(FantasticoNotSupportedError, db_config["additional_params"].update, {"charset": "latin1"})
+
+    def test_snapshot_languages_lookup(self):
+        '''Test case that ensures supported languages lookup table is precomputed correctly.'''
+
+        snapshot = SettingsSnapshot(MultiLanguageSettings())
+
+        lookup = snapshot.get("supported_languages_lookup")
+
+        self.assertEqual("en_us", lookup["en"])
+        self.assertEqual("en_us", lookup["en_us"])
+        self.assertEqual("ro_ro", lookup["ro"])
+        self.assertNotIn("fr", lookup)
@@ -0,0 +1,246 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.cache_backends
+'''
+from fantastico.exceptions import FantasticoSettingNotFoundError
+from fantastico.settings import SettingsFacade
+from fantastico.utils import instantiator
+from fantastico.utils.invalidation_bus import INVALIDATION_BUS, tag_topic
+from fantastico.utils.private_files import ensure_private_folder, get_private_folder
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+class FileCacheBackend(object):
+    '''This class provides a cache backend which stores each entry (pickled) into a file of a local folder. It is slower than
+    in process caches but it is shared by all workers of a host and it survives restarts. It provides the same interface as
+    :py:class:`fantastico.utils.lru_cache.LruCache`.
+
+    Entries are unpickled so the folder must be owned by the current user and not accessible by other users (it is created
+    with mode 0700 if it does not exist). By default, a private folder of the current user is used (see
+    :py:func:`fantastico.utils.private_files.get_private_folder`).
+
+    .. code-block:: python
+
+        cache = FileCacheBackend("/var/cache/my-app")
+        cache.set("key1", {"sample": "value"}, ttl=60)
+
+        print(cache.get("key1"))
+    '''
+
+    def __init__(self, folder=None, time_provider=time):
+        self._folder = ensure_private_folder(folder) if folder else get_private_folder("fantastico-cache")
+        self._time_provider = time_provider
+
+    @property
+    def folder(self):
+        '''This property returns the folder where entries are stored.'''
+
+        return self._folder
+
+    def get(self, key, default=None):
+        '''This method returns the value cached for the given key or default if the key is not cached (or expired).'''
+
+        try:
+            with open(self._get_path(key), "rb") as entry_file:
+                expires_at, value = pickle.load(entry_file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return default
+
+        if expires_at is not None and expires_at <= self._time_provider.time():
+            self.delete(key)
+            return default
+
+        return value
+
+    def set(self, key, value, ttl=None):
+        '''This method caches the given value under the given key (for at most ttl seconds if ttl is given). The entry file is
+        replaced atomically so concurrent readers never see partial entries.'''
+
+        expires_at = self._time_provider.time() + ttl if ttl else None
+
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self._folder, prefix=".tmp-")
+
+        try:
+            with os.fdopen(file_descriptor, "wb") as entry_file:
+                pickle.dump((expires_at, value), entry_file, pickle.HIGHEST_PROTOCOL)
+
+            os.replace(tmp_path, self._get_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            raise
+
+    def delete(self, key):
+        '''This method removes the given key from cache (if it is cached).'''
+
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        '''This method removes all entries from cache.'''
+
+        for file_name in os.listdir(self._folder):
+            file_path = os.path.join(self._folder, file_name)
+
+            if os.path.isdir(file_path) and not os.path.islink(file_path):
+                shutil.rmtree(file_path, ignore_errors=True)
+            else:
+                os.remove(file_path)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def _get_path(self, key):
+        '''This method returns the file which holds the given key.'''
+
+        return os.path.join(self._folder, hashlib.sha1(str(key).encode()).hexdigest())
+
+class CacheRegistry(object):
+    '''This class builds (once per process) the cache backends configured in **cache_config** setting and provides tag based
+    invalidation across all of them. Each tag has a version stored in every backend and a generation on
+    :py:data:`fantastico.utils.invalidation_bus.INVALIDATION_BUS`; cached entries remember the versions of their tags and are
+    considered stale once a tag is invalidated (by any worker if the bus is shared).
+
+    .. code-block:: python
+
+        backend = CACHES.get_backend("memory")
+        versions = CACHES.get_tags_versions(backend, ["model:fantastico.contrib.tracking_codes.models.codes.TrackingCode"])
+
+        CACHES.invalidate(model_tag(TrackingCode)) # all entries depending on tracking codes are now stale.
+    '''
+
+    TAG_PREFIX = "fantastico.cache.tag:"
+    DEFAULT_BACKENDS = {"memory": {"backend": "fantastico.utils.lru_cache.LruCache", "max_size": 1024}}
+
+    def __init__(self, settings_facade=SettingsFacade, invalidation_bus=None):
+        self._settings_facade_cls = settings_facade
+        self._invalidation_bus = invalidation_bus or INVALIDATION_BUS
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backends(self):
+        '''This property returns a dictionary containing all backends built so far (indexed by name).'''
+
+        return dict(self._backends)
+
+    def register(self, name, backend):
+        '''This method registers an already built backend under the given name.'''
+
+        with self._lock:
+            self._backends[name] = backend
+
+        return backend
+
+    def get_backend(self, name=None):
+        '''This method returns the backend with the given name (by default, **default_backend** from **cache_config**
+        setting). Backends are built on first usage.
+
+        :raises fantastico.exceptions.FantasticoSettingNotFoundError: Raised when the backend is not configured.'''
+
+        backend = self._backends.get(name)
+
+        if backend is not None:
+            return backend
+
+        with self._lock:
+            cache_config = self._get_cache_config()
+            name = name or cache_config.get("default_backend") or "memory"
+
+            backend = self._backends.get(name)
+
+            if backend is None:
+                backends_config = cache_config.get("backends") or self.DEFAULT_BACKENDS
+                backend_config = dict(backends_config.get(name) or {})
+
+                if not backend_config.get("backend"):
+                    raise FantasticoSettingNotFoundError("Cache backend %s is not configured." % name)
+
+                backend_cls = instantiator.import_class(backend_config.pop("backend"))
+
+                backend = self._backends[name] = backend_cls(**backend_config)
+
+        return backend
+
+    def get_tags_versions(self, backend, tags):
+        '''This method returns the current versions of the given tags from the given backend (combined with the generations
+        of the tags on invalidation bus). Tags which do not have a version yet receive one.'''
+
+        versions = []
+
+        for tag in tags:
+            version = backend.get(self.TAG_PREFIX + tag)
+
+            if version is None:
+                version = self._new_version()
+                backend.set(self.TAG_PREFIX + tag, version)
+
+            versions.append((version, self._invalidation_bus.generation(tag_topic(tag))))
+
+        return tuple(versions)
+
+    def invalidate(self, *tags):
+        '''This method invalidates all entries depending on any of the given tags (in all backends built so far). The tags are
+        also published on invalidation bus so that other workers discard their entries too.'''
+
+        for backend in list(self._backends.values()):
+            for tag in tags:
+                backend.set(self.TAG_PREFIX + tag, self._new_version())
+
+        self._invalidation_bus.publish(*[tag_topic(tag) for tag in tags])
+
+    def clear(self):
+        '''This method discards all backends built so far (they are built again on next usage).'''
+
+        with self._lock:
+            self._backends.clear()
+
+    def _get_cache_config(self):
+        '''This method returns cache configuration from settings.'''
+
+        try:
+            cache_config = self._settings_facade_cls().get("cache_config")
+        except FantasticoSettingNotFoundError:
+            cache_config = None
+
+        return cache_config if isinstance(cache_config, dict) else {}
+
+    @staticmethod
+    def _new_version():
+        '''This method generates a new (unique) tag version.'''
+
+        return uuid.uuid4().hex
+
+def model_tag(model):
+    '''This function returns the cache tag of the given model class (or model class full name). Model writes executed through
+    :py:class:`fantastico.mvc.model_facade.ModelFacade` invalidate this tag.'''
+
+    if not isinstance(model, str):
+        model = "%s.%s" % (model.__module__, model.__name__)
+
+    return "model:%s" % model
+
+CACHES = CacheRegistry()
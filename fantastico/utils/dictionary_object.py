@@ -28,7 +28,12 @@ class DictionaryObject(object):
 
         obj = SimpleObject({"first_name": "John", "last_name": "Doe"})
 
-        print(obj.first_name)'''
+        print(obj.first_name)
+
+    By default, the given dictionary is converted into an internal structure when the object is built (nested dictionaries
+    become dictionary objects). When **lazy** is True (or when the object is built using
+    :py:meth:`fantastico.utils.dictionary_object.DictionaryObject.view`) nothing is copied: attributes are read directly from
+    the given dictionary, nested dictionaries are wrapped on access and changes are written directly into the dictionary.'''
 
     @property
     def dictionary(self):
@@ -36,14 +41,21 @@ class DictionaryObject(object):
 
         return self._dictionary
 
-    def __init__(self, desc, immutable=True):
+    def __init__(self, desc, immutable=True, lazy=False):
         if desc is None:
             desc = {}
 
         self.__setattr__("_internals", set(), internal=True)
         self.__setattr__("_immutable", immutable, internal=True)
+        self.__setattr__("_lazy", lazy, internal=True)
         self.__setattr__("_dictionary", desc, internal=True)
-        self.__setattr__("_internal_data", self._build_internal_structure(desc), internal=True)
+        self.__setattr__("_internal_data", desc if lazy else self._build_internal_structure(desc), internal=True)
+
+    @classmethod
+    def view(cls, desc, immutable=True):
+        '''This method builds a lazy, non copying dictionary object on top of the given dictionary.'''
+
+        return cls(desc, immutable, lazy=True)
 
     def _build_internal_structure(self, dictionary):
         '''This method recursively build an hierarchical data structure starting from a complex dictionary. When a value
@@ -68,10 +80,15 @@ class DictionaryObject(object):
             return super(DictionaryObject, self).__getattribute__(attr_name)
 
         try:
-            return self._internal_data[attr_name]
+            value = self._internal_data[attr_name]
         except KeyError:
             raise AttributeError("Attribute %s is not found." % attr_name)
 
+        if self._lazy and isinstance(value, dict):
+            return DictionaryObject(value, self._immutable, lazy=True)
+
+        return value
+
     def __setattr__(self, attr_name, attr_value, internal=False):
         '''This method set the attr_name with the given value either on the underlining dictionary or  on the current object
         instance.'''
@@ -87,6 +104,14 @@ class DictionaryObject(object):
         internal_data = self._internal_data
         dictionary = self._dictionary
 
+        if self._lazy:
+            if attr_value is None:
+                dictionary.pop(attr_name, None)
+            else:
+                dictionary[attr_name] = attr_value
+
+            return
+
         if attr_value is None:
             if not attr_name in internal_data:
                 return
@@ -0,0 +1,77 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.fork_hooks
+'''
+import logging
+import os
+
+class ForkHooks(object):
+    '''This class provides a registry of callables which must be invoked in a worker process right after it is forked from
+    a master process which already built the application (e.g uWSGI master mode). Hooks are used for discarding per process
+    resources inherited from the master: database connections, sockets, caches which must not be shared.
+
+    .. code-block:: python
+
+        @POST_FORK_HOOKS.register
+        def reset_my_client():
+            MY_CLIENT.reconnect()
+
+    Hooks run at most once per process even if multiple fork notification mechanisms are active (e.g uWSGI
+    **post_fork_hook** and :py:func:`os.register_at_fork`).'''
+
+    def __init__(self):
+        self._hooks = []
+        self._last_pid = os.getpid()
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def hooks(self):
+        '''This property returns the list of registered hooks.'''
+
+        return list(self._hooks)
+
+    def register(self, hook):
+        '''This method registers the given hook (once) and returns it so that it can be used as a decorator.'''
+
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+
+        return hook
+
+    def run(self, force=False):
+        '''This method invokes all registered hooks in registration order. Unless forced, hooks are invoked only if they were
+        not already invoked in the current process. Failing hooks are logged and do not stop the remaining hooks.'''
+
+        pid = os.getpid()
+
+        if not force and pid == self._last_pid:
+            return False
+
+        self._last_pid = pid
+
+        for hook in self._hooks:
+            try:
+                hook()
+            except Exception as ex: # pylint: disable=W0703
+                self._logger.warning("Post fork hook %s failed: %s", hook, ex)
+
+        return True
+
+POST_FORK_HOOKS = ForkHooks()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=POST_FORK_HOOKS.run)
@@ -0,0 +1,91 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.histogram
+'''
+import bisect
+import threading
+
+class Histogram(object):
+    '''This class provides a thread safe histogram with fixed buckets. Each bucket counts the observed values which are lower
+    or equal than the bucket upper bound (buckets are cumulative, the same way Prometheus histograms are). By default, the
+    buckets are suitable for measuring latencies expressed in seconds.
+
+    .. code-block:: python
+
+        histogram = Histogram()
+        histogram.observe(0.012)
+
+        print(histogram.count, histogram.sum, histogram.buckets)'''
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=None):
+        self._bounds = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def bounds(self):
+        '''This property returns the upper bounds of all finite buckets of this histogram.'''
+
+        return self._bounds
+
+    @property
+    def count(self):
+        '''This property returns the number of observed values.'''
+
+        return sum(self._counts)
+
+    @property
+    def sum(self):
+        '''This property returns the sum of all observed values.'''
+
+        return self._sum
+
+    @property
+    def buckets(self):
+        '''This property returns a list of (upper bound, cumulative count) tuples. The last bucket has an infinite upper bound
+        and counts all observed values.'''
+
+        with self._lock:
+            counts = list(self._counts)
+
+        result = []
+        cumulative = 0
+
+        for bound, bucket_count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += bucket_count
+            result.append((bound, cumulative))
+
+        return result
+
+    def observe(self, value):
+        '''This method records the given value into the histogram.'''
+
+        idx = bisect.bisect_left(self._bounds, value)
+
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+
+    def reset(self):
+        '''This method discards all observed values.'''
+
+        with self._lock:
+            self._counts = [0] * (len(self._bounds) + 1)
+            self._sum = 0.0
@@ -0,0 +1,243 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.invalidation_bus
+'''
+from fantastico.utils.fork_hooks import POST_FORK_HOOKS
+from fantastico.utils.private_files import get_private_folder, open_private_file
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+class InvalidationBus(object):
+    '''This class provides a lightweight bus used by worker processes to announce that cached data became stale. Each topic
+    (e.g **table:oauth2_clients**, **client:my-client**, **tag:homepage**) has a generation counter; publishing a topic
+    increments its counter and the counter of its namespace wildcard (e.g **client:\\***). When **mmap_file** is configured,
+    counters are stored in a shared memory file so that a publish from one worker is visible to all workers of the host;
+    otherwise they are private to the current process. The file must be owned by the current user and not accessible by
+    other users (see :py:func:`fantastico.utils.private_files.open_private_file`); when **mmap_file** is True, it is created
+    into the private folder of the current user.
+
+    .. code-block:: python
+
+        INVALIDATION_BUS.subscribe("table:menus", MENUS_INDEX.invalidate)
+
+        INVALIDATION_BUS.publish(table_topic(DynamicMenu)) # all workers invalidate their menus index.
+
+    Consumers can detect changes in two ways:
+
+    * by comparing :py:meth:`generation` of a topic with the one observed when data was cached. This is what
+      :py:class:`fantastico.utils.cache_backends.CacheRegistry` does for tags on each lookup so cached entries are never
+      served after a tag is invalidated (no staleness).
+    * by subscribing a callback. Callbacks of the current process are invoked synchronously on publish; callbacks of other
+      processes are invoked by :py:meth:`poll` which runs at the beginning of requests at most once every **poll_interval**
+      seconds. Stale data is served for at most **poll_interval** seconds after the publish.
+
+    Topics are hashed on a fixed number of **slots**: unrelated topics might share a counter which only causes extra
+    invalidations. Writes which do not go through fantastico (e.g manual sql scripts) are not published.'''
+
+    COUNTER = struct.Struct("<Q")
+
+    def __init__(self, file_path=None, slots=4096, poll_interval=1.0, time_provider=time):
+        self._file_path = None
+        self._slots = slots
+        self._poll_interval = poll_interval
+        self._time_provider = time_provider
+        self._logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._subscriptions = []
+        self._last_poll = 0
+        self._file_desc = None
+        self._counters = bytearray(slots * self.COUNTER.size)
+
+        if file_path:
+            self.configure(file_path)
+
+    @property
+    def file_path(self):
+        '''This property returns the location of the shared memory file (None if counters are private to this process).'''
+
+        return self._file_path
+
+    def configure(self, file_path=None, slots=None, poll_interval=None):
+        '''This method maps the counters on the given shared memory file (creating it if necessary; True means the default
+        file from the private folder). Subscriptions are kept; their observed generations are reset to the counters of the
+        new file.
+
+        :raises fantastico.exceptions.FantasticoUnsafeFileError: Raised when the file is not private to the current user.'''
+
+        if file_path is True:
+            file_path = get_default_path()
+
+        with self._lock:
+            self.close()
+
+            self._slots = slots or self._slots
+            self._poll_interval = poll_interval if poll_interval is not None else self._poll_interval
+
+            file_size = self._slots * self.COUNTER.size
+
+            if file_path:
+                file_desc = open_private_file(file_path)
+
+                try:
+                    if os.fstat(file_desc).st_size < file_size:
+                        os.ftruncate(file_desc, file_size)
+
+                    self._counters = mmap.mmap(file_desc, file_size)
+                except Exception:
+                    os.close(file_desc)
+                    raise
+
+                self._file_path, self._file_desc = file_path, file_desc
+            else:
+                self._counters = bytearray(file_size)
+
+            for subscription in self._subscriptions:
+                subscription[2] = self.generation(subscription[0])
+
+    def close(self):
+        '''This method releases the shared memory file (if any). Counters become private to this process.'''
+
+        with self._lock:
+            if self._file_desc is not None:
+                self._counters.close()
+                os.close(self._file_desc)
+
+            self._file_path, self._file_desc = None, None
+            self._counters = bytearray(self._slots * self.COUNTER.size)
+
+    def generation(self, topic):
+        '''This method returns the current generation of the given topic.'''
+
+        return self.COUNTER.unpack_from(self._counters, self._get_offset(topic))[0]
+
+    def publish(self, *topics):
+        '''This method announces that data described by the given topics changed. Subscribers of the current process are
+        notified immediately.'''
+
+        with self._lock:
+            for topic in topics:
+                for slot_topic in self._expand_topic(topic):
+                    self._increment(self._get_offset(slot_topic))
+
+        self.poll(force=True)
+
+    def subscribe(self, topic, callback):
+        '''This method registers a callback (without arguments) invoked when the given topic is published. Wildcard topics
+        (e.g **client:\\***) are notified for all topics of their namespace. The callback is returned so that this method can
+        be used as a decorator.'''
+
+        with self._lock:
+            self._subscriptions.append([topic, callback, self.generation(topic)])
+
+        return callback
+
+    def poll(self, force=False):
+        '''This method notifies subscribers of topics published (by any process) since the previous poll. Unless forced, the
+        counters are checked at most once every **poll_interval** seconds. It returns True if counters were checked.'''
+
+        now = self._time_provider.time()
+
+        if not force and now - self._last_poll < self._poll_interval:
+            return False
+
+        self._last_poll = now
+
+        with self._lock:
+            changed = []
+
+            for subscription in self._subscriptions:
+                generation = self.generation(subscription[0])
+
+                if generation != subscription[2]:
+                    subscription[2] = generation
+                    changed.append(subscription[1])
+
+        for callback in changed:
+            try:
+                callback()
+            except Exception as ex: # pylint: disable=W0703
+                self._logger.warning("Invalidation callback %s failed: %s", callback, ex)
+
+        return True
+
+    def reset(self):
+        '''This method recreates the lock of the bus. It is invoked in forked workers.'''
+
+        self._lock = threading.RLock()
+        self._last_poll = 0
+
+    def _expand_topic(self, topic):
+        '''This method returns the given topic and its namespace wildcard.'''
+
+        namespace = topic.split(":", 1)[0]
+
+        if namespace == topic or topic.endswith(":*"):
+            return [topic]
+
+        return [topic, "%s:*" % namespace]
+
+    def _get_offset(self, topic):
+        '''This method returns the offset of the counter assigned to the given topic (stable across processes).'''
+
+        return (zlib.crc32(topic.encode()) % self._slots) * self.COUNTER.size
+
+    def _increment(self, offset):
+        '''This method increments the counter located at the given offset. When counters are shared, the counter is locked
+        for other processes during the increment. Publishes of the current process are serialized so a process holds at most
+        one counter lock at a time.'''
+
+        if self._file_desc is None:
+            self.COUNTER.pack_into(self._counters, offset, self.COUNTER.unpack_from(self._counters, offset)[0] + 1)
+            return
+
+        fcntl.lockf(self._file_desc, fcntl.LOCK_EX, self.COUNTER.size, offset)
+
+        try:
+            self.COUNTER.pack_into(self._counters, offset, self.COUNTER.unpack_from(self._counters, offset)[0] + 1)
+        finally:
+            fcntl.lockf(self._file_desc, fcntl.LOCK_UN, self.COUNTER.size, offset)
+
+def get_default_path():
+    '''This function returns the default location of the counters file (inside the private folder of the current user).'''
+
+    return os.path.join(get_private_folder(), "invalidations")
+
+def table_topic(model_cls):
+    '''This function returns the topic published when rows of the table of the given model class change.'''
+
+    return "table:%s" % getattr(model_cls, "__tablename__", model_cls.__name__)
+
+def client_topic(client_id):
+    '''This function returns the topic published when the given oauth2 client changes.'''
+
+    return "client:%s" % client_id
+
+def tag_topic(tag):
+    '''This function returns the topic published when the given cache tag is purged.'''
+
+    return "tag:%s" % tag
+
+INVALIDATION_BUS = InvalidationBus()
+
+POST_FORK_HOOKS.register(INVALIDATION_BUS.reset)
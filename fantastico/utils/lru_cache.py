@@ -0,0 +1,117 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.lru_cache
+'''
+from collections import OrderedDict
+from fantastico.utils import metrics
+import threading
+import time
+
+class LruCache(object):
+    '''This class provides a thread safe, bounded, in process cache. When the cache is full, the least recently used entry is
+    evicted.
+
+    .. code-block:: python
+
+        cache = LruCache(max_size=2)
+
+        cache.set("key1", "value1")
+        cache.set("key2", "value2")
+        cache.get("key1")
+        cache.set("key3", "value3") # key2 is evicted.
+
+        print(cache.get("key2", "not found"))
+
+    Entries can also expire: ``cache.set("key4", "value4", ttl=60)``. When a name is given, cache hits and misses are
+    reported into **fantastico_cache_requests_total** metric.'''
+
+    def __init__(self, max_size=1024, name=None, metrics_registry=None, time_provider=time):
+        self._max_size = max_size
+        self._time_provider = time_provider
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = None
+        self._misses = None
+
+        if name:
+            metrics_registry = metrics_registry or metrics.METRICS
+
+            self._hits = metrics_registry.counter("fantastico_cache_requests_total", "Cache lookups.",
+                                                  {"cache": name, "result": "hit"})
+            self._misses = metrics_registry.counter("fantastico_cache_requests_total", "Cache lookups.",
+                                                    {"cache": name, "result": "miss"})
+
+    @property
+    def max_size(self):
+        '''This property returns the maximum number of entries this cache can hold.'''
+
+        return self._max_size
+
+    def get(self, key, default=None):
+        '''This method returns the value cached for the given key or default if the key is not cached.'''
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] is not None and entry[1] <= self._time_provider.time():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                if self._misses:
+                    self._misses.inc()
+
+                return default
+
+            self._entries.move_to_end(key)
+
+        if self._hits:
+            self._hits.inc()
+
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        '''This method caches the given value under the given key (for at most ttl seconds if ttl is given). If the cache is
+        full the least recently used entry is evicted.'''
+
+        expires_at = self._time_provider.time() + ttl if ttl else None
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            if len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        '''This method removes the given key from cache (if it is cached).'''
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        '''This method removes all entries from cache.'''
+
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
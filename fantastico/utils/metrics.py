@@ -0,0 +1,669 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.metrics
+'''
+from fantastico.utils.fork_hooks import POST_FORK_HOOKS
+from fantastico.utils.histogram import Histogram
+import contextlib
+import fcntl
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+class Counter(object):
+    '''This class provides a thread safe, monotonic counter.'''
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        '''This property returns the current value of the counter.'''
+
+        return self._value
+
+    def inc(self, amount=1):
+        '''This method increments the counter with the given amount.'''
+
+        with self._lock:
+            self._value += amount
+
+    def reset(self):
+        '''This method sets the counter back to 0.'''
+
+        self._value = 0.0
+
+class Gauge(object):
+    '''This class provides a thread safe gauge. If a callback is given, the value of the gauge is obtained by invoking the
+    callback each time metrics are collected.'''
+
+    def __init__(self, callback=None):
+        self._value = 0.0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        '''This property returns the current value of the gauge.'''
+
+        if self._callback:
+            return self._callback()
+
+        return self._value
+
+    def set(self, value):
+        '''This method sets the gauge to the given value.'''
+
+        self._value = value
+
+    def inc(self, amount=1):
+        '''This method increments the gauge with the given amount.'''
+
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        '''This method decrements the gauge with the given amount.'''
+
+        self.inc(-amount)
+
+    def reset(self):
+        '''This method sets the gauge back to 0.'''
+
+        self._value = 0.0
+
+def merge_values(value1, value2):
+    '''This function sums two values of the same metric (numbers or histogram dictionaries).'''
+
+    if not isinstance(value1, dict):
+        return value1 + value2
+
+    return {"buckets": [[bound, count1 + count2] for (bound, count1), (_, count2) in zip(value1["buckets"],
+                                                                                         value2["buckets"])],
+            "count": value1["count"] + value2["count"],
+            "sum": value1["sum"] + value2["sum"]}
+
+class MmapMetricsStore(object):
+    '''This class provides a shared memory file in which each worker process publishes a snapshot of its metrics. The file
+    is split into fixed size slots; each worker claims a free slot (or a slot belonging to a dead process) the first time it
+    publishes. Slots claimed before a fork are automatically reclaimed by the child processes.
+
+    Before the slot of a dead worker is reused or ignored, the counters and histograms of its last snapshot are folded into
+    an additional retained slot so that aggregated counters never go down when workers are recycled. Gauges of dead workers
+    are discarded.
+
+    .. code-block:: python
+
+        store = MmapMetricsStore("/tmp/fantastico-metrics.mmap", slots=64, slot_size=65536)
+
+        store.publish([...])
+        worker_snapshots = store.read_all()
+
+    Snapshots which do not fit into **slot_size** are not published: they are counted by **overflows** property and logged
+    once per process.'''
+
+    SLOT_HEADER = struct.Struct("<qI")
+    MONOTONIC_TYPES = ("counter", "histogram")
+
+    def __init__(self, file_path, slots=64, slot_size=65536):
+        self._file_path = file_path
+        self._slots = slots
+        self._slot_size = slot_size
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+        self._mmap = None
+        self._slot_idx = None
+        self._slot_pid = None
+        self._overflows = 0
+
+    @property
+    def file_path(self):
+        '''This property returns the location of the shared memory file.'''
+
+        return self._file_path
+
+    @property
+    def overflows(self):
+        '''This property returns the number of snapshots (published or retained) which did not fit into a slot.'''
+
+        return self._overflows
+
+    def publish(self, snapshot):
+        '''This method writes the given snapshot into the slot of the current process. It returns False if no slot is available
+        or the snapshot does not fit into a slot.'''
+
+        payload = json.dumps(snapshot).encode()
+
+        if not self._fits(payload):
+            return False
+
+        with self._lock:
+            slot_idx = self._claim_slot()
+
+            if slot_idx is None:
+                return False
+
+            self._write_slot(slot_idx, self._slot_pid, payload)
+
+        return True
+
+    def read_all(self):
+        '''This method returns the snapshots published by all alive worker processes followed by the snapshot retained from
+        dead workers (if any). Slots which are partially written are ignored.'''
+
+        snapshots = []
+
+        with self._lock:
+            self._open()
+
+            with self._lock_file():
+                self._fold_dead_slots()
+
+                for slot_idx in range(self._slots + 1):
+                    pid, snapshot = self._read_slot(slot_idx)
+
+                    if snapshot is not None and (slot_idx == self._slots or pid):
+                        snapshots.append(snapshot)
+
+        return snapshots
+
+    def close(self):
+        '''This method releases the shared memory file. Next publish will map the file again.'''
+
+        with self._lock:
+            if self._mmap:
+                self._mmap.close()
+
+            self._mmap = None
+            self._slot_idx = None
+            self._slot_pid = None
+
+    def _open(self):
+        '''This method maps the shared memory file (creating it if necessary). The last slot holds the snapshot retained from
+        dead workers.'''
+
+        if self._mmap:
+            return
+
+        file_size = (self._slots + 1) * self._slot_size
+
+        file_desc = os.open(self._file_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            if os.fstat(file_desc).st_size < file_size:
+                os.ftruncate(file_desc, file_size)
+
+            self._mmap = mmap.mmap(file_desc, file_size)
+        finally:
+            os.close(file_desc)
+
+    @contextlib.contextmanager
+    def _lock_file(self):
+        '''This method holds an exclusive lock on the shared memory file so that concurrent workers never claim or fold the
+        same slot.'''
+
+        with open(self._file_path, "rb") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _claim_slot(self):
+        '''This method returns the slot owned by the current process. If no slot is owned yet, a free slot is claimed under an
+        exclusive file lock (after folding the slots of dead workers).'''
+
+        pid = os.getpid()
+
+        if self._slot_pid == pid:
+            return self._slot_idx
+
+        self._open()
+
+        with self._lock_file():
+            self._fold_dead_slots()
+
+            for slot_idx in range(self._slots):
+                offset = slot_idx * self._slot_size
+                slot_pid, _ = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+
+                if slot_pid and slot_pid != pid and self._is_alive(slot_pid):
+                    continue
+
+                self.SLOT_HEADER.pack_into(self._mmap, offset, pid, 0)
+
+                self._slot_idx, self._slot_pid = slot_idx, pid
+
+                return slot_idx
+
+        return None
+
+    def _fold_dead_slots(self):
+        '''This method adds the monotonic metrics of dead workers snapshots into the retained slot and releases their slots.
+        It must be invoked while holding the file lock.'''
+
+        _, retained = self._read_slot(self._slots)
+        retained = {(entry[0], json.dumps(entry[1])): entry for entry in retained or []}
+        changed = False
+
+        for slot_idx in range(self._slots):
+            offset = slot_idx * self._slot_size
+            pid, snapshot = self._read_slot(slot_idx)
+
+            if not pid or pid == os.getpid() or self._is_alive(pid):
+                continue
+
+            for entry in snapshot or []:
+                if len(entry) < 4 or entry[3] not in self.MONOTONIC_TYPES:
+                    continue
+
+                key = (entry[0], json.dumps(entry[1]))
+
+                if key in retained:
+                    retained[key] = [entry[0], entry[1], merge_values(retained[key][2], entry[2]), entry[3]]
+                else:
+                    retained[key] = list(entry)
+
+            self.SLOT_HEADER.pack_into(self._mmap, offset, 0, 0)
+            changed = True
+
+        if changed:
+            payload = json.dumps(list(retained.values())).encode()
+
+            if self._fits(payload):
+                self._write_slot(self._slots, 0, payload)
+
+    def _read_slot(self, slot_idx):
+        '''This method returns the owner pid and the decoded snapshot of the given slot (None if the slot is empty or
+        partially written).'''
+
+        offset = slot_idx * self._slot_size
+        pid, length = self.SLOT_HEADER.unpack_from(self._mmap, offset)
+
+        if not length or length > self._slot_size - self.SLOT_HEADER.size:
+            return pid, None
+
+        payload = self._mmap[offset + self.SLOT_HEADER.size:offset + self.SLOT_HEADER.size + length]
+
+        try:
+            return pid, json.loads(payload.decode())
+        except ValueError:
+            return pid, None
+
+    def _write_slot(self, slot_idx, pid, payload):
+        '''This method writes the given payload into a slot. Length is written last so readers never decode partial
+        payloads.'''
+
+        offset = slot_idx * self._slot_size
+
+        self.SLOT_HEADER.pack_into(self._mmap, offset, pid, 0)
+        self._mmap[offset + self.SLOT_HEADER.size:offset + self.SLOT_HEADER.size + len(payload)] = payload
+        self.SLOT_HEADER.pack_into(self._mmap, offset, pid, len(payload))
+
+    def _fits(self, payload):
+        '''This method returns True if the given payload fits into a slot. Otherwise, the overflow is counted and logged once
+        per process.'''
+
+        if len(payload) <= self._slot_size - self.SLOT_HEADER.size:
+            return True
+
+        self._overflows += 1
+
+        if self._overflows == 1:
+            self._logger.error("Metrics snapshot of %s bytes does not fit into %s bytes slots of %s. Increase slot_size "
+                               "of metrics_config setting.", len(payload), self._slot_size, self._file_path)
+
+        return False
+
+    def _is_alive(self, pid):
+        '''This method returns True if the process with the given identifier is still running.'''
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+        return True
+
+class MetricsRegistry(object):
+    '''This class provides the registry in which fantastico components report their counters, gauges and latency histograms.
+    Metrics are identified by name and labels and can be rendered in
+    `Prometheus text format <https://prometheus.io/docs/instrumenting/exposition_formats/>`_.
+
+    .. code-block:: python
+
+        METRICS.counter("fantastico_cache_hits_total", "Cache hits.", {"cache": "languages"}).inc()
+
+        with METRICS.timer("fantastico_model_facade_seconds", "Model facade latency.", {"operation": "create"}):
+            pass
+
+        print(METRICS.render())
+
+    When a :py:class:`fantastico.utils.metrics.MmapMetricsStore` is configured, each worker periodically publishes its
+    snapshot into the shared memory file and rendering aggregates the snapshots of all workers (counters, gauges and
+    histograms are summed).
+
+    Timers can also report their duration under a category (e.g **db**, **template**) into the breakdown of the current
+    thread. This is used for obtaining per request timing breakdowns:
+
+    .. code-block:: python
+
+        breakdown = METRICS.start_breakdown()
+
+        try:
+            handle_request()
+        finally:
+            METRICS.stop_breakdown()
+
+        print(breakdown.get("db", 0.0))'''
+
+    COUNTER = "counter"
+    GAUGE = "gauge"
+    HISTOGRAM = "histogram"
+
+    def __init__(self, store=None, publish_interval=1.0, time_provider=time):
+        self._store = store
+        self._publish_interval = publish_interval
+        self._time_provider = time_provider
+        self._last_publish = 0.0
+
+        self._metrics = {}
+        self._descriptions = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def store(self):
+        '''This property returns the shared memory store used for aggregating metrics across workers (if any).'''
+
+        return self._store
+
+    def configure(self, store=None, publish_interval=None):
+        '''This method changes the store used for aggregating metrics across workers.'''
+
+        if self._store and self._store is not store:
+            self._store.close()
+
+        self._store = store
+        self._last_publish = 0.0
+
+        if publish_interval is not None:
+            self._publish_interval = publish_interval
+
+    def counter(self, name, help_text="", labels=None):
+        '''This method returns the counter registered under the given name and labels (it is created if necessary).'''
+
+        return self._get_metric(name, self.COUNTER, help_text, labels, Counter)
+
+    def gauge(self, name, help_text="", labels=None, callback=None):
+        '''This method returns the gauge registered under the given name and labels (it is created if necessary). The callback
+        is used only when the gauge is created.'''
+
+        return self._get_metric(name, self.GAUGE, help_text, labels, lambda: Gauge(callback))
+
+    def histogram(self, name, help_text="", labels=None, buckets=None):
+        '''This method returns the histogram registered under the given name and labels (it is created if necessary).'''
+
+        return self._get_metric(name, self.HISTOGRAM, help_text, labels, lambda: Histogram(buckets))
+
+    def timer(self, name, help_text="", labels=None, category=None):
+        '''This method returns a context manager which records the duration of the enclosed block into the given histogram
+        (and into the given breakdown category of the current thread).'''
+
+        return MetricsTimer(self.histogram(name, help_text, labels), self._time_provider, category, self)
+
+    def timed(self, name, help_text="", labels=None, category=None):
+        '''This method returns a decorator which records the duration of each decorated function call into the given
+        histogram (and into the given breakdown category of the current thread).'''
+
+        histogram = self.histogram(name, help_text, labels)
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with MetricsTimer(histogram, self._time_provider, category, self):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def start_breakdown(self):
+        '''This method starts a new timing breakdown for the current thread and returns it. The breakdown is a dictionary
+        which accumulates the durations of all categorized timers (indexed by category) till it is stopped. Breakdowns can be
+        nested; when a nested breakdown is stopped its durations are added to the enclosing breakdown.'''
+
+        breakdowns = getattr(self._local, "breakdowns", None)
+
+        if breakdowns is None:
+            breakdowns = self._local.breakdowns = []
+
+        breakdown = {}
+        breakdowns.append(breakdown)
+
+        return breakdown
+
+    def stop_breakdown(self):
+        '''This method stops the most recent breakdown of the current thread and returns it.'''
+
+        breakdowns = self._local.breakdowns
+        breakdown = breakdowns.pop()
+
+        if breakdowns:
+            for category, duration in breakdown.items():
+                breakdowns[-1][category] = breakdowns[-1].get(category, 0.0) + duration
+
+        return breakdown
+
+    def add_to_breakdown(self, category, duration):
+        '''This method adds the given duration to the category of the active breakdown of the current thread (if any).'''
+
+        breakdowns = getattr(self._local, "breakdowns", None)
+
+        if not breakdowns:
+            return
+
+        breakdown = breakdowns[-1]
+        breakdown[category] = breakdown.get(category, 0.0) + duration
+
+    def snapshot(self):
+        '''This method returns a json serializable snapshot of all metrics reported by the current process. Each entry holds
+        metric name, labels, value and metric type.'''
+
+        with self._lock:
+            metrics = list(self._metrics.items())
+
+        result = []
+
+        for (name, labels), metric in metrics:
+            metric_type, _ = self._descriptions[name]
+
+            if metric_type == self.HISTOGRAM:
+                value = {"buckets": [[bound, count] for bound, count in metric.buckets[:-1]],
+                         "count": metric.count,
+                         "sum": metric.sum}
+            else:
+                try:
+                    value = metric.value
+                except Exception: # pylint: disable=W0703
+                    continue
+
+            result.append([name, [list(label) for label in labels], value, metric_type])
+
+        return result
+
+    def publish(self, force=False):
+        '''This method publishes the snapshot of the current process into the configured store. Unless forced, the snapshot
+        is published at most once every **publish_interval** seconds so that it can be invoked on each request.'''
+
+        if not self._store:
+            return False
+
+        now = self._time_provider.time()
+
+        if not force and now - self._last_publish < self._publish_interval:
+            return False
+
+        self._last_publish = now
+
+        return self._store.publish(self.snapshot())
+
+    def collect(self):
+        '''This method returns the aggregated snapshot of all workers (or of the current process if no store is configured).'''
+
+        if not self._store:
+            return [entry[:3] for entry in self.snapshot()]
+
+        self.publish(force=True)
+
+        aggregated = {}
+
+        for snapshot in self._store.read_all():
+            for entry in snapshot:
+                name, labels, value = entry[:3]
+                key = (name, tuple(tuple(label) for label in labels))
+
+                if key not in aggregated:
+                    aggregated[key] = value
+                    continue
+
+                aggregated[key] = merge_values(aggregated[key], value)
+
+        return [[name, [list(label) for label in labels], value] for (name, labels), value in aggregated.items()]
+
+    def render(self):
+        '''This method renders the aggregated metrics in Prometheus text exposition format.'''
+
+        families = {}
+
+        for name, labels, value in self.collect():
+            families.setdefault(name, []).append((labels, value))
+
+        lines = []
+
+        for name in sorted(families.keys()):
+            metric_type, help_text = self._descriptions.get(name, (self.GAUGE, ""))
+
+            lines.append("# HELP %s %s" % (name, help_text.replace("\\", "\\\\").replace("\n", "\\n")))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+
+            for labels, value in sorted(families[name], key=lambda sample: sample[0]):
+                if metric_type != self.HISTOGRAM:
+                    lines.append("%s%s %s" % (name, self._format_labels(labels), self._format_value(value)))
+                    continue
+
+                for bound, count in value["buckets"]:
+                    lines.append("%s_bucket%s %s" % (name, self._format_labels(labels + [["le", self._format_value(bound)]]),
+                                                     self._format_value(count)))
+
+                lines.append("%s_bucket%s %s" % (name, self._format_labels(labels + [["le", "+Inf"]]),
+                                                 self._format_value(value["count"])))
+                lines.append("%s_sum%s %s" % (name, self._format_labels(labels), self._format_value(value["sum"])))
+                lines.append("%s_count%s %s" % (name, self._format_labels(labels), self._format_value(value["count"])))
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        '''This method resets the values of all registered metrics (metrics remain registered). It is invoked in forked
+        workers so that values reported by the master process are not reported again by each worker.'''
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        for metric in metrics:
+            metric.reset()
+
+    def clear(self):
+        '''This method removes all registered metrics.'''
+
+        with self._lock:
+            self._metrics.clear()
+            self._descriptions.clear()
+
+    def _get_metric(self, name, metric_type, help_text, labels, metric_factory):
+        '''This method returns the metric identified by name and labels, registering it if necessary.'''
+
+        key = (name, tuple(sorted((labels or {}).items())))
+
+        metric = self._metrics.get(key)
+
+        if metric is not None and self._descriptions[name][0] == metric_type:
+            return metric
+
+        with self._lock:
+            registered_type, _ = self._descriptions.setdefault(name, (metric_type, help_text))
+
+            if registered_type != metric_type:
+                raise ValueError("Metric %s is already registered as %s." % (name, registered_type))
+
+            return self._metrics.setdefault(key, metric_factory())
+
+    def _format_labels(self, labels):
+        '''This method formats the given labels as a prometheus labels set.'''
+
+        if not labels:
+            return ""
+
+        formatted = ['%s="%s"' % (label, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+                     for label, value in labels]
+
+        return "{%s}" % ",".join(formatted)
+
+    def _format_value(self, value):
+        '''This method formats the given numeric value.'''
+
+        return repr(float(value))
+
+class MetricsTimer(object):
+    '''This class provides a context manager which records the duration of the enclosed block into a histogram. If a
+    category is given, the duration is also added to the active breakdown of the current thread.'''
+
+    __slots__ = ("_histogram", "_time_provider", "_category", "_registry", "_start")
+
+    def __init__(self, histogram, time_provider=time, category=None, registry=None):
+        self._histogram = histogram
+        self._time_provider = time_provider
+        self._category = category
+        self._registry = registry
+        self._start = None
+
+    def __enter__(self):
+        self._start = self._time_provider.time()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = self._time_provider.time() - self._start
+
+        self._histogram.observe(duration)
+
+        if self._category:
+            self._registry.add_to_breakdown(self._category, duration)
+
+METRICS = MetricsRegistry()
+
+POST_FORK_HOOKS.register(METRICS.reset)
@@ -0,0 +1,86 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.private_files
+'''
+from fantastico.exceptions import FantasticoUnsafeFileError
+import errno
+import os
+import stat
+import tempfile
+
+def get_private_folder(name="fantastico"):
+    '''This function returns a folder private to the current user (created if it does not exist) suitable for files shared by
+    the workers of a host. **XDG_RUNTIME_DIR** is used when available, otherwise a folder named after the current user id is
+    created in RAM backed /dev/shm (or temporary folder).'''
+
+    runtime_folder = os.environ.get("XDG_RUNTIME_DIR")
+
+    if runtime_folder and os.path.isdir(runtime_folder):
+        folder = os.path.join(runtime_folder, name)
+    else:
+        parent_folder = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        folder = os.path.join(parent_folder, "%s-%s" % (name, os.getuid()))
+
+    return ensure_private_folder(folder)
+
+def ensure_private_folder(folder):
+    '''This function creates the given folder (mode 0700) if it does not exist and makes sure it is owned by the current user
+    and not accessible by other users.
+
+    :raises fantastico.exceptions.FantasticoUnsafeFileError: Raised when the folder is a symlink, is owned by another user or
+        is accessible by other users.'''
+
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+
+    _check_private(os.lstat(folder), folder, stat.S_ISDIR)
+
+    return folder
+
+def open_private_file(file_path, flags=os.O_RDWR | os.O_CREAT):
+    '''This function opens the given file (created with mode 0600 if it does not exist) without following symlinks and returns
+    its descriptor. The file must be a regular file owned by the current user and not accessible by other users.
+
+    :raises fantastico.exceptions.FantasticoUnsafeFileError: Raised when the file is not private to the current user.'''
+
+    try:
+        file_desc = os.open(file_path, flags | os.O_NOFOLLOW, 0o600)
+    except OSError as ex:
+        if ex.errno == errno.ELOOP:
+            raise FantasticoUnsafeFileError("File %s is a symlink." % file_path)
+
+        raise
+
+    try:
+        _check_private(os.fstat(file_desc), file_path, stat.S_ISREG)
+    except Exception:
+        os.close(file_desc)
+        raise
+
+    return file_desc
+
+def _check_private(file_stat, file_path, type_check):
+    '''This function makes sure the given stat result describes an entry of the expected type owned by the current user and
+    not accessible by other users.'''
+
+    if not type_check(file_stat.st_mode):
+        raise FantasticoUnsafeFileError("%s does not have the expected type (or it is a symlink)." % file_path)
+
+    if file_stat.st_uid != os.getuid():
+        raise FantasticoUnsafeFileError("%s is not owned by the current user." % file_path)
+
+    if file_stat.st_mode & 0o077:
+        raise FantasticoUnsafeFileError("%s is accessible by other users (mode %o)." % (file_path, file_stat.st_mode & 0o777))
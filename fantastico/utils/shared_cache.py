@@ -0,0 +1,424 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.shared_cache
+'''
+from fantastico.exceptions import FantasticoUnsafeFileError
+from fantastico.utils import metrics
+from fantastico.utils.fork_hooks import POST_FORK_HOOKS
+from fantastico.utils.private_files import get_private_folder, open_private_file
+import contextlib
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+class SharedMemoryCache(object):
+    '''This class provides a cache backend stored in a memory mapped file so that all worker processes of a host share the
+    same entries without an external service. It provides the same interface as :py:class:`fantastico.utils.lru_cache.LruCache`
+    and can be configured in **cache_config** setting:
+
+    .. code-block:: python
+
+        cache = SharedMemoryCache("/dev/shm/my-app-cache", slabs=[(1024, 4096), (16384, 512)], ways=8)
+
+        cache.set("key1", {"sample": "value"}, ttl=60)
+        print(cache.get("key1"))
+
+    Values are pickled and stored into the smallest slab class they fit in; each slab class is given as (item size, items
+    count). Values larger than the biggest item size are not cached. Each slab class is a fixed size hash table split into
+    buckets of **ways** entries; a key can only be stored in its bucket and when the bucket is full an entry is evicted
+    using the CLOCK algorithm (recently read entries get a second chance). Each bucket is protected by its own lock (a file
+    region lock for other processes and a striped thread lock for threads of the current process) so concurrent workers
+    only contend when they touch the same bucket. Lookups for keys which are not cached do not take any lock.
+
+    Keys are identified by a 128 bits digest. Each layout (slabs and ways) is mapped from its own file (path suffixed with the
+    layout id) so workers started with a different layout never touch the file mapped by running workers. The file must be
+    owned by the current user and not accessible by other users (values are unpickled from it); by default it is created
+    into a private folder (see :py:func:`fantastico.utils.private_files.get_private_folder`).'''
+
+    MAGIC = b"FTCSHM01"
+    HEADER = struct.Struct("<8sII")
+    HEADER_SIZE = 64
+    BUCKET_HEADER = struct.Struct("<I")
+    BUCKET_HEADER_SIZE = 8
+    ENTRY = struct.Struct("<16sdIIB")
+    ENTRY_SIZE = 40
+    DEFAULT_SLABS = [(256, 8192), (1024, 4096), (4096, 1024), (16384, 256), (65536, 64)]
+    THREAD_LOCKS = 256
+
+    FLAG_USED = 1
+    FLAG_REFERENCED = 2
+
+    def __init__(self, path=None, slabs=None, ways=8, name=None, metrics_registry=None, time_provider=time):
+        self._ways = ways
+        self._time_provider = time_provider
+        self._open_lock = threading.Lock()
+        self._thread_locks = [threading.Lock() for _ in range(self.THREAD_LOCKS)]
+
+        self._slabs = []
+        offset = self.HEADER_SIZE
+
+        for item_size, items_count in sorted(slabs or self.DEFAULT_SLABS):
+            buckets = max(1, -(-items_count // ways))
+            entry_size = self.ENTRY_SIZE + item_size
+            bucket_size = self.BUCKET_HEADER_SIZE + ways * entry_size
+
+            self._slabs.append((item_size, offset, buckets, bucket_size, entry_size))
+
+            offset += buckets * bucket_size
+
+        self._file_size = offset
+        self._layout_id = zlib.crc32(repr((self._slabs, ways)).encode())
+        self._path = "%s.%08x" % (path or self._get_default_path(), self._layout_id)
+        self._file_desc = None
+        self._mmap = None
+
+        self._hits = None
+        self._misses = None
+
+        if name:
+            metrics_registry = metrics_registry or metrics.METRICS
+
+            self._hits = metrics_registry.counter("fantastico_cache_requests_total", "Cache lookups.",
+                                                  {"cache": name, "result": "hit"})
+            self._misses = metrics_registry.counter("fantastico_cache_requests_total", "Cache lookups.",
+                                                    {"cache": name, "result": "miss"})
+
+        _INSTANCES.add(self)
+
+    @property
+    def path(self):
+        '''This property returns the location of the memory mapped file (suffixed with the layout id).'''
+
+        return self._path
+
+    @property
+    def max_item_size(self):
+        '''This property returns the size (in bytes) of the biggest pickled value which can be cached.'''
+
+        return self._slabs[-1][0]
+
+    def get(self, key, default=None):
+        '''This method returns the value cached for the given key or default if the key is not cached (or expired).'''
+
+        self._open()
+
+        digest = self._get_digest(key)
+        generation = self._get_generation()
+        now = self._time_provider.time()
+        payload = None
+
+        for slab in self._slabs:
+            bucket_offset = self._get_bucket_offset(slab, digest)
+
+            if self._find_way(slab, bucket_offset, digest, generation) is None:
+                continue
+
+            with self._bucket_lock(bucket_offset):
+                way = self._find_way(slab, bucket_offset, digest, generation)
+
+                if way is None:
+                    continue
+
+                entry_offset = bucket_offset + self.BUCKET_HEADER_SIZE + way * slab[4]
+                _, expires_at, _, length, flags = self.ENTRY.unpack_from(self._mmap, entry_offset)
+
+                if expires_at and expires_at <= now:
+                    self.ENTRY.pack_into(self._mmap, entry_offset, digest, 0, 0, 0, 0)
+                    break
+
+                self._mmap[entry_offset + 32] = flags | self.FLAG_REFERENCED
+
+                value_offset = entry_offset + self.ENTRY_SIZE
+                payload = self._mmap[value_offset:value_offset + length]
+
+            break
+
+        if payload is None:
+            if self._misses:
+                self._misses.inc()
+
+            return default
+
+        if self._hits:
+            self._hits.inc()
+
+        return pickle.loads(payload)
+
+    def set(self, key, value, ttl=None):
+        '''This method caches the given value under the given key (for at most ttl seconds if ttl is given). If the bucket of
+        the key is full, an entry is evicted using CLOCK algorithm. Values bigger than :py:attr:`max_item_size` are not
+        cached (previously cached value for the key is removed).'''
+
+        self._open()
+
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        digest = self._get_digest(key)
+        generation = self._get_generation()
+        expires_at = self._time_provider.time() + ttl if ttl else 0
+
+        target_slab = None
+
+        for slab in self._slabs:
+            if target_slab is None and len(payload) <= slab[0]:
+                target_slab = slab
+            else:
+                self._delete_from_slab(slab, digest, generation)
+
+        if target_slab is None:
+            return
+
+        bucket_offset = self._get_bucket_offset(target_slab, digest)
+
+        with self._bucket_lock(bucket_offset):
+            way = self._find_way(target_slab, bucket_offset, digest, generation)
+
+            if way is None:
+                way = self._choose_way(target_slab, bucket_offset, generation)
+
+            entry_offset = bucket_offset + self.BUCKET_HEADER_SIZE + way * target_slab[4]
+            value_offset = entry_offset + self.ENTRY_SIZE
+
+            self._mmap[value_offset:value_offset + len(payload)] = payload
+            self.ENTRY.pack_into(self._mmap, entry_offset, digest, expires_at, generation, len(payload), self.FLAG_USED)
+
+    def delete(self, key):
+        '''This method removes the given key from cache (if it is cached).'''
+
+        self._open()
+
+        digest = self._get_digest(key)
+        generation = self._get_generation()
+
+        for slab in self._slabs:
+            self._delete_from_slab(slab, digest, generation)
+
+    def clear(self):
+        '''This method removes all entries from cache (for all processes). Entries are not touched: the generation of the cache
+        is incremented so that all existing entries become free.'''
+
+        self._open()
+
+        with self._bucket_lock(0):
+            magic, layout_id, generation = self.HEADER.unpack_from(self._mmap, 0)
+
+            self.HEADER.pack_into(self._mmap, 0, magic, layout_id, (generation + 1) % 2 ** 32)
+
+    def close(self):
+        '''This method releases the memory mapped file. Next operation maps the file again.'''
+
+        with self._open_lock:
+            if self._mmap:
+                self._mmap.close()
+                os.close(self._file_desc)
+
+            self._mmap = None
+            self._file_desc = None
+
+    def reset(self):
+        '''This method recreates the thread locks of this cache. It is invoked in worker processes right after fork because
+        locks held by other threads of the parent process are never released in the child.'''
+
+        self._open_lock = threading.Lock()
+        self._thread_locks = [threading.Lock() for _ in range(self.THREAD_LOCKS)]
+
+    def __len__(self):
+        self._open()
+
+        generation = self._get_generation()
+        now = self._time_provider.time()
+        count = 0
+
+        for _, slab_offset, buckets, bucket_size, entry_size in self._slabs:
+            for bucket_idx in range(buckets):
+                for way in range(self._ways):
+                    entry_offset = slab_offset + bucket_idx * bucket_size + self.BUCKET_HEADER_SIZE + way * entry_size
+                    _, expires_at, entry_generation, _, flags = self.ENTRY.unpack_from(self._mmap, entry_offset)
+
+                    if flags & self.FLAG_USED and entry_generation == generation and (not expires_at or expires_at > now):
+                        count += 1
+
+        return count
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def _open(self):
+        '''This method maps the cache file (creating and initializing it if it does not exist). A file which is mapped by other
+        processes is never resized or reinitialized.
+
+        :raises fantastico.exceptions.FantasticoUnsafeFileError: Raised when the file is not private to the current user or it
+            does not have the expected layout.'''
+
+        if self._mmap:
+            return
+
+        with self._open_lock:
+            if self._mmap:
+                return
+
+            file_desc = open_private_file(self._path)
+
+            try:
+                fcntl.lockf(file_desc, fcntl.LOCK_EX, 1, 0)
+
+                try:
+                    file_size = os.fstat(file_desc).st_size
+                    header = os.pread(file_desc, self.HEADER.size, 0)
+
+                    # a file is mapped only after its header is written (while holding the lock) so an empty file (or a file
+                    # without header) is not mapped by any process and can be initialized.
+                    if file_size == 0 or (file_size == self._file_size and not header.strip(b"\x00")):
+                        os.ftruncate(file_desc, self._file_size)
+                        os.pwrite(file_desc, self.HEADER.pack(self.MAGIC, self._layout_id, 0), 0)
+                    elif file_size != self._file_size or self.HEADER.unpack(header)[:2] != (self.MAGIC, self._layout_id):
+                        raise FantasticoUnsafeFileError("Cache file %s does not have the expected layout." % self._path)
+
+                    self._mmap = mmap.mmap(file_desc, self._file_size)
+                finally:
+                    fcntl.lockf(file_desc, fcntl.LOCK_UN, 1, 0)
+            except Exception:
+                os.close(file_desc)
+                raise
+
+            self._file_desc = file_desc
+
+    @contextlib.contextmanager
+    def _bucket_lock(self, bucket_offset):
+        '''This method acquires the lock of the bucket located at the given offset: first the thread lock stripe of the bucket
+        and then the file region lock (which only excludes other processes).'''
+
+        thread_lock = self._thread_locks[(bucket_offset // self.BUCKET_HEADER_SIZE) % self.THREAD_LOCKS]
+
+        with thread_lock:
+            while True:
+                try:
+                    fcntl.lockf(self._file_desc, fcntl.LOCK_EX, 1, bucket_offset)
+                    break
+                except OSError as ex:
+                    # region locks are owned by processes so the kernel reports a deadlock when threads of two workers
+                    # wait for each other's buckets; a thread never holds two buckets so the lock is simply retried.
+                    if ex.errno != errno.EDEADLK:
+                        raise
+
+                    time.sleep(0)
+
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._file_desc, fcntl.LOCK_UN, 1, bucket_offset)
+
+    def _get_digest(self, key):
+        '''This method returns the digest identifying the given key.'''
+
+        if not isinstance(key, bytes):
+            key = str(key).encode()
+
+        return hashlib.blake2b(key, digest_size=16).digest()
+
+    def _get_generation(self):
+        '''This method returns the current generation of the cache (incremented by each clear).'''
+
+        return self.HEADER.unpack_from(self._mmap, 0)[2]
+
+    def _get_bucket_offset(self, slab, digest):
+        '''This method returns the offset of the bucket in which the given digest is stored for the given slab class.'''
+
+        _, slab_offset, buckets, bucket_size, _ = slab
+
+        return slab_offset + (int.from_bytes(digest[:8], "little") % buckets) * bucket_size
+
+    def _find_way(self, slab, bucket_offset, digest, generation):
+        '''This method returns the index of the bucket entry holding the given digest or None if the digest is not stored.'''
+
+        entry_offset = bucket_offset + self.BUCKET_HEADER_SIZE
+
+        for way in range(self._ways):
+            entry_digest, _, entry_generation, _, flags = self.ENTRY.unpack_from(self._mmap, entry_offset)
+
+            if flags & self.FLAG_USED and entry_digest == digest and entry_generation == generation:
+                return way
+
+            entry_offset += slab[4]
+
+        return None
+
+    def _choose_way(self, slab, bucket_offset, generation):
+        '''This method returns the index of the bucket entry which receives a new value: a free (or expired) entry if
+        available, otherwise the entry chosen by CLOCK algorithm. Must be invoked while holding the bucket lock.'''
+
+        now = self._time_provider.time()
+        entries_offset = bucket_offset + self.BUCKET_HEADER_SIZE
+
+        for way in range(self._ways):
+            _, expires_at, entry_generation, _, flags = self.ENTRY.unpack_from(self._mmap, entries_offset + way * slab[4])
+
+            if not flags & self.FLAG_USED or entry_generation != generation or (expires_at and expires_at <= now):
+                return way
+
+        hand = self.BUCKET_HEADER.unpack_from(self._mmap, bucket_offset)[0] % self._ways
+
+        while True:
+            flags_offset = entries_offset + hand * slab[4] + 32
+
+            if not self._mmap[flags_offset] & self.FLAG_REFERENCED:
+                break
+
+            self._mmap[flags_offset] &= ~self.FLAG_REFERENCED
+            hand = (hand + 1) % self._ways
+
+        self.BUCKET_HEADER.pack_into(self._mmap, bucket_offset, (hand + 1) % self._ways)
+
+        return hand
+
+    def _delete_from_slab(self, slab, digest, generation):
+        '''This method removes the given digest from the given slab class (if it is stored there).'''
+
+        bucket_offset = self._get_bucket_offset(slab, digest)
+
+        if self._find_way(slab, bucket_offset, digest, generation) is None:
+            return
+
+        with self._bucket_lock(bucket_offset):
+            way = self._find_way(slab, bucket_offset, digest, generation)
+
+            if way is not None:
+                entry_offset = bucket_offset + self.BUCKET_HEADER_SIZE + way * slab[4]
+
+                self.ENTRY.pack_into(self._mmap, entry_offset, digest, 0, 0, 0, 0)
+
+    @staticmethod
+    def _get_default_path():
+        '''This method returns the default location of the cache file (inside the private folder of the current user).'''
+
+        return os.path.join(get_private_folder(), "cache")
+
+_INSTANCES = weakref.WeakSet()
+
+@POST_FORK_HOOKS.register
+def reset_after_fork():
+    '''This function recreates the thread locks of all shared memory caches in a newly forked worker.'''
+
+    for cache in list(_INSTANCES):
+        cache.reset()
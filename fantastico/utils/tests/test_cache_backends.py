@@ -0,0 +1,171 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.tests.test_cache_backends
+'''
+from fantastico.exceptions import FantasticoSettingNotFoundError, FantasticoUnsafeFileError
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.cache_backends import FileCacheBackend, CacheRegistry, model_tag
+from fantastico.utils.invalidation_bus import InvalidationBus
+from fantastico.utils.lru_cache import LruCache
+from mock import Mock
+import os
+import shutil
+import tempfile
+
+class FileCacheBackendTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for local file cache backend.'''
+
+    def init(self):
+        '''This method creates a temporary cache folder for each test case.'''
+
+        self._folder = tempfile.mkdtemp()
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=100)
+
+        self._cache = FileCacheBackend(self._folder, time_provider=self._time_provider)
+
+    def cleanup(self):
+        '''This method removes the temporary cache folder.'''
+
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def test_get_set_delete_ok(self):
+        '''This test case ensures values can be cached, retrieved and removed correctly.'''
+
+        self._cache.set("key1", {"sample": b"value"})
+
+        self.assertEqual({"sample": b"value"}, self._cache.get("key1"))
+        self.assertTrue("key1" in self._cache)
+        self.assertEqual("default", self._cache.get("key2", "default"))
+
+        self._cache.delete("key1")
+        self._cache.delete("key1")
+
+        self.assertIsNone(self._cache.get("key1"))
+
+    def test_shared_between_instances(self):
+        '''This test case ensures entries written by one backend instance (e.g: another worker) are visible to others.'''
+
+        self._cache.set("key1", "value1")
+
+        self.assertEqual("value1", FileCacheBackend(self._folder).get("key1"))
+
+    def test_ttl_clear(self):
+        '''This test case ensures expired entries are discarded and clear removes all entries.'''
+
+        self._cache.set("key1", "value1", ttl=10)
+        self._cache.set("key2", "value2")
+
+        self._time_provider.time.return_value = 110
+
+        self.assertIsNone(self._cache.get("key1"))
+        self.assertEqual("value2", self._cache.get("key2"))
+
+        self._cache.clear()
+
+        self.assertIsNone(self._cache.get("key2"))
+
+    def test_private_folder(self):
+        '''This test case ensures missing folders are created private and folders accessible by other users are refused.'''
+
+        folder = os.path.join(self._folder, "entries")
+
+        FileCacheBackend(folder)
+
+        self.assertEqual(0o700, os.stat(folder).st_mode & 0o777)
+
+        os.chmod(folder, 0o777)
+
+        with self.assertRaises(FantasticoUnsafeFileError):
+            FileCacheBackend(folder)
+
+        os.symlink(self._folder, os.path.join(self._folder, "link"))
+
+        with self.assertRaises(FantasticoUnsafeFileError):
+            FileCacheBackend(os.path.join(self._folder, "link"))
+
+class CacheRegistryTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for cache registry.'''
+
+    def init(self):
+        '''This method builds a registry configured with an in process backend.'''
+
+        self._cache_config = {"default_backend": "memory",
+                              "backends": {"memory": {"backend": "fantastico.utils.lru_cache.LruCache", "max_size": 10}}}
+
+        settings_facade = Mock()
+        settings_facade.get = Mock(side_effect=lambda key: self._cache_config)
+
+        self._invalidation_bus = InvalidationBus()
+        self._registry = CacheRegistry(settings_facade=Mock(return_value=settings_facade),
+                                       invalidation_bus=self._invalidation_bus)
+
+    def test_get_backend_ok(self):
+        '''This test case ensures backends are built from configuration only once.'''
+
+        backend = self._registry.get_backend()
+
+        self.assertIsInstance(backend, LruCache)
+        self.assertEqual(10, backend.max_size)
+        self.assertIs(backend, self._registry.get_backend("memory"))
+        self.assertEqual({"memory": backend}, self._registry.backends)
+
+    def test_get_backend_notconfigured(self):
+        '''This test case ensures a concrete exception is raised for unknown backends.'''
+
+        with self.assertRaises(FantasticoSettingNotFoundError):
+            self._registry.get_backend("shared")
+
+    def test_tags_invalidation(self):
+        '''This test case ensures invalidating a tag changes its version in all built backends.'''
+
+        backend = self._registry.get_backend()
+        other_backend = self._registry.register("other", LruCache())
+
+        versions = self._registry.get_tags_versions(backend, ["tag1", "tag2"])
+        other_versions = self._registry.get_tags_versions(other_backend, ["tag1"])
+
+        self.assertEqual(versions, self._registry.get_tags_versions(backend, ["tag1", "tag2"]))
+
+        self._registry.invalidate("tag1")
+
+        new_versions = self._registry.get_tags_versions(backend, ["tag1", "tag2"])
+
+        self.assertNotEqual(versions[0], new_versions[0])
+        self.assertEqual(versions[1], new_versions[1])
+        self.assertNotEqual(other_versions, self._registry.get_tags_versions(other_backend, ["tag1"]))
+
+    def test_tags_invalidation_otherworker(self):
+        '''This test case ensures tags invalidated by other workers (published on invalidation bus) change tags versions of
+        process private backends.'''
+
+        backend = self._registry.get_backend()
+
+        versions = self._registry.get_tags_versions(backend, ["tag1", "tag2"])
+
+        self._invalidation_bus.publish("tag:tag2")
+
+        new_versions = self._registry.get_tags_versions(backend, ["tag1", "tag2"])
+
+        self.assertEqual(versions[0], new_versions[0])
+        self.assertNotEqual(versions[1], new_versions[1])
+
+    def test_model_tag(self):
+        '''This test case ensures model tags are built from model class full name.'''
+
+        self.assertEqual("model:fantastico.utils.lru_cache.LruCache", model_tag(LruCache))
+        self.assertEqual("model:fantastico.utils.lru_cache.LruCache", model_tag("fantastico.utils.lru_cache.LruCache"))
@@ -141,6 +141,37 @@ class DictionaryObjectTests(FantasticoUnitTestsCase):
         self.assertNotEqual(obj1, obj2)
         self.assertNotEqual(hash(obj1), hash(obj2))
 
+    def test_dictionary_view_nocopy(self):
+        '''This test case ensures a dictionary object view reads and writes directly into the given dictionary.'''
+
+        desc = {"attr1": "abcd",
+                "address": {"street": "17, Dreams Street"}}
+
+        obj = DictionaryObject.view(desc, immutable=False)
+
+        self.assertEqual(desc["attr1"], obj.attr1)
+        self.assertIsInstance(obj.address, DictionaryObject)
+
+        obj.address.street = "street changed"
+        obj.attr2 = "new attr"
+        obj.attr1 = None
+
+        self.assertEqual({"attr2": "new attr", "address": {"street": "street changed"}}, desc)
+        self.assertRaises(AttributeError, lambda: obj.attr1)
+
+    def test_dictionary_view_immutable(self):
+        '''This test case ensures immutable dictionary object views can not be changed.'''
+
+        obj = MockDictionaryObject.view({"attr1": "abcd"})
+
+        self.assertIsInstance(obj, MockDictionaryObject)
+        self.assertEqual(MockDictionaryObject({"attr1": "abcd"}), obj)
+
+        def set_attr(obj):
+            obj.attr1 = "changed"
+
+        self.assertRaises(AttributeError, set_attr, obj)
+
 class MockDictionaryObject(DictionaryObject):
     '''A very simple mock object used for testing dictionary object.'''
 
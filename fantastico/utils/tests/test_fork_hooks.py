@@ -0,0 +1,100 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.tests.test_fork_hooks
+'''
+from fantastico import mvc
+from fantastico.mvc import DbSessionManager
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils import fork_hooks
+from fantastico.utils.fork_hooks import ForkHooks
+from mock import Mock
+import os
+
+class ForkHooksTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for post fork hooks registry.'''
+
+    def test_run_once_per_process(self):
+        '''This test case ensures hooks are invoked in order, only once per process and failing hooks do not stop the others.'''
+
+        calls = []
+
+        hooks = ForkHooks()
+        hooks.register(lambda: calls.append("hook1"))
+
+        failing_hook = hooks.register(Mock(side_effect=Exception("Unexpected error")))
+        hooks.register(failing_hook)
+
+        hooks.register(lambda: calls.append("hook2"))
+
+        self.assertEqual(3, len(hooks.hooks))
+        self.assertFalse(hooks.run())
+        self.assertEqual([], calls)
+
+        self.assertTrue(hooks.run(force=True))
+        self.assertEqual(["hook1", "hook2"], calls)
+        failing_hook.assert_called_once_with()
+
+    def test_db_engine_discarded(self):
+        '''This test case ensures the registered database hook discards the inherited engine without closing it.'''
+
+        self.assertTrue(mvc.reset_after_fork in fork_hooks.POST_FORK_HOOKS.hooks)
+
+        engine = Mock()
+        old_conn_manager = mvc.CONN_MANAGER
+
+        DbSessionManager.ENGINE = engine
+        mvc.CONN_MANAGER = Mock()
+
+        try:
+            mvc.reset_after_fork()
+
+            self.assertIsNone(DbSessionManager.ENGINE)
+            self.assertIsNone(DbSessionManager.SESSION)
+            self.assertEqual(0, engine.dispose.call_count)
+            self.assertIs(engine, DbSessionManager.FORKED_ENGINES.pop())
+
+            mvc.CONN_MANAGER.discard_connections.assert_called_once_with()
+        finally:
+            mvc.CONN_MANAGER = old_conn_manager
+
+    def test_hooks_run_in_forked_child(self):
+        '''This test case ensures global hooks are invoked automatically (and only once, even if they are invoked again
+        explicitly as uWSGI post fork hook does) in processes created with os.fork.'''
+
+        if not hasattr(os, "register_at_fork"):
+            return
+
+        read_fd, write_fd = os.pipe()
+
+        hook = lambda: os.write(write_fd, b"forked")
+
+        fork_hooks.POST_FORK_HOOKS.register(hook)
+
+        try:
+            pid = os.fork()
+
+            if pid == 0:
+                fork_hooks.POST_FORK_HOOKS.run()
+                os._exit(0) # pylint: disable=W0212
+
+            os.waitpid(pid, 0)
+            os.close(write_fd)
+
+            self.assertEqual(b"forked", os.read(read_fd, 12))
+        finally:
+            fork_hooks.POST_FORK_HOOKS._hooks.remove(hook) # pylint: disable=W0212
+            os.close(read_fd)
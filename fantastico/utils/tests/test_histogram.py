@@ -0,0 +1,47 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+
+.. py:module:: fantastico.utils.tests.test_histogram
+'''
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.histogram import Histogram
+
+class HistogramTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for fixed buckets histogram.'''
+
+    def test_observe_ok(self):
+        '''This test case ensures observed values are counted into cumulative buckets.'''
+
+        histogram = Histogram(buckets=[1, 0.1])
+
+        for value in [0.05, 0.1, 0.5, 7]:
+            histogram.observe(value)
+
+        self.assertEqual((0.1, 1), histogram.bounds)
+        self.assertEqual(4, histogram.count)
+        self.assertAlmostEqual(7.65, histogram.sum)
+        self.assertEqual([(0.1, 2), (1, 3), (float("inf"), 4)], histogram.buckets)
+
+    def test_reset_ok(self):
+        '''This test case ensures all observed values can be discarded.'''
+
+        histogram = Histogram()
+        histogram.observe(0.2)
+        histogram.reset()
+
+        self.assertEqual(0, histogram.count)
+        self.assertEqual(0.0, histogram.sum)
@@ -0,0 +1,175 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.tests.test_invalidation_bus
+'''
+from fantastico.exceptions import FantasticoUnsafeFileError
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.invalidation_bus import InvalidationBus, table_topic, client_topic, tag_topic
+from mock import Mock, patch
+import os
+import shutil
+import tempfile
+
+class InvalidationBusTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for cross worker invalidation bus.'''
+
+    def init(self):
+        '''This method creates a temporary folder for the shared counters file.'''
+
+        self._folder = tempfile.mkdtemp()
+        self._file_path = os.path.join(self._folder, "invalidations")
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=100)
+        self._buses = []
+
+    def cleanup(self):
+        '''This method releases all buses and removes the temporary folder.'''
+
+        for bus in self._buses:
+            bus.close()
+
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def _build_bus(self, file_path=None):
+        '''This method builds a bus polled at most once every 5 seconds.'''
+
+        bus = InvalidationBus(file_path, slots=64, poll_interval=5, time_provider=self._time_provider)
+        self._buses.append(bus)
+
+        return bus
+
+    def test_publish_local_subscribers(self):
+        '''This test case ensures subscribers of the publishing process are notified immediately.'''
+
+        bus = self._build_bus()
+        menus_callback, clients_callback = Mock(), Mock()
+
+        bus.subscribe("table:menus", menus_callback)
+        bus.subscribe("client:*", clients_callback)
+
+        bus.publish("client:abc")
+
+        self.assertEqual(0, menus_callback.call_count)
+        clients_callback.assert_called_once_with()
+        self.assertEqual(1, bus.generation("client:abc"))
+        self.assertEqual(1, bus.generation("client:*"))
+
+        bus.publish("table:menus", "table:pages")
+
+        menus_callback.assert_called_once_with()
+        self.assertEqual(1, clients_callback.call_count)
+
+    def test_publish_other_workers(self):
+        '''This test case ensures publishes of another worker process are noticed on poll (bounded by poll interval).'''
+
+        bus = self._build_bus(self._file_path)
+        callback = Mock()
+
+        bus.subscribe("table:menus", callback)
+        bus.poll()
+
+        pid = os.fork()
+
+        if pid == 0:
+            InvalidationBus(self._file_path, slots=64).publish("table:menus")
+
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+
+        self.assertEqual(1, bus.generation("table:menus"))
+        self.assertFalse(bus.poll())
+        self.assertEqual(0, callback.call_count)
+
+        self._time_provider.time.return_value = 105
+
+        self.assertTrue(bus.poll())
+        callback.assert_called_once_with()
+
+        self.assertTrue(bus.poll(force=True))
+        self.assertEqual(1, callback.call_count)
+
+    def test_callback_failure(self):
+        '''This test case ensures a failing subscriber does not prevent other subscribers from being notified.'''
+
+        bus = self._build_bus()
+        callback = Mock()
+
+        bus.subscribe("tag:homepage", Mock(side_effect=Exception("Unexpected exception.")))
+        bus.subscribe("tag:homepage", callback)
+
+        bus.publish("tag:homepage")
+
+        callback.assert_called_once_with()
+
+    def test_configure_keeps_subscriptions(self):
+        '''This test case ensures subscriptions survive remapping the bus on a shared file.'''
+
+        bus = self._build_bus()
+        callback = Mock()
+
+        bus.subscribe("table:menus", callback)
+        bus.publish("table:pages")
+        bus.configure(self._file_path)
+
+        self.assertEqual(self._file_path, bus.file_path)
+        self.assertEqual(0, bus.generation("table:pages"))
+
+        self._build_bus(self._file_path).publish("table:menus")
+
+        self.assertTrue(bus.poll(force=True))
+        callback.assert_called_once_with()
+
+    def test_configure_unsafe_file(self):
+        '''This test case ensures counters files accessible by other users are rejected and counters stay private.'''
+
+        with open(self._file_path, "wb"):
+            pass
+
+        os.chmod(self._file_path, 0o644)
+
+        bus = self._build_bus()
+
+        with self.assertRaises(FantasticoUnsafeFileError):
+            bus.configure(self._file_path)
+
+        self.assertIsNone(bus.file_path)
+
+        bus.publish("table:menus")
+
+        self.assertEqual(1, bus.generation("table:menus"))
+
+    def test_configure_private_folder(self):
+        '''This test case ensures the counters file is created into the private folder of the current user when requested.'''
+
+        with patch.dict(os.environ, {"XDG_RUNTIME_DIR": self._folder}):
+            bus = self._build_bus(True)
+
+        file_path = os.path.join(self._folder, "fantastico", "invalidations")
+
+        self.assertEqual(file_path, bus.file_path)
+        self.assertEqual(0o600, os.stat(file_path).st_mode & 0o777)
+
+    def test_topics(self):
+        '''This test case ensures topics are built correctly.'''
+
+        class Menu(object):
+            __tablename__ = "menus"
+
+        self.assertEqual("table:menus", table_topic(Menu))
+        self.assertEqual("client:abc", client_topic("abc"))
+        self.assertEqual("tag:homepage", tag_topic("homepage"))
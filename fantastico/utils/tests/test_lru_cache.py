@@ -0,0 +1,90 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.tests.test_lru_cache
+'''
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.lru_cache import LruCache
+from mock import Mock
+
+class LruCacheTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for in process lru cache.'''
+
+    def test_get_set_ok(self):
+        '''This test case ensures values can be cached and retrieved correctly.'''
+
+        cache = LruCache(max_size=2)
+
+        cache.set("key1", "value1")
+
+        self.assertEqual("value1", cache.get("key1"))
+        self.assertIsNone(cache.get("key2"))
+        self.assertEqual("default", cache.get("key2", "default"))
+        self.assertTrue("key1" in cache)
+
+    def test_lru_eviction(self):
+        '''This test case ensures the least recently used entry is evicted when the cache is full.'''
+
+        cache = LruCache(max_size=2)
+
+        cache.set("key1", "value1")
+        cache.set("key2", "value2")
+        cache.get("key1")
+        cache.set("key3", "value3")
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual("value1", cache.get("key1"))
+        self.assertIsNone(cache.get("key2"))
+        self.assertEqual("value3", cache.get("key3"))
+
+    def test_ttl_expiration(self):
+        '''This test case ensures entries cached with a ttl expire.'''
+
+        time_provider = Mock()
+        time_provider.time = Mock(return_value=100)
+
+        cache = LruCache(time_provider=time_provider)
+
+        cache.set("key1", "value1", ttl=10)
+        cache.set("key2", "value2")
+
+        time_provider.time.return_value = 109
+
+        self.assertEqual("value1", cache.get("key1"))
+
+        time_provider.time.return_value = 110
+
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual("value2", cache.get("key2"))
+        self.assertEqual(1, len(cache))
+
+    def test_delete_clear(self):
+        '''This test case ensures entries can be removed from cache.'''
+
+        cache = LruCache()
+
+        cache.set("key1", "value1")
+        cache.set("key2", "value2")
+
+        cache.delete("key1")
+        cache.delete("key_notfound")
+
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(1, len(cache))
+
+        cache.clear()
+
+        self.assertEqual(0, len(cache))
@@ -0,0 +1,197 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.tests.test_metrics
+'''
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.metrics import MetricsRegistry, MmapMetricsStore
+from mock import Mock
+import json
+import os
+import tempfile
+
+class MetricsRegistryTests(FantasticoUnitTestsCase):
+    '''This class provides the tests suite for metrics registry and shared memory metrics store.'''
+
+    _time_provider = None
+    _registry = None
+    _store_path = None
+
+    def init(self):
+        '''This method is invoked automatically in order to set common dependencies for all test cases.'''
+
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=100.0)
+
+        self._registry = MetricsRegistry(time_provider=self._time_provider)
+
+        file_desc, self._store_path = tempfile.mkstemp()
+        os.close(file_desc)
+
+    def cleanup(self):
+        '''This method removes the shared memory file used by test cases.'''
+
+        self._registry.configure(None)
+
+        os.remove(self._store_path)
+
+    def test_render_ok(self):
+        '''This test case ensures counters, gauges and histograms are rendered correctly in prometheus text format.'''
+
+        self._registry.counter("requests_total", "Requests.", {"handler": "a.\"b\""}).inc(2)
+        self._registry.gauge("pool_size", "Pool size.", callback=lambda: 5)
+        self._registry.histogram("latency_seconds", "Latency.", buckets=[0.1, 1.0]).observe(0.5)
+
+        expected = ["# HELP latency_seconds Latency.",
+                    "# TYPE latency_seconds histogram",
+                    "latency_seconds_bucket{le=\"0.1\"} 0.0",
+                    "latency_seconds_bucket{le=\"1.0\"} 1.0",
+                    "latency_seconds_bucket{le=\"+Inf\"} 1.0",
+                    "latency_seconds_sum 0.5",
+                    "latency_seconds_count 1.0",
+                    "# HELP pool_size Pool size.",
+                    "# TYPE pool_size gauge",
+                    "pool_size 5.0",
+                    "# HELP requests_total Requests.",
+                    "# TYPE requests_total counter",
+                    "requests_total{handler=\"a.\\\"b\\\"\"} 2.0"]
+
+        self.assertEqual("\n".join(expected) + "\n", self._registry.render())
+
+    def test_timed_ok(self):
+        '''This test case ensures timed decorator records the duration of each call (including failed calls).'''
+
+        self._time_provider.time = Mock(side_effect=[1.0, 3.0, 10.0, 11.0])
+
+        @self._registry.timed("calls_seconds", labels={"operation": "sample"})
+        def sample(fail):
+            if fail:
+                raise ValueError("fail")
+
+            return "result"
+
+        self.assertEqual("result", sample(False))
+        self.assertRaises(ValueError, sample, True)
+
+        histogram = self._registry.histogram("calls_seconds", labels={"operation": "sample"})
+
+        self.assertEqual(2, histogram.count)
+        self.assertEqual(3.0, histogram.sum)
+
+    def test_metric_type_mismatch(self):
+        '''This test case ensures a metric name can not be registered with two different types.'''
+
+        self._registry.counter("sample_metric")
+
+        self.assertRaises(ValueError, self._registry.gauge, "sample_metric")
+
+    def test_collect_workers_aggregated(self):
+        '''This test case ensures metrics published by all alive workers are summed when collected.'''
+
+        store = MmapMetricsStore(self._store_path, slots=4, slot_size=4096)
+        self._registry.configure(store, publish_interval=5)
+
+        self._registry.counter("requests_total").inc(3)
+        self._registry.histogram("latency_seconds", buckets=[1.0]).observe(0.5)
+
+        self.assertTrue(self._registry.publish())
+        self.assertFalse(self._registry.publish())
+
+        worker_snapshot = json.dumps([["requests_total", [], 4.0],
+                                      ["latency_seconds", [], {"buckets": [[1.0, 0]], "count": 1, "sum": 2.0}]]).encode()
+
+        with open(self._store_path, "r+b") as store_file:
+            store_file.seek(4096)
+            store_file.write(MmapMetricsStore.SLOT_HEADER.pack(os.getppid(), len(worker_snapshot)) + worker_snapshot)
+
+        metrics = {name: value for name, _, value in self._registry.collect()}
+
+        self.assertEqual(7.0, metrics["requests_total"])
+        self.assertEqual({"buckets": [[1.0, 1]], "count": 2, "sum": 2.5}, metrics["latency_seconds"])
+
+    def test_store_snapshot_too_large(self):
+        '''This test case ensures snapshots which do not fit into a slot are not published.'''
+
+        store = MmapMetricsStore(self._store_path, slots=1, slot_size=32)
+
+        self.assertFalse(store.publish([["requests_total", [["handler", "a" * 64]], 1.0]]))
+        self.assertFalse(store.publish([["requests_total", [["handler", "a" * 64]], 2.0]]))
+        self.assertEqual([], store.read_all())
+        self.assertEqual(2, store.overflows)
+
+        store.close()
+
+    def test_dead_workers_retained(self):
+        '''This test case ensures counters and histograms of dead workers are retained (and gauges discarded) so that
+        aggregated counters never go down when workers are recycled.'''
+
+        store = MmapMetricsStore(self._store_path, slots=2, slot_size=4096)
+        self._registry.configure(store)
+
+        self._registry.counter("requests_total").inc(3)
+        self._registry.gauge("inflight").set(1)
+
+        dead_pid = self._get_dead_pid()
+
+        for slot_idx in range(2):
+            dead_snapshot = json.dumps([["requests_total", [], 4.0, "counter"],
+                                        ["inflight", [], 2.0, "gauge"],
+                                        ["latency_seconds", [], {"buckets": [[1.0, 1]], "count": 1, "sum": 0.5},
+                                         "histogram"]]).encode()
+
+            with open(self._store_path, "r+b") as store_file:
+                store_file.seek(slot_idx * 4096)
+                store_file.write(MmapMetricsStore.SLOT_HEADER.pack(dead_pid, len(dead_snapshot)) + dead_snapshot)
+
+            metrics = {name: value for name, _, value in self._registry.collect()}
+
+            self.assertEqual(3.0 + 4.0 * (slot_idx + 1), metrics["requests_total"])
+            self.assertEqual(1.0, metrics["inflight"])
+            self.assertEqual({"buckets": [[1.0, slot_idx + 1]], "count": slot_idx + 1, "sum": 0.5 * (slot_idx + 1)},
+                             metrics["latency_seconds"])
+
+    def _get_dead_pid(self):
+        '''This method returns the identifier of a process which already exited.'''
+
+        pid = os.fork()
+
+        if not pid:
+            os._exit(0) # pylint: disable=W0212
+
+        os.waitpid(pid, 0)
+
+        return pid
+
+    def test_breakdown_nested(self):
+        '''This test case ensures categorized timers report into the active breakdown and nested breakdowns are added to the
+        enclosing one.'''
+
+        self._time_provider.time = Mock(side_effect=[0.0, 1.0, 5.0, 7.0])
+
+        with self._registry.timer("outside_seconds", category="db"):
+            pass
+
+        outer = self._registry.start_breakdown()
+        inner = self._registry.start_breakdown()
+
+        with self._registry.timer("db_seconds", category="db"):
+            pass
+
+        self.assertIs(inner, self._registry.stop_breakdown())
+        self.assertIs(outer, self._registry.stop_breakdown())
+
+        self.assertEqual({"db": 2.0}, inner)
+        self.assertEqual({"db": 2.0}, outer)
@@ -0,0 +1,224 @@
+'''
+Copyright 2013 Cosnita Radu Viorel
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+.. codeauthor:: Radu Viorel Cosnita <radu.cosnita@gmail.com>
+.. py:module:: fantastico.utils.tests.test_shared_cache
+'''
+from fantastico.exceptions import FantasticoUnsafeFileError
+from fantastico.tests.base_case import FantasticoUnitTestsCase
+from fantastico.utils.shared_cache import SharedMemoryCache
+from mock import Mock
+import os
+import shutil
+import tempfile
+
+class SharedMemoryCacheTests(FantasticoUnitTestsCase):
+    '''This class provides the test cases for memory mapped cache shared by worker processes.'''
+
+    def init(self):
+        '''This method creates a temporary folder for the cache file of each test case.'''
+
+        self._folder = tempfile.mkdtemp()
+        self._path = os.path.join(self._folder, "cache")
+        self._time_provider = Mock()
+        self._time_provider.time = Mock(return_value=100)
+        self._caches = []
+
+    def cleanup(self):
+        '''This method releases all caches and removes the temporary folder.'''
+
+        for cache in self._caches:
+            cache.close()
+
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def _build_cache(self, **kwargs):
+        '''This method builds a cache mapped on the temporary file.'''
+
+        kwargs.setdefault("slabs", [(64, 16), (1024, 8)])
+        kwargs.setdefault("ways", 4)
+
+        cache = SharedMemoryCache(self._path, time_provider=self._time_provider, **kwargs)
+        self._caches.append(cache)
+
+        return cache
+
+    def test_get_set_delete_ok(self):
+        '''This test case ensures values can be cached, retrieved, replaced and removed correctly.'''
+
+        cache = self._build_cache()
+
+        cache.set("key1", "value1")
+        cache.set(("key", 2), {"sample": b"value"})
+
+        self.assertEqual("value1", cache.get("key1"))
+        self.assertEqual({"sample": b"value"}, cache.get(("key", 2)))
+        self.assertEqual("default", cache.get("key3", "default"))
+        self.assertTrue("key1" in cache)
+        self.assertEqual(2, len(cache))
+
+        cache.set("key1", "x" * 500)
+
+        self.assertEqual("x" * 500, cache.get("key1"))
+        self.assertEqual(2, len(cache))
+
+        cache.delete("key1")
+
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(1, len(cache))
+
+    def test_shared_between_processes(self):
+        '''This test case ensures entries written by a worker process are visible to other processes.'''
+
+        cache = self._build_cache()
+        cache.set("key1", "value1")
+
+        pid = os.fork()
+
+        if pid == 0:
+            child_cache = SharedMemoryCache(self._path, slabs=[(64, 16), (1024, 8)], ways=4)
+            child_cache.set("key2", child_cache.get("key1") + " from child")
+
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+
+        self.assertEqual("value1 from child", cache.get("key2"))
+
+    def test_ttl_expiration(self):
+        '''This test case ensures entries cached with a ttl expire.'''
+
+        cache = self._build_cache()
+
+        cache.set("key1", "value1", ttl=10)
+        cache.set("key2", "value2")
+
+        self._time_provider.time.return_value = 110
+
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual("value2", cache.get("key2"))
+
+    def test_clock_eviction(self):
+        '''This test case ensures a full bucket evicts entries which were not recently read.'''
+
+        cache = self._build_cache(slabs=[(64, 4)], ways=4)
+
+        for idx in range(4):
+            cache.set("key%s" % idx, idx)
+
+        cache.get("key0")
+        cache.get("key2")
+
+        cache.set("key4", 4)
+
+        self.assertEqual(4, len(cache))
+        self.assertEqual(0, cache.get("key0"))
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(2, cache.get("key2"))
+        self.assertEqual(4, cache.get("key4"))
+
+    def test_too_large_values(self):
+        '''This test case ensures values bigger than the biggest slab item are not cached.'''
+
+        cache = self._build_cache()
+
+        cache.set("key1", "value1")
+        cache.set("key1", "x" * 2048)
+
+        self.assertEqual(1024, cache.max_item_size)
+        self.assertIsNone(cache.get("key1"))
+
+    def test_clear_layout_change(self):
+        '''This test case ensures clear discards all entries and a different layout is mapped from its own file.'''
+
+        cache = self._build_cache()
+
+        cache.set("key1", "value1")
+        cache.clear()
+
+        self.assertIsNone(cache.get("key1"))
+
+        cache.set("key1", "value1")
+
+        self.assertEqual("value1", self._build_cache().get("key1"))
+
+        other_cache = self._build_cache(ways=2)
+
+        self.assertIsNone(other_cache.get("key1"))
+        self.assertNotEqual(cache.path, other_cache.path)
+        self.assertEqual("value1", cache.get("key1"))
+
+    def test_unexpected_file_refused(self):
+        '''This test case ensures files which are not private or do not have the expected layout are never mapped (nor
+        truncated).'''
+
+        cache = self._build_cache()
+
+        with open(cache.path, "wb") as cache_file:
+            cache_file.write(b"not a cache file")
+
+        with self.assertRaises(FantasticoUnsafeFileError):
+            cache.get("key1")
+
+        with open(cache.path, "rb") as cache_file:
+            self.assertEqual(b"not a cache file", cache_file.read())
+
+        os.remove(cache.path)
+        os.symlink(os.path.join(self._folder, "target"), cache.path)
+
+        with self.assertRaises(FantasticoUnsafeFileError):
+            cache.get("key1")
+
+        os.remove(cache.path)
+        cache.set("key1", "value1")
+        cache.close()
+
+        os.chmod(cache.path, 0o644)
+
+        with self.assertRaises(FantasticoUnsafeFileError):
+            cache.get("key1")
+
+    def test_default_path_private(self):
+        '''This test case ensures the default cache file is located into a folder private to the current user.'''
+
+        os.environ["XDG_RUNTIME_DIR"], old_runtime_dir = self._folder, os.environ.get("XDG_RUNTIME_DIR")
+
+        try:
+            cache = SharedMemoryCache()
+            self._caches.append(cache)
+        finally:
+            if old_runtime_dir is None:
+                del os.environ["XDG_RUNTIME_DIR"]
+            else:
+                os.environ["XDG_RUNTIME_DIR"] = old_runtime_dir
+
+        self.assertTrue(cache.path.startswith(os.path.join(self._folder, "fantastico", "cache.")))
+        self.assertEqual(0o700, os.stat(os.path.dirname(cache.path)).st_mode & 0o777)
+
+    def test_metrics(self):
+        '''This test case ensures hits and misses are reported when the cache is named.'''
+
+        metrics_registry = Mock()
+        hits, misses = Mock(), Mock()
+        metrics_registry.counter = Mock(side_effect=[hits, misses])
+
+        cache = self._build_cache(name="shared", metrics_registry=metrics_registry)
+
+        cache.set("key1", "value1")
+        cache.get("key1")
+        cache.get("key2")
+
+        hits.inc.assert_called_once_with()
+        misses.inc.assert_called_once_with()